@@ -0,0 +1,168 @@
+"""
+Benchmarks GromacsParser on synthetic ACPYPE-style ITPs, comparing parsing
+with the line tokenizer against matching every handler's pattern against
+every line, as the parser used to:
+
+    python benchmark_parser.py
+    python benchmark_parser.py --lines 1000 10000 100000 --repeats 5
+
+Both paths must split the files into the same sections.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from modules.gromacs.parsers.data_models.section import Section
+from modules.gromacs.parsers.gromacs_parser import GromacsParser
+from modules.gromacs.parsers.handlers.default_handler import DefaultHandler
+
+
+class RegexDispatchParser(GromacsParser):
+    """
+    Parses line by line, trying the pattern of every handler on every line.
+    """
+
+    def parse(self, filepath: str, lazy: bool = False) -> OrderedDict:
+        sections = OrderedDict()
+        current_section = Section(construct_name=None, handler_name=None)
+        with open(filepath, "r") as file:
+            for line in file:
+                line = line.rstrip("\n")
+                construct_name, handler_name, name = self._match_every_handler(line)
+                if construct_name:
+                    key = self._generate_key(
+                        sections, current_section.construct_name, current_section.name
+                    )
+                    sections[key] = current_section
+                    current_section = Section(
+                        construct_name=construct_name,
+                        handler_name=handler_name,
+                        name=name,
+                    )
+                current_section.add_line(line)
+        if current_section.lines:
+            key = self._generate_key(
+                sections, current_section.construct_name, current_section.name
+            )
+            sections[key] = current_section
+        return sections
+
+    def _match_every_handler(self, line: str):
+        for handler_name, handler_class in self.available_handlers.items():
+            if handler_class.re_pattern is None:
+                continue
+            match = handler_class.re_pattern.match(line)
+            if match:
+                name = match.group(1) if match.groups() else None
+                self.suppressed_constructs = handler_class.suppress
+                return handler_class.construct_name, handler_name, name
+        return None, DefaultHandler.construct_name, None
+
+
+def write_synthetic_itp(itp_path: str, num_lines: int) -> str:
+    """
+    Writes an ITP of a linear chain with about `num_lines` lines, most of them
+    bonds, angles and dihedrals, as in the ITPs of long polymers.
+    """
+    # Bonds, pairs, angles and 3 dihedrals per atom, plus the atom itself
+    num_atoms = max(num_lines // 7, 4)
+    lines = [
+        "; Synthetic ITP",
+        "",
+        "[ atomtypes ]",
+        ";name   bond_type     mass     charge   ptype   sigma         epsilon",
+        " c3       c3          0.00000  0.00000   A     3.39967e-01   4.57730e-01",
+        " hc       hc          0.00000  0.00000   A     2.64953e-01   6.56888e-02",
+        "",
+        "[ moleculetype ]",
+        ";name            nrexcl",
+        " POL              3",
+        "",
+        "[ atoms ]",
+        ";   nr  type  resi  res  atom  cgnr     charge      mass",
+    ]
+    lines += [
+        f"{i:6d}   c3     1   POL    C{i % 1000:<4d}{i:5d}    -0.091000     12.01000"
+        for i in range(1, num_atoms + 1)
+    ]
+    lines += ["", "[ bonds ]", ";   ai     aj funct   r             k"]
+    lines += [
+        f"{i:6d} {i + 1:6d}   1    1.5375e-01    2.5179e+05"
+        for i in range(1, num_atoms)
+    ]
+    lines += ["", "[ pairs ]", ";   ai     aj    funct"]
+    lines += [f"{i:6d} {i + 3:6d}      1" for i in range(1, num_atoms - 2)]
+    lines += ["", "[ angles ]", ";   ai     aj     ak    funct   theta         cth"]
+    lines += [
+        f"{i:6d} {i + 1:6d} {i + 2:6d}      1    1.1070e+02    3.2635e+02"
+        for i in range(1, num_atoms - 1)
+    ]
+    lines += ["", "[ dihedrals ]", ";    i      j      k      l   func   phase     kd      pn"]
+    lines += [
+        f"{i:6d} {i + 1:6d} {i + 2:6d} {i + 3:6d}      9     0.00   0.65084   {pn}"
+        for i in range(1, num_atoms - 2)
+        for pn in (1, 2, 3)
+    ]
+    lines += ["", "#ifdef POSRES", '#include "posre.itp"', "#endif", ""]
+    with open(itp_path, "w") as file:
+        file.write("\n".join(lines))
+    return itp_path
+
+
+def get_unstored_parser() -> GromacsParser:
+    # Parses the file every time, rather than sharing it through the store
+    parser = GromacsParser()
+    parser.topology_store = None
+    return parser
+
+
+def time_parse(parser: GromacsParser, itp_path: str, repeats: int, **kwargs) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        parser.parse(itp_path, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def check_same_sections(itp_path: str):
+    reference = RegexDispatchParser().parse(itp_path)
+    for lazy in (False, True):
+        sections = get_unstored_parser().parse(itp_path, lazy=lazy)
+        if list(sections) != list(reference) or any(
+            (section.construct_name, section.handler_name, section.name, section.lines)
+            != (
+                reference[key].construct_name,
+                reference[key].handler_name,
+                reference[key].name,
+                reference[key].lines,
+            )
+            for key, section in sections.items()
+        ):
+            raise AssertionError(f"Sections of {itp_path} differ (lazy={lazy}).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--lines", type=int, nargs="+", default=[1000, 10000, 100000]
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'lines':>8} {'regex (s)':>10} {'tokenizer (s)':>14} {'lazy (s)':>9} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for num_lines in args.lines:
+            itp_path = write_synthetic_itp(
+                os.path.join(temp_dir, f"synthetic_{num_lines}.itp"), num_lines
+            )
+            check_same_sections(itp_path)
+            regex_s = time_parse(RegexDispatchParser(), itp_path, args.repeats)
+            tokenizer_s = time_parse(get_unstored_parser(), itp_path, args.repeats)
+            lazy_s = time_parse(get_unstored_parser(), itp_path, args.repeats, lazy=True)
+            print(
+                f"{num_lines:>8} {regex_s:>10.4f} {tokenizer_s:>14.4f} {lazy_s:>9.4f}"
+                f" {regex_s / tokenizer_s:>7.1f}x"
+            )
@@ -0,0 +1,25 @@
+"""
+Reports how well the caches of a campaign deliver reuse, from the stats every
+worker process dumps while it runs:
+
+    python cache_stats.py
+    python cache_stats.py --report cache_stats.csv
+
+Caches are listed lowest hit rate first, so a layer that keeps recomputing
+parametrisations or equilibrations shows up at the top.
+"""
+
+import argparse
+from config.paths import CACHE_STATS_DIR
+from modules.cache_store.cache_stats import load_cache_stats, log_cache_stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--stats-dir", default=CACHE_STATS_DIR)
+    parser.add_argument("--report", default=None, metavar="CSV_PATH")
+    args = parser.parse_args()
+
+    stats = load_cache_stats(args.stats_dir)
+    log_cache_stats(stats)
+    if args.report:
+        stats.to_csv(args.report, index=False)
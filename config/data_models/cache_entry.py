@@ -0,0 +1,46 @@
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Set
+
+
+@dataclass
+class CacheEntry:
+    """
+    A single entry of a cache index, with the bookkeeping cache maintenance
+    evicts by. Entries of indexes that do not track accesses have an
+    `accessed_at` of 0.
+    """
+
+    key: str
+    value: Any
+    size_bytes: int = 0
+    accessed_at: float = 0.0
+
+
+@dataclass
+class MaintenanceAction:
+    """
+    A single removal made (or, in a dry run, planned) by cache maintenance:
+    an index entry and the files only it referenced, or an orphaned file.
+    Orphaned files belong to no entry and have no `key`.
+    """
+
+    cache_name: str
+    reason: str
+    key: Optional[str] = None
+    paths: List[str] = field(default_factory=list)
+    bytes_freed: int = 0
+
+
+@dataclass
+class ScannedCacheEntry:
+    """
+    A cache entry as found by cache maintenance: the files it refers to, their
+    combined size and whether any of them has been removed.
+    """
+
+    cache_name: str
+    entry: CacheEntry
+    paths: Set[str] = field(default_factory=set)
+    size_bytes: int = 0
+    accessed_at: float = 0.0
+    dangling: bool = False
@@ -0,0 +1,40 @@
+from dataclasses import dataclass, field
+from typing import Dict
+
+
+@dataclass
+class LatencyHistogram:
+    """
+    Latencies of a cache operation, counted into buckets by their upper bound
+    in seconds (e.g. "0.01"), with "inf" for anything slower.
+    """
+
+    count: int = 0
+    total_s: float = 0.0
+    max_s: float = 0.0
+    buckets: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class CacheStats:
+    """
+    Usage of a single cache in one process. Lookups are retrievals and
+    existence checks that find nothing, so checking a key and then retrieving
+    it counts once. Memory hits are hits served by the in-process memory tier,
+    bytes read are those deserialised from disk.
+    """
+
+    cache_name: str
+    hits: int = 0
+    misses: int = 0
+    memory_hits: int = 0
+    stores: int = 0
+    bytes_read: int = 0
+    bytes_written: int = 0
+    lookup_latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    store_latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
@@ -0,0 +1,34 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+@dataclass
+class StageForecast:
+    """
+    Whether a single stage of a job would be served from a cache or computed.
+    Stages that are never cached have no `cache_name` or `cache_key`.
+    """
+
+    stage: str
+    hit: bool
+    cache_name: Optional[str] = None
+    cache_key: Optional[str] = None
+
+
+@dataclass
+class JobPlan:
+    """
+    Dry-run forecast of a single job: the stages it would go through, in
+    order, and the predicted wall time of the work that is not cached.
+    """
+
+    job_id: str
+    stages: List[StageForecast] = field(default_factory=list)
+    predicted_runtime_s: float = 0.0
+
+    @property
+    def is_cached(self) -> bool:
+        return all(stage.hit for stage in self.stages)
+
+    def get_computed_stages(self) -> List[StageForecast]:
+        return [stage for stage in self.stages if not stage.hit]
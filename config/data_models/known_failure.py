@@ -0,0 +1,34 @@
+from dataclasses import dataclass
+from enum import Enum
+from typing import Optional
+
+
+class FailureReason(Enum):
+    """
+    Classes of deterministic failures worth remembering, so the inputs that
+    caused them are skipped rather than retried.
+    """
+
+    MONOMER_REJECTED = "monomer_rejected"  # e.g. more than one double bond
+    PARAMETERISATION_FAILED = "parameterisation_failed"  # ACPYPE errors
+    GROMPP_FAILED = "grompp_failed"
+    MDRUN_FAILED = "mdrun_failed"
+
+
+@dataclass
+class KnownFailure:
+    """
+    A failure recorded in the failure cache. It only applies to inputs with
+    the same `input_digest`, and until `expires_at` (if set), after which the
+    inputs are tried again.
+    """
+
+    key: str
+    reason: FailureReason
+    message: str
+    input_digest: str
+    failed_at: float
+    expires_at: Optional[float] = None
+
+    def is_expired(self, now: float) -> bool:
+        return self.expires_at is not None and now >= self.expires_at
@@ -0,0 +1,30 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+@dataclass
+class SectionSpan:
+    """
+    Where a section of a parsed file is: its offsets in the file's text, and
+    the construct and handler its first line matched.
+    """
+
+    construct_name: Optional[str]
+    handler_name: Optional[str]
+    name: Optional[str]
+    start: int
+    end: int
+
+
+@dataclass
+class ParsedTopology:
+    """
+    A GROMACS file split into sections, shared by every parse of the same
+    content. `text` is immutable, so sections built from it are independent.
+    """
+
+    text: str
+    digest: str
+    spans: List[SectionSpan] = field(default_factory=list)
+    # Constructs the parser suppresses once the file is parsed
+    suppressed_constructs: Optional[List[str]] = None
@@ -0,0 +1,31 @@
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Dict, List
+
+
+class StageKind(Enum):
+    """
+    Which concurrency pool a stage is run in.
+    """
+
+    CPU = "cpu"  # Python/pandas heavy file preparation, analysis
+    MDRUN = "mdrun"  # Stages dominated by mdrun (or other GROMACS) subprocesses
+
+
+@dataclass
+class PipelineStage:
+    """
+    A single node of a stage graph. `func` is called with the results of the
+    stages in `depends_on` (in order) as positional arguments, followed by
+    `kwargs`. Stages of kind MDRUN also receive `mdrun_flags` when the
+    executor hands out core budgets.
+
+    Stages with the same `stage_id` are merged, so jobs sharing an input (e.g.
+    an equilibrated solvent box) only compute it once.
+    """
+
+    stage_id: str
+    func: Callable[..., Any]
+    kind: StageKind = StageKind.CPU
+    depends_on: List[str] = field(default_factory=list)
+    kwargs: Dict[str, Any] = field(default_factory=dict)
@@ -0,0 +1,49 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+
+@dataclass
+class CoreBudget:
+    """
+    The slice of a node handed to a single job: a contiguous block of cores
+    starting at `pin_offset`, and the memory it is expected to use.
+    """
+
+    n_cores: int
+    pin_offset: int = 0
+    memory_gb: float = 0.0
+
+    def to_mdrun_flags(self) -> List[str]:
+        """
+        Converts the budget into mdrun flags, running one thread-MPI rank with
+        `n_cores` OpenMP threads pinned to this job's block of cores.
+
+        :return: List of mdrun command line flags.
+        """
+        return [
+            "-nt",
+            str(self.n_cores),
+            "-ntomp",
+            str(self.n_cores),
+            "-pin",
+            "on",
+            "-pinoffset",
+            str(self.pin_offset),
+            "-pinstride",
+            "1",
+        ]
+
+
+@dataclass
+class ScheduledJob:
+    """
+    A single polymer/solvent/temperature job, ready to be run by an executor.
+    `target` is called with `kwargs` in a separate process.
+    """
+
+    job_id: str
+    target: Callable[..., Any]
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    atom_count: int = 0
+    predicted_runtime_s: float = 0.0
+    budget: Optional[CoreBudget] = None
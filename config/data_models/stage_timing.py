@@ -0,0 +1,18 @@
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class StageTiming:
+    """
+    Timing of a single mdrun stage, harvested from its `.log` file.
+    """
+
+    stage_name: str
+    atom_count: int
+    nsteps: int
+    n_threads: int
+    wall_time_s: float
+    is_minimisation: bool = False
+    box_volume_nm3: Optional[float] = None
+    log_path: Optional[str] = None
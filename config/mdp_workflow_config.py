@@ -8,6 +8,7 @@ from modules.gromacs.equilibriation.full_equilibriation_workflow import (
     FullEquilibrationWorkflow,
 )
 from modules.cache_store.mdp_cache import MDPCache
+from typing import List, Optional
 import os
 
 mdp_cache = MDPCache(cache_dir=MDP_CACHE_DIR)
@@ -31,11 +32,7 @@ solvent_workflow.add_em_step(
     step_name="minim_2",
     workflow_step=workflow_step,
     template_path=os.path.join(PME_TEMPLATE_DIR, "em.mdp"),
-<<<<<<< HEAD
     base_params={"nsteps": "20000", "emtol": "100"},
-=======
-    base_params={"nsteps": "50000", "emtol": "100"},
->>>>>>> 91758eb (cleaned up)
 )
 
 solvent_workflow.add_thermal_step(
@@ -88,11 +85,7 @@ polymer_workflow.add_em_step(
     step_name="minim_2_RF",
     workflow_step=workflow_step,
     template_path=os.path.join(RF_TEMPLATE_DIR, "em.mdp"),
-<<<<<<< HEAD
     base_params={"nsteps": "20000", "emtol": "100"},
-=======
-    base_params={"nsteps": "50000", "emtol": "100"},
->>>>>>> 91758eb (cleaned up)
 )
 
 polymer_workflow.add_thermal_step(
@@ -100,11 +93,7 @@ polymer_workflow.add_thermal_step(
     workflow_step=workflow_step,
     template_path=os.path.join(RF_TEMPLATE_DIR, "nvt.mdp"),
     base_params={
-<<<<<<< HEAD
         "nsteps": "30000",
-=======
-        "nsteps": "100000",
->>>>>>> 91758eb (cleaned up)
     },
 )
 
@@ -131,11 +120,30 @@ polymer_workflow.add_thermal_step(
     workflow_step=workflow_step,
     template_path=os.path.join(RF_TEMPLATE_DIR, "prod.mdp"),
     base_params={
-<<<<<<< HEAD
         "nsteps": "80000",
-=======
-        "nsteps": "50000",
->>>>>>> 91758eb (cleaned up)
         "dt": "0.002",
     },
 )
+
+
+def set_mdrun_flags(additional_flags: Optional[List[str]]):
+    """
+    Apply the same mdrun flags to every predefined workflow in this process,
+    overriding the per-step thread settings.
+
+    :param additional_flags: Flags passed to mdrun, or None to restore the defaults.
+    """
+    for workflow in (solvent_workflow, minim_workflow, polymer_workflow):
+        workflow.set_additional_flags(additional_flags)
+
+
+def set_checkpoint_dir(checkpoint_dir: Optional[str]):
+    """
+    Run every predefined workflow in this process resumably, keeping mdrun
+    checkpoints and completed step outputs in `checkpoint_dir`.
+
+    :param checkpoint_dir: Directory kept across restarts of a job, or None to
+        run without checkpoints.
+    """
+    for workflow in (solvent_workflow, minim_workflow, polymer_workflow):
+        workflow.set_checkpoint_dir(checkpoint_dir)
@@ -3,13 +3,19 @@ from enum import Enum
 import dataclasses
 from typing import Optional
 
-<<<<<<< HEAD
-TEMP_DIR = "temp"
-=======
 job_id = os.getenv("SLURM_JOB_ID", "local_run")
 TEMP_DIR = f"temp_{job_id}"
->>>>>>> 91758eb (cleaned up)
 LOG_DIR = "logs"
+
+# Jobs running concurrently on one node each get their own scratch and log
+# directories, since workflows delete TEMP_DIR/LOG_DIR when they finish.
+WORKER_ID_ENV_VAR = "POLYMER_MD_WORKER_ID"
+worker_id = os.getenv(WORKER_ID_ENV_VAR)
+if worker_id:
+    TEMP_DIR = f"{TEMP_DIR}_worker_{worker_id}"
+    LOG_DIR = f"{LOG_DIR}_worker_{worker_id}"
+# mdrun checkpoints of each job, kept across restarts and workers
+CHECKPOINT_DIR = "checkpoints"
 TOPOL_NAME = "topol.top"
 MAIN_CACHE_DIR = "cache"
 PREPROCESSED_DIR = "preprocessed"
@@ -19,6 +25,10 @@ EQUILIBRIATED_SOLVENT_BOX_DIR = os.path.join(
 )
 SOLVENT_PDB_DIR = os.path.join(PREPROCESSED_DIR, "solvent_pdbs")
 MDP_CACHE_DIR = os.path.join(MAIN_CACHE_DIR, "mdp_cache")
+RUNTIME_HISTORY_PATH = os.path.join(MAIN_CACHE_DIR, "runtime_history.db")
+RUNTIME_MODEL_PATH = os.path.join(MAIN_CACHE_DIR, "runtime_model.json")
+# Cache hit/miss statistics, dumped by every worker process
+CACHE_STATS_DIR = "cache_stats"
 SHORT_POLYMER_BUILDING_BLOCKS_DIR = os.path.join(
     PREPROCESSED_DIR, "parameterised_polymer_building_blocks"
 )
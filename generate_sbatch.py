@@ -0,0 +1,247 @@
+"""
+Generates sbatch scripts for running a campaign as a cost-balanced SLURM job
+array, based on md_slurm.sh:
+
+    python generate_sbatch.py --n-shards 8
+    bash submit_campaign.sh
+
+The prefetch job equilibrates every solvent box of the campaign once, and the
+array tasks (one shard each, see `modules/campaign/sharding.py`) only start
+once it has finished. The current runtime model is frozen next to the scripts,
+so every task balances the shards on the same predicted runtimes.
+
+With --workers, the campaign is instead submitted to the shared work queue by
+one job, and the array tasks are workers pulling from it (see
+`modules/campaign/queue_worker.py`), so any number of nodes can drain it:
+
+    python generate_sbatch.py --workers 8
+    bash submit_workers.sh
+
+Sharded arrays need a simulation manager with a solvent prefetch and
+sharding (SimulationManager), work queue arrays one with the work queue
+(PolymerSimulationManager); main.py rejects the flags of a mode its manager
+does not implement.
+"""
+
+from modules.campaign.runtime_predictor import freeze_runtime_model
+from typing import Optional
+import argparse
+import os
+
+HEADER_TEMPLATE = """#!/bin/bash
+#SBATCH --job-name={job_name}
+#SBATCH --output=logs/output_{log_suffix}.log
+#SBATCH --error=logs/error_{log_suffix}.log
+#SBATCH --time={time}
+#SBATCH --nodes=1
+#SBATCH --ntasks=1
+#SBATCH --cpus-per-task={cpus_per_task}
+#SBATCH --mem={mem}
+#SBATCH --signal=B:TERM@{signal_lead_s}
+"""
+
+BODY_TEMPLATE = """
+
+cd $SLURM_SUBMIT_DIR
+
+
+module load miniconda/3
+module load gromacs/2019.3
+conda activate {conda_env}
+
+
+# exec, so the SIGTERM sent before the time limit reaches python, which
+# stops its jobs after their mdruns checkpoint
+exec python main.py {main_args}
+"""
+
+SUBMIT_TEMPLATE = """#!/bin/bash
+set -e
+
+first_job_id=$(sbatch --parsable {first_script})
+echo "Submitted {first_description} job $first_job_id"
+sbatch --dependency=afterok:$first_job_id {array_script}
+"""
+
+
+def generate_sbatch_scripts(
+    n_shards: int,
+    output_dir: str = ".",
+    job_name: str = "polymer_sim",
+    time: str = "12:00:00",
+    prefetch_time: str = "04:00:00",
+    cpus_per_task: int = 16,
+    mem: str = "32G",
+    conda_env: str = "md_env",
+    max_concurrent_tasks: int = 0,
+    signal_lead_s: int = 300,
+    runtime_model_path: Optional[str] = None,
+) -> str:
+    """
+    Writes the prefetch script, the array script and a submit script.
+
+    :param n_shards: Number of array tasks the campaign is split into.
+    :param output_dir: Directory to write the scripts to.
+    :param max_concurrent_tasks: Limit on array tasks running at once, 0 for no limit.
+    :param signal_lead_s: Seconds before the time limit at which jobs get SIGTERM
+        and checkpoint, so the next submission resumes them.
+    :param runtime_model_path: Runtime model every task balances the shards
+        on, defaults to freezing the current model next to the scripts.
+    :return: Path to the submit script.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if not runtime_model_path:
+        runtime_model_path = freeze_runtime_model(
+            os.path.join(output_dir, "runtime_model_frozen.json")
+        )
+    shard_args = f"--n-shards {n_shards} --runtime-model {os.path.abspath(runtime_model_path)}"
+
+    array_range = f"0-{n_shards - 1}"
+    if max_concurrent_tasks:
+        array_range = f"{array_range}%{max_concurrent_tasks}"
+
+    prefetch_script = HEADER_TEMPLATE.format(
+        job_name=f"{job_name}_prefetch",
+        log_suffix="%j",
+        time=prefetch_time,
+        cpus_per_task=cpus_per_task,
+        mem=mem,
+        signal_lead_s=signal_lead_s,
+    ) + BODY_TEMPLATE.format(
+        conda_env=conda_env, main_args=f"--prefetch-only {shard_args}"
+    )
+
+    array_script = (
+        HEADER_TEMPLATE.format(
+            job_name=job_name,
+            log_suffix="%A_%a",
+            time=time,
+            cpus_per_task=cpus_per_task,
+            mem=mem,
+            signal_lead_s=signal_lead_s,
+        )
+        + f"#SBATCH --array={array_range}\n"
+        + BODY_TEMPLATE.format(
+            conda_env=conda_env, main_args=shard_args
+        )
+    )
+
+    prefetch_path = os.path.join(output_dir, "md_slurm_prefetch.sh")
+    array_path = os.path.join(output_dir, "md_slurm_array.sh")
+    submit_path = os.path.join(output_dir, "submit_campaign.sh")
+    for path, content in [
+        (prefetch_path, prefetch_script),
+        (array_path, array_script),
+        (
+            submit_path,
+            SUBMIT_TEMPLATE.format(
+                first_script=prefetch_path,
+                first_description="solvent box prefetch",
+                array_script=array_path,
+            ),
+        ),
+    ]:
+        with open(path, "w") as file:
+            file.write(content)
+        os.chmod(path, 0o755)
+    return submit_path
+
+
+def generate_worker_sbatch_scripts(
+    n_workers: int,
+    output_dir: str = ".",
+    job_name: str = "polymer_worker",
+    time: str = "12:00:00",
+    seed_time: str = "01:00:00",
+    cpus_per_task: int = 16,
+    mem: str = "32G",
+    conda_env: str = "md_env",
+    signal_lead_s: int = 300,
+) -> str:
+    """
+    Writes a script submitting the campaign to the work queue, an array of
+    queue workers and a submit script. Resubmitting the workers alone resumes
+    the campaign.
+
+    :param n_workers: Number of worker array tasks, each one node.
+    :param output_dir: Directory to write the scripts to.
+    :param signal_lead_s: Seconds before the time limit at which workers get
+        SIGTERM, checkpoint their jobs and release them to other workers.
+    :return: Path to the submit script.
+    """
+    header_kwargs = dict(cpus_per_task=cpus_per_task, mem=mem, signal_lead_s=signal_lead_s)
+    seed_script = HEADER_TEMPLATE.format(
+        job_name=f"{job_name}_seed", log_suffix="%j", time=seed_time, **header_kwargs
+    ) + BODY_TEMPLATE.format(conda_env=conda_env, main_args="--seed-queue")
+    worker_script = (
+        HEADER_TEMPLATE.format(
+            job_name=job_name, log_suffix="%A_%a", time=time, **header_kwargs
+        )
+        + f"#SBATCH --array=0-{n_workers - 1}\n"
+        + BODY_TEMPLATE.format(conda_env=conda_env, main_args="--worker")
+    )
+
+    os.makedirs(output_dir, exist_ok=True)
+    seed_path = os.path.join(output_dir, "md_slurm_seed.sh")
+    worker_path = os.path.join(output_dir, "md_slurm_workers.sh")
+    submit_path = os.path.join(output_dir, "submit_workers.sh")
+    for path, content in [
+        (seed_path, seed_script),
+        (worker_path, worker_script),
+        (
+            submit_path,
+            SUBMIT_TEMPLATE.format(
+                first_script=seed_path,
+                first_description="work queue seed",
+                array_script=worker_path,
+            ),
+        ),
+    ]:
+        with open(path, "w") as file:
+            file.write(content)
+        os.chmod(path, 0o755)
+    return submit_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--n-shards", type=int)
+    mode.add_argument("--workers", type=int)
+    parser.add_argument("--output-dir", default=".")
+    parser.add_argument("--job-name", default="polymer_sim")
+    parser.add_argument("--time", default="12:00:00")
+    parser.add_argument("--prefetch-time", default="04:00:00")
+    parser.add_argument("--cpus-per-task", type=int, default=16)
+    parser.add_argument("--mem", default="32G")
+    parser.add_argument("--conda-env", default="md_env")
+    parser.add_argument("--max-concurrent-tasks", type=int, default=0)
+    parser.add_argument("--signal-lead-s", type=int, default=300)
+    args = parser.parse_args()
+
+    if args.workers:
+        submit_path = generate_worker_sbatch_scripts(
+            n_workers=args.workers,
+            output_dir=args.output_dir,
+            time=args.time,
+            cpus_per_task=args.cpus_per_task,
+            mem=args.mem,
+            conda_env=args.conda_env,
+            signal_lead_s=args.signal_lead_s,
+        )
+        print(f"Submit the workers with: bash {submit_path}")
+        raise SystemExit
+
+    submit_path = generate_sbatch_scripts(
+        n_shards=args.n_shards,
+        output_dir=args.output_dir,
+        job_name=args.job_name,
+        time=args.time,
+        prefetch_time=args.prefetch_time,
+        cpus_per_task=args.cpus_per_task,
+        mem=args.mem,
+        conda_env=args.conda_env,
+        max_concurrent_tasks=args.max_concurrent_tasks,
+        signal_lead_s=args.signal_lead_s,
+    )
+    print(f"Submit the campaign with: bash {submit_path}")
@@ -1,8 +1,48 @@
 <<<<<<< HEAD
 from input_data.monomer_smiles import monomer_smiles_list
 from simulation_manager import PolymerSimulationManager
+import argparse
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--seed-queue",
+        action="store_true",
+        help="Submit the campaign to the shared work queue.",
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="Pull jobs from the shared work queue until it is drained.",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Forecast which stages of each job are cached, without running anything.",
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Rerun jobs that failed in an earlier run.",
+    )
+    # Sharded job arrays (see generate_sbatch.py) need a solvent prefetch and
+    # sharding, which PolymerSimulationManager does not implement
+    parser.add_argument("--n-shards", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--prefetch-only", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument(
+        "--runtime-model",
+        default=None,
+        help="Runtime model frozen when the array was submitted, used to "
+        "prioritise the submitted jobs.",
+    )
+    args = parser.parse_args()
+    if args.n_shards or args.prefetch_only:
+        parser.error(
+            "--n-shards and --prefetch-only run a sharded job array, which "
+            "PolymerSimulationManager does not support; generate the scripts "
+            "with generate_sbatch.py --workers instead."
+        )
+
     manager = PolymerSimulationManager(
         solvent_csv="input_data/solvent_data.csv",
         monomer_smiles=monomer_smiles_list,
@@ -10,30 +50,93 @@ if __name__ == "__main__":
         temperatures=[280, 298, 348],
         output_dir="outputs_test_run",
         csv_file_path="output_2_4.csv",
+        runtime_model_path=args.runtime_model,
     )
-
+    if args.plan:
+        manager.plan(plan_file="plan.csv")
+    elif args.worker:
+        if args.seed_queue:
+            manager.seed_queue(retry_failed=args.retry_failed)
+        manager.run_worker()
+    elif args.seed_queue:
+        manager.seed_queue(retry_failed=args.retry_failed)
+    else:
+        manager.run(retry_failed=args.retry_failed)
 =======
 from simulation_manager import SimulationManager
+import argparse
 import datetime
 import os
 
 
-job_id = os.getenv("SLURM_JOB_ID", "local_run")
+# Array tasks share the array's job id so their outputs land in one folder
+job_id = os.getenv("SLURM_ARRAY_JOB_ID", os.getenv("SLURM_JOB_ID", "local_run"))
+task_id = os.getenv("SLURM_ARRAY_TASK_ID")
 script_dir = os.path.dirname(os.path.abspath(__file__))
 os.chdir(script_dir)
 timestamp = datetime.datetime.now().strftime("%m-%d_%H")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--n-shards",
+        type=int,
+        default=None,
+        help="Split the campaign into this many cost-balanced shards, the shard "
+        "to run is taken from SLURM_ARRAY_TASK_ID.",
+    )
+    parser.add_argument(
+        "--prefetch-only",
+        action="store_true",
+        help="Only equilibrate the solvent boxes of the whole campaign.",
+    )
+    parser.add_argument(
+        "--runtime-model",
+        default=None,
+        help="Runtime model frozen when the array was submitted, shards are "
+        "balanced on its predictions rather than on atom counts.",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Forecast which stages of each job are cached, without running anything.",
+    )
+    # Work queue job arrays (see generate_sbatch.py) need the shared work
+    # queue, which SimulationManager does not implement
+    parser.add_argument("--seed-queue", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.seed_queue or args.worker:
+        parser.error(
+            "--seed-queue and --worker run a work queue job array, which "
+            "SimulationManager does not support; generate the scripts with "
+            "generate_sbatch.py --n-shards instead."
+        )
+
+    # Index slices are only used when not sharding
+    index_slices = (
+        {}
+        if args.n_shards or task_id is not None
+        else dict(
+            polymer_start_idx=5,
+            polymer_end_idx=25,
+            solvent_end_idx=10,
+        )
+    )
     manager = SimulationManager(
         parameterised_poly_dir="test_sol",
         parameterised_sol_dir="test_poly",
         temperatures=[298],
         output_dir=f"output_{job_id}_{timestamp}",
-        identifying_tag=job_id,
-        polymer_start_idx=5,
-        solvent_end_idx=5,
-        polymer_end_idx=25,
-        solvent_end_idx=10,
+        identifying_tag=job_id if task_id is None else f"{job_id}_{task_id}",
+        n_shards=args.n_shards,
+        runtime_model_path=args.runtime_model,
+        **index_slices,
     )
+    if args.plan:
+        manager.plan(plan_file=os.path.join(manager.output_dir, "plan.csv"))
+    elif args.prefetch_only:
+        manager.prefetch_solvent_boxes()
+    else:
+        manager.run()
 >>>>>>> 91758eb (cleaned up)
-    manager.run()
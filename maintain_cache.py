@@ -0,0 +1,50 @@
+"""
+Keeps the caches of a campaign within their disk quotas. Run it from the
+campaign directory, between campaigns or while no workers are running:
+
+    python maintain_cache.py --default-quota 50G --dry-run
+    python maintain_cache.py --default-quota 50G --quota picklecache_solvent_cache=10G
+
+Entries whose files were removed (e.g. with a worker's TEMP_DIR) are removed,
+caches over their quota have their least recently used entries evicted along
+with the files only those entries refer to, and cache files no entry refers to
+are deleted. With --dry-run nothing is removed, and the report lists what would be.
+"""
+
+import argparse
+from config.paths import MAIN_CACHE_DIR
+from modules.cache_store.cache_maintenance import (
+    CacheMaintenance,
+    log_maintenance_report,
+    parse_size,
+    write_maintenance_csv,
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--cache-dir", action="append", dest="cache_dirs", default=None
+    )
+    parser.add_argument(
+        "--quota", action="append", default=[], metavar="CACHE_NAME=SIZE"
+    )
+    parser.add_argument("--default-quota", default=None, metavar="SIZE")
+    parser.add_argument("--index-only", action="store_true")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--report", default=None, metavar="CSV_PATH")
+    args = parser.parse_args()
+
+    quotas = {}
+    for quota in args.quota:
+        cache_name, size = quota.rsplit("=", 1)
+        quotas[cache_name] = parse_size(size)
+    maintenance = CacheMaintenance(
+        cache_dirs=args.cache_dirs or [MAIN_CACHE_DIR],
+        quotas=quotas,
+        default_quota=parse_size(args.default_quota) if args.default_quota else None,
+        delete_referenced_files=not args.index_only,
+    )
+    actions = maintenance.run(dry_run=args.dry_run)
+    log_maintenance_report(maintenance, actions, dry_run=args.dry_run)
+    if args.report:
+        write_maintenance_csv(actions, args.report)
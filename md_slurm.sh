@@ -7,6 +7,8 @@
 #SBATCH --ntasks=1
 #SBATCH --cpus-per-task=16
 #SBATCH --mem=32G
+# SIGTERM the batch shell 5 minutes before the time limit, so running mdruns checkpoint
+#SBATCH --signal=B:TERM@300
 
 
 cd $SLURM_SUBMIT_DIR
@@ -17,4 +19,4 @@ module load gromacs/2019.3
 conda activate md_env
 
 
-python main.py
+exec python main.py
@@ -16,10 +16,12 @@ from modules.acpype.acpype_utils import (
 )
 from config.paths import ACPYPE_POLYMER_NAME, TEMP_DIR
 import os
-from typing import Optional
+from typing import Any, Dict, Optional
 
 
 class ACPYPEParameterizer(CommandLineOperation):
+    net_charge: int = 0
+    atom_type: str = "gaff2"
 
     def __init__(
         self,
@@ -53,15 +55,23 @@ class ACPYPEParameterizer(CommandLineOperation):
             "-o",
             "gmx",
             "-n",
-            "0",
+            str(self.net_charge),
             "-a",
-            "gaff2",
+            self.atom_type,
             "-b",
             self.molecule_name,
         ]
 
         return acpype_command
 
+    @classmethod
+    def get_settings(cls) -> Dict[str, Any]:
+        """
+        Settings the parameterisation depends on, for the provenance of
+        results built from it.
+        """
+        return {"net_charge": cls.net_charge, "atom_type": cls.atom_type}
+
     def run(
         self,
         input_file_path: str,
@@ -11,38 +11,64 @@ from typing import Any, Dict, Optional
 import os
 import json
 import hashlib
+import copy
 import logging
+import time
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Tuple
+from modules.cache_store.cache_backend import CacheBackend, SQLiteCacheBackend
+from modules.cache_store.cache_maintenance import get_paths_size, get_referenced_paths
+from modules.cache_store.cache_stats import CacheStatsRecorder, cache_stats
+from modules.cache_store.memory_tier import MemoryTier
 
 logger = logging.getLogger(__name__)
 
 
 class BaseCache(ABC):
     """
-    A base class for caching various types of objects.
+    A base class for caching various types of objects. The index mapping keys
+    to serialised data is kept by a pluggable `CacheBackend`, SQLite by default.
+
+    Caches that identify their stored data (see `_get_memory_token`) keep
+    recently retrieved objects in a memory tier shared by every cache of the
+    process, so e.g. the same solvent box is unpickled once per worker rather
+    than once per temperature and chain length.
+
+    Hits, misses, stores, bytes read and written and latencies are recorded
+    per cache name, see `modules.cache_store.cache_stats`.
     """
 
+    memory_tier: MemoryTier = MemoryTier(max_bytes=256 * 1024**2)
+    # Objects are handed out as copies, so callers modifying them never change
+    # what later retrievals return
+    copy_from_memory: bool = True
+
     def __init__(
         self,
         cache_name: str,
         cache_dir: str = MAIN_CACHE_DIR,
+        backend: Optional[CacheBackend] = None,
     ):
+        """
+        :param cache_name: Name of the cache, its index files are named after it.
+        :param cache_dir: Directory to store the cache in.
+        :param backend: Storage of the cache index, defaults to an SQLite
+            database in `cache_dir` that imports the cache's old JSON index.
+        """
         check_directory_exists(directory_path=cache_dir, make_dirs=True)
+        self.cache_name = cache_name
         self.cache_dir = os.path.abspath(cache_dir)
         self.cache_index_path = os.path.join(self.cache_dir, f"{cache_name}_index.json")
-        self.cache_index = self._load_cache_index()
-
-    def _load_cache_index(self) -> Dict[str, Any]:
-        if os.path.exists(self.cache_index_path):
-            with open(self.cache_index_path, "r") as file:
-                return json.load(file)
-        return {}
+        self.backend = backend or SQLiteCacheBackend(
+            os.path.join(self.cache_dir, f"{cache_name}_index.sqlite"),
+            legacy_index_path=self.cache_index_path,
+        )
 
-    def _save_cache_index(self):
-        """Saves the cache index to a JSON file."""
-        with open(self.cache_index_path, "w") as file:
-            json.dump(self.cache_index, file, indent=4)
+    @property
+    def stats(self) -> CacheStatsRecorder:
+        # Looked up rather than held, so caches stay picklable, e.g. as part of
+        # a job handed to a spawned process
+        return cache_stats.get_recorder(self.cache_name)
 
     def has_key(self, key: str) -> bool:
         """
@@ -51,7 +77,28 @@ class BaseCache(ABC):
         :param key: The key to check.
         :return: True if the key exists, False otherwise.
         """
-        return key in self.cache_index
+        start = time.perf_counter()
+        found = self.backend.has(key)
+        # Found keys are counted as hits when they are retrieved
+        if not found:
+            self.stats.record_lookup(False, time.perf_counter() - start)
+        return found
+
+    def has_keys(self, keys: Iterable[str]) -> Set[str]:
+        """
+        Checks which of the given keys exist in the cache, in one lookup.
+
+        :param keys: The keys to check.
+        :return: The keys that exist.
+        """
+        keys = set(keys)
+        start = time.perf_counter()
+        found = set(self.backend.get_many(keys))
+        if len(found) < len(keys):
+            self.stats.record_lookup(
+                False, time.perf_counter() - start, count=len(keys) - len(found)
+            )
+        return found
 
     def store(self, key: str, data: Any):
         """
@@ -60,8 +107,14 @@ class BaseCache(ABC):
         :param key: The key under which to store the data.
         :param data: The data to store.
         """
-        self.cache_index[key] = self._serialize(data)
-        self._save_cache_index()
+        start = time.perf_counter()
+        value = self._serialize(data)
+        # Sized with the files the data refers to, e.g. trajectories, for quotas
+        size_bytes = get_paths_size(
+            get_referenced_paths(value) | get_referenced_paths(data)
+        )
+        self.backend.set(key, value, size_bytes=size_bytes)
+        self.stats.record_store(size_bytes, time.perf_counter() - start)
 
     def retrieve(self, key: str) -> Optional[Any]:
         """
@@ -70,13 +123,65 @@ class BaseCache(ABC):
         :param key: The key to retrieve.
         :return: The cached data if available, otherwise None.
         """
-        return (
-            self._deserialize(self.cache_index.get(key))
-            if key in self.cache_index
-            else None
-        )
+        start = time.perf_counter()
+        data = self.backend.get(key)
+        if data is None:
+            self.stats.record_lookup(False, time.perf_counter() - start)
+            return None
+        self.backend.touch(key)
+        obj = self._deserialize_through_memory(data)
+        self.stats.record_lookup(obj is not None, time.perf_counter() - start)
+        return obj
+
+    def retrieve_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Retrieves the values of several keys, in one lookup.
+
+        :param keys: The keys to retrieve.
+        :return: The cached data of the keys that exist, keyed by key.
+        """
+        keys = set(keys)
+        start = time.perf_counter()
+        values = self.backend.get_many(keys)
+        self.backend.touch_many(values)
+        objects = {
+            key: self._deserialize_through_memory(data) for key, data in values.items()
+        }
+        n_hits = sum(obj is not None for obj in objects.values())
+        latency_s = time.perf_counter() - start
+        if n_hits:
+            self.stats.record_lookup(True, latency_s, count=n_hits)
+        if n_hits < len(keys):
+            self.stats.record_lookup(False, latency_s, count=len(keys) - n_hits)
+        return objects
+
+    def _get_memory_token(self, data: Any) -> Optional[Tuple[Hashable, int]]:
+        """
+        Identifies stored data for the memory tier: a token that changes
+        whenever the data does, and the size in bytes to account it with.
+
+        :param data: Data as stored in the index.
+        :return: The token and size, or None to always deserialise the data.
+        """
+        return None
+
+    def _deserialize_through_memory(self, data: Any) -> Any:
+        memory_token = self._get_memory_token(data)
+        if memory_token is None:
+            # Only the index value is read, e.g. the path of a cached file
+            self.stats.record_read(len(json.dumps(data, default=str)))
+            return self._deserialize(data)
+        token, size_bytes = memory_token
+        found, obj = self.memory_tier.get(token)
+        self.stats.record_read(size_bytes, from_memory=found)
+        if not found:
+            obj = self._deserialize(data)
+            if obj is None:
+                return None
+            self.memory_tier.put(token, obj, size_bytes)
+        return copy.deepcopy(obj) if self.copy_from_memory else obj
 
     def clear_cache(self):
         """Clears all cache data."""
-        self.cache_index = {}
-        self._save_cache_index()
+        self.backend.clear()
+        self.memory_tier.clear()
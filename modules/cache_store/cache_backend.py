@@ -0,0 +1,370 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from config.data_models.cache_entry import CacheEntry
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    """
+    Storage of a cache's index, mapping cache keys to JSON serialisable
+    values (e.g. the path of a pickled object).
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """
+        :return: The value stored under `key`, or None if there is none.
+        """
+        pass
+
+    @abstractmethod
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        :return: The values of the keys that are stored, keyed by key.
+        """
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: Any, size_bytes: int = 0):
+        """
+        :param size_bytes: Disk space taken up by the entry, for quotas.
+        """
+        pass
+
+    @abstractmethod
+    def delete(self, key: str) -> bool:
+        """
+        :return: True if the key was stored.
+        """
+        pass
+
+    @abstractmethod
+    def items(self) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    def has(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def keys(self) -> List[str]:
+        return list(self.items())
+
+    def touch(self, key: str):
+        """
+        Records an access to `key`, for least recently used eviction.
+        """
+        self.touch_many([key])
+
+    def touch_many(self, keys: Iterable[str]):
+        """
+        Records an access to each of `keys`. Backends that do not track
+        accesses ignore it.
+        """
+        pass
+
+    def entries(self) -> List[CacheEntry]:
+        """
+        :return: Every entry, with its size and last access where tracked.
+        """
+        return [CacheEntry(key=key, value=value) for key, value in self.items().items()]
+
+    def delete_many(self, keys: Iterable[str]) -> int:
+        """
+        :return: The number of keys that were stored.
+        """
+        return sum(self.delete(key) for key in keys)
+
+
+class JsonIndexBackend(CacheBackend):
+    """
+    The original index format: a single JSON file, loaded once and rewritten
+    in full on every store. Stores are atomic, but not safe against concurrent
+    writers, which overwrite each other's entries.
+    """
+
+    def __init__(self, index_path: str):
+        """
+        :param index_path: Path to the JSON index, created on the first store.
+        """
+        self.index_path = index_path
+        self.index = self._load()
+
+    def _load(self) -> Dict[str, Any]:
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as file:
+                return json.load(file)
+        return {}
+
+    def _save(self):
+        # Written to a temporary file first so that concurrent workflows never
+        # read a half written index
+        index_json = json.dumps(dict(self.index), indent=4)
+        temp_index_path = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_index_path, "w") as file:
+            file.write(index_json)
+        os.replace(temp_index_path, self.index_path)
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.index.get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        return {key: self.index[key] for key in keys if key in self.index}
+
+    def set(self, key: str, value: Any, size_bytes: int = 0):
+        self.index[key] = value
+        self._save()
+
+    def delete(self, key: str) -> bool:
+        if key not in self.index:
+            return False
+        del self.index[key]
+        self._save()
+        return True
+
+    def delete_many(self, keys: Iterable[str]) -> int:
+        deleted = [key for key in set(keys) if self.index.pop(key, None) is not None]
+        if deleted:
+            self._save()
+        return len(deleted)
+
+    def items(self) -> Dict[str, Any]:
+        return dict(self.index)
+
+    def clear(self):
+        self.index = {}
+        self._save()
+
+
+# Column definitions of what cache maintenance evicts by: the disk space of an
+# entry and when it was last read
+MAINTENANCE_COLUMNS = {
+    "size_bytes": "INTEGER NOT NULL DEFAULT 0",
+    "accessed_at": "REAL",
+}
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Cache index in an SQLite database. Every store is a single row upsert
+    rather than a rewrite of the whole index, and any number of processes may
+    read and write the same cache at once without losing each other's entries.
+
+    Only the database path is stored on the instance, every call opens its own
+    connection, so caches can be shared with spawned worker processes.
+    """
+
+    busy_timeout_s: float = 60.0
+    # Accesses are recorded at most this often per key, so cache hits do not
+    # each take the write lock
+    touch_interval_s: float = 60.0
+    # Stays below SQLite's default limit on host parameters per statement
+    max_query_params: int = 500
+
+    def __init__(self, db_path: str, legacy_index_path: Optional[str] = None):
+        """
+        :param db_path: Path to the SQLite database, created if missing.
+        :param legacy_index_path: JSON index written by `JsonIndexBackend`,
+            imported once, into a database without entries.
+        """
+        self.db_path = os.path.abspath(db_path)
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._create_tables(legacy_index_path)
+
+    @contextmanager
+    def _connect(self, write: bool = False) -> Iterator[sqlite3.Connection]:
+        # The default rollback journal is used rather than WAL, since WAL does
+        # not work on the network filesystems HPC campaigns usually run from.
+        connection = sqlite3.connect(
+            self.db_path, timeout=self.busy_timeout_s, isolation_level=None
+        )
+        try:
+            if not write:
+                yield connection
+                return
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def _create_tables(self, legacy_index_path: Optional[str]):
+        with self._connect(write=True) as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            # Maintenance columns, added to indexes created before they existed
+            columns = {
+                row[1] for row in connection.execute("PRAGMA table_info(entries)")
+            }
+            for column, definition in MAINTENANCE_COLUMNS.items():
+                if column not in columns:
+                    connection.execute(
+                        f"ALTER TABLE entries ADD COLUMN {column} {definition}"
+                    )
+            if not legacy_index_path or not os.path.exists(legacy_index_path):
+                return
+            # Imports are recorded, so entries removed since (e.g. by cache
+            # maintenance) are not imported again once the index is empty
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS legacy_imports (
+                    index_path TEXT PRIMARY KEY,
+                    imported_at REAL NOT NULL
+                )
+                """
+            )
+            legacy_index_path = os.path.abspath(legacy_index_path)
+            if connection.execute(
+                "SELECT 1 FROM legacy_imports WHERE index_path = ?", (legacy_index_path,)
+            ).fetchone():
+                return
+            now = time.time()
+            connection.execute(
+                "INSERT INTO legacy_imports (index_path, imported_at) VALUES (?, ?)",
+                (legacy_index_path, now),
+            )
+            # Indexes created before imports were recorded have entries already
+            if connection.execute("SELECT 1 FROM entries LIMIT 1").fetchone():
+                return
+            legacy_entries = JsonIndexBackend(legacy_index_path).items()
+            connection.executemany(
+                "INSERT OR IGNORE INTO entries (key, value, updated_at) VALUES (?, ?, ?)",
+                [
+                    (key, json.dumps(value), now)
+                    for key, value in legacy_entries.items()
+                ],
+            )
+            logger.info(
+                f"Imported {len(legacy_entries)} entries from {legacy_index_path} "
+                f"into {self.db_path}"
+            )
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT value FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        values = {}
+        with self._connect() as connection:
+            for start in range(0, len(keys), self.max_query_params):
+                chunk = keys[start : start + self.max_query_params]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = connection.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({placeholders})",
+                    chunk,
+                )
+                values.update((key, json.loads(value)) for key, value in rows)
+        return values
+
+    def set(self, key: str, value: Any, size_bytes: int = 0):
+        now = time.time()
+        with self._connect(write=True) as connection:
+            connection.execute(
+                """
+                INSERT INTO entries (key, value, updated_at, size_bytes, accessed_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    value = excluded.value,
+                    updated_at = excluded.updated_at,
+                    size_bytes = excluded.size_bytes,
+                    accessed_at = excluded.accessed_at
+                """,
+                (key, json.dumps(value), now, size_bytes, now),
+            )
+
+    def delete(self, key: str) -> bool:
+        with self._connect(write=True) as connection:
+            cursor = connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return cursor.rowcount > 0
+
+    def delete_many(self, keys: Iterable[str]) -> int:
+        keys = list(keys)
+        deleted = 0
+        with self._connect(write=True) as connection:
+            for start in range(0, len(keys), self.max_query_params):
+                chunk = keys[start : start + self.max_query_params]
+                placeholders = ", ".join("?" * len(chunk))
+                cursor = connection.execute(
+                    f"DELETE FROM entries WHERE key IN ({placeholders})", chunk
+                )
+                deleted += cursor.rowcount
+        return deleted
+
+    def touch_many(self, keys: Iterable[str]):
+        keys = list(keys)
+        now = time.time()
+        # Checked without the write lock first, most hits were recorded recently
+        stale_keys = []
+        with self._connect() as connection:
+            for start in range(0, len(keys), self.max_query_params):
+                chunk = keys[start : start + self.max_query_params]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = connection.execute(
+                    f"""
+                    SELECT key FROM entries WHERE key IN ({placeholders})
+                    AND COALESCE(accessed_at, 0) < ?
+                    """,
+                    [*chunk, now - self.touch_interval_s],
+                )
+                stale_keys.extend(key for key, in rows)
+        if not stale_keys:
+            return
+        with self._connect(write=True) as connection:
+            connection.executemany(
+                "UPDATE entries SET accessed_at = ? WHERE key = ?",
+                [(now, key) for key in stale_keys],
+            )
+
+    def entries(self) -> List[CacheEntry]:
+        with self._connect() as connection:
+            rows = connection.execute(
+                """
+                SELECT key, value, size_bytes, COALESCE(accessed_at, updated_at)
+                FROM entries
+                """
+            )
+            return [
+                CacheEntry(
+                    key=key,
+                    value=json.loads(value),
+                    size_bytes=size_bytes,
+                    accessed_at=accessed_at,
+                )
+                for key, value, size_bytes, accessed_at in rows
+            ]
+
+    def items(self) -> Dict[str, Any]:
+        with self._connect() as connection:
+            rows = connection.execute("SELECT key, value FROM entries")
+            return {key: json.loads(value) for key, value in rows}
+
+    def clear(self):
+        with self._connect(write=True) as connection:
+            connection.execute("DELETE FROM entries")
@@ -0,0 +1,415 @@
+from config.data_models.cache_entry import (
+    CacheEntry,
+    MaintenanceAction,
+    ScannedCacheEntry,
+)
+from modules.cache_store.cache_backend import (
+    CacheBackend,
+    JsonIndexBackend,
+    SQLiteCacheBackend,
+)
+from dataclasses import fields, is_dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set
+import logging
+import os
+import pickle
+import time
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+SQLITE_INDEX_SUFFIX = "_index.sqlite"
+JSON_INDEX_SUFFIX = "_index.json"
+# Files owned by caches, removed when no index entry refers to them
+CACHE_FILE_EXTENSIONS = (".pkl", ".mdp")
+TEMP_FILE_EXTENSION = ".tmp"
+SIZE_UNITS = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+# Reasons an entry or file is removed, as they appear in the report
+DANGLING = "dangling"
+EVICTED = "evicted"
+ORPHANED = "orphaned"
+
+
+def get_referenced_paths(data: Any) -> Set[str]:
+    """
+    Paths of the files a cached value refers to: the value itself if it is a
+    path (e.g. of a pickled object, an MDP file or a `FileCache` file), and
+    every path field of the dataclasses it holds (e.g. `GromacsOutputs`).
+    Other strings, e.g. in coarse-grained maps, are not paths.
+
+    :param data: A cached value or object.
+    :return: Absolute paths, whether or not the files still exist.
+    """
+    if isinstance(data, str):
+        return {os.path.abspath(data)}
+    return _get_dataclass_paths(data)
+
+
+def _get_dataclass_paths(data: Any) -> Set[str]:
+    if is_dataclass(data) and not isinstance(data, type):
+        paths = set()
+        for data_field in fields(data):
+            value = getattr(data, data_field.name)
+            if isinstance(value, str):
+                paths.add(os.path.abspath(value))
+            else:
+                paths |= _get_dataclass_paths(value)
+        return paths
+    if isinstance(data, dict):
+        data = list(data.values())
+    if isinstance(data, (list, tuple, set)):
+        return set().union(*(_get_dataclass_paths(item) for item in data))
+    return set()
+
+
+def get_paths_size(paths: Iterable[str]) -> int:
+    """
+    :return: Combined size in bytes of the files that exist.
+    """
+    return sum(os.path.getsize(path) for path in paths if os.path.isfile(path))
+
+
+def parse_size(size: str) -> int:
+    """
+    Parses a size such as "500M" or "2G" (binary units) into bytes.
+
+    :param size: Number of bytes, optionally followed by K, M, G or T.
+    :return: The size in bytes.
+    """
+    size = size.strip().upper().rstrip("B")
+    if size and size[-1] in SIZE_UNITS:
+        return int(float(size[:-1]) * SIZE_UNITS[size[-1]])
+    return int(size)
+
+
+def discover_caches(cache_dir: str) -> Dict[str, CacheBackend]:
+    """
+    Finds the index of every cache under `cache_dir`, including caches in
+    subdirectories (e.g. the MDP cache).
+
+    :param cache_dir: Directory the caches were created in.
+    :return: Index backends keyed by cache name, e.g. "picklecache_solvent_cache"
+        or "mdp_cache/cache".
+    """
+    caches = {}
+    for root, _, file_names in os.walk(cache_dir):
+        for file_name in sorted(file_names):
+            index_path = os.path.join(root, file_name)
+            if file_name.endswith(SQLITE_INDEX_SUFFIX):
+                cache_path = index_path[: -len(SQLITE_INDEX_SUFFIX)]
+                backend = SQLiteCacheBackend(index_path)
+            elif file_name.endswith(JSON_INDEX_SUFFIX):
+                cache_path = index_path[: -len(JSON_INDEX_SUFFIX)]
+                # Imported into the SQLite index once the cache is next opened
+                if os.path.exists(cache_path + SQLITE_INDEX_SUFFIX):
+                    continue
+                backend = JsonIndexBackend(index_path)
+            else:
+                continue
+            caches[os.path.relpath(cache_path, cache_dir)] = backend
+    return caches
+
+
+class CacheMaintenance:
+    """
+    Keeps the caches under a set of directories within their disk quotas:
+    removes entries whose files were deleted (e.g. with a `TEMP_DIR`), evicts
+    the least recently used entries of caches over their quota together with
+    the files only they refer to (pickled objects, equilibrated boxes,
+    trajectories), and removes cache files no entry refers to.
+
+    Entries are read from every cache index found, so a file shared by several
+    entries or caches is only removed once none of them refers to it. Relative
+    paths in cached objects are resolved against the working directory, which
+    should be the campaign directory the caches were written from.
+    """
+
+    # Cache files younger than this are never treated as orphaned, they may be
+    # written by a running workflow that has not stored its entry yet
+    orphan_min_age_s: float = 3600.0
+
+    def __init__(
+        self,
+        cache_dirs: List[str],
+        quotas: Optional[Dict[str, int]] = None,
+        default_quota: Optional[int] = None,
+        delete_referenced_files: bool = True,
+    ):
+        """
+        :param cache_dirs: Directories whose caches to maintain.
+        :param quotas: Size quota in bytes per cache name, see `discover_caches`.
+        :param default_quota: Size quota in bytes of caches not in `quotas`, or
+            None for no quota.
+        :param delete_referenced_files: Whether removing an entry also removes
+            the output files it refers to, rather than only its index entry and
+            pickled object.
+        """
+        self.cache_dirs = [os.path.abspath(cache_dir) for cache_dir in cache_dirs]
+        self.quotas = quotas or {}
+        self.default_quota = default_quota
+        self.delete_referenced_files = delete_referenced_files
+        self.caches: Dict[str, CacheBackend] = {}
+        self.scanned_entries: List[ScannedCacheEntry] = []
+        for cache_dir in self.cache_dirs:
+            for cache_name, backend in discover_caches(cache_dir).items():
+                if len(self.cache_dirs) > 1:
+                    cache_name = os.path.join(os.path.basename(cache_dir), cache_name)
+                self.caches[cache_name] = backend
+
+    def get_quota(self, cache_name: str) -> Optional[int]:
+        return self.quotas.get(cache_name, self.default_quota)
+
+    def _load_referenced_paths(self, value: Any) -> Optional[Set[str]]:
+        # Pickled objects are loaded to find the outputs they refer to. Entries
+        # from before the object store point to a second Pickle file.
+        paths = get_referenced_paths(value)
+        while isinstance(value, str) and value.endswith(".pkl"):
+            if not os.path.isfile(value):
+                return paths
+            try:
+                with open(value, "rb") as file:
+                    value = pickle.load(file)
+            except Exception as e:
+                logger.warning(f"Could not load cached object {value}: {e}")
+                return None
+            if isinstance(value, str) and value.endswith(".pkl"):
+                paths.add(os.path.abspath(value))
+            else:
+                paths |= _get_dataclass_paths(value)
+        return paths
+
+    def _scan_entry(self, cache_name: str, entry: CacheEntry) -> ScannedCacheEntry:
+        scanned = ScannedCacheEntry(cache_name=cache_name, entry=entry)
+        paths = self._load_referenced_paths(entry.value)
+        if paths is None:
+            # Unreadable objects are kept, sized as they were when stored
+            scanned.paths = get_referenced_paths(entry.value)
+            scanned.size_bytes = max(entry.size_bytes, get_paths_size(scanned.paths))
+        else:
+            scanned.paths = paths
+            scanned.size_bytes = get_paths_size(paths)
+            scanned.dangling = any(not os.path.exists(path) for path in paths)
+        scanned.accessed_at = entry.accessed_at
+        if not scanned.accessed_at:
+            # Indexes that do not track accesses fall back to modification times
+            scanned.accessed_at = max(
+                (os.path.getmtime(path) for path in scanned.paths if os.path.exists(path)),
+                default=0.0,
+            )
+        return scanned
+
+    def scan(self) -> List[ScannedCacheEntry]:
+        """
+        :return: Every entry of every cache, with the files it refers to.
+        """
+        return [
+            self._scan_entry(cache_name, entry)
+            for cache_name, backend in self.caches.items()
+            for entry in backend.entries()
+        ]
+
+    def _select_evictions(self, entries: List[ScannedCacheEntry]) -> Dict[int, str]:
+        removals = {id(entry): DANGLING for entry in entries if entry.dangling}
+        for cache_name in self.caches:
+            quota = self.get_quota(cache_name)
+            if quota is None:
+                continue
+            kept = [
+                entry
+                for entry in entries
+                if entry.cache_name == cache_name and id(entry) not in removals
+            ]
+            # Shared files are counted for every entry referring to them
+            total_bytes = sum(entry.size_bytes for entry in kept)
+            for entry in sorted(kept, key=lambda entry: entry.accessed_at):
+                if total_bytes <= quota:
+                    break
+                removals[id(entry)] = EVICTED
+                total_bytes -= entry.size_bytes
+        return removals
+
+    def _find_orphaned_files(self, referenced_paths: Set[str]) -> List[str]:
+        now = time.time()
+        orphaned_files = []
+        for cache_dir in self.cache_dirs:
+            for root, _, file_names in os.walk(cache_dir):
+                for file_name in file_names:
+                    path = os.path.join(root, file_name)
+                    is_cache_file = file_name.endswith(CACHE_FILE_EXTENSIONS)
+                    # Left behind by writers killed between write and rename
+                    is_temp_file = file_name.endswith(TEMP_FILE_EXTENSION)
+                    if not (is_cache_file or is_temp_file) or path in referenced_paths:
+                        continue
+                    if os.path.getmtime(path) > now - self.orphan_min_age_s:
+                        continue
+                    orphaned_files.append(path)
+        return sorted(orphaned_files)
+
+    def plan(self) -> List[MaintenanceAction]:
+        """
+        Works out what `run` would remove, without removing anything.
+
+        :return: One action per removed entry or orphaned file.
+        """
+        entries = self.scan()
+        self.scanned_entries = entries
+        removals = self._select_evictions(entries)
+        kept_paths = set().union(
+            *(entry.paths for entry in entries if id(entry) not in removals)
+        )
+        actions = []
+        claimed_paths = set()
+        for entry in entries:
+            if id(entry) not in removals:
+                continue
+            paths = [
+                path
+                for path in sorted(entry.paths - kept_paths - claimed_paths)
+                if os.path.isfile(path)
+                and (self.delete_referenced_files or path.endswith(CACHE_FILE_EXTENSIONS))
+            ]
+            claimed_paths.update(paths)
+            actions.append(
+                MaintenanceAction(
+                    cache_name=entry.cache_name,
+                    reason=removals[id(entry)],
+                    key=entry.entry.key,
+                    paths=paths,
+                    bytes_freed=get_paths_size(paths),
+                )
+            )
+        all_paths = set().union(*(entry.paths for entry in entries))
+        for path in self._find_orphaned_files(all_paths):
+            actions.append(
+                MaintenanceAction(
+                    cache_name=self._get_orphan_cache_name(path),
+                    reason=ORPHANED,
+                    paths=[path],
+                    bytes_freed=get_paths_size([path]),
+                )
+            )
+        return actions
+
+    def _get_orphan_cache_name(self, path: str) -> str:
+        # Orphaned files are reported under the top level directory they are
+        # in, e.g. "objects" for the Pickle object store
+        cache_dir = max(
+            (cache_dir for cache_dir in self.cache_dirs if path.startswith(cache_dir)),
+            key=len,
+        )
+        cache_name = os.path.relpath(os.path.dirname(path), cache_dir).split(os.sep)[0]
+        if len(self.cache_dirs) > 1:
+            cache_name = os.path.join(os.path.basename(cache_dir), cache_name)
+        return cache_name
+
+    def run(self, dry_run: bool = False) -> List[MaintenanceAction]:
+        """
+        Removes dangling entries, evicts entries of caches over their quota
+        and removes orphaned files.
+
+        :param dry_run: Only report what would be removed.
+        :return: The actions taken, or that would be taken in a dry run.
+        """
+        actions = self.plan()
+        if dry_run:
+            return actions
+
+        keys_by_cache: Dict[str, List[str]] = {}
+        for action in actions:
+            if action.key is not None:
+                keys_by_cache.setdefault(action.cache_name, []).append(action.key)
+        # Index entries go first, so no reader is handed a file being removed
+        for cache_name, keys in keys_by_cache.items():
+            self.caches[cache_name].delete_many(keys)
+        for action in actions:
+            for path in action.paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return actions
+
+    def summarise(self, actions: List[MaintenanceAction]) -> pd.DataFrame:
+        """
+        Sizes of every cache found by the last `plan` or `run`, against their
+        quotas, and what the actions remove from them.
+
+        :param actions: Actions returned by `plan` or `run`.
+        :return: One row per cache.
+        """
+        rows = {}
+        for cache_name in [
+            *self.caches,
+            *(action.cache_name for action in actions),
+        ]:
+            rows.setdefault(
+                cache_name,
+                {
+                    "cache": cache_name,
+                    "entries": 0,
+                    "size_bytes": 0,
+                    "quota_bytes": self.get_quota(cache_name),
+                    DANGLING: 0,
+                    EVICTED: 0,
+                    ORPHANED: 0,
+                    "bytes_freed": 0,
+                },
+            )
+        for entry in self.scanned_entries:
+            rows[entry.cache_name]["entries"] += 1
+            rows[entry.cache_name]["size_bytes"] += entry.size_bytes
+        for action in actions:
+            rows[action.cache_name][action.reason] += 1
+            rows[action.cache_name]["bytes_freed"] += action.bytes_freed
+        return pd.DataFrame(list(rows.values()))
+
+
+def log_maintenance_report(
+    maintenance: CacheMaintenance, actions: List[MaintenanceAction], dry_run: bool
+):
+    """
+    Logs what cache maintenance removed, or would remove in a dry run, per cache.
+    """
+    verb = "Would remove" if dry_run else "Removed"
+    freed_mb = sum(action.bytes_freed for action in actions) / 1024**2
+    logger.info(f"{verb} {len(actions)} entries and files, {freed_mb:.1f} MB in total")
+    for _, row in maintenance.summarise(actions).iterrows():
+        quota = (
+            f"{row['quota_bytes'] / 1024**2:.1f} MB"
+            if pd.notna(row["quota_bytes"])
+            else "no quota"
+        )
+        logger.info(
+            f"  {row['cache']}: {row['entries']} entries, "
+            f"{row['size_bytes'] / 1024**2:.1f} MB ({quota}), "
+            f"{row[DANGLING]} dangling, {row[EVICTED]} evicted, "
+            f"{row[ORPHANED]} orphaned files, {row['bytes_freed'] / 1024**2:.1f} MB freed"
+        )
+
+
+def write_maintenance_csv(actions: List[MaintenanceAction], file_path: str) -> str:
+    """
+    Writes every action of cache maintenance to a CSV file, one row per
+    removed entry or orphaned file.
+
+    :param actions: Actions returned by `CacheMaintenance.plan` or `run`.
+    :param file_path: Path of the CSV file.
+    :return: The path of the CSV file.
+    """
+    rows = [
+        {
+            "cache": action.cache_name,
+            "reason": action.reason,
+            "key": action.key,
+            "bytes_freed": action.bytes_freed,
+            "paths": ";".join(action.paths),
+        }
+        for action in actions
+    ]
+    pd.DataFrame(
+        rows, columns=["cache", "reason", "key", "bytes_freed", "paths"]
+    ).to_csv(file_path, index=False)
+    logger.info(f"Maintenance report written to {file_path}")
+    return file_path
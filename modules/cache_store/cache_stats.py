@@ -0,0 +1,296 @@
+from config.data_models.cache_stats import CacheStats, LatencyHistogram
+from config.paths import CACHE_STATS_DIR, WORKER_ID_ENV_VAR
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional
+import threading
+import logging
+import socket
+import json
+import glob
+import time
+import os
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS_S = (0.0001, 0.001, 0.01, 0.1, 1.0, 10.0)
+
+
+def _get_bucket_name(latency_s: float) -> str:
+    for bound in LATENCY_BUCKETS_S:
+        if latency_s <= bound:
+            return str(bound)
+    return "inf"
+
+
+def _record_latency(histogram: LatencyHistogram, latency_s: float):
+    histogram.count += 1
+    histogram.total_s += latency_s
+    histogram.max_s = max(histogram.max_s, latency_s)
+    bucket = _get_bucket_name(latency_s)
+    histogram.buckets[bucket] = histogram.buckets.get(bucket, 0) + 1
+
+
+class CacheStatsRecorder:
+    """
+    Counters of a single cache, shared by every instance of the cache in the
+    process (caches are named after their index, so instances of the same
+    cache record into the same counters). Safe to share between threads.
+    """
+
+    def __init__(self, cache_name: str):
+        self.stats = CacheStats(cache_name=cache_name)
+        self._lock = threading.Lock()
+
+    def record_lookup(self, hit: bool, latency_s: float, count: int = 1):
+        """
+        :param hit: Whether the looked up keys were found.
+        :param latency_s: Seconds the lookup took.
+        :param count: Number of keys the lookup covered.
+        """
+        with self._lock:
+            if hit:
+                self.stats.hits += count
+            else:
+                self.stats.misses += count
+            _record_latency(self.stats.lookup_latency, latency_s)
+
+    def record_read(self, size_bytes: int, from_memory: bool = False):
+        with self._lock:
+            if from_memory:
+                self.stats.memory_hits += 1
+            else:
+                self.stats.bytes_read += size_bytes
+
+    def record_store(self, size_bytes: int, latency_s: float):
+        with self._lock:
+            self.stats.stores += 1
+            self.stats.bytes_written += size_bytes
+            _record_latency(self.stats.store_latency, latency_s)
+
+    def snapshot(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                **{
+                    **asdict(self.stats),
+                    "lookup_latency": LatencyHistogram(
+                        **asdict(self.stats.lookup_latency)
+                    ),
+                    "store_latency": LatencyHistogram(
+                        **asdict(self.stats.store_latency)
+                    ),
+                }
+            )
+
+
+class CacheStatsRegistry:
+    """
+    The `CacheStatsRecorder` of every cache used in the process, by cache name.
+    """
+
+    def __init__(self):
+        self._recorders: Dict[str, CacheStatsRecorder] = {}
+        self._lock = threading.Lock()
+
+    def get_recorder(self, cache_name: str) -> CacheStatsRecorder:
+        with self._lock:
+            if cache_name not in self._recorders:
+                self._recorders[cache_name] = CacheStatsRecorder(cache_name)
+            return self._recorders[cache_name]
+
+    def snapshot(self) -> Dict[str, CacheStats]:
+        with self._lock:
+            recorders = list(self._recorders.values())
+        return {
+            recorder.stats.cache_name: recorder.snapshot() for recorder in recorders
+        }
+
+    def reset(self):
+        with self._lock:
+            self._recorders.clear()
+
+
+cache_stats = CacheStatsRegistry()
+
+
+def get_cache_stats() -> Dict[str, CacheStats]:
+    """
+    Usage of every cache in this process since it started (or since
+    `reset_cache_stats`).
+
+    :return: A snapshot of the stats, keyed by cache name.
+    """
+    return cache_stats.snapshot()
+
+
+def reset_cache_stats():
+    cache_stats.reset()
+
+
+def get_worker_stats_path(stats_dir: str = CACHE_STATS_DIR) -> str:
+    """
+    File this process dumps its cache stats to, one per process so dumps of
+    concurrent workers never overwrite each other.
+    """
+    worker_id = os.getenv(WORKER_ID_ENV_VAR)
+    worker = f"_worker_{worker_id}" if worker_id else ""
+    return os.path.join(
+        stats_dir, f"{socket.gethostname()}_{os.getpid()}{worker}.json"
+    )
+
+
+def write_cache_stats_json(output_path: str, **metadata: Any):
+    """
+    Writes the stats of every cache in this process to a JSON file, replacing
+    it atomically so readers never see a partial dump.
+
+    :param output_path: Path of the JSON file.
+    :param metadata: Additional fields of the dump, e.g. the job id.
+    """
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    dump = {
+        **metadata,
+        "host": socket.gethostname(),
+        "pid": os.getpid(),
+        "worker_id": os.getenv(WORKER_ID_ENV_VAR),
+        "dumped_at": time.time(),
+        "caches": {name: asdict(stats) for name, stats in get_cache_stats().items()},
+    }
+    temp_path = f"{output_path}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(dump, file, indent=2)
+    os.replace(temp_path, output_path)
+
+
+class CacheStatsDumper:
+    """
+    Dumps the cache stats of this process to a JSON file every `interval_s`
+    seconds from a background thread, and once more when stopped, so the
+    stats of a worker are available while it runs and after it exits.
+
+        with CacheStatsDumper(job_id=job.job_id):
+            job.target(**job.kwargs)
+    """
+
+    interval_s: float = 60.0
+
+    def __init__(self, output_path: Optional[str] = None, **metadata: Any):
+        """
+        :param output_path: Path of the JSON file, defaults to one per process
+            in CACHE_STATS_DIR.
+        :param metadata: Additional fields of the dump, e.g. the job id.
+        """
+        self.output_path = output_path or get_worker_stats_path()
+        self.metadata = metadata
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def dump(self):
+        try:
+            write_cache_stats_json(self.output_path, **self.metadata)
+        except OSError as e:
+            # Stats are diagnostics, a failed dump never fails a job
+            logger.warning(f"Failed to dump cache stats to {self.output_path}: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            self.dump()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="cache_stats_dumper", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.dump()
+
+    def __enter__(self) -> "CacheStatsDumper":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def load_cache_stats(stats_dir: str = CACHE_STATS_DIR) -> pd.DataFrame:
+    """
+    Combines the stats dumped by every worker process in `stats_dir`.
+
+    :return: One row per cache, with its summed counters, hit rate and mean
+        lookup and store latencies, lowest hit rate first.
+    """
+    columns = [
+        "cache_name",
+        "hits",
+        "misses",
+        "memory_hits",
+        "stores",
+        "bytes_read",
+        "bytes_written",
+        "lookup_count",
+        "lookup_total_s",
+        "lookup_max_s",
+        "store_count",
+        "store_total_s",
+        "store_max_s",
+    ]
+    rows: List[Dict[str, Any]] = []
+    for dump_path in sorted(glob.glob(os.path.join(stats_dir, "*.json"))):
+        try:
+            with open(dump_path, "r") as file:
+                dump = json.load(file)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping unreadable cache stats {dump_path}: {e}")
+            continue
+        for stats in dump.get("caches", {}).values():
+            row = {column: stats.get(column, 0) for column in columns[:7]}
+            for prefix in ("lookup", "store"):
+                histogram = stats.get(f"{prefix}_latency", {})
+                row[f"{prefix}_count"] = histogram.get("count", 0)
+                row[f"{prefix}_total_s"] = histogram.get("total_s", 0.0)
+                row[f"{prefix}_max_s"] = histogram.get("max_s", 0.0)
+            rows.append(row)
+
+    df = pd.DataFrame(rows, columns=columns)
+    df = df.groupby("cache_name", as_index=False).agg(
+        {
+            **{column: "sum" for column in columns[1:] if not column.endswith("max_s")},
+            "lookup_max_s": "max",
+            "store_max_s": "max",
+        }
+    )
+    lookups = df["hits"] + df["misses"]
+    df["hit_rate"] = (df["hits"] / lookups.where(lookups > 0)).fillna(0.0)
+    df["mean_lookup_s"] = (
+        df["lookup_total_s"] / df["lookup_count"].where(df["lookup_count"] > 0)
+    ).fillna(0.0)
+    df["mean_store_s"] = (
+        df["store_total_s"] / df["store_count"].where(df["store_count"] > 0)
+    ).fillna(0.0)
+    return df.sort_values("hit_rate").reset_index(drop=True)
+
+
+def log_cache_stats(df: pd.DataFrame):
+    """
+    Logs a summary of `load_cache_stats`, one line per cache.
+    """
+    if df.empty:
+        logger.info("No cache stats recorded")
+        return
+    for row in df.itertuples():
+        logger.info(
+            f"{row.cache_name}: {row.hits} hits, {row.misses} misses "
+            f"({row.hit_rate:.0%}, {row.memory_hits} from memory), {row.stores} stores, "
+            f"{row.bytes_read / 1024**2:.1f} MiB read, "
+            f"{row.bytes_written / 1024**2:.1f} MiB written, "
+            f"mean lookup {row.mean_lookup_s * 1000:.1f} ms, "
+            f"mean store {row.mean_store_s * 1000:.1f} ms"
+        )
@@ -1,13 +1,15 @@
 from modules.cache_store.pickle_cache import PickleCache
+from modules.cache_store.cache_backend import CacheBackend
 from config.paths import MAIN_CACHE_DIR
 from config.data_models.solvent import Solvent
-from typing import List
+from modules.rdkit.canonical_smiles import get_polymer_key
+from typing import List, Optional
 
 
 class EquilibriatedAtomisticPolymerCache(PickleCache):
 
-    def __init__(self, cache_dir=MAIN_CACHE_DIR):
-        super().__init__(name="polymer_cache", cache_dir=cache_dir)
+    def __init__(self, cache_dir=MAIN_CACHE_DIR, backend: Optional[CacheBackend] = None):
+        super().__init__(name="polymer_cache", cache_dir=cache_dir, backend=backend)
 
     def get_cache_key(
         self,
@@ -15,7 +17,21 @@ class EquilibriatedAtomisticPolymerCache(PickleCache):
         monomer_smiles: List[str],
         num_units: float,
         temperature: float,
+        box_size_nm: Optional[List[float]] = None,
+        provenance: Optional[str] = None,
     ):
-        monomer_smiles_str = "_".join(monomer_smiles)
-        cache_key = f"{solvent.name}_{solvent.compressibility}_{monomer_smiles_str}_{num_units}_{temperature}"
+        """
+        :param provenance: Digest of the inputs, protocol and programs the
+            polymer is equilibrated with (see `get_provenance_digest`), so
+            results computed from anything else are never reused.
+        """
+        # Keyed by the polymer rather than how its monomers are spelled or
+        # repeated in the list, see `get_polymer_key`
+        polymer_key = get_polymer_key(monomer_smiles, num_units)
+        cache_key = f"{solvent.name}_{solvent.compressibility}_{polymer_key}_{temperature}"
+        if box_size_nm:
+            box_size_str = "_".join(map(str, box_size_nm))
+            cache_key = f"{cache_key}_{box_size_str}"
+        if provenance:
+            cache_key = f"{cache_key}_{provenance}"
         return cache_key
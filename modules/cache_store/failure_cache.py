@@ -0,0 +1,217 @@
+from config.data_models.known_failure import FailureReason, KnownFailure
+from config.paths import MAIN_CACHE_DIR
+from modules.cache_store.base_cache import BaseCache
+from modules.cache_store.cache_backend import CacheBackend
+from modules.cache_store.provenance import get_provenance_digest
+from modules.rdkit.canonical_smiles import get_canonical_smiles
+from modules.rdkit.polymer_builders.base_polymer_generator import MonomerRejectedError
+from dataclasses import asdict
+from typing import Any, Dict, Iterable, List, Optional
+import subprocess
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+DAY_S = 24 * 3600.0
+
+
+class KnownFailureError(RuntimeError):
+    """
+    Raised instead of retrying inputs the failure cache knows to fail.
+    """
+
+    def __init__(self, failure: KnownFailure):
+        super().__init__(
+            f"Known failure ({failure.reason.value}) of {failure.key}: {failure.message}"
+        )
+        self.failure = failure
+
+
+def classify_failure(exception: BaseException) -> Optional[FailureReason]:
+    """
+    Reason class of a failure that will happen again with the same inputs.
+    Anything else, e.g. bugs, timeouts or a skipped known failure, is None and
+    is not recorded.
+
+    :param exception: The exception a job or parametiser failed with.
+    :return: The reason, or None.
+    """
+    if isinstance(exception, MonomerRejectedError):
+        return FailureReason.MONOMER_REJECTED
+    if isinstance(exception, subprocess.CalledProcessError):
+        command = exception.cmd if isinstance(exception.cmd, list) else [exception.cmd]
+        command = [str(part) for part in command]
+        if any(part.endswith("acpype") for part in command[:1]):
+            return FailureReason.PARAMETERISATION_FAILED
+        if "grompp" in command[:2]:
+            return FailureReason.GROMPP_FAILED
+        if "mdrun" in command[:2]:
+            return FailureReason.MDRUN_FAILED
+    return None
+
+
+def get_monomer_failure_key(monomer_smiles: str) -> str:
+    return f"monomer_{get_canonical_smiles(monomer_smiles)}"
+
+
+def get_monomer_digest(monomer_smiles: str) -> str:
+    return get_provenance_digest(monomer_smiles=get_canonical_smiles(monomer_smiles))
+
+
+class FailureCache(BaseCache):
+    """
+    Negative result cache: remembers inputs that failed deterministically
+    (see `FailureReason`), so they are skipped immediately instead of being
+    retried in a new process on every run.
+
+    Each failure is stored with a digest of the inputs it failed with and only
+    applies to the same inputs, so changing e.g. an MDP template or the ACPYPE
+    settings retries them. Failures expire after the TTL of their reason, as
+    e.g. mdrun crashes may be down to a node rather than the inputs.
+    """
+
+    # Seconds a failure is remembered for, None to remember it until the
+    # inputs change
+    default_ttl_s: Dict[FailureReason, Optional[float]] = {
+        FailureReason.MONOMER_REJECTED: None,
+        FailureReason.PARAMETERISATION_FAILED: 7 * DAY_S,
+        FailureReason.GROMPP_FAILED: 7 * DAY_S,
+        FailureReason.MDRUN_FAILED: 1 * DAY_S,
+    }
+
+    def __init__(
+        self,
+        name: str = "known_failures",
+        cache_dir: str = MAIN_CACHE_DIR,
+        backend: Optional[CacheBackend] = None,
+    ):
+        """
+        :param cache_dir: Directory to store the cache index in.
+        :param backend: Storage of the cache index, see `BaseCache`.
+        """
+        super().__init__(
+            cache_name=f"failure_cache_{name}", cache_dir=cache_dir, backend=backend
+        )
+
+    def _serialize(self, data: KnownFailure) -> Dict[str, Any]:
+        return {**asdict(data), "reason": data.reason.value}
+
+    def _deserialize(self, data: Dict[str, Any]) -> KnownFailure:
+        return KnownFailure(**{**data, "reason": FailureReason(data["reason"])})
+
+    def record_failure(
+        self,
+        key: str,
+        reason: FailureReason,
+        message: str,
+        input_digest: str,
+        ttl_s: Optional[float] = None,
+    ) -> KnownFailure:
+        """
+        Records that `key` failed with the inputs digested as `input_digest`.
+
+        :param key: What failed, e.g. a job id or `get_monomer_failure_key`.
+        :param reason: Reason class of the failure.
+        :param message: Error message, reported when the key is skipped.
+        :param input_digest: Digest of everything the failure depends on.
+        :param ttl_s: Seconds to remember the failure for, infinite for as long
+            as the inputs are the same. Defaults to the reason's `default_ttl_s`.
+        :return: The recorded failure.
+        """
+        if ttl_s is None:
+            ttl_s = self.default_ttl_s[reason]
+        now = time.time()
+        failure = KnownFailure(
+            key=key,
+            reason=reason,
+            message=message,
+            input_digest=input_digest,
+            failed_at=now,
+            expires_at=(
+                now + ttl_s if ttl_s is not None and ttl_s != float("inf") else None
+            ),
+        )
+        self.store(key, failure)
+        logger.info(f"Recorded known failure ({reason.value}) of {key}")
+        return failure
+
+    def record_exception(
+        self,
+        key: str,
+        input_digest: str,
+        exception: BaseException,
+        reasons: Optional[Iterable[FailureReason]] = None,
+    ) -> Optional[KnownFailure]:
+        """
+        Records a failure if `classify_failure` recognises the exception.
+
+        :param reasons: Only record failures of these reasons, defaults to all.
+        :return: The recorded failure, or None if nothing was recorded.
+        """
+        reason = classify_failure(exception)
+        if reason is None or (reasons is not None and reason not in reasons):
+            return None
+        message = f"{type(exception).__name__}: {exception}"
+        return self.record_failure(key, reason, message, input_digest)
+
+    def get_failures(self, input_digests: Dict[str, str]) -> Dict[str, KnownFailure]:
+        """
+        Looks up the failures of many keys at once. Failures recorded with
+        other inputs or that have expired do not apply, and are removed.
+
+        :param input_digests: Digest of the current inputs of each key.
+        :return: The failures that apply, keyed by key.
+        """
+        failures = self.retrieve_many(input_digests)
+        now = time.time()
+        stale_keys = [
+            key
+            for key, failure in failures.items()
+            if failure.input_digest != input_digests[key] or failure.is_expired(now)
+        ]
+        if stale_keys:
+            self.backend.delete_many(stale_keys)
+        return {
+            key: failure for key, failure in failures.items() if key not in stale_keys
+        }
+
+    def get_failure(self, key: str, input_digest: str) -> Optional[KnownFailure]:
+        return self.get_failures({key: input_digest}).get(key)
+
+    def check(self, input_digests: Dict[str, str]):
+        """
+        :param input_digests: Digest of the current inputs of each key.
+        :raises KnownFailureError: If any of the keys is known to fail.
+        """
+        failures = self.get_failures(input_digests)
+        if failures:
+            raise KnownFailureError(next(iter(failures.values())))
+
+    def get_monomer_digests(self, monomer_smiles: List[str]) -> Dict[str, str]:
+        """
+        :return: Input digests of the monomer failure keys of `monomer_smiles`,
+            to look up or `check` whether any of the monomers is rejected.
+        """
+        return {
+            get_monomer_failure_key(smiles): get_monomer_digest(smiles)
+            for smiles in monomer_smiles
+        }
+
+    def record_monomer_rejection(self, exception: BaseException) -> Optional[KnownFailure]:
+        """
+        Records the rejected monomer of a `MonomerRejectedError`, so every
+        polymer containing it is skipped.
+
+        :return: The recorded failure, or None for other exceptions.
+        """
+        if not isinstance(exception, MonomerRejectedError):
+            return None
+        return self.record_exception(
+            get_monomer_failure_key(exception.monomer_smiles),
+            get_monomer_digest(exception.monomer_smiles),
+            exception,
+        )
+
+
+failure_cache = FailureCache()
@@ -1,4 +1,5 @@
 from modules.cache_store.base_cache import BaseCache
+from modules.cache_store.cache_backend import CacheBackend
 from pathlib import Path
 from config.paths import MAIN_CACHE_DIR
 from typing import Any, Optional
@@ -12,15 +13,22 @@ logger = logging.getLogger(__name__)
 class FileCache(BaseCache):
     """Caches file paths for quick lookup."""
 
-    def __init__(self, name: str, cache_dir=MAIN_CACHE_DIR):
+    def __init__(
+        self,
+        name: str,
+        cache_dir=MAIN_CACHE_DIR,
+        backend: Optional[CacheBackend] = None,
+    ):
         """
         Initializes the PickleCache.
 
         :param cache_dir: Directory to store cached objects.
+        :param backend: Storage of the cache index, see `BaseCache`.
         """
         super().__init__(
             cache_name=f"file_cache_{name}",
             cache_dir=cache_dir,
+            backend=backend,
         )
 
     def _serialize(self, data: Any) -> str:
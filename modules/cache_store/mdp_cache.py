@@ -1,7 +1,10 @@
 import os
 import hashlib
 import json
-from typing import Dict
+from typing import Any, Dict, Optional
+from modules.cache_store.base_cache import BaseCache
+from modules.cache_store.cache_backend import CacheBackend
+from modules.cache_store.provenance import get_file_digest
 from modules.utils.shared.file_utils import (
     check_directory_exists,
     save_content_to_path,
@@ -11,53 +14,68 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-class MDPCache:
+class MDPCache(BaseCache):
     """
     A class to manage caching of MDP files based on parameters.
     """
 
-    def __init__(self, cache_dir: str):
+    def __init__(self, cache_dir: str, backend: Optional[CacheBackend] = None):
         """
         Initialize the MDPCache.
 
         :param cache_dir: Directory to store cached MDP files.
+        :param backend: Storage of the cache index, see `BaseCache`.
         """
-        self.cache_dir = check_directory_exists(cache_dir)
-        self.cache_index_path = os.path.join(cache_dir, "cache_index.json")
-        self.cache_index = {}
-        self._initialize_cache()
+        # Named so that the index imported from older caches is cache_index.json
+        super().__init__(cache_name="cache", cache_dir=cache_dir, backend=backend)
 
-    def _initialize_cache(self):
+    def _serialize(self, data: Any) -> str:
+        return data
+
+    def _deserialize(self, data: Any) -> str:
+        return data
+
+    def _generate_hash(self, template_path: str, params: Dict[str, str]) -> str:
         """
-        Load the cache index from file or initialize it.
+        Generate a hash key based on the template and the given parameters.
+        Editing a template changes the keys of the MDP files generated from it.
+
+        :param template_path: Path to the MDP template file.
+        :param params: Dictionary of MDP parameters.
+        :return: A unique hash string for the template and parameters.
         """
-        if os.path.exists(self.cache_index_path):
-            with open(self.cache_index_path, "r") as file:
-                self.cache_index = json.load(file)
-                logger.info(f"Cache index loaded from {self.cache_index_path}")
-        else:
-            self.cache_index = {}
-            logger.info("Initialized a new cache index.")
-
-    def _save_cache_index(self):
+        params_string = json.dumps(params, sort_keys=True)
+        template_digest = get_file_digest(template_path)
+        hash_key = hashlib.md5(
+            f"{template_digest}:{params_string}".encode()
+        ).hexdigest()
+        logger.debug(
+            f"Generated hash key: {hash_key} for template: {template_path} "
+            f"({template_digest}), params: {params_string}"
+        )
+        return hash_key
+
+    def get_cache_key(self, template_path: str, params: Dict[str, str]) -> str:
         """
-        Save the cache index to file.
+        Key an MDP file generated from `template_path` with `params` is cached under.
+
+        :param template_path: Path to the MDP template file.
+        :param params: Dictionary of MDP parameters.
+        :return: The cache key.
         """
-        with open(self.cache_index_path, "w") as file:
-            json.dump(self.cache_index, file, indent=4)
-        logger.info(f"Cache index saved to {self.cache_index_path}")
+        return self._generate_hash(template_path, params)
 
-    def _generate_hash(self, params: Dict[str, str]) -> str:
+    def has_mdp(self, template_path: str, params: Dict[str, str]) -> bool:
         """
-        Generate a hash key based on the given parameters.
+        Checks, without generating anything, whether `get_or_create_mdp` would
+        return a cached MDP file for `template_path` and `params`.
 
+        :param template_path: Path to the MDP template file.
         :param params: Dictionary of MDP parameters.
-        :return: A unique hash string for the parameters.
+        :return: True if the MDP file is cached, False otherwise.
         """
-        params_string = json.dumps(params, sort_keys=True)
-        hash_key = hashlib.md5(params_string.encode()).hexdigest()
-        logger.debug(f"Generated hash key: {hash_key} for params: {params_string}")
-        return hash_key
+        mdp_file_path = self.retrieve(self._generate_hash(template_path, params))
+        return mdp_file_path is not None and os.path.exists(mdp_file_path)
 
     def _validate_paths(self, template_path: str, output_path: str):
         """
@@ -119,13 +137,9 @@ class MDPCache:
             f"Checking cache for MDP file with params: {params} with template: {template_path}"
         )
 
-        # Ensure the cache index is initialized
-        if not self.cache_index:
-            self._initialize_cache()
-
-        # Generate hash key for parameters
-        hash_key = self._generate_hash(params)
-        mdp_file_path = self.cache_index.get(hash_key)
+        # Generate hash key for the template and parameters
+        hash_key = self._generate_hash(template_path, params)
+        mdp_file_path = self.retrieve(hash_key)
 
         if mdp_file_path:
             if os.path.exists(mdp_file_path):
@@ -142,7 +156,6 @@ class MDPCache:
         self._generate_mdp_file(template_path, mdp_file_path, params)
 
         # Update the cache index
-        self.cache_index[hash_key] = mdp_file_path
-        self._save_cache_index()
+        self.store(hash_key, mdp_file_path)
 
         return mdp_file_path
@@ -0,0 +1,70 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryTier:
+    """
+    In-process least recently used store of deserialised cache objects, in
+    front of the disk caches. Objects are keyed by a token identifying the
+    stored data they were deserialised from (e.g. the content-addressed path
+    of a pickled object), so an entry that is stored again under new data is
+    never served from memory.
+
+    Sizes are those of the serialised data, a proxy for the memory the
+    objects take up. Safe to share between the threads of a worker.
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        :param max_bytes: Combined size of the objects kept, the least recently
+            used are dropped beyond it.
+        """
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._objects: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: Hashable) -> Tuple[bool, Optional[Any]]:
+        """
+        :return: Whether an object is kept for `token`, and the object.
+        """
+        with self._lock:
+            if token not in self._objects:
+                return False, None
+            self._objects.move_to_end(token)
+            return True, self._objects[token][0]
+
+    def put(self, token: Hashable, obj: Any, size_bytes: int):
+        """
+        Keeps `obj` under `token`, dropping the least recently used objects to
+        stay within `max_bytes`. Objects larger than that are not kept.
+        """
+        if size_bytes > self.max_bytes:
+            return
+        with self._lock:
+            self._pop(token)
+            self._objects[token] = (obj, size_bytes)
+            self.size_bytes += size_bytes
+            while self.size_bytes > self.max_bytes:
+                self._pop(next(iter(self._objects)))
+
+    def invalidate(self, token: Hashable):
+        with self._lock:
+            self._pop(token)
+
+    def clear(self):
+        with self._lock:
+            self._objects.clear()
+            self.size_bytes = 0
+
+    def _pop(self, token: Hashable):
+        if token in self._objects:
+            _, size_bytes = self._objects.pop(token)
+            self.size_bytes -= size_bytes
+
+    def __len__(self) -> int:
+        return len(self._objects)
@@ -1,44 +1,74 @@
 import pickle
+import hashlib
 import os
 import logging
-from typing import Any
+import threading
+import time
+from typing import Any, Hashable, Optional, Tuple
 from config.paths import MAIN_CACHE_DIR
 from modules.cache_store.base_cache import BaseCache
+from modules.cache_store.cache_backend import CacheBackend
 
 logger = logging.getLogger(__name__)
 
 
 class PickleCache(BaseCache):
     """
-    A cache for storing and retrieving objects using Pickle.
+    A cache for storing and retrieving objects using Pickle. Objects are kept
+    in a store shared by every PickleCache in `cache_dir`, named after the
+    SHA-256 digest of their contents.
     """
 
-    def __init__(self, name: str, cache_dir=MAIN_CACHE_DIR):
+    objects_subdir: str = "objects"
+
+    def __init__(
+        self,
+        name: str,
+        cache_dir=MAIN_CACHE_DIR,
+        backend: Optional[CacheBackend] = None,
+    ):
         """
         Initializes the PickleCache.
 
         :param cache_dir: Directory to store cached objects.
+        :param backend: Storage of the cache index, see `BaseCache`.
         """
-        super().__init__(cache_dir=cache_dir, cache_name=f"picklecache_{name}")
+        super().__init__(
+            cache_dir=cache_dir, cache_name=f"picklecache_{name}", backend=backend
+        )
+
+    def _get_object_path(self, digest: str) -> str:
+        # Objects are fanned out over subdirectories by digest prefix, so no
+        # single directory grows too large
+        return os.path.join(
+            self.cache_dir, self.objects_subdir, digest[:2], f"{digest}.pkl"
+        )
 
     def _serialize(self, data: Any) -> str:
         """
-        Serializes data using Pickle and stores the file path in the cache.
+        Serializes data using Pickle into the content-addressed object store.
+        Identical objects are stored once, and files are written under a
+        temporary name and renamed, so no reader ever sees a partial file.
 
         :param data: The data to serialize.
         :return: The file path where the serialized data is stored.
         """
-        hash_key = self._generate_hash(data)
-        file_path = os.path.join(self.cache_dir, f"{hash_key}.pkl")
-
-        with open(file_path, "wb") as file:
-            pickle.dump(data, file)
-
+        payload = pickle.dumps(data)
+        file_path = self._get_object_path(self._generate_hash(payload))
+        if os.path.exists(file_path):
+            return file_path
+
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        temp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(payload)
+        os.replace(temp_path, file_path)
         return file_path
 
     def _deserialize(self, file_path: str) -> Any:
         """
-        Deserializes Pickle data from a file.
+        Deserializes Pickle data from a file, checking it against the digest
+        in its name. Corrupted files are removed and treated as missing.
 
         :param file_path: Path to the Pickle file.
         :return: The deserialized object.
@@ -47,16 +77,50 @@ class PickleCache(BaseCache):
             return None
 
         with open(file_path, "rb") as file:
-            return pickle.load(file)
+            payload = file.read()
+        digest = os.path.splitext(os.path.basename(file_path))[0]
+        if not self._is_digest(digest):
+            return self._deserialize_legacy(payload)
+        if self._generate_hash(payload) != digest:
+            logger.warning(f"Removing corrupted cache file {file_path}")
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+            return None
+        return pickle.loads(payload)
+
+    def _deserialize_legacy(self, payload: bytes) -> Any:
+        # Entries written before the object store pointed to a second Pickle
+        # file holding the object, named after Python's per-process hash
+        data = pickle.loads(payload)
+        if isinstance(data, str) and data.endswith(".pkl") and os.path.exists(data):
+            with open(data, "rb") as file:
+                return pickle.load(file)
+        return data
+
+    def _get_memory_token(self, file_path: Any) -> Optional[Tuple[Hashable, int]]:
+        # Object files are named after their contents, the modification time
+        # covers files written before the object store
+        try:
+            stat = os.stat(file_path)
+        except (OSError, TypeError):
+            return None
+        return (file_path, stat.st_mtime_ns, stat.st_size), stat.st_size
+
+    @staticmethod
+    def _is_digest(name: str) -> bool:
+        return len(name) == 64 and all(c in "0123456789abcdef" for c in name)
 
-    def _generate_hash(self, data: Any) -> str:
+    def _generate_hash(self, payload: bytes) -> str:
         """
-        Generates a hash key based on the object's Pickle serialization.
+        Generates a content hash of an object's Pickle serialization, the same
+        in every process.
 
-        :param data: The data object to hash.
-        :return: A unique hash string.
+        :param payload: The pickled object.
+        :return: SHA-256 hex digest.
         """
-        return str(hash(pickle.dumps(data)))
+        return hashlib.sha256(payload).hexdigest()
 
     def store_object(self, key: str, data: Any):
         """
@@ -65,9 +129,24 @@ class PickleCache(BaseCache):
         :param key: Unique key for retrieving the object later.
         :param data: The object to store.
         """
-        file_path = self._serialize(data)
-        self.store(key, file_path)
-        logger.info(f"Stored object in cache at {file_path}")
+        self.store(key, data)
+        logger.info(f"Stored object in cache with key: {key}")
+
+    def has_object(self, key: str) -> bool:
+        """
+        Checks if an object can be retrieved for a key, i.e. the key exists and
+        its Pickle file has not been removed.
+
+        :param key: The key to check.
+        :return: True if the object is cached, False otherwise.
+        """
+        start = time.perf_counter()
+        file_path = self.backend.get(key)
+        found = file_path is not None and os.path.exists(file_path)
+        # Found objects are counted as hits when they are retrieved
+        if not found:
+            self.stats.record_lookup(False, time.perf_counter() - start)
+        return found
 
     def retrieve_object(self, key: str) -> Any:
         """
@@ -76,8 +155,4 @@ class PickleCache(BaseCache):
         :param key: The key for the object.
         :return: The cached object if available, otherwise None.
         """
-        if not self.has_key(key):
-            return None
-
-        file_path = self.retrieve(key)
-        return self._deserialize(file_path)
+        return self.retrieve(key)
@@ -0,0 +1,101 @@
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Digests are kept per file and modification, inputs such as solvent boxes are
+# looked up for every job of a campaign
+_file_digests: Dict[Tuple[str, int, int], str] = {}
+_file_digests_lock = threading.Lock()
+
+MISSING_FILE_DIGEST = "missing"
+UNKNOWN_GROMACS_VERSION = "unknown"
+PROVENANCE_DIGEST_LENGTH = 16
+
+
+def _iter_digest_lines(file_path: str):
+    # GROMACS comments (e.g. the creation date ACPYPE writes), .gro titles and
+    # the directories of include files do not change a simulation's result
+    is_gro = file_path.endswith(".gro")
+    with open(file_path, "r", errors="replace") as file:
+        for line_number, line in enumerate(file):
+            if is_gro and line_number == 0:
+                continue
+            stripped = line.strip()
+            if not stripped or stripped.startswith(";"):
+                continue
+            if stripped.startswith("#include"):
+                include = stripped.split(None, 1)[-1].strip("\"'<> ")
+                yield f"#include {os.path.basename(include)}"
+                continue
+            yield stripped
+
+
+def get_file_digest(file_path: Optional[str]) -> str:
+    """
+    Content digest of an input file, ignoring what does not affect a
+    simulation's result (see `_iter_digest_lines`), so files regenerated
+    identically digest the same.
+
+    :param file_path: Path of the file, or None.
+    :return: SHA-256 hex digest, or "missing" if there is no such file.
+    """
+    if not file_path:
+        return MISSING_FILE_DIGEST
+    file_path = os.path.abspath(file_path)
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return MISSING_FILE_DIGEST
+    memo_key = (file_path, stat.st_mtime_ns, stat.st_size)
+    with _file_digests_lock:
+        if memo_key in _file_digests:
+            return _file_digests[memo_key]
+
+    sha = hashlib.sha256()
+    for line in _iter_digest_lines(file_path):
+        sha.update(line.encode())
+        sha.update(b"\n")
+    digest = sha.hexdigest()
+    with _file_digests_lock:
+        _file_digests[memo_key] = digest
+    return digest
+
+
+@lru_cache(maxsize=None)
+def get_gromacs_version() -> str:
+    """
+    Version of the GROMACS installation on the PATH, e.g. "2023.3".
+
+    :return: The version, or "unknown" if `gmx` cannot be run.
+    """
+    try:
+        result = subprocess.run(
+            ["gmx", "--version"], capture_output=True, text=True, timeout=60
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning(f"Could not determine the GROMACS version: {e}")
+        return UNKNOWN_GROMACS_VERSION
+    for line in (result.stdout + result.stderr).splitlines():
+        if line.strip().startswith("GROMACS version:"):
+            return line.split(":", 1)[1].strip()
+    return UNKNOWN_GROMACS_VERSION
+
+
+def get_provenance_digest(**components: Any) -> str:
+    """
+    Digest of everything that affects a cached result, e.g. input file
+    digests, protocol steps and program settings, appended to cache keys so
+    entries computed from anything else are never reused.
+
+    :param components: JSON serialisable components, by name.
+    :return: Short hex digest.
+    """
+    payload = json.dumps(components, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:PROVENANCE_DIGEST_LENGTH]
@@ -0,0 +1,47 @@
+from config.data_models.parsed_topology import SectionSpan
+from config.paths import MAIN_CACHE_DIR
+from modules.cache_store.base_cache import BaseCache
+from modules.cache_store.cache_backend import CacheBackend
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SectionIndexCache(BaseCache):
+    """
+    Section boundaries of parsed GROMACS files by content digest, so the
+    parsed topology store (see `ParsedTopologyStore`) of a new process only
+    reads files it has parsed before, without splitting them again.
+    """
+
+    def __init__(
+        self, cache_dir: str = MAIN_CACHE_DIR, backend: Optional[CacheBackend] = None
+    ):
+        super().__init__(
+            cache_name="section_index_cache", cache_dir=cache_dir, backend=backend
+        )
+
+    @staticmethod
+    def get_cache_key(digest: str, variant: str) -> str:
+        """
+        :param digest: Digest of the file's text.
+        :param variant: What else the sections depend on, e.g. the handlers.
+        """
+        return f"{digest}_{variant}"
+
+    def _serialize(
+        self, data: Tuple[List[SectionSpan], Optional[List[str]]]
+    ) -> Dict[str, Any]:
+        spans, suppressed_constructs = data
+        return {
+            "spans": [asdict(span) for span in spans],
+            "suppressed_constructs": suppressed_constructs,
+        }
+
+    def _deserialize(
+        self, data: Dict[str, Any]
+    ) -> Tuple[List[SectionSpan], Optional[List[str]]]:
+        spans = [SectionSpan(**span) for span in data["spans"]]
+        return spans, data["suppressed_constructs"]
@@ -1,12 +1,31 @@
 from modules.cache_store.pickle_cache import PickleCache
+from modules.cache_store.cache_backend import CacheBackend
 from config.paths import MAIN_CACHE_DIR
 from config.data_models.solvent import Solvent
+from typing import List, Optional
 
 
 class SolventCache(PickleCache):
 
-    def __init__(self, cache_dir=MAIN_CACHE_DIR):
-        super().__init__(name="solvent_cache", cache_dir=cache_dir)
+    def __init__(self, cache_dir=MAIN_CACHE_DIR, backend: Optional[CacheBackend] = None):
+        super().__init__(name="solvent_cache", cache_dir=cache_dir, backend=backend)
 
-    def get_cache_key(self, solvent: Solvent, temperature: float):
-        return f"{solvent.name}_{solvent.compressibility}_{temperature}"
+    def get_cache_key(
+        self,
+        solvent: Solvent,
+        temperature: float,
+        box_size_nm: Optional[List[float]] = None,
+        provenance: Optional[str] = None,
+    ):
+        """
+        :param provenance: Digest of the inputs, protocol and programs the box
+            is equilibrated with (see `get_provenance_digest`), so boxes built
+            from anything else are never reused.
+        """
+        cache_key = f"{solvent.name}_{solvent.compressibility}_{temperature}"
+        if box_size_nm:
+            box_size_str = "_".join(map(str, box_size_nm))
+            cache_key = f"{cache_key}_{box_size_str}"
+        if provenance:
+            cache_key = f"{cache_key}_{provenance}"
+        return cache_key
@@ -0,0 +1,302 @@
+from config.data_models.campaign_plan import JobPlan, StageForecast
+from config.data_models.output_types import GromacsPaths
+from config.data_models.solvent import Solvent
+from config.mdp_workflow_config import minim_workflow, polymer_workflow, solvent_workflow
+from modules.cache_store.equilibriated_atomistic_polymer_cache import (
+    EquilibriatedAtomisticPolymerCache,
+)
+from modules.cache_store.file_cache import FileCache
+from modules.cache_store.solvent_cache import SolventCache
+from modules.rdkit.canonical_smiles import get_monomer_list_key
+from modules.gromacs.equilibriation.full_equilibriation_workflow import (
+    FullEquilibrationWorkflow,
+)
+from modules.workflows.atomistic.polymer_parametizer import PolymerGeneratorWorkflow
+from modules.workflows.separated.gromacs.joined import (
+    equiibriated_atomistic_polymer_cache,
+)
+from modules.workflows.separated.gromacs.polymer import PolymerWorkflow
+from modules.workflows.separated.gromacs.solvent import (
+    SolventEquilibriationWorkflow,
+    packmol_solvent_cache,
+    solvent_cache,
+)
+from typing import Dict, List, Optional
+import logging
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Cache names as they appear in the plan, matching their index files
+SOLVENT_CACHE_NAME = "solvent_cache"
+PACKMOL_CACHE_NAME = "packmol_solvent_cache"
+POLYMER_CACHE_NAME = "polymer_cache"
+SHORT_POLYMER_CACHE_NAME = "short_polymer_cache"
+LONG_POLYMER_CACHE_NAME = "long_polymer_cache"
+MDP_CACHE_NAME = "mdp_cache"
+
+
+def forecast_mdp_files(
+    workflow: FullEquilibrationWorkflow,
+    varying_params_list: List[Dict[str, str]],
+) -> List[StageForecast]:
+    """
+    Forecasts whether the MDP file of each step of `workflow` is cached.
+
+    :param workflow: Workflow whose steps to check.
+    :param varying_params_list: As passed to the workflow's `run`.
+    :return: One forecast per step.
+    """
+    return [
+        StageForecast(
+            stage=f"mdp:{step_name}",
+            hit=workflow.mdp_cache.has_mdp(template_path, params),
+            cache_name=MDP_CACHE_NAME,
+            cache_key=workflow.mdp_cache.get_cache_key(template_path, params),
+        )
+        for step_name, template_path, params in workflow.get_step_params(
+            varying_params_list
+        )
+    ]
+
+
+def forecast_solvent_box(
+    solvent: Solvent,
+    box_size_nm: List[float],
+    temperature: float,
+    solvent_cache: SolventCache = solvent_cache,
+    packmol_solvent_cache: FileCache = packmol_solvent_cache,
+    workflow: FullEquilibrationWorkflow = solvent_workflow,
+    provenance: Optional[str] = None,
+) -> List[StageForecast]:
+    """
+    Forecasts the equilibrated solvent box of a job and, if it is not cached,
+    the Packmol box and MDP files it would be built from.
+
+    :param provenance: Provenance of the box, as computed by the workflow
+        that would build it.
+    :return: Forecasts, starting with the equilibrated box.
+    """
+    cache_key = solvent_cache.get_cache_key(
+        solvent=solvent,
+        temperature=temperature,
+        box_size_nm=box_size_nm,
+        provenance=provenance,
+    )
+    forecasts = [
+        StageForecast(
+            stage="solvent_box",
+            hit=solvent_cache.has_object(cache_key),
+            cache_name=SOLVENT_CACHE_NAME,
+            cache_key=cache_key,
+        )
+    ]
+    if forecasts[0].hit:
+        return forecasts
+
+    packmol_key = SolventEquilibriationWorkflow.get_packmol_cache_key(
+        solvent, box_size_nm
+    )
+    forecasts.append(
+        StageForecast(
+            stage="packmol_box",
+            hit=packmol_solvent_cache.file_exists(packmol_key),
+            cache_name=PACKMOL_CACHE_NAME,
+            cache_key=packmol_key,
+        )
+    )
+    forecasts.extend(
+        forecast_mdp_files(
+            workflow,
+            SolventEquilibriationWorkflow.get_varying_params_list(solvent, temperature),
+        )
+    )
+    return forecasts
+
+
+def forecast_equilibriated_polymer(
+    solvent: Solvent,
+    monomer_smiles: List[str],
+    num_units: int,
+    temperature: float,
+    cache: EquilibriatedAtomisticPolymerCache = equiibriated_atomistic_polymer_cache,
+    minim_workflow: FullEquilibrationWorkflow = minim_workflow,
+    full_workflow: FullEquilibrationWorkflow = polymer_workflow,
+    box_size_nm: Optional[List[float]] = None,
+    provenance: Optional[str] = None,
+) -> List[StageForecast]:
+    """
+    Forecasts the equilibrated polymer in solvent of a job and, if it is not
+    cached, the MDP files of its minimisation and equilibration.
+
+    :param provenance: Provenance of the polymer, as computed by the workflow
+        that would equilibrate it, or None if its inputs do not exist yet, in
+        which case it is computed.
+    :return: Forecasts, starting with the equilibrated polymer.
+    """
+    cache_key = cache.get_cache_key(
+        solvent=solvent,
+        monomer_smiles=monomer_smiles,
+        num_units=num_units,
+        temperature=temperature,
+        box_size_nm=box_size_nm,
+        provenance=provenance,
+    )
+    forecasts = [
+        StageForecast(
+            stage="equilibriated_polymer",
+            hit=provenance is not None and cache.has_object(cache_key),
+            cache_name=POLYMER_CACHE_NAME,
+            cache_key=cache_key,
+        )
+    ]
+    if forecasts[0].hit:
+        return forecasts
+
+    forecasts.extend(forecast_mdp_files(minim_workflow, [None]))
+    forecasts.extend(
+        forecast_mdp_files(
+            full_workflow,
+            PolymerWorkflow.get_varying_params_list(solvent, temperature),
+        )
+    )
+    return forecasts
+
+
+def forecast_polymer_generation(
+    monomer_smiles: List[str], num_units: int
+) -> List[StageForecast]:
+    """
+    Forecasts the parameterised polymer of the atomistic workflows: the long
+    polymer and, if it is not cached, the short building block it is scaled
+    up from. Chains too short to be scaled up are always parameterised directly.
+
+    :return: Forecasts, starting with the long polymer.
+    """
+    # Constructing the generator only sets up RDKit builders, it runs nothing
+    generator = PolymerGeneratorWorkflow(
+        monomer_smiles=monomer_smiles, num_units=num_units
+    )
+    long_key = generator._generate_polymer_cache_key(
+        monomer_smiles, generator.actual_num_units
+    )
+    forecasts = [
+        StageForecast(
+            stage="long_polymer",
+            hit=generator.long_polymer_cache.has_object(long_key),
+            cache_name=LONG_POLYMER_CACHE_NAME,
+            cache_key=long_key,
+        )
+    ]
+    if forecasts[0].hit:
+        return forecasts
+
+    if generator.num_repeats < 1:
+        forecasts.append(StageForecast(stage="short_polymer_parameterisation", hit=False))
+        return forecasts
+    short_key = get_monomer_list_key(monomer_smiles)
+    forecasts.append(
+        StageForecast(
+            stage="short_polymer",
+            hit=generator.short_polymer_cache.has_object(short_key),
+            cache_name=SHORT_POLYMER_CACHE_NAME,
+            cache_key=short_key,
+        )
+    )
+    return forecasts
+
+
+def get_cached_parameterised_polymer(
+    monomer_smiles: List[str], num_units: int
+) -> Optional[GromacsPaths]:
+    """
+    Parameterised long polymer of the atomistic workflows, if it is cached, so
+    the provenance of the polymer equilibrated from it can be forecast.
+
+    :return: The parameter files, or None if the polymer would be parameterised.
+    """
+    generator = PolymerGeneratorWorkflow(
+        monomer_smiles=monomer_smiles, num_units=num_units
+    )
+    long_key = generator._generate_polymer_cache_key(
+        monomer_smiles, generator.actual_num_units
+    )
+    if not generator.long_polymer_cache.has_object(long_key):
+        return None
+    _, parameterised_polymer = generator.long_polymer_cache.retrieve_object(long_key)
+    return parameterised_polymer
+
+
+def summarise_plan(plans: List[JobPlan]) -> pd.DataFrame:
+    """
+    Counts the unique cache entries the plan would read and the ones it would
+    compute, per cache. Entries shared between jobs (e.g. solvent boxes and MDP
+    files) are counted once.
+
+    :param plans: Job plans.
+    :return: One row per cache with its number of unique keys, hits and misses.
+    """
+    keys: Dict[str, Dict[str, bool]] = {}
+    for plan in plans:
+        for stage in plan.stages:
+            if stage.cache_name is None:
+                continue
+            keys.setdefault(stage.cache_name, {})[stage.cache_key] = stage.hit
+    rows = [
+        {
+            "cache": cache_name,
+            "keys": len(hits),
+            "hits": sum(hits.values()),
+            "misses": len(hits) - sum(hits.values()),
+        }
+        for cache_name, hits in keys.items()
+    ]
+    return pd.DataFrame(rows, columns=["cache", "keys", "hits", "misses"])
+
+
+def log_plan(plans: List[JobPlan]):
+    """
+    Logs a summary of a dry run: how many jobs are fully cached, the predicted
+    wall time of the rest, and the hits and misses of each cache.
+    """
+    cached_jobs = sum(plan.is_cached for plan in plans)
+    predicted_runtime_h = sum(plan.predicted_runtime_s for plan in plans) / 3600
+    logger.info(
+        f"Plan: {len(plans)} jobs, {cached_jobs} fully cached, "
+        f"{len(plans) - cached_jobs} to compute, predicted {predicted_runtime_h:.1f} h "
+        f"of job wall time"
+    )
+    for _, row in summarise_plan(plans).iterrows():
+        logger.info(
+            f"  {row['cache']}: {row['keys']} entries, {row['hits']} cached, "
+            f"{row['misses']} to compute"
+        )
+
+
+def write_plan_csv(plans: List[JobPlan], file_path: str) -> str:
+    """
+    Writes every stage forecast of a plan to a CSV file, one row per stage.
+
+    :param plans: Job plans.
+    :param file_path: Path of the CSV file.
+    :return: The path of the CSV file.
+    """
+    rows = [
+        {
+            "job_id": plan.job_id,
+            "stage": stage.stage,
+            "cache": stage.cache_name,
+            "cache_key": stage.cache_key,
+            "hit": stage.hit,
+            "predicted_runtime_s": plan.predicted_runtime_s,
+        }
+        for plan in plans
+        for stage in plan.stages
+    ]
+    pd.DataFrame(
+        rows,
+        columns=["job_id", "stage", "cache", "cache_key", "hit", "predicted_runtime_s"],
+    ).to_csv(file_path, index=False)
+    logger.info(f"Plan written to {file_path}")
+    return file_path
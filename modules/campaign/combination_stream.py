@@ -0,0 +1,122 @@
+from typing import Iterator, List, Sequence, Tuple
+import math
+import random
+
+# (monomer list, solvent name, solvent SMILES, density, compressibility, temperature, num units)
+Combination = Tuple[List[str], str, str, float, float, float, int]
+# (name, SMILES, density, compressibility)
+SolventRow = Tuple[str, str, float, float]
+
+
+def unrank_combination(rank: int, n: int, k: int) -> Tuple[int, ...]:
+    """
+    Returns the `rank`-th k-combination of range(n), in the same
+    (lexicographic) order as `itertools.combinations(range(n), k)`.
+
+    :param rank: Index of the combination, from 0 to comb(n, k) - 1.
+    :param n: Number of items to choose from.
+    :param k: Combination size.
+    :return: Indices of the chosen items.
+    """
+    indices = []
+    start = 0
+    for remaining in range(k, 0, -1):
+        for index in range(start, n):
+            # Number of combinations that start with `index` at this position
+            count = math.comb(n - index - 1, remaining - 1)
+            if rank < count:
+                indices.append(index)
+                start = index + 1
+                break
+            rank -= count
+    return tuple(indices)
+
+
+class CombinationStream:
+    """
+    Every (monomer set, solvent, temperature, chain length) combination of a
+    campaign, evaluated lazily. Single monomers, pairs and triplets (up to
+    `max_monomers_per_chain`) are enumerated in the same order as nested
+    `itertools.combinations` loops, but any combination can be decoded from
+    its index, so nothing is materialised.
+
+    Iteration visits the combinations in a seeded pseudo-random order, an
+    affine permutation `(a * i + b) mod N` with `a` coprime to N, so every
+    restart of a campaign sees the same order without storing it.
+    """
+
+    def __init__(
+        self,
+        monomer_smiles: Sequence[str],
+        solvents: Sequence[SolventRow],
+        temperatures: Sequence[float],
+        num_units: Sequence[int],
+        seed: int = 42,
+        max_monomers_per_chain: int = 3,
+    ):
+        self.monomer_smiles = list(monomer_smiles)
+        self.solvents = list(solvents)
+        self.temperatures = list(temperatures)
+        self.num_units = list(num_units)
+        self.seed = seed
+        n_monomers = len(self.monomer_smiles)
+        self.monomer_set_sizes = [
+            math.comb(n_monomers, k)
+            for k in range(1, min(max_monomers_per_chain, n_monomers) + 1)
+        ]
+        self.n_monomer_sets = sum(self.monomer_set_sizes)
+
+    def __len__(self) -> int:
+        return (
+            len(self.num_units)
+            * len(self.temperatures)
+            * len(self.solvents)
+            * self.n_monomer_sets
+        )
+
+    def _monomer_set(self, index: int) -> List[str]:
+        for k, size in enumerate(self.monomer_set_sizes, start=1):
+            if index < size:
+                return [
+                    self.monomer_smiles[i]
+                    for i in unrank_combination(index, len(self.monomer_smiles), k)
+                ]
+            index -= size
+        raise IndexError("Monomer set index out of range.")
+
+    def __getitem__(self, index: int) -> Combination:
+        """
+        Decodes the combination at `index` of the unshuffled enumeration
+        (chain length, then temperature, then solvent, then monomer set).
+        """
+        if not 0 <= index < len(self):
+            raise IndexError(f"Combination index {index} out of range.")
+        index, monomer_set_index = divmod(index, self.n_monomer_sets)
+        index, solvent_index = divmod(index, len(self.solvents))
+        num_units_index, temperature_index = divmod(index, len(self.temperatures))
+        name, smiles, density, compressibility = self.solvents[solvent_index]
+        return (
+            self._monomer_set(monomer_set_index),
+            name,
+            smiles,
+            density,
+            compressibility,
+            self.temperatures[temperature_index],
+            self.num_units[num_units_index],
+        )
+
+    def _permutation(self) -> Tuple[int, int]:
+        size = len(self)
+        rng = random.Random(self.seed)
+        if size <= 1:
+            return 1, 0
+        while True:
+            stride = rng.randrange(1, size)
+            if math.gcd(stride, size) == 1:
+                return stride, rng.randrange(size)
+
+    def __iter__(self) -> Iterator[Combination]:
+        size = len(self)
+        stride, offset = self._permutation()
+        for position in range(size):
+            yield self[(stride * position + offset) % size]
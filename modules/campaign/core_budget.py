@@ -0,0 +1,210 @@
+from config.constants import LengthUnits, MassUnits
+from config.data_models.scheduled_job import CoreBudget
+from modules.utils.shared.calculation_utils import calculate_num_particles
+from rdkit import Chem
+from rdkit.Chem import AllChem
+from typing import List, Optional
+import functools
+import math
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rough sizing for one job: GROMACS stops scaling well below a few thousand
+# atoms per core, and the pandas based preparation steps hold a few kB per atom.
+DEFAULT_ATOMS_PER_CORE = 3000
+DEFAULT_BASE_MEMORY_GB = 0.5
+DEFAULT_MEMORY_PER_ATOM_GB = 2e-6
+
+
+def get_available_cores() -> int:
+    """
+    Number of cores available to this allocation. Uses the SLURM allocation if
+    present, otherwise the number of CPUs on the machine.
+
+    :return: Number of usable cores.
+    """
+    slurm_cpus = os.getenv("SLURM_CPUS_PER_TASK")
+    if slurm_cpus:
+        return int(slurm_cpus)
+    return os.cpu_count() or 1
+
+
+def get_available_memory_gb() -> Optional[float]:
+    """
+    Memory available to this allocation in GB, taken from SLURM. Returns None
+    when no limit is known, in which case memory is not used for packing.
+
+    :return: Memory in GB, or None.
+    """
+    slurm_mem_mb = os.getenv("SLURM_MEM_PER_NODE")
+    if slurm_mem_mb:
+        return float(slurm_mem_mb) / 1024
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def count_atoms_from_smiles(smiles: str) -> int:
+    """
+    Counts all atoms (including hydrogens) of a molecule given as SMILES.
+
+    :param smiles: SMILES string of the molecule.
+    :return: Number of atoms.
+    """
+    mol = Chem.MolFromSmiles(smiles)
+    if mol is None:
+        raise ValueError(f"Invalid SMILES string: {smiles}")
+    return Chem.AddHs(mol).GetNumAtoms()
+
+
+@functools.lru_cache(maxsize=None)
+def molecular_weight_from_smiles(smiles: str) -> float:
+    """
+    Molecular weight (g/mol) of a molecule given as SMILES.
+    """
+    mol = Chem.MolFromSmiles(smiles)
+    if mol is None:
+        raise ValueError(f"Invalid SMILES string: {smiles}")
+    return AllChem.CalcExactMolWt(Chem.AddHs(mol))
+
+
+def count_atoms_from_gro(gro_path: str) -> int:
+    """
+    Reads the atom count line of a `.gro` file without parsing the atoms.
+
+    :param gro_path: Path to the `.gro` file.
+    :return: Number of atoms.
+    """
+    with open(gro_path, "r") as file:
+        file.readline()
+        return int(file.readline().strip())
+
+
+def estimate_system_atom_count(
+    box_size_nm: List[float],
+    solvent_density: float,
+    solvent_molecular_weight: float,
+    atoms_per_solvent_molecule: int,
+    polymer_atom_count: int = 0,
+) -> int:
+    """
+    Estimates the number of atoms in a solvated polymer box.
+
+    :param box_size_nm: Box dimensions in nm.
+    :param solvent_density: Solvent density in kg/m^3.
+    :param solvent_molecular_weight: Solvent molecular weight in g/mol.
+    :param atoms_per_solvent_molecule: Number of atoms in one solvent molecule.
+    :param polymer_atom_count: Number of atoms in the polymer chain.
+    :return: Estimated total atom count.
+    """
+    num_solvent_molecules = calculate_num_particles(
+        box_dimensions=box_size_nm,
+        molecular_weight=solvent_molecular_weight,
+        density_SI=solvent_density,
+        box_units=LengthUnits.NANOMETER,
+        mass_units=MassUnits.GRAM,
+    )
+    return num_solvent_molecules * atoms_per_solvent_molecule + polymer_atom_count
+
+
+def estimate_memory_gb(
+    atom_count: int,
+    base_memory_gb: float = DEFAULT_BASE_MEMORY_GB,
+    memory_per_atom_gb: float = DEFAULT_MEMORY_PER_ATOM_GB,
+) -> float:
+    """
+    Estimates the peak memory of a job from its atom count.
+    """
+    return base_memory_gb + atom_count * memory_per_atom_gb
+
+
+def estimate_core_count(
+    atom_count: int,
+    total_cores: int,
+    atoms_per_core: int = DEFAULT_ATOMS_PER_CORE,
+    min_cores: int = 1,
+    max_cores: Optional[int] = None,
+) -> int:
+    """
+    Number of cores worth giving a job of a given size. Small boxes get few
+    cores so that several of them can share a node.
+
+    :param atom_count: Estimated atom count of the job.
+    :param total_cores: Cores available on the node.
+    :param atoms_per_core: Target number of atoms per core.
+    :param min_cores: Lower bound on cores per job.
+    :param max_cores: Upper bound on cores per job, defaults to total_cores.
+    :return: Number of cores for the job.
+    """
+    max_cores = min(max_cores or total_cores, total_cores)
+    n_cores = math.ceil(atom_count / atoms_per_core) if atom_count else min_cores
+    return max(min(n_cores, max_cores), min(min_cores, max_cores))
+
+
+class CoreAllocator:
+    """
+    Tracks which cores of a node are in use and hands out contiguous blocks,
+    so each job can be pinned with its own -pinoffset.
+    """
+
+    def __init__(self, total_cores: int, total_memory_gb: Optional[float] = None):
+        self.total_cores = total_cores
+        self.total_memory_gb = total_memory_gb
+        self.free_cores = [True] * total_cores
+        self.used_memory_gb = 0.0
+
+    def _find_block(self, n_cores: int) -> Optional[int]:
+        run_start, run_length = 0, 0
+        for index, is_free in enumerate(self.free_cores):
+            if is_free:
+                if run_length == 0:
+                    run_start = index
+                run_length += 1
+                if run_length == n_cores:
+                    return run_start
+            else:
+                run_length = 0
+        return None
+
+    def _memory_fits(self, memory_gb: float) -> bool:
+        if self.total_memory_gb is None:
+            return True
+        # An oversized job is still allowed to run on an otherwise empty node
+        if self.used_memory_gb == 0:
+            return True
+        return self.used_memory_gb + memory_gb <= self.total_memory_gb
+
+    def fits(self, n_cores: int, memory_gb: float = 0.0) -> bool:
+        """
+        :return: True if a block of `n_cores` cores and `memory_gb` is free.
+        """
+        return self._memory_fits(memory_gb) and self._find_block(n_cores) is not None
+
+    def allocate(self, n_cores: int, memory_gb: float = 0.0) -> Optional[CoreBudget]:
+        """
+        Reserves a contiguous block of cores and memory.
+
+        :return: The reserved budget, or None if it does not currently fit.
+        """
+        if not self._memory_fits(memory_gb):
+            return None
+        pin_offset = self._find_block(n_cores)
+        if pin_offset is None:
+            return None
+        for index in range(pin_offset, pin_offset + n_cores):
+            self.free_cores[index] = False
+        self.used_memory_gb += memory_gb
+        return CoreBudget(n_cores=n_cores, pin_offset=pin_offset, memory_gb=memory_gb)
+
+    def release(self, budget: CoreBudget):
+        """
+        Returns a budget's cores and memory to the pool.
+        """
+        for index in range(budget.pin_offset, budget.pin_offset + budget.n_cores):
+            self.free_cores[index] = True
+        self.used_memory_gb = max(0.0, self.used_memory_gb - budget.memory_gb)
+
+    @property
+    def num_free_cores(self) -> int:
+        return sum(self.free_cores)
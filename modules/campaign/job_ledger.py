@@ -0,0 +1,500 @@
+from contextlib import contextmanager
+from enum import Enum
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class JobState(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    # Stopped by a timeout or signal after writing a checkpoint, resumed on the next run
+    INTERRUPTED = "interrupted"
+
+
+# States a job may move to from each state
+ALLOWED_TRANSITIONS = {
+    JobState.QUEUED: {JobState.RUNNING, JobState.FAILED},
+    JobState.RUNNING: {
+        JobState.DONE,
+        JobState.FAILED,
+        JobState.QUEUED,
+        JobState.INTERRUPTED,
+    },
+    JobState.FAILED: {JobState.QUEUED, JobState.RUNNING},
+    JobState.INTERRUPTED: {JobState.QUEUED, JobState.RUNNING, JobState.FAILED},
+    JobState.DONE: set(),
+}
+
+# Column definitions of the work queue: claim order, what a worker needs to
+# run the job, and who holds it until when
+QUEUE_COLUMNS = {
+    "priority": "REAL NOT NULL DEFAULT 0",
+    "payload": "TEXT",
+    "lease_owner": "TEXT",
+    "lease_expires_at": "REAL",
+}
+
+
+class JobLedger:
+    """
+    SQLite backed record of every job in a campaign, replacing the progress,
+    error and output backup CSVs. Lookups are indexed by job key, state changes
+    are single transactions, and any number of processes may write at once.
+
+    Only the database path is stored on the instance, every call opens its own
+    connection, so a ledger can be handed to spawned worker processes.
+
+    The ledger doubles as a work queue shared by workers on any number of
+    nodes: jobs are submitted with a payload, workers claim them with a lease
+    they renew by heartbeat, and jobs whose lease expired (e.g. the node died)
+    go back to the queue.
+    """
+
+    busy_timeout_s: float = 60.0
+    # Stays below SQLite's default limit on host parameters per statement
+    max_query_params: int = 500
+
+    def __init__(self, db_path: str):
+        """
+        :param db_path: Path to the SQLite database, created if missing.
+        """
+        self.db_path = os.path.abspath(db_path)
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._create_tables()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # The default rollback journal is used rather than WAL, since WAL does
+        # not work on the network filesystems HPC campaigns usually run from.
+        connection = sqlite3.connect(
+            self.db_path, timeout=self.busy_timeout_s, isolation_level=None
+        )
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def _create_tables(self):
+        with self._connect() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_key TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    worker TEXT,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_state_index ON jobs (state)"
+            )
+            # Work queue columns, added to ledgers created before the queue existed
+            columns = {
+                row[1] for row in connection.execute("PRAGMA table_info(jobs)")
+            }
+            for column, definition in QUEUE_COLUMNS.items():
+                if column not in columns:
+                    connection.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_claim_index ON jobs (state, priority)"
+            )
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS outputs (
+                    job_key TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+
+    @staticmethod
+    def _worker_name() -> str:
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def enqueue(self, job_keys: Iterable[str]) -> int:
+        """
+        Adds jobs in the queued state. Jobs already in the ledger are left untouched.
+
+        :param job_keys: Keys of the jobs to add.
+        :return: Number of jobs added.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            cursor = connection.executemany(
+                "INSERT OR IGNORE INTO jobs (job_key, state, updated_at) VALUES (?, ?, ?)",
+                [(job_key, JobState.QUEUED.value, now) for job_key in job_keys],
+            )
+            return cursor.rowcount
+
+    def submit(self, jobs: Iterable[Tuple[str, float, Dict[str, Any]]]) -> int:
+        """
+        Adds jobs to the work queue with everything a worker needs to run them.
+        Jobs already in the ledger keep their state, but get the new payload and
+        priority.
+
+        :param jobs: (job key, priority, JSON serialisable payload) of each job,
+            jobs with a higher priority are claimed first.
+        :return: Number of jobs added or updated.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            cursor = connection.executemany(
+                """
+                INSERT INTO jobs (job_key, state, priority, payload, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (job_key) DO UPDATE SET
+                    priority = excluded.priority, payload = excluded.payload
+                """,
+                [
+                    (job_key, JobState.QUEUED.value, priority, json.dumps(payload), now)
+                    for job_key, priority, payload in jobs
+                ],
+            )
+            return cursor.rowcount
+
+    def claim_next(self, lease_s: float) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Claims the queued or interrupted job with the highest priority for this
+        process, with a lease of `lease_s` seconds. Jobs whose lease has expired
+        are put back in the queue first. Claiming is a single transaction, so
+        two workers never claim the same job.
+
+        :param lease_s: Seconds the job is held without a heartbeat.
+        :return: (job key, payload) of the claimed job, or None if none is available.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            expired = connection.execute(
+                """
+                UPDATE jobs
+                SET state = ?, lease_owner = NULL, lease_expires_at = NULL,
+                    error = 'Lease expired.', updated_at = ?
+                WHERE state = ? AND lease_expires_at < ?
+                """,
+                (JobState.QUEUED.value, now, JobState.RUNNING.value, now),
+            ).rowcount
+            if expired:
+                logger.warning(f"Requeued {expired} jobs whose lease expired")
+            row = connection.execute(
+                """
+                SELECT job_key, payload FROM jobs
+                WHERE state IN (?, ?) AND payload IS NOT NULL
+                ORDER BY priority DESC, job_key
+                LIMIT 1
+                """,
+                (JobState.QUEUED.value, JobState.INTERRUPTED.value),
+            ).fetchone()
+            if row is None:
+                return None
+            worker = self._worker_name()
+            connection.execute(
+                """
+                UPDATE jobs
+                SET state = ?, worker = ?, lease_owner = ?, lease_expires_at = ?,
+                    attempts = attempts + 1, updated_at = ?
+                WHERE job_key = ?
+                """,
+                (JobState.RUNNING.value, worker, worker, now + lease_s, now, row[0]),
+            )
+        return row[0], json.loads(row[1])
+
+    def renew_leases(self, lease_s: float) -> int:
+        """
+        Heartbeat: extends the lease of every job this process has claimed.
+
+        :param lease_s: Seconds from now the leases are extended to.
+        :return: Number of leases renewed.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            cursor = connection.execute(
+                """
+                UPDATE jobs SET lease_expires_at = ?
+                WHERE state = ? AND lease_owner = ?
+                """,
+                (now + lease_s, JobState.RUNNING.value, self._worker_name()),
+            )
+            return cursor.rowcount
+
+    def has_queued_work(self) -> bool:
+        """
+        :return: True while any submitted job can still be claimed, now or once
+            a lease held by another worker expires.
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                """
+                SELECT 1 FROM jobs
+                WHERE (state IN (?, ?) AND payload IS NOT NULL)
+                    OR (state = ? AND lease_expires_at IS NOT NULL)
+                LIMIT 1
+                """,
+                (
+                    JobState.QUEUED.value,
+                    JobState.INTERRUPTED.value,
+                    JobState.RUNNING.value,
+                ),
+            ).fetchone()
+        return row is not None
+
+    def release_leases(self) -> int:
+        """
+        Puts every job this process has claimed but is no longer running back in
+        the queue, e.g. jobs claimed just before the worker was told to stop.
+
+        :return: Number of released jobs.
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                """
+                UPDATE jobs
+                SET state = ?, lease_owner = NULL, lease_expires_at = NULL, updated_at = ?
+                WHERE state = ? AND lease_owner = ?
+                """,
+                (
+                    JobState.QUEUED.value,
+                    time.time(),
+                    JobState.RUNNING.value,
+                    self._worker_name(),
+                ),
+            )
+            return cursor.rowcount
+
+    def transition(
+        self, job_key: str, new_state: JobState, error: Optional[str] = None
+    ) -> bool:
+        """
+        Moves a job to `new_state` if that is allowed from its current state.
+        The check and the update happen in one transaction, so two processes can
+        never both move the same job, e.g. both start it.
+
+        :param job_key: Key of the job.
+        :param new_state: State to move to.
+        :param error: Error message, stored when moving to FAILED.
+        :return: True if the job was moved.
+        """
+        from_states = [
+            state.value
+            for state, targets in ALLOWED_TRANSITIONS.items()
+            if new_state in targets
+        ]
+        if not from_states:
+            return False
+        placeholders = ", ".join("?" for _ in from_states)
+        attempts_increment = 1 if new_state == JobState.RUNNING else 0
+        # A job only holds a lease while it runs
+        release_lease = (
+            "" if new_state == JobState.RUNNING
+            else ", lease_owner = NULL, lease_expires_at = NULL"
+        )
+        with self._connect() as connection:
+            cursor = connection.execute(
+                f"""
+                UPDATE jobs
+                SET state = ?, error = ?, worker = ?, updated_at = ?,
+                    attempts = attempts + ?{release_lease}
+                WHERE job_key = ? AND state IN ({placeholders})
+                """,
+                [
+                    new_state.value,
+                    error,
+                    self._worker_name(),
+                    time.time(),
+                    attempts_increment,
+                    job_key,
+                    *from_states,
+                ],
+            )
+            moved = cursor.rowcount == 1
+        if not moved:
+            logger.warning(
+                f"Job {job_key} could not be moved to {new_state.value}, "
+                f"current state is {self.get_state(job_key)}"
+            )
+        return moved
+
+    def mark_running(self, job_key: str) -> bool:
+        return self.transition(job_key, JobState.RUNNING)
+
+    def mark_done(self, job_key: str) -> bool:
+        return self.transition(job_key, JobState.DONE)
+
+    def mark_failed(self, job_key: str, error: str) -> bool:
+        """
+        Marks a job as failed. Jobs unknown to the ledger are added first, so
+        errors raised before a job is queued are still recorded.
+        """
+        self.enqueue([job_key])
+        return self.transition(job_key, JobState.FAILED, error=error)
+
+    def mark_interrupted(self, job_key: str, error: str) -> bool:
+        """
+        Marks a running job as stopped but resumable from its checkpoints.
+        """
+        return self.transition(job_key, JobState.INTERRUPTED, error=error)
+
+    def requeue_unfinished(self, retry_failed: bool = False) -> int:
+        """
+        Puts jobs left unfinished by an earlier run back in the queue, e.g. when
+        resuming a campaign after a crash or a wall time limit. Interrupted jobs
+        continue from their checkpoints. Running jobs are only requeued once
+        their lease has expired, or if they hold none (run outside the work
+        queue), so jobs of live queue workers are never handed out twice.
+
+        :param retry_failed: Also requeue jobs that failed.
+        :return: Number of requeued jobs.
+        """
+        now = time.time()
+        states = [JobState.INTERRUPTED.value]
+        if retry_failed:
+            states.append(JobState.FAILED.value)
+        placeholders = ", ".join("?" for _ in states)
+        with self._connect() as connection:
+            cursor = connection.execute(
+                f"""
+                UPDATE jobs
+                SET state = ?, updated_at = ?, lease_owner = NULL, lease_expires_at = NULL
+                WHERE state IN ({placeholders})
+                    OR (state = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?))
+                """,
+                (JobState.QUEUED.value, now, *states, JobState.RUNNING.value, now),
+            )
+            return cursor.rowcount
+
+    def get_state(self, job_key: str) -> Optional[JobState]:
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT state FROM jobs WHERE job_key = ?", (job_key,)
+            ).fetchone()
+        return JobState(row[0]) if row else None
+
+    def get_error(self, job_key: str) -> Optional[str]:
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT error FROM jobs WHERE job_key = ?", (job_key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_jobs(self, state: JobState) -> Set[str]:
+        """
+        :return: Keys of all jobs currently in `state`.
+        """
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT job_key FROM jobs WHERE state = ?", (state.value,)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def filter_state(
+        self, job_keys: Iterable[str], state: JobState = JobState.DONE
+    ) -> Set[str]:
+        """
+        Looks up which of `job_keys` are in `state`, so callers can skip them
+        without loading every key of the campaign into memory.
+
+        :param job_keys: Keys to check.
+        :param state: State to filter on.
+        :return: The subset of `job_keys` currently in `state`.
+        """
+        return self.filter_states(job_keys, [state])
+
+    def filter_states(
+        self, job_keys: Iterable[str], states: Iterable[JobState]
+    ) -> Set[str]:
+        """
+        :param job_keys: Keys to check.
+        :param states: States to filter on.
+        :return: The subset of `job_keys` currently in any of `states`.
+        """
+        job_keys = list(job_keys)
+        state_values = [state.value for state in states]
+        state_placeholders = ", ".join("?" * len(state_values))
+        chunk_size = self.max_query_params - len(state_values)
+        found: Set[str] = set()
+        with self._connect() as connection:
+            for start in range(0, len(job_keys), chunk_size):
+                chunk = job_keys[start : start + chunk_size]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = connection.execute(
+                    f"SELECT job_key FROM jobs WHERE state IN ({state_placeholders}) "
+                    f"AND job_key IN ({placeholders})",
+                    (*state_values, *chunk),
+                ).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+
+    def get_counts(self) -> Dict[str, int]:
+        """
+        :return: Number of jobs in each state.
+        """
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT state, COUNT(*) FROM jobs GROUP BY state"
+            ).fetchall()
+        return dict(rows)
+
+    def record_output(self, job_key: str, data: Dict[str, Any]):
+        """
+        Stores a job's output row, replacing any earlier one.
+
+        :param job_key: Key of the job.
+        :param data: JSON serialisable output data.
+        """
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO outputs (job_key, data, updated_at) VALUES (?, ?, ?)",
+                (job_key, json.dumps(data), time.time()),
+            )
+
+    def get_output(self, job_key: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT data FROM outputs WHERE job_key = ?", (job_key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_outputs(self) -> List[Dict[str, Any]]:
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT data FROM outputs ORDER BY updated_at"
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def import_completed_jobs(self, job_keys: Iterable[str]) -> int:
+        """
+        Marks jobs as done without running them, used to carry over the
+        progress of campaigns started before the ledger existed.
+
+        :return: Number of jobs marked as done.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            cursor = connection.executemany(
+                """
+                INSERT INTO jobs (job_key, state, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT (job_key) DO UPDATE SET state = excluded.state
+                """,
+                [(job_key, JobState.DONE.value, now) for job_key in job_keys],
+            )
+            return cursor.rowcount
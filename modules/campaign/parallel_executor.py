@@ -0,0 +1,313 @@
+from config.data_models.scheduled_job import CoreBudget, ScheduledJob
+from config.paths import CHECKPOINT_DIR, WORKER_ID_ENV_VAR
+from modules.campaign.core_budget import (
+    CoreAllocator,
+    DEFAULT_ATOMS_PER_CORE,
+    estimate_core_count,
+    estimate_memory_gb,
+    get_available_cores,
+    get_available_memory_gb,
+)
+from typing import Callable, Dict, Iterable, List, Optional
+import multiprocessing
+import itertools
+import threading
+import hashlib
+import logging
+import signal
+import shutil
+import time
+import sys
+import os
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+# Exit code of a job process that was stopped after checkpointing its mdrun
+RESUMABLE_EXIT_CODE = 75
+
+
+def get_job_checkpoint_dir(job_id: str) -> str:
+    """
+    Checkpoint directory of a job, the same in every run of the campaign.
+    Job ids contain SMILES, so the directory is named by their hash.
+    """
+    return os.path.join(CHECKPOINT_DIR, hashlib.sha256(job_id.encode()).hexdigest()[:16])
+
+
+def _run_scheduled_job(
+    job: ScheduledJob, error_queue: multiprocessing.SimpleQueue
+) -> None:
+    """
+    Entry point of a job's child process: applies the job's core budget to
+    every mdrun call and runs the job's target with checkpointing. On SIGTERM,
+    the running mdrun writes a checkpoint and the process exits with
+    RESUMABLE_EXIT_CODE, and the checkpoints are removed once the job succeeds.
+    The process dumps its cache stats while the job runs and when it ends.
+    """
+    from config.mdp_workflow_config import set_checkpoint_dir, set_mdrun_flags
+    from modules.cache_store.cache_stats import CacheStatsDumper
+    from modules.command_line_operation import (
+        TerminationRequested,
+        forward_termination_signals,
+    )
+
+    forward_termination_signals()
+    checkpoint_dir = get_job_checkpoint_dir(job.job_id)
+    set_mdrun_flags(job.budget.to_mdrun_flags())
+    set_checkpoint_dir(checkpoint_dir)
+    try:
+        with CacheStatsDumper(job_id=job.job_id):
+            job.target(**job.kwargs)
+    except TerminationRequested as e:
+        logger.warning(f"Job {job.job_id} stopped, resumable from {checkpoint_dir}: {e}")
+        sys.exit(RESUMABLE_EXIT_CODE)
+    except Exception as e:
+        error_queue.put((job.job_id, f"{type(e).__name__}: {e}"))
+        raise
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
+
+
+class CoreBudgetedExecutor:
+    """
+    Runs many jobs at once on a single node. Each job gets its own block of
+    cores (passed to mdrun as -nt/-ntomp/-pinoffset) sized by its estimated
+    atom count, and jobs are packed onto the node largest-first by cores and
+    memory. Jobs are started longest predicted runtime first (atom count when
+    no prediction is given). Every job runs in a freshly spawned process with
+    its own TEMP_DIR and LOG_DIR.
+
+    Jobs that time out, and all running jobs when the executor receives
+    SIGTERM, are stopped gracefully so their mdrun checkpoints, and are
+    reported as interrupted rather than failed.
+    """
+
+    poll_interval: float = 2.0
+    # Seconds a stopped job gets to write its checkpoint before it is killed
+    termination_grace_s: float = 60.0
+
+    def __init__(
+        self,
+        total_cores: Optional[int] = None,
+        total_memory_gb: Optional[float] = None,
+        atoms_per_core: int = DEFAULT_ATOMS_PER_CORE,
+        min_cores_per_job: int = 2,
+        max_cores_per_job: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
+        """
+        :param total_cores: Cores to share between jobs, defaults to the SLURM allocation.
+        :param total_memory_gb: Memory to share between jobs, defaults to the SLURM allocation.
+        :param atoms_per_core: Target atoms per core used to size each job.
+        :param min_cores_per_job: Smallest core budget handed to a job.
+        :param max_cores_per_job: Largest core budget handed to a job.
+        :param timeout: Wall time in seconds after which a job is terminated.
+        """
+        self.total_cores = total_cores or get_available_cores()
+        self.total_memory_gb = (
+            total_memory_gb if total_memory_gb is not None else get_available_memory_gb()
+        )
+        self.atoms_per_core = atoms_per_core
+        self.min_cores_per_job = min_cores_per_job
+        self.max_cores_per_job = max_cores_per_job
+        self.timeout = timeout
+        self.context = multiprocessing.get_context("spawn")
+        self._worker_ids = itertools.count()
+        # Set by SIGTERM during `run`, after which no more jobs are started
+        self.stop_requested = threading.Event()
+
+    def _size_job(self, job: ScheduledJob) -> ScheduledJob:
+        n_cores = estimate_core_count(
+            job.atom_count,
+            total_cores=self.total_cores,
+            atoms_per_core=self.atoms_per_core,
+            min_cores=self.min_cores_per_job,
+            max_cores=self.max_cores_per_job,
+        )
+        job.budget = CoreBudget(
+            n_cores=n_cores, memory_gb=estimate_memory_gb(job.atom_count)
+        )
+        return job
+
+    def _start_job(
+        self, job: ScheduledJob, error_queue: multiprocessing.SimpleQueue
+    ) -> multiprocessing.Process:
+        process = self.context.Process(
+            target=_run_scheduled_job, args=(job, error_queue), name=job.job_id
+        )
+        # The spawned interpreter reads the worker id when it imports config.paths
+        previous_worker_id = os.environ.get(WORKER_ID_ENV_VAR)
+        os.environ[WORKER_ID_ENV_VAR] = str(next(self._worker_ids))
+        try:
+            process.start()
+        finally:
+            if previous_worker_id is None:
+                os.environ.pop(WORKER_ID_ENV_VAR, None)
+            else:
+                os.environ[WORKER_ID_ENV_VAR] = previous_worker_id
+        logger.info(
+            f"Started {job.job_id} (~{job.atom_count} atoms) on "
+            f"{job.budget.n_cores} cores at offset {job.budget.pin_offset}"
+        )
+        return process
+
+    def run(
+        self,
+        jobs: Iterable[ScheduledJob],
+        on_success: Optional[Callable[[str], None]] = None,
+        on_failure: Optional[Callable[[str, str], None]] = None,
+        lookahead: Optional[int] = None,
+        on_interrupted: Optional[Callable[[str, str], None]] = None,
+    ) -> Dict[str, bool]:
+        """
+        Runs all jobs, keeping the node as full as their budgets allow.
+
+        :param jobs: Jobs to run, any iterable. With a `lookahead`, jobs are
+            only drawn from it as slots free up, so a lazy generator is never
+            materialised.
+        :param on_success: Called with the job id of every job that completes.
+        :param on_failure: Called with the job id and error message of every
+            job that fails or times out.
+        :param lookahead: Number of jobs held in the pending window, which is
+            ordered longest first. None reads every job up front. 0 only draws
+            a job when none is pending and the smallest core budget is free,
+            so jobs are not held while they could start elsewhere.
+        :param on_interrupted: Called with the job id and reason of every job
+            stopped after checkpointing, defaults to `on_failure`.
+        :return: Mapping of job id to whether it succeeded.
+        """
+        allocator = CoreAllocator(self.total_cores, self.total_memory_gb)
+        error_queue = self.context.SimpleQueue()
+        job_iterator = iter(jobs)
+        pending: List[ScheduledJob] = []
+        running: Dict[str, tuple] = {}
+        errors: Dict[str, str] = {}
+        results: Dict[str, bool] = {}
+
+        def refill_pending():
+            if lookahead == 0:
+                can_start = not pending and allocator.fits(
+                    min(self.min_cores_per_job, self.total_cores)
+                )
+                window = 1 if can_start else 0
+            else:
+                window = lookahead if lookahead is not None else float("inf")
+            added = False
+            while len(pending) < window:
+                job = next(job_iterator, None)
+                if job is None:
+                    break
+                pending.append(self._size_job(job))
+                added = True
+            if added:
+                pending.sort(
+                    key=lambda job: (job.predicted_runtime_s, job.atom_count),
+                    reverse=True,
+                )
+
+        # On SIGTERM (e.g. from SLURM before the wall time) no more jobs are
+        # started and the running ones are stopped so they checkpoint
+        stop_requested = self.stop_requested
+        previous_handler = None
+        if threading.current_thread() is threading.main_thread():
+            previous_handler = signal.signal(
+                signal.SIGTERM, lambda signum, frame: stop_requested.set()
+            )
+        on_interrupted = on_interrupted or on_failure
+        stopping = False
+
+        if not stop_requested.is_set():
+            refill_pending()
+        try:
+            while (pending and not stopping) or running:
+                if stop_requested.is_set() and not stopping:
+                    stopping = True
+                    logger.warning(
+                        f"Termination requested, stopping {len(running)} running jobs, "
+                        f"{len(pending)} pending jobs stay queued."
+                    )
+                    for job, process, start_time in running.values():
+                        process.terminate()
+
+                # Fill free cores, longest job that fits first
+                for job in [] if stopping else list(pending):
+                    budget = allocator.allocate(job.budget.n_cores, job.budget.memory_gb)
+                    if budget is None:
+                        continue
+                    job.budget = budget
+                    pending.remove(job)
+                    running[job.job_id] = (job, self._start_job(job, error_queue), time.time())
+                    refill_pending()
+
+                if not running and pending and not stopping:
+                    raise RuntimeError(
+                        f"Job {pending[0].job_id} needs {pending[0].budget.n_cores} cores "
+                        f"but only {self.total_cores} are available."
+                    )
+
+                time.sleep(self.poll_interval)
+
+                while not error_queue.empty():
+                    job_id, message = error_queue.get()
+                    errors[job_id] = message
+
+                for job_id, (job, process, start_time) in list(running.items()):
+                    if process.is_alive():
+                        if self.timeout and time.time() - start_time > self.timeout:
+                            logger.warning(
+                                f"Timeout exceeded for {job_id}, terminating process."
+                            )
+                            self._stop_job(process)
+                            errors[job_id] = "Simulation timed out."
+                        elif stopping:
+                            self._stop_job(process)
+                            errors[job_id] = "Stopped by SIGTERM."
+                        else:
+                            continue
+                    process.join()
+                    allocator.release(job.budget)
+                    del running[job_id]
+
+                    while not error_queue.empty():
+                        failed_id, message = error_queue.get()
+                        errors[failed_id] = message
+
+                    succeeded = process.exitcode == 0 and job_id not in errors
+                    results[job_id] = succeeded
+                    if succeeded:
+                        logger.info(f"Job {job_id} completed.")
+                        if on_success:
+                            on_success(job_id)
+                    elif process.exitcode == RESUMABLE_EXIT_CODE:
+                        message = f"{errors.get(job_id, 'Stopped.')} Resumable from checkpoint."
+                        logger.warning(f"Job {job_id} interrupted: {message}")
+                        if on_interrupted:
+                            on_interrupted(job_id, message)
+                    else:
+                        message = errors.get(
+                            job_id, f"Process exited with code {process.exitcode}."
+                        )
+                        logger.error(f"Job {job_id} failed: {message}")
+                        if on_failure:
+                            on_failure(job_id, message)
+
+                # Without a window, the next job is drawn once cores are freed
+                if lookahead == 0 and not stopping and not stop_requested.is_set():
+                    refill_pending()
+        finally:
+            if previous_handler is not None:
+                signal.signal(signal.SIGTERM, previous_handler)
+
+        return results
+
+    def _stop_job(self, process: multiprocessing.Process):
+        """
+        Sends SIGTERM so the job's mdrun writes a checkpoint, and kills the job
+        if it has not exited after `termination_grace_s`.
+        """
+        process.terminate()
+        process.join(self.termination_grace_s)
+        if process.is_alive():
+            process.kill()
+            process.join()
@@ -0,0 +1,124 @@
+from config.data_models.scheduled_job import ScheduledJob
+from modules.campaign.job_ledger import JobLedger
+from modules.campaign.parallel_executor import CoreBudgetedExecutor
+from typing import Any, Callable, Dict, Iterator, Optional
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+class QueueWorker:
+    """
+    Worker daemon that pulls jobs from a campaign's shared job ledger instead
+    of running a fixed slice of the campaign. Any number of workers, on any
+    number of nodes sharing the ledger's filesystem, can drain the same queue:
+    each claims the highest priority job whenever it has cores free, so fast
+    nodes keep taking work while slow ones finish theirs.
+
+    Claimed jobs hold a lease that a heartbeat thread renews. If a worker dies,
+    its leases expire and other workers pick the jobs up again, resuming them
+    from their mdrun checkpoints.
+    """
+
+    def __init__(
+        self,
+        ledger: JobLedger,
+        make_job: Callable[[str, Dict[str, Any]], ScheduledJob],
+        executor: CoreBudgetedExecutor,
+        lease_s: float = 900.0,
+        heartbeat_s: float = 60.0,
+        poll_s: float = 60.0,
+    ):
+        """
+        :param ledger: Ledger the campaign was submitted to.
+        :param make_job: Builds a job from its key and submitted payload.
+        :param executor: Runs the claimed jobs on this node.
+        :param lease_s: Seconds a claimed job is held without a heartbeat.
+        :param heartbeat_s: Seconds between lease renewals, well below `lease_s`.
+        :param poll_s: Seconds to wait before checking the queue again while
+            other workers still hold leases that may expire.
+        """
+        if heartbeat_s >= lease_s:
+            raise ValueError(
+                f"Heartbeat interval ({heartbeat_s}s) must be shorter than the lease ({lease_s}s)."
+            )
+        self.ledger = ledger
+        self.make_job = make_job
+        self.executor = executor
+        self.lease_s = lease_s
+        self.heartbeat_s = heartbeat_s
+        self.poll_s = poll_s
+
+    def _claim_jobs(self) -> Iterator[ScheduledJob]:
+        # Jobs are claimed one at a time, only once the executor has cores
+        # free to start them, so no job is leased while this node is busy
+        while not self.executor.stop_requested.is_set():
+            claimed = self.ledger.claim_next(self.lease_s)
+            if claimed is None:
+                return
+            job_key, payload = claimed
+            try:
+                job = self.make_job(job_key, payload)
+            except Exception as e:
+                self.ledger.mark_failed(job_key, f"{type(e).__name__}: {e}")
+                continue
+            logger.info(f"Claimed {job_key}")
+            yield job
+
+    def _heartbeat(self, stop: threading.Event):
+        while not stop.wait(self.heartbeat_s):
+            try:
+                self.ledger.renew_leases(self.lease_s)
+            except Exception as e:
+                # A missed heartbeat only matters if the lease runs out
+                logger.warning(f"Failed to renew leases: {e}")
+
+    def run(
+        self,
+        on_success: Optional[Callable[[str], None]] = None,
+        on_failure: Optional[Callable[[str, str], None]] = None,
+        on_interrupted: Optional[Callable[[str, str], None]] = None,
+    ) -> Dict[str, bool]:
+        """
+        Runs claimed jobs until the queue is drained and no other worker holds
+        a lease, or until SIGTERM.
+
+        :return: Mapping of job id to whether it succeeded, for this worker's jobs.
+        """
+        results: Dict[str, bool] = {}
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=(stop_heartbeat,), daemon=True
+        )
+        heartbeat.start()
+        try:
+            while True:
+                results.update(
+                    self.executor.run(
+                        self._claim_jobs(),
+                        on_success=on_success,
+                        on_failure=on_failure,
+                        lookahead=0,
+                        on_interrupted=on_interrupted,
+                    )
+                )
+                if self.executor.stop_requested.is_set():
+                    break
+                if not self.ledger.has_queued_work():
+                    break
+                # Other workers still hold jobs, which come back if their lease expires
+                time.sleep(self.poll_s)
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+            released = self.ledger.release_leases()
+            if released:
+                logger.info(f"Released {released} claimed jobs that were not started")
+
+        logger.info(
+            f"Worker finished: {sum(results.values())} of {len(results)} jobs succeeded"
+        )
+        return results
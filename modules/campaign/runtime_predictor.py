@@ -0,0 +1,505 @@
+from config.data_models.stage_timing import StageTiming
+from config.paths import RUNTIME_HISTORY_PATH, RUNTIME_MODEL_PATH
+from modules.campaign.core_budget import count_atoms_from_gro
+from contextlib import contextmanager
+from dataclasses import asdict
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+import pandas as pd
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+NSTEPS_PATTERN = re.compile(r"^\s*nsteps\s*=\s*(-?\d+)", re.MULTILINE)
+INTEGRATOR_PATTERN = re.compile(r"^\s*integrator\s*=\s*(\S+)", re.MULTILINE)
+MPI_THREADS_PATTERN = re.compile(r"Using (\d+) MPI threads?")
+OMP_THREADS_PATTERN = re.compile(r"Using (\d+) OpenMP threads?")
+ATOMS_PATTERN = re.compile(r"There are:\s*(\d+)\s*Atoms")
+WALL_TIME_PATTERN = re.compile(r"^\s*Time:\s+([\d.]+)\s+([\d.]+)", re.MULTILINE)
+MINIMISATION_INTEGRATORS = {"steep", "cg", "l-bfgs"}
+# Used when a log has no box volume, roughly the atom density of liquids
+ATOMS_PER_NM3 = 100.0
+
+
+def read_gro_box_volume(gro_path: str) -> Optional[float]:
+    """
+    Volume (nm^3) of the box on the last line of a `.gro` file.
+    """
+    with open(gro_path, "rb") as file:
+        file.seek(0, os.SEEK_END)
+        file.seek(max(0, file.tell() - 512))
+        last_line = file.read().decode().strip().splitlines()[-1]
+    box = [float(value) for value in last_line.split()]
+    if len(box) < 3:
+        return None
+    return box[0] * box[1] * box[2]
+
+
+def _find_output_gro(log_path: str) -> Optional[str]:
+    # BaseWorkflowStep saves logs to log_files/ and coordinates to gro_files/
+    log_dir, log_name = os.path.split(log_path)
+    gro_name = f"{os.path.splitext(log_name)[0]}.gro"
+    for gro_dir in (os.path.join(os.path.dirname(log_dir), "gro_files"), log_dir):
+        gro_path = os.path.join(gro_dir, gro_name)
+        if os.path.exists(gro_path):
+            return gro_path
+    return None
+
+
+def parse_mdrun_log(log_path: str) -> Optional[StageTiming]:
+    """
+    Extracts the timing of an mdrun stage from its `.log` file. The atom count
+    and box volume are read from the stage's output `.gro` when it was saved
+    next to the log.
+
+    :param log_path: Path to the mdrun `.log` file.
+    :return: The stage timing, or None if the log is incomplete.
+    """
+    with open(log_path, "r", errors="replace") as file:
+        content = file.read()
+
+    nsteps_match = NSTEPS_PATTERN.search(content)
+    wall_time_match = WALL_TIME_PATTERN.search(content)
+    if not nsteps_match or not wall_time_match:
+        logger.debug(f"Skipping incomplete mdrun log {log_path}")
+        return None
+
+    mpi_threads = MPI_THREADS_PATTERN.search(content)
+    omp_threads = OMP_THREADS_PATTERN.search(content)
+    n_threads = (int(mpi_threads.group(1)) if mpi_threads else 1) * (
+        int(omp_threads.group(1)) if omp_threads else 1
+    )
+    integrator = INTEGRATOR_PATTERN.search(content)
+
+    gro_path = _find_output_gro(log_path)
+    atoms_match = ATOMS_PATTERN.search(content)
+    if gro_path:
+        atom_count = count_atoms_from_gro(gro_path)
+        box_volume_nm3 = read_gro_box_volume(gro_path)
+    elif atoms_match:
+        atom_count = int(atoms_match.group(1))
+        box_volume_nm3 = None
+    else:
+        logger.debug(f"No atom count found for mdrun log {log_path}")
+        return None
+
+    return StageTiming(
+        stage_name=os.path.splitext(os.path.basename(log_path))[0],
+        atom_count=atom_count,
+        nsteps=int(nsteps_match.group(1)),
+        n_threads=n_threads,
+        wall_time_s=float(wall_time_match.group(2)),
+        is_minimisation=bool(integrator)
+        and integrator.group(1).lower() in MINIMISATION_INTEGRATORS,
+        box_volume_nm3=box_volume_nm3,
+        log_path=os.path.abspath(log_path),
+    )
+
+
+def harvest_timings(log_dirs: List[str]) -> pd.DataFrame:
+    """
+    Collects the timings of every mdrun `.log` file found under `log_dirs`.
+
+    :param log_dirs: Directories to search, e.g. LOG_DIR.
+    :return: One row per stage, with the fields of `StageTiming`.
+    """
+    timings = []
+    for log_dir in log_dirs:
+        for root, _, files in os.walk(log_dir):
+            for file_name in files:
+                if not file_name.endswith(".log"):
+                    continue
+                timing = parse_mdrun_log(os.path.join(root, file_name))
+                if timing:
+                    timings.append(asdict(timing))
+    return pd.DataFrame(
+        timings, columns=list(StageTiming.__dataclass_fields__.keys())
+    )
+
+
+# Column definitions of the runtime history, one per field of `StageTiming`
+HISTORY_COLUMNS = {
+    "stage_name": "TEXT NOT NULL",
+    "atom_count": "INTEGER NOT NULL",
+    "nsteps": "INTEGER NOT NULL",
+    "n_threads": "INTEGER NOT NULL",
+    "wall_time_s": "REAL NOT NULL",
+    "is_minimisation": "INTEGER NOT NULL",
+    "box_volume_nm3": "REAL",
+    "log_path": "TEXT",
+}
+
+
+class RuntimeHistory:
+    """
+    SQLite backed history of mdrun stage timings. Every workflow appends its
+    timings as one transaction when it finishes, so any number of processes
+    may append at once without interleaving rows.
+
+    Only the database path is stored on the instance, every call opens its own
+    connection, so a history can be handed to spawned worker processes.
+    """
+
+    busy_timeout_s: float = 60.0
+
+    def __init__(self, db_path: str = RUNTIME_HISTORY_PATH):
+        """
+        :param db_path: Path to the SQLite database, created on the first append.
+        """
+        self.db_path = os.path.abspath(db_path)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.db_path)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # The default rollback journal is used rather than WAL, as in JobLedger,
+        # since WAL does not work on network filesystems
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(
+            self.db_path, timeout=self.busy_timeout_s, isolation_level=None
+        )
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                columns = ", ".join(
+                    f"{column} {definition}"
+                    for column, definition in HISTORY_COLUMNS.items()
+                )
+                connection.execute(f"CREATE TABLE IF NOT EXISTS timings ({columns})")
+                self._create_unique_index(connection)
+                yield connection
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _create_unique_index(connection: sqlite3.Connection):
+        # A stage is recorded once per log file, so harvesting the same log
+        # directory again does not weight its timings twice. Histories written
+        # before the index existed may hold such duplicates, which are dropped
+        # once before the index is created
+        exists = connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?",
+            ("timings_log_stage",),
+        ).fetchone()
+        if exists:
+            return
+        connection.execute(
+            "DELETE FROM timings WHERE rowid NOT IN "
+            "(SELECT MIN(rowid) FROM timings GROUP BY log_path, stage_name)"
+        )
+        connection.execute(
+            "CREATE UNIQUE INDEX timings_log_stage ON timings (log_path, stage_name)"
+        )
+
+    def append(self, timings: pd.DataFrame) -> int:
+        """
+        Timings of a stage already recorded from the same log file are skipped.
+
+        :param timings: Output of `harvest_timings`.
+        :return: Number of timings appended.
+        """
+        columns = list(HISTORY_COLUMNS)
+        rows = [
+            (
+                str(row.stage_name),
+                int(row.atom_count),
+                int(row.nsteps),
+                int(row.n_threads),
+                float(row.wall_time_s),
+                int(bool(row.is_minimisation)),
+                None if pd.isna(row.box_volume_nm3) else float(row.box_volume_nm3),
+                None if pd.isna(row.log_path) else str(row.log_path),
+            )
+            for row in timings[columns].itertuples(index=False)
+        ]
+        placeholders = ", ".join("?" for _ in columns)
+        with self._connect() as connection:
+            changes = connection.total_changes
+            connection.executemany(
+                f"INSERT OR IGNORE INTO timings ({', '.join(columns)}) "
+                f"VALUES ({placeholders})",
+                rows,
+            )
+            return connection.total_changes - changes
+
+    def read(self) -> pd.DataFrame:
+        """
+        :return: Every recorded timing, with the columns of `harvest_timings`.
+        """
+        with self._connect() as connection:
+            timings = pd.read_sql_query(
+                f"SELECT {', '.join(HISTORY_COLUMNS)} FROM timings", connection
+            )
+        timings["is_minimisation"] = timings["is_minimisation"].astype(bool)
+        timings["box_volume_nm3"] = timings["box_volume_nm3"].astype(float)
+        return timings
+
+
+def record_runtime_history(
+    log_dir: str, history_path: str = RUNTIME_HISTORY_PATH
+) -> int:
+    """
+    Appends the timings found in `log_dir` to the runtime history, so they are
+    kept after workflows delete their log directory.
+
+    :param log_dir: Log directory of a finished workflow.
+    :param history_path: SQLite database holding the runtime history.
+    :return: Number of stage timings recorded, not counting those already in
+        the history.
+    """
+    if not os.path.isdir(log_dir):
+        return 0
+    try:
+        timings = harvest_timings([log_dir])
+        if timings.empty:
+            return 0
+        return RuntimeHistory(history_path).append(timings)
+    except Exception as e:
+        # Timings are best effort and must never fail a finished simulation
+        logger.warning(f"Failed to record runtime history from {log_dir}: {e}")
+        return 0
+
+
+class RuntimePredictor:
+    """
+    Predicts mdrun wall time from atom count, box volume, nsteps and thread
+    count with a log-linear model:
+
+        log(wall time) = c0 + c1 log(atoms) + c2 log(nsteps) + c3 log(threads)
+                         + c4 log(box volume) + c5 [energy minimisation]
+
+    Until it is fitted to harvested timings it uses a rough default of
+    wall time proportional to atoms * nsteps / threads.
+    """
+
+    feature_names = [
+        "intercept",
+        "log_atoms",
+        "log_nsteps",
+        "log_threads",
+        "log_box_volume",
+        "is_minimisation",
+    ]
+    default_coefficients = [math.log(2.7e-7), 1.0, 1.0, -1.0, 0.0, 0.0]
+    ridge_penalty: float = 1e-3
+
+    def __init__(self, coefficients: Optional[List[float]] = None):
+        self.coefficients = np.array(coefficients or self.default_coefficients)
+        self.n_samples = 0
+
+    @staticmethod
+    def _features(
+        atom_count: np.ndarray,
+        nsteps: np.ndarray,
+        n_threads: np.ndarray,
+        box_volume_nm3: np.ndarray,
+        is_minimisation: np.ndarray,
+    ) -> np.ndarray:
+        atom_count = np.maximum(np.asarray(atom_count, dtype=float), 1.0)
+        box_volume_nm3 = np.asarray(box_volume_nm3, dtype=float)
+        box_volume_nm3 = np.where(
+            np.isnan(box_volume_nm3), atom_count / ATOMS_PER_NM3, box_volume_nm3
+        )
+        return np.column_stack(
+            [
+                np.ones_like(atom_count),
+                np.log(atom_count),
+                np.log(np.maximum(np.asarray(nsteps, dtype=float), 1.0)),
+                np.log(np.maximum(np.asarray(n_threads, dtype=float), 1.0)),
+                np.log(np.maximum(box_volume_nm3, 1e-3)),
+                np.asarray(is_minimisation, dtype=float),
+            ]
+        )
+
+    def fit(self, timings: pd.DataFrame) -> "RuntimePredictor":
+        """
+        Fits the model to harvested timings. With too few timings the current
+        coefficients are kept.
+
+        :param timings: Output of `harvest_timings`.
+        :return: The predictor.
+        """
+        timings = timings[timings["wall_time_s"] > 0]
+        if len(timings) < 2 * len(self.feature_names):
+            logger.warning(
+                f"Only {len(timings)} timings available, keeping the current runtime model"
+            )
+            return self
+        features = self._features(
+            timings["atom_count"],
+            timings["nsteps"],
+            timings["n_threads"],
+            timings["box_volume_nm3"],
+            timings["is_minimisation"].astype(bool),
+        )
+        targets = np.log(timings["wall_time_s"].to_numpy(dtype=float))
+        # Small ridge penalty keeps the fit stable when features barely vary,
+        # e.g. a campaign that always uses the same thread count
+        gram = features.T @ features + self.ridge_penalty * np.eye(features.shape[1])
+        self.coefficients = np.linalg.solve(gram, features.T @ targets)
+        self.n_samples = len(timings)
+        residuals = targets - features @ self.coefficients
+        logger.info(
+            f"Fitted runtime model to {self.n_samples} timings, "
+            f"RMS log error {np.sqrt(np.mean(residuals ** 2)):.3f}"
+        )
+        return self
+
+    def predict(
+        self,
+        atom_count: int,
+        nsteps: int,
+        n_threads: int = 1,
+        box_volume_nm3: Optional[float] = None,
+        is_minimisation: bool = False,
+    ) -> float:
+        """
+        Predicted wall time of one mdrun stage in seconds.
+        """
+        features = self._features(
+            [atom_count],
+            [nsteps],
+            [n_threads],
+            [np.nan if box_volume_nm3 is None else box_volume_nm3],
+            [is_minimisation],
+        )
+        return float(np.exp(features @ self.coefficients)[0])
+
+    def predict_workflow(
+        self,
+        workflow,
+        atom_count: int,
+        n_threads: int = 1,
+        box_volume_nm3: Optional[float] = None,
+        n_varying_params: int = 1,
+    ) -> Dict[str, float]:
+        """
+        Predicted wall time of every step of a `FullEquilibrationWorkflow`.
+
+        :param workflow: The workflow, its steps' `nsteps` are read from their base params.
+        :param n_varying_params: Number of times the thermal steps are repeated.
+        :return: Predicted seconds keyed by step name.
+        """
+        predictions = {}
+        for step in workflow.em_steps:
+            step_name, base_params = step[0], step[3]
+            predictions[step_name] = self.predict(
+                atom_count,
+                int(base_params.get("nsteps", 0)),
+                n_threads,
+                box_volume_nm3,
+                is_minimisation=True,
+            )
+        for step in workflow.thermal_steps:
+            step_name, base_params = step[0], step[3]
+            predictions[step_name] = n_varying_params * self.predict(
+                atom_count, int(base_params.get("nsteps", 0)), n_threads, box_volume_nm3
+            )
+        return predictions
+
+    def predict_job(
+        self,
+        workflows: List,
+        atom_count: int,
+        n_threads: int,
+        box_size_nm: Optional[List[float]] = None,
+    ) -> float:
+        """
+        Predicted wall time in seconds of a job running `workflows` one after another.
+        """
+        box_volume_nm3 = float(np.prod(box_size_nm)) if box_size_nm else None
+        return sum(
+            sum(
+                self.predict_workflow(
+                    workflow, atom_count, n_threads, box_volume_nm3
+                ).values()
+            )
+            for workflow in workflows
+        )
+
+    def save(self, model_path: str = RUNTIME_MODEL_PATH):
+        os.makedirs(os.path.dirname(model_path) or ".", exist_ok=True)
+        with open(model_path, "w") as file:
+            json.dump(
+                {
+                    "features": self.feature_names,
+                    "coefficients": self.coefficients.tolist(),
+                    "n_samples": self.n_samples,
+                },
+                file,
+                indent=4,
+            )
+        logger.info(f"Saved runtime model to {model_path}")
+
+    @classmethod
+    def load(cls, model_path: str = RUNTIME_MODEL_PATH) -> "RuntimePredictor":
+        with open(model_path, "r") as file:
+            model = json.load(file)
+        predictor = cls(model["coefficients"])
+        predictor.n_samples = model.get("n_samples", 0)
+        return predictor
+
+
+def get_runtime_predictor(
+    model_path: str = RUNTIME_MODEL_PATH, history_path: str = RUNTIME_HISTORY_PATH
+) -> RuntimePredictor:
+    """
+    Loads the trained runtime model, fitting one to the runtime history if no
+    model was saved, or falls back to the default model.
+    """
+    if os.path.exists(model_path):
+        return RuntimePredictor.load(model_path)
+    history = RuntimeHistory(history_path)
+    if history.exists():
+        return RuntimePredictor().fit(history.read())
+    return RuntimePredictor()
+
+
+def freeze_runtime_model(
+    frozen_model_path: str,
+    model_path: str = RUNTIME_MODEL_PATH,
+    history_path: str = RUNTIME_HISTORY_PATH,
+) -> str:
+    """
+    Saves the current runtime model (see `get_runtime_predictor`) to
+    `frozen_model_path`, for every task of a job array to balance its shards
+    on the same predictions while the runtime history keeps growing.
+
+    :return: Path to the frozen model.
+    """
+    get_runtime_predictor(model_path, history_path).save(frozen_model_path)
+    return frozen_model_path
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description="Train the runtime model offline from mdrun logs and the runtime history."
+    )
+    parser.add_argument("log_dirs", nargs="*", help="Directories holding mdrun .log files.")
+    parser.add_argument("--history", default=RUNTIME_HISTORY_PATH)
+    parser.add_argument("--output", default=RUNTIME_MODEL_PATH)
+    args = parser.parse_args()
+
+    timings = [harvest_timings(args.log_dirs)]
+    history = RuntimeHistory(args.history)
+    if history.exists():
+        timings.append(history.read())
+    # Logs passed here may also have been recorded in the history already
+    timings = pd.concat(timings, ignore_index=True).drop_duplicates(
+        subset=["log_path", "stage_name"]
+    )
+    RuntimePredictor().fit(timings).save(args.output)
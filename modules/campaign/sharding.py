@@ -0,0 +1,98 @@
+from config.data_models.scheduled_job import ScheduledJob
+from typing import Callable, List, Optional, Tuple
+import heapq
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+SHARD_INDEX_ENV_VAR = "SLURM_ARRAY_TASK_ID"
+SHARD_MIN_ENV_VAR = "SLURM_ARRAY_TASK_MIN"
+SHARD_COUNT_ENV_VAR = "SLURM_ARRAY_TASK_COUNT"
+
+
+def job_cost(job: ScheduledJob) -> float:
+    """
+    Default job cost: the predicted runtime, or the atom count when the job has
+    no prediction, since MD cost grows roughly linearly with the number of atoms.
+    """
+    if job.predicted_runtime_s > 0:
+        return job.predicted_runtime_s
+    return float(max(job.atom_count, 1))
+
+
+def atom_count_cost(job: ScheduledJob) -> float:
+    """
+    Job cost from the atom count alone, the same in every array task whatever
+    runtime history each task has seen.
+    """
+    return float(max(job.atom_count, 1))
+
+
+def get_shard_from_env() -> Tuple[Optional[int], Optional[int]]:
+    """
+    Reads this task's shard index and the number of shards from a SLURM job array.
+    The index is relative to the first task id, so `--array=1-8` also works.
+
+    :return: (shard index, number of shards), or (None, None) outside an array job.
+    """
+    task_id = os.getenv(SHARD_INDEX_ENV_VAR)
+    if task_id is None:
+        return None, None
+    task_min = int(os.getenv(SHARD_MIN_ENV_VAR, "0"))
+    task_count = os.getenv(SHARD_COUNT_ENV_VAR)
+    return int(task_id) - task_min, int(task_count) if task_count else None
+
+
+def balance_shards(
+    jobs: List[ScheduledJob],
+    n_shards: int,
+    cost_fn: Callable[[ScheduledJob], float] = job_cost,
+) -> List[List[ScheduledJob]]:
+    """
+    Splits jobs into `n_shards` groups of roughly equal total cost, placing
+    the most expensive job on the cheapest shard first (longest processing
+    time first). Ties are broken by job id, so every array task computes the
+    same split independently.
+
+    :param jobs: All jobs of the campaign.
+    :param n_shards: Number of shards.
+    :param cost_fn: Predicted cost of a job.
+    :return: Jobs of each shard, in descending cost order.
+    """
+    if n_shards < 1:
+        raise ValueError(f"Number of shards must be at least 1, got {n_shards}.")
+    shards: List[List[ScheduledJob]] = [[] for _ in range(n_shards)]
+    shard_costs = [(0.0, shard_index) for shard_index in range(n_shards)]
+    heapq.heapify(shard_costs)
+    for job in sorted(jobs, key=lambda job: (-cost_fn(job), job.job_id)):
+        shard_cost, shard_index = heapq.heappop(shard_costs)
+        shards[shard_index].append(job)
+        heapq.heappush(shard_costs, (shard_cost + cost_fn(job), shard_index))
+    return shards
+
+
+def select_shard(
+    jobs: List[ScheduledJob],
+    shard_index: int,
+    n_shards: int,
+    cost_fn: Callable[[ScheduledJob], float] = job_cost,
+) -> List[ScheduledJob]:
+    """
+    Returns the jobs of one cost-balanced shard.
+
+    :param jobs: All jobs of the campaign.
+    :param shard_index: Index of the shard, from 0 to n_shards - 1.
+    :param n_shards: Number of shards.
+    :param cost_fn: Predicted cost of a job.
+    :return: The shard's jobs.
+    """
+    if not 0 <= shard_index < n_shards:
+        raise ValueError(f"Shard index {shard_index} is out of range for {n_shards} shards.")
+    shards = balance_shards(jobs, n_shards, cost_fn=cost_fn)
+    shard_costs = [sum(cost_fn(job) for job in shard) for shard in shards]
+    logger.info(
+        f"Shard {shard_index}/{n_shards}: {len(shards[shard_index])} jobs, "
+        f"cost {shard_costs[shard_index]:.3g} (max shard cost {max(shard_costs):.3g})"
+    )
+    return shards[shard_index]
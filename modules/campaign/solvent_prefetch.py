@@ -0,0 +1,188 @@
+from config.data_models.output_types import GromacsOutputs, GromacsPaths
+from config.data_models.pipeline_stage import PipelineStage, StageKind
+from config.data_models.scheduled_job import ScheduledJob
+from config.data_models.solvent import Solvent
+from config.paths import TEMP_DIR, LOG_DIR
+from modules.campaign.core_budget import get_available_cores
+from modules.utils.shared.file_utils import cleanup_directory
+from modules.workflows.pipeline.stage_graph_executor import StageGraphExecutor
+from modules.workflows.separated.gromacs.joined import JoinedAtomisticPolymerWorkflow
+from modules.workflows.separated.gromacs.solvent import (
+    SolventEquilibriationWorkflow,
+    solvent_cache,
+)
+from typing import Dict, List, Optional, Tuple
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# (parameterised solvent, solvent, box size in nm, temperature)
+SolventBox = Tuple[GromacsPaths, Solvent, List[float], float]
+
+
+def get_solvent_box_key(job: ScheduledJob) -> str:
+    """
+    Solvent cache key of the box a `SimulationManager` job is run in.
+
+    :param job: Job whose kwargs hold `parameterised_solvent`, `solvent`,
+        `n_units` and `temp`.
+    :return: The box's cache key.
+    """
+    return SolventEquilibriationWorkflow.get_cache_key(
+        solvent=job.kwargs["solvent"],
+        parameterised_solvent=job.kwargs["parameterised_solvent"],
+        box_size_nm=JoinedAtomisticPolymerWorkflow.get_box_size(job.kwargs["n_units"]),
+        temperature=job.kwargs["temp"],
+    )
+
+
+def collect_solvent_boxes(jobs: List[ScheduledJob]) -> Dict[str, SolventBox]:
+    """
+    Collects the unique solvent boxes (solvent, compressibility, temperature and
+    box size) needed by a set of `SimulationManager` jobs, e.g. a whole
+    campaign or a single shard of it, keyed by their solvent cache key.
+
+    :param jobs: Jobs whose kwargs hold `parameterised_solvent`, `solvent`,
+        `n_units` and `temp`.
+    :return: Unique solvent boxes keyed by cache key.
+    """
+    boxes: Dict[str, SolventBox] = {}
+    for job in jobs:
+        boxes.setdefault(
+            get_solvent_box_key(job),
+            (
+                job.kwargs["parameterised_solvent"],
+                job.kwargs["solvent"],
+                JoinedAtomisticPolymerWorkflow.get_box_size(job.kwargs["n_units"]),
+                job.kwargs["temp"],
+            ),
+        )
+    return boxes
+
+
+def _get_solvent_box_workflow(
+    box: SolventBox, temp_dir: str, log_dir: str
+) -> SolventEquilibriationWorkflow:
+    parameterised_solvent, solvent, box_size_nm, temperature = box
+    return SolventEquilibriationWorkflow(
+        solvent=solvent,
+        parameterised_solvent=parameterised_solvent,
+        box_size_nm=box_size_nm,
+        temperature=temperature,
+        confirm_temp_dir_deletion=False,
+        temp_dir=temp_dir,
+        log_dir=log_dir,
+    )
+
+
+def _prepare_solvent_box(box: SolventBox, temp_dir: str, log_dir: str) -> GromacsPaths:
+    return _get_solvent_box_workflow(box, temp_dir, log_dir).prepare_files()
+
+
+def _equilibriate_solvent_box(
+    prepared_files: GromacsPaths,
+    box: SolventBox,
+    temp_dir: str,
+    log_dir: str,
+    mdrun_flags: Optional[List[str]] = None,
+) -> GromacsOutputs:
+    return _get_solvent_box_workflow(
+        box, temp_dir, log_dir
+    ).equilibriate_prepared_files(prepared_files, mdrun_flags=mdrun_flags)
+
+
+def prefetch_solvent_boxes(
+    boxes: Dict[str, SolventBox],
+    total_cores: Optional[int] = None,
+    cores_per_box: Optional[int] = None,
+) -> Tuple[Dict[str, GromacsOutputs], Dict[str, str]]:
+    """
+    Equilibrates every solvent box that is not cached yet, in parallel, so that
+    polymer jobs only read them from the solvent cache. Each box is equilibrated
+    exactly once, so concurrent jobs no longer race to build the same box.
+    The Packmol box and solvent files of each solvent and box size are
+    prepared once by their own stage, which the boxes of every temperature
+    are equilibrated from.
+
+    :param boxes: Output of `collect_solvent_boxes`.
+    :param total_cores: Cores to share between boxes, defaults to the SLURM allocation.
+    :param cores_per_box: Cores pinned to each box's mdrun, defaults to an even
+        split of `total_cores`.
+    :return: Equilibrated boxes keyed by cache key, and the error message of
+        every box that failed keyed by cache key.
+    """
+    cached_keys = solvent_cache.has_keys(boxes)
+    outputs: Dict[str, GromacsOutputs] = {
+        cache_key: solvent_cache.retrieve_object(cache_key) for cache_key in cached_keys
+    }
+    stages = []
+    prepare_stage_ids: Dict[str, str] = {}
+    # Scratch of the preparation stages, kept until every temperature is done
+    prepare_dirs = []
+    for cache_key, box in boxes.items():
+        if cache_key in cached_keys:
+            continue
+        _, solvent, box_size_nm, _ = box
+        packmol_key = SolventEquilibriationWorkflow.get_packmol_cache_key(
+            solvent, box_size_nm
+        )
+        prepare_stage_id = f"solvent_files:{packmol_key}"
+        prepare_stage_ids[cache_key] = prepare_stage_id
+        prepare_temp_dir = os.path.join(TEMP_DIR, f"solvent_files_{packmol_key}")
+        prepare_log_dir = os.path.join(LOG_DIR, f"solvent_files_{packmol_key}")
+        if prepare_temp_dir not in prepare_dirs:
+            prepare_dirs.extend([prepare_temp_dir, prepare_log_dir])
+        # Merged with the stages of the same solvent and box size
+        stages.append(
+            PipelineStage(
+                stage_id=prepare_stage_id,
+                func=_prepare_solvent_box,
+                kwargs={
+                    "box": box,
+                    "temp_dir": prepare_temp_dir,
+                    "log_dir": prepare_log_dir,
+                },
+            )
+        )
+        stages.append(
+            PipelineStage(
+                stage_id=cache_key,
+                func=_equilibriate_solvent_box,
+                kind=StageKind.MDRUN,
+                depends_on=[prepare_stage_id],
+                kwargs={
+                    "box": box,
+                    "temp_dir": os.path.join(TEMP_DIR, f"solvent_{cache_key}"),
+                    "log_dir": os.path.join(LOG_DIR, f"solvent_{cache_key}"),
+                },
+            )
+        )
+
+    num_boxes = sum(stage.kind == StageKind.MDRUN for stage in stages)
+    logger.info(
+        f"{len(boxes)} solvent boxes needed, {len(outputs)} cached, "
+        f"{num_boxes} to equilibrate"
+    )
+    if not stages:
+        return outputs, {}
+
+    total_cores = total_cores or get_available_cores()
+    if not cores_per_box:
+        cores_per_box = max(1, total_cores // num_boxes)
+    results, errors = StageGraphExecutor(
+        cores_per_mdrun_stage=cores_per_box, total_cores=total_cores
+    ).run(stages)
+    for prepare_dir in prepare_dirs:
+        cleanup_directory(prepare_dir)
+    outputs.update(
+        (cache_key, result) for cache_key, result in results.items() if cache_key in boxes
+    )
+    # Boxes skipped as their files failed report why those failed
+    box_errors = {
+        cache_key: errors.get(prepare_stage_ids[cache_key], message)
+        for cache_key, message in errors.items()
+        if cache_key in boxes
+    }
+    return outputs, box_errors
@@ -1,12 +1,53 @@
 from abc import ABC, abstractmethod
 from typing import Optional, Tuple, List
 import subprocess
+import threading
 import logging
+import signal
 from config.constants import LengthUnits
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Commands currently running in this process, and whether this process has
+# been asked to stop
+_running_processes = set()
+_termination_requested = threading.Event()
+
+
+class TerminationRequested(RuntimeError):
+    """
+    Raised when a command was stopped by a forwarded termination signal. Any
+    mdrun that was running has written a checkpoint and can be resumed.
+    """
+
+
+def _forward_termination_signal(signum, frame):
+    if not _termination_requested.is_set():
+        logger.warning(
+            f"Received signal {signum}, stopping {len(_running_processes)} running commands"
+        )
+    _termination_requested.set()
+    for process in list(_running_processes):
+        if process.poll() is None:
+            process.send_signal(signum)
+
+
+def forward_termination_signals(signals: Tuple[int, ...] = (signal.SIGTERM,)):
+    """
+    Forwards termination signals (e.g. SIGTERM from SLURM before the wall time
+    or from a job timeout) to the commands this process is running, and makes
+    every command raise `TerminationRequested` once it has exited. mdrun stops
+    at its next step and writes a checkpoint when it receives SIGTERM.
+    Must be called from the main thread.
+    """
+    for signum in signals:
+        signal.signal(signum, _forward_termination_signal)
+
+
+def termination_requested() -> bool:
+    return _termination_requested.is_set()
+
 
 class CommandLineOperation(ABC):
     def __init__(self):
@@ -29,7 +70,8 @@ class CommandLineOperation(ABC):
         **subprocess_kwargs,
     ) -> str:
         """
-        Execute a command using subprocess.run.
+        Execute a command in a subprocess, which receives any termination
+        signal forwarded by `forward_termination_signals`.
 
         :param command: Command to execute
         :type command: List
@@ -40,22 +82,41 @@ class CommandLineOperation(ABC):
         :return: _description_
         :rtype: str
         """
+        if _termination_requested.is_set():
+            raise TerminationRequested(
+                f"Not starting {self.__class__.__name__}, termination was requested."
+            )
         try:
 
             self._log_input(command)
 
-            result = subprocess.run(
+            command_input = subprocess_kwargs.pop("input", None)
+            process = subprocess.Popen(
                 command,
-                check=True,
                 cwd=cwd,
+                stdin=subprocess.PIPE if command_input is not None else None,
                 stdout=subprocess.PIPE if verbose else None,
                 stderr=subprocess.PIPE if verbose else None,
                 text=True,
                 **subprocess_kwargs,
             )
+            _running_processes.add(process)
+            try:
+                stdout, stderr = process.communicate(input=command_input)
+            finally:
+                _running_processes.discard(process)
+
+            if _termination_requested.is_set():
+                raise TerminationRequested(
+                    f"{self.__class__.__name__} was stopped by a termination signal."
+                )
+            if process.returncode:
+                raise subprocess.CalledProcessError(
+                    process.returncode, command, output=stdout, stderr=stderr
+                )
 
             if verbose:
-                self._log_output(result.stdout, result.stderr)
+                self._log_output(stdout, stderr)
 
             logger.info(f"Command completed successfully: {self.__class__.__name__}")
         except subprocess.CalledProcessError as e:
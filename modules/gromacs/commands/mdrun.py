@@ -5,6 +5,9 @@ import os
 
 # NOTE: NEED TO FIX, think abt temp, and where to input/output dir - e.g. in the new base class for equilibrium or not
 class MDrun(BaseGromacsCommand):
+    # Minutes between checkpoints written by resumable runs
+    checkpoint_interval_min: float = 15.0
+
     def __init__(self):
         super().__init__()
 
@@ -14,11 +17,19 @@ class MDrun(BaseGromacsCommand):
         output_name: str,
         verbose: bool = False,
         additional_flags: Optional[List[str]] = None,
+        checkpoint: bool = False,
     ) -> Dict[str, str]:
-        command = self._create_command(input_tpr_path, output_name, additional_flags)
+        """
+        :param checkpoint: Write `<output_name>.cpt` every `checkpoint_interval_min`
+            minutes and when mdrun is stopped by a signal, and continue from it
+            (appending to the existing outputs) if it already exists.
+        """
+        command = self._create_command(
+            input_tpr_path, output_name, additional_flags, checkpoint=checkpoint
+        )
         self._execute(command, verbose=verbose)
         output_files = {
-            ext: f"{output_name}.{ext}" for ext in ["gro", "log", "edr", "trr"]
+            ext: f"{output_name}.{ext}" for ext in ["gro", "log", "edr", "trr", "cpt"]
         }
 
         return {k: v for k, v in output_files.items() if os.path.exists(v)}
@@ -28,8 +39,14 @@ class MDrun(BaseGromacsCommand):
         input_tpr_path: str,
         output_name: str,
         additional_flags: Optional[List[str]] = None,
+        checkpoint: bool = False,
     ) -> List[str]:
         command = ["gmx", "mdrun", "-s", input_tpr_path, "-deffnm", output_name]
+        if checkpoint:
+            checkpoint_path = f"{output_name}.cpt"
+            command.extend(["-cpt", str(self.checkpoint_interval_min)])
+            if os.path.exists(checkpoint_path):
+                command.extend(["-cpi", checkpoint_path])
         if additional_flags:
             command.extend(additional_flags)
         return command
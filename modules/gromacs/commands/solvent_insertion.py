@@ -13,7 +13,7 @@ import logging
 from typing import Tuple
 from config.constants import MassUnits
 import subprocess
-from modules.gromacs.parsers.gromacs_parser import GromacsParser
+import numpy as np
 from modules.gromacs.parsers.handlers.gro_handler import GroHandler
 
 logger = logging.getLogger(__name__)
@@ -188,14 +188,6 @@ class SolventInsertion(BaseGromacsCommand):
         if not os.path.exists(gro_file):
             return 0
 
-        # Use FileSplitter and GroHandler to parse the .gro file
-        parser = GromacsParser()
-        sections = parser.parse(gro_file)
-
-        # Assuming the `.gro` file content is the first section
-        gro_section = next(iter(sections.values()))
-        gro_handler = GroHandler()
-        gro_handler.process(gro_section)
-
-        residue_numbers = gro_handler.content["Residue Number"].unique()
+        gro_handler = GroHandler().read(gro_file)
+        residue_numbers = np.unique(gro_handler.atoms["resid"])
         return len(residue_numbers)
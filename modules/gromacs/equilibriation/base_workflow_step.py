@@ -7,6 +7,7 @@ from modules.gromacs.commands.grompp import Grompp
 from modules.gromacs.commands.mdrun import MDrun
 from modules.utils.shared.file_utils import check_directory_exists, copy_file
 import logging
+import shutil
 import os
 
 from modules.cache_store.mdp_cache import MDPCache
@@ -69,6 +70,58 @@ class BaseWorkflowStep:
 
         return saved_files
 
+    def _run_resumable(
+        self,
+        step_name: str,
+        mdp_file: str,
+        input_gro_path: str,
+        input_topol_path: str,
+        checkpoint_dir: str,
+        checkpoint_key: Optional[str],
+        expected_outputs: Dict[str, str],
+        verbose: bool,
+        additional_flags: Optional[List[str]],
+    ):
+        """
+        Runs grompp and mdrun in `checkpoint_dir`, skipping grompp when a
+        checkpoint of an interrupted run exists and skipping both when the step
+        already completed, then copies the outputs to `expected_outputs`.
+        """
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        run_name = f"{step_name}_{checkpoint_key}" if checkpoint_key else step_name
+        run_prefix = os.path.join(checkpoint_dir, run_name)
+        done_marker = f"{run_prefix}.done"
+        checkpoint_outputs = {ext: f"{run_prefix}.{ext}" for ext in expected_outputs}
+
+        if os.path.exists(done_marker) and all(
+            os.path.isfile(path) for path in checkpoint_outputs.values()
+        ):
+            logger.info(f"Workflow step '{step_name}' already completed, reusing its outputs.")
+        else:
+            tpr_path = f"{run_prefix}.tpr"
+            if os.path.isfile(f"{run_prefix}.cpt") and os.path.isfile(tpr_path):
+                logger.info(f"Resuming workflow step '{step_name}' from its checkpoint.")
+            else:
+                tpr_path = self.grompp.run(
+                    mdp_file_path=mdp_file,
+                    input_gro_path=input_gro_path,
+                    input_topol_path=input_topol_path,
+                    output_dir=checkpoint_dir,
+                    output_name=run_name,
+                    verbose=verbose,
+                )
+            self.mdrun.run(
+                input_tpr_path=tpr_path,
+                output_name=run_prefix,
+                verbose=verbose,
+                additional_flags=additional_flags,
+                checkpoint=True,
+            )
+            open(done_marker, "w").close()
+
+        for file_type, file_path in checkpoint_outputs.items():
+            shutil.copyfile(file_path, expected_outputs[file_type])
+
     def run(
         self,
         step_name: str,
@@ -83,10 +136,9 @@ class BaseWorkflowStep:
         save_intermediate_gro: bool = False,
         save_intermediate_log: bool = False,
         verbose: bool = False,
-<<<<<<< HEAD
-        additional_flags =None
-=======
->>>>>>> 91758eb (cleaned up)
+        additional_flags: Optional[List[str]] = None,
+        checkpoint_dir: Optional[str] = None,
+        checkpoint_key: Optional[str] = None,
     ) -> str:
         """
         Run the workflow step.
@@ -102,6 +154,11 @@ class BaseWorkflowStep:
         :param save_intermediate_gro: Flag to save intermediate `.gro` files in log_dir.
         :param save_intermediate_log: Flag to save intermediate `.log` files in log_dir.
         :param verbose: Enable verbose logging for GROMACS commands.
+        :param additional_flags: Extra flags passed to mdrun (e.g. thread count and pinning).
+        :param checkpoint_dir: Directory that outlives the job's temporary files.
+            When given, mdrun runs there with checkpointing, so an interrupted
+            step resumes from its checkpoint and a completed one is not rerun.
+        :param checkpoint_key: Identifies this step's inputs within `checkpoint_dir`.
         :return: Path to the final `.gro` file.
         """
         # Generate MDP file
@@ -121,26 +178,36 @@ class BaseWorkflowStep:
             "log": f"{output_prefix}.log",
         }
 
-        # Run GROMPP
-        grompp_output = self.grompp.run(
-            mdp_file_path=mdp_file,
-            input_gro_path=input_gro_path,
-            input_topol_path=input_topol_path,
-            output_dir=temp_output_dir,
-            output_name=step_name,
-            verbose=verbose,
-        )
-
-        # Run MDrun
-        mdrun_outputs = self.mdrun.run(
-            input_tpr_path=grompp_output,
-            output_name=output_prefix,
-            verbose=verbose,
-<<<<<<< HEAD
-            additional_flags = additional_flags,
-=======
->>>>>>> 91758eb (cleaned up)
-        )
+        if checkpoint_dir:
+            self._run_resumable(
+                step_name=step_name,
+                mdp_file=mdp_file,
+                input_gro_path=input_gro_path,
+                input_topol_path=input_topol_path,
+                checkpoint_dir=checkpoint_dir,
+                checkpoint_key=checkpoint_key,
+                expected_outputs=expected_outputs,
+                verbose=verbose,
+                additional_flags=additional_flags,
+            )
+        else:
+            # Run GROMPP
+            grompp_output = self.grompp.run(
+                mdp_file_path=mdp_file,
+                input_gro_path=input_gro_path,
+                input_topol_path=input_topol_path,
+                output_dir=temp_output_dir,
+                output_name=step_name,
+                verbose=verbose,
+            )
+
+            # Run MDrun
+            mdrun_outputs = self.mdrun.run(
+                input_tpr_path=grompp_output,
+                output_name=output_prefix,
+                verbose=verbose,
+                additional_flags=additional_flags,
+            )
 
         # Verify generated files
         for file_type, file_path in expected_outputs.items():
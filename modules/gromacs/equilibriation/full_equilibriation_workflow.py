@@ -1,8 +1,11 @@
+import hashlib
 import shutil
+import json
 import os
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from modules.gromacs.equilibriation.base_workflow_step import BaseWorkflowStep
 from modules.cache_store.mdp_cache import MDPCache
+from modules.cache_store.provenance import get_file_digest
 from modules.utils.shared.file_utils import (
     check_directory_exists,
     copy_and_rename,
@@ -17,6 +20,57 @@ class FullEquilibrationWorkflow:
         self.mdp_cache = mdp_cache
         self.em_steps = []  # Store EM steps separately
         self.thermal_steps = []  # Store temperature-dependent steps
+        self.additional_flags_override: Optional[List[str]] = None
+        self.checkpoint_dir: Optional[str] = None
+
+    def set_additional_flags(self, additional_flags: Optional[List[str]]):
+        """
+        Override the mdrun flags of every step, e.g. with a per-job core budget.
+
+        :param additional_flags: Flags passed to mdrun for all steps, or None to
+            fall back to the flags each step was added with.
+        """
+        self.additional_flags_override = additional_flags
+
+    def set_checkpoint_dir(self, checkpoint_dir: Optional[str]):
+        """
+        Run every step resumably in `checkpoint_dir`, e.g. a directory kept for
+        one job across restarts, so an interrupted run picks up where it stopped.
+
+        :param checkpoint_dir: Directory for mdrun checkpoints and completed step
+            outputs, or None to run without checkpoints.
+        """
+        self.checkpoint_dir = checkpoint_dir
+
+    @staticmethod
+    def _get_initial_checkpoint_key(input_topol_path: str, input_gro_path: str) -> str:
+        # Include lines point into per-run temporary directories, so only the
+        # rest of the topology (e.g. the molecule counts) and the starting
+        # structure identify the system
+        sha = hashlib.sha256()
+        with open(input_topol_path, "r") as file:
+            for line in file:
+                if not line.lstrip().startswith("#include"):
+                    sha.update(line.encode())
+        sha.update(get_file_digest(input_gro_path).encode())
+        return sha.hexdigest()[:16]
+
+    @staticmethod
+    def _get_next_checkpoint_key(
+        previous_key: str, step_name: str, template_path: str, params: Dict[str, str]
+    ) -> str:
+        # Chained on the previous key, so rerunning a step invalidates every
+        # checkpoint after it
+        payload = json.dumps(
+            [
+                previous_key,
+                step_name,
+                template_path,
+                get_file_digest(template_path),
+                sorted(params.items()),
+            ]
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
 
     def add_em_step(
         self,
@@ -24,16 +78,10 @@ class FullEquilibrationWorkflow:
         workflow_step: BaseWorkflowStep,
         template_path: str,
         base_params: Dict[str, str],
-<<<<<<< HEAD
         additional_flags = ["-nt", "6", "-ntomp", "6", "-pin", "on"]
     ):
         """Add energy minimization step."""
         self.em_steps.append((step_name, workflow_step, template_path, base_params, additional_flags))
-=======
-    ):
-        """Add energy minimization step."""
-        self.em_steps.append((step_name, workflow_step, template_path, base_params))
->>>>>>> 91758eb (cleaned up)
 
     def add_thermal_step(
         self,
@@ -41,20 +89,49 @@ class FullEquilibrationWorkflow:
         workflow_step: BaseWorkflowStep,
         template_path: str,
         base_params: Dict[str, str],
-<<<<<<< HEAD
         additional_flags =  ["-nt", "8", "-ntomp", "8", "-pin", "on"]
     ):
         """Add thermal steps (e.g., NVT, NPT)."""
         self.thermal_steps.append(
             (step_name, workflow_step, template_path, base_params, additional_flags)
-=======
-    ):
-        """Add thermal steps (e.g., NVT, NPT)."""
-        self.thermal_steps.append(
-            (step_name, workflow_step, template_path, base_params)
->>>>>>> 91758eb (cleaned up)
         )
 
+    def get_step_params(
+        self, varying_params_list: List[Dict[str, str]]
+    ) -> List[Tuple[str, str, Dict[str, str]]]:
+        """
+        MDP parameters of every step `run` would execute, in order, without
+        running anything.
+
+        :param varying_params_list: As passed to `run`.
+        :return: (step name, template path, params) of each step.
+        """
+        step_params = [
+            (step_name, template_path, base_params)
+            for step_name, _, template_path, base_params, *_ in self.em_steps
+        ]
+        for varying_params in varying_params_list:
+            for step_name, _, template_path, base_params, *_ in self.thermal_steps:
+                step_params.append(
+                    (step_name, template_path, {**base_params, **(varying_params or {})})
+                )
+        return step_params
+
+    def get_protocol(self, varying_params_list: List[Dict[str, str]]) -> List[list]:
+        """
+        Every step `run` would execute, with the digest of its MDP template
+        rather than its path, for the provenance of cached results.
+
+        :param varying_params_list: As passed to `run`.
+        :return: [step name, template digest, sorted params] of each step.
+        """
+        return [
+            [step_name, get_file_digest(template_path), sorted(params.items())]
+            for step_name, template_path, params in self.get_step_params(
+                varying_params_list
+            )
+        ]
+
     def run(
         self,
         input_gro_path: str,
@@ -70,7 +147,17 @@ class FullEquilibrationWorkflow:
         save_intermediate_log: bool = True,
         verbose: bool = True,
         file_name_override: Optional[str] = None,
+        mdrun_flags: Optional[List[str]] = None,
+        checkpoint_dir: Optional[str] = None,
     ):
+        """
+        Runs the EM steps followed by the thermal steps for each set of varying params.
+
+        :param mdrun_flags: mdrun flags for this run only, taking precedence over
+            `set_additional_flags` so concurrent runs can each use their own cores.
+        :param checkpoint_dir: Checkpoint directory for this run only, taking
+            precedence over `set_checkpoint_dir`.
+        """
         check_directory_exists(temp_output_dir)
         check_directory_exists(log_dir)
         check_directory_exists(main_output_dir)
@@ -83,13 +170,22 @@ class FullEquilibrationWorkflow:
 
         current_gro_path = input_gro_path
         final_step_name = None
+        checkpoint_dir = checkpoint_dir or self.checkpoint_dir
+        checkpoint_key = (
+            self._get_initial_checkpoint_key(input_topol_path, input_gro_path)
+            if checkpoint_dir
+            else None
+        )
 
         # Run all EM steps first
-<<<<<<< HEAD
         for step_name, step, template_path, base_params, additional_flags in self.em_steps:
-=======
-        for step_name, step, template_path, base_params in self.em_steps:
->>>>>>> 91758eb (cleaned up)
+            additional_flags = (
+                mdrun_flags or self.additional_flags_override or additional_flags
+            )
+            if checkpoint_dir:
+                checkpoint_key = self._get_next_checkpoint_key(
+                    checkpoint_key, step_name, template_path, base_params
+                )
             current_gro_path = step.run(
                 step_name=step_name,
                 mdp_template_path=template_path,
@@ -103,10 +199,9 @@ class FullEquilibrationWorkflow:
                 save_intermediate_gro=save_intermediate_gro,
                 save_intermediate_log=save_intermediate_log,
                 verbose=verbose,
-<<<<<<< HEAD
-                additional_flags=additional_flags
-=======
->>>>>>> 91758eb (cleaned up)
+                additional_flags=additional_flags,
+                checkpoint_dir=checkpoint_dir,
+                checkpoint_key=checkpoint_key,
             )
             final_step_name = step_name  # Track the last step name
 
@@ -117,13 +212,16 @@ class FullEquilibrationWorkflow:
 
         # Run thermal steps with varying parameters
         for varying_params in varying_params_list:
-<<<<<<< HEAD
             for step_name, step, template_path, base_params, additional_flags in self.thermal_steps:
-=======
-            for step_name, step, template_path, base_params in self.thermal_steps:
->>>>>>> 91758eb (cleaned up)
+                additional_flags = (
+                    mdrun_flags or self.additional_flags_override or additional_flags
+                )
                 # Merge base and varying parameters
                 params = {**base_params, **varying_params}
+                if checkpoint_dir:
+                    checkpoint_key = self._get_next_checkpoint_key(
+                        checkpoint_key, step_name, template_path, params
+                    )
 
                 # Run the step
                 current_gro_path = step.run(
@@ -139,10 +237,9 @@ class FullEquilibrationWorkflow:
                     save_intermediate_gro=save_intermediate_gro,
                     save_intermediate_log=save_intermediate_log,
                     verbose=verbose,
-<<<<<<< HEAD
-                    additional_flags=additional_flags
-=======
->>>>>>> 91758eb (cleaned up)
+                    additional_flags=additional_flags,
+                    checkpoint_dir=checkpoint_dir,
+                    checkpoint_key=checkpoint_key,
                 )
                 final_step_name = step_name  # Track the last step name
 
@@ -1,9 +1,19 @@
-from typing import Optional
+from typing import List, Optional
 
 
 handlers = {}
 
 
+def split_lines(text: str) -> List[str]:
+    """
+    Splits text into lines without their newlines, like iterating over a file.
+    """
+    lines = text.split("\n")
+    if not text or text.endswith("\n"):
+        lines.pop()
+    return lines
+
+
 # NOTE: need to figure out what construct type and handler name acc is
 class Section:
     def __init__(
@@ -27,3 +37,55 @@ class Section:
         String representation of the Section for debugging purposes.
         """
         return f"Section(construct_type={self.construct_name}, handler={self.handler_name}, name={self.name}, lines={len(self.lines)})"
+
+    def export_text(self) -> str:
+        """
+        The section's lines as written to a file.
+        """
+        return "\n".join(self.lines) + "\n"
+
+
+class LazySection(Section):
+    """
+    A section whose lines are a region of the parsed file's text, split into
+    lines only when they are first accessed. Sections that are never accessed
+    are exported by copying their region.
+    """
+
+    def __init__(
+        self,
+        construct_name: str,
+        handler_name: str,
+        text: str,
+        start: int,
+        end: int,
+        name: Optional[str] = None,
+    ):
+        """
+        :param text: Text of the whole file, shared by all its sections.
+        :param start: Offset of the section's first line in `text`.
+        :param end: Offset after the section's last line in `text`.
+        """
+        super().__init__(construct_name, handler_name, name=name)
+        self._text = text
+        self._start = start
+        self._end = end
+        self._lines = None
+
+    @property
+    def lines(self) -> List[str]:
+        if self._lines is None:
+            self._lines = split_lines(self._text[self._start : self._end])
+            self._text = None
+        return self._lines
+
+    @lines.setter
+    def lines(self, lines: List[str]):
+        self._lines = lines
+        self._text = None
+
+    def export_text(self) -> str:
+        if self._lines is not None:
+            return super().export_text()
+        segment = self._text[self._start : self._end]
+        return segment if segment.endswith("\n") else segment + "\n"
@@ -0,0 +1,207 @@
+from typing import List, Optional, Tuple, Union
+import numpy as np
+import logging
+import mmap
+import os
+
+logger = logging.getLogger(__name__)
+
+# Fixed-width columns (start, width) of a .gro atom line
+GRO_COLUMNS = {
+    "resid": (0, 5),
+    "resname": (5, 5),
+    "atomname": (10, 5),
+    "atomnr": (15, 5),
+    "x": (20, 8),
+    "y": (28, 8),
+    "z": (36, 8),
+    "vx": (44, 8),
+    "vy": (52, 8),
+    "vz": (60, 8),
+}
+GRO_POSITION_LINE_LENGTH = 44
+GRO_VELOCITY_LINE_LENGTH = 68
+
+GRO_ATOM_DTYPE = np.dtype(
+    [
+        ("resid", np.int32),
+        ("resname", "U5"),
+        ("atomname", "U5"),
+        ("atomnr", np.int32),
+        ("xyz", np.float64, (3,)),
+    ]
+)
+GRO_ATOM_VELOCITY_DTYPE = np.dtype(GRO_ATOM_DTYPE.descr + [("v", np.float64, (3,))])
+
+_NEWLINE = ord("\n")
+_CARRIAGE_RETURN = ord("\r")
+_SEMICOLON = ord(";")
+_DECIMAL_POINT = ord(".")
+_MINUS = ord("-")
+_SPACE = ord(" ")
+_ZERO = ord("0")
+
+
+def _get_line_bounds(buffer: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    ends = np.flatnonzero(buffer == _NEWLINE)
+    if len(buffer) and buffer[-1] != _NEWLINE:
+        ends = np.append(ends, len(buffer))
+    starts = np.concatenate(([0], ends[:-1] + 1)).astype(np.int64)
+    # Windows line endings
+    has_carriage_return = np.zeros(len(ends), dtype=bool)
+    non_empty = ends > starts
+    has_carriage_return[non_empty] = buffer[ends[non_empty] - 1] == _CARRIAGE_RETURN
+    return starts, ends - has_carriage_return
+
+
+def _slice_columns(block: np.ndarray, first: str, last: str) -> np.ndarray:
+    """
+    :param block: The characters of every line, one row per line.
+    :return: The characters of the adjacent columns `first` to `last`, with
+        shape (lines, columns, width) if there are several.
+    """
+    start, width = GRO_COLUMNS[first]
+    end = GRO_COLUMNS[last][0] + width
+    chars = block[:, start:end]
+    if end - start == width:
+        return chars
+    return chars.reshape(len(block), (end - start) // width, width)
+
+
+def _parse_number_column(chars: np.ndarray, decimals: int = 0) -> np.ndarray:
+    # Digits are summed with their place values, which is exact for the
+    # integers and fixed-point values of .gro files, rather than parsing
+    # every value as a string
+    width = chars.shape[-1]
+    digit_columns = np.arange(width)
+    digits = chars - np.uint8(_ZERO)
+    is_digit = digits <= 9
+    is_minus = chars == _MINUS
+    is_valid = is_digit | is_minus | (chars == _SPACE)
+    if decimals:
+        point = width - decimals - 1
+        is_valid[..., point] = chars[..., point] == _DECIMAL_POINT
+        digit_columns = digit_columns[digit_columns != point]
+    if not is_valid.all():
+        raise ValueError("Numbers are not in the default .gro format.")
+
+    # Integers of up to eight digits are exact in float64, which is summed by BLAS
+    place_values = np.zeros(width, dtype=np.float64)
+    place_values[digit_columns] = 10.0 ** np.arange(len(digit_columns) - 1, -1, -1)
+    values = (digits * is_digit).astype(np.float64) @ place_values
+    values = np.where(is_minus.any(axis=-1), -values, values)
+    return values / 10**decimals if decimals else values.astype(np.int64)
+
+
+def _parse_name_column(chars: np.ndarray) -> np.ndarray:
+    # Files have few distinct names, so only those are decoded
+    names, inverse = np.unique(
+        np.ascontiguousarray(chars).view(f"S{chars.shape[1]}").ravel(),
+        return_inverse=True,
+    )
+    decoded = np.array([name.decode().strip() for name in names], dtype="U5")
+    return decoded[inverse.ravel()]
+
+
+def parse_gro_atom_lines(
+    buffer: Union[bytes, bytearray, memoryview, mmap.mmap, np.ndarray],
+    num_atoms: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Parses .gro atom lines into a structured array by slicing the fixed-width
+    columns of all lines at once, instead of splitting them one by one.
+
+    :param buffer: The atom lines, e.g. a memory-mapped file region.
+    :param num_atoms: Number of atom lines to parse, defaults to all lines.
+    :return: Array of `GRO_ATOM_DTYPE`, or `GRO_ATOM_VELOCITY_DTYPE` if every
+        line has velocities.
+    :raises ValueError: If the lines are not in the default fixed-width format,
+        or contain in-line comments.
+    """
+    if not isinstance(buffer, np.ndarray):
+        buffer = np.frombuffer(buffer, dtype=np.uint8)
+    starts, ends = _get_line_bounds(buffer)
+    if num_atoms is None:
+        num_atoms = len(starts)
+    if len(starts) < num_atoms:
+        raise ValueError(
+            f"Expected {num_atoms} atoms but found {len(starts)} atom lines."
+        )
+    starts, ends = starts[:num_atoms], ends[:num_atoms]
+    if num_atoms == 0:
+        return np.zeros(0, dtype=GRO_ATOM_DTYPE)
+
+    atom_region = buffer[starts[0] : ends[-1]]
+    if np.any(atom_region == _SEMICOLON):
+        raise ValueError("Atom lines contain in-line comments.")
+    line_lengths = ends - starts
+    if line_lengths.min() < GRO_POSITION_LINE_LENGTH:
+        raise ValueError("Atom lines are shorter than the fixed-width format.")
+
+    has_velocities = line_lengths.min() >= GRO_VELOCITY_LINE_LENGTH
+
+    # Only the default %8.3f (%8.4f for velocities) format is sliced, other
+    # precisions shift the columns
+    atoms = np.empty(
+        num_atoms, dtype=GRO_ATOM_VELOCITY_DTYPE if has_velocities else GRO_ATOM_DTYPE
+    )
+    line_length = GRO_VELOCITY_LINE_LENGTH if has_velocities else GRO_POSITION_LINE_LENGTH
+    line_steps = np.diff(starts)
+    if len(line_steps) and np.all(line_steps == line_steps[0]) and line_steps[0] > 0:
+        # Lines of equal length are viewed as rows without copying
+        block = np.lib.stride_tricks.as_strided(
+            buffer[starts[0] :],
+            shape=(num_atoms, line_length),
+            strides=(int(line_steps[0]), 1),
+            writeable=False,
+        )
+    else:
+        block = buffer[starts[:, None] + np.arange(line_length)]
+    atoms["resid"] = _parse_number_column(_slice_columns(block, "resid", "resid"))
+    atoms["atomnr"] = _parse_number_column(_slice_columns(block, "atomnr", "atomnr"))
+    atoms["resname"] = _parse_name_column(_slice_columns(block, "resname", "resname"))
+    atoms["atomname"] = _parse_name_column(
+        _slice_columns(block, "atomname", "atomname")
+    )
+    atoms["xyz"] = _parse_number_column(_slice_columns(block, "x", "z"), decimals=3)
+    if has_velocities:
+        atoms["v"] = _parse_number_column(_slice_columns(block, "vx", "vz"), decimals=4)
+    return atoms
+
+
+def _read_gro_buffer(buffer: np.ndarray) -> Tuple[str, np.ndarray, Optional[str]]:
+    starts, ends = _get_line_bounds(buffer)
+    if len(starts) < 2:
+        raise ValueError("Missing number of atoms line in the .gro file.")
+    title = bytes(buffer[starts[0] : ends[0]]).decode().strip()
+    try:
+        num_atoms = int(bytes(buffer[starts[1] : ends[1]]))
+    except ValueError:
+        raise ValueError("Expected an integer for the number of atoms.")
+    atom_buffer = buffer[starts[2] :] if len(starts) > 2 else buffer[:0]
+    atoms = parse_gro_atom_lines(atom_buffer, num_atoms)
+    box_line = None
+    if len(starts) > num_atoms + 2:
+        box_line = bytes(buffer[starts[num_atoms + 2] : ends[num_atoms + 2]]).decode()
+    return title, atoms, box_line
+
+
+def read_gro(gro_path: str) -> Tuple[str, np.ndarray, Optional[str]]:
+    """
+    Reads a .gro file through a memory map, parsing its atoms with
+    `parse_gro_atom_lines`, so the file is never held as Python strings.
+
+    :param gro_path: Path to the .gro file.
+    :return: The title line, the atoms and the box line (None if missing).
+    :raises ValueError: If the file is not in the default fixed-width format.
+    """
+    with open(gro_path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            raise ValueError("Missing number of atoms line in the .gro file.")
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            try:
+                return _read_gro_buffer(np.frombuffer(mapped, dtype=np.uint8))
+            except ValueError as e:
+                # Raised once the map is closed, the traceback holds views of it
+                error = str(e)
+    raise ValueError(error)
@@ -0,0 +1,133 @@
+from typing import List, Sequence
+import numpy as np
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+GRO_LINE_LENGTH = 44
+_SPACE = ord(" ")
+_MINUS = ord("-")
+_DECIMAL_POINT = ord(".")
+_ZERO = ord("0")
+
+
+def _format_integer_column(
+    lines: np.ndarray, start: int, width: int, values: Sequence[int]
+):
+    # Right-aligned, e.g. "%5d"
+    values = np.asarray(values)
+    if values.dtype.kind not in "iu":
+        raise ValueError("Integer column is not numeric.")
+    values = values.astype(np.int64)
+    if np.any(values < 0) or np.any(values >= 10**width):
+        raise ValueError("Integers do not fit the fixed-width format.")
+    for position in range(width):
+        place_value = 10 ** (width - 1 - position)
+        digits = (values // place_value) % 10
+        # Leading zeros are padded with spaces, the units digit is always set
+        is_leading = values < place_value if position < width - 1 else False
+        lines[:, start + position] = np.where(is_leading, _SPACE, _ZERO + digits)
+
+
+def _format_name_column(
+    lines: np.ndarray, start: int, width: int, values: Sequence[str], left: bool
+):
+    codes, names = pd.factorize(np.asarray(values, dtype=object), sort=False)
+    if np.any(codes < 0):
+        raise ValueError("Names are missing.")
+    table = np.full((len(names), width), _SPACE, dtype=np.uint8)
+    for index, name in enumerate(names):
+        encoded = str(name).encode()
+        if len(encoded) > width:
+            raise ValueError(f"Name {name} does not fit the fixed-width format.")
+        if left:
+            table[index, : len(encoded)] = np.frombuffer(encoded, dtype=np.uint8)
+        elif encoded:
+            table[index, width - len(encoded) :] = np.frombuffer(
+                encoded, dtype=np.uint8
+            )
+    lines[:, start : start + width] = table[codes]
+
+
+def _format_fixed_point_column(
+    lines: np.ndarray, start: int, values: np.ndarray, width: int = 8, decimals: int = 3
+) -> np.ndarray:
+    """
+    Formats values like "%8.3f". Rounding matches Python's formatting except
+    for values within rounding error of a tie, which are returned so they can
+    be formatted by Python.
+
+    :return: Indices of the lines to format with Python.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if not np.all(np.isfinite(values)):
+        raise ValueError("Coordinates are not finite.")
+    scaled = np.abs(values) * 10**decimals
+    rounded = np.rint(scaled)
+    is_tie = np.abs(np.abs(scaled - np.floor(scaled)) - 0.5) < 1e-6
+    is_negative = np.signbit(values)
+    integers = rounded.astype(np.int64)
+    num_integer_places = width - decimals - 1
+    # One place is kept for the sign of negative values
+    limit = 10 ** (num_integer_places + decimals)
+    if np.any(integers >= np.where(is_negative, limit // 10, limit)):
+        raise ValueError("Coordinates do not fit the fixed-width format.")
+
+    point = start + num_integer_places
+    lines[:, point] = _DECIMAL_POINT
+    for position in range(decimals):
+        place_value = 10 ** (decimals - 1 - position)
+        lines[:, point + 1 + position] = _ZERO + (integers // place_value) % 10
+    whole = integers // 10**decimals
+    sign_position = np.full(len(values), point - 2)
+    for position in range(num_integer_places):
+        place_value = 10**position
+        column = point - 1 - position
+        # The units digit is always set, e.g. "0.500"
+        is_digit = (whole >= place_value) | (position == 0)
+        lines[:, column] = np.where(is_digit, _ZERO + (whole // place_value) % 10, _SPACE)
+        sign_position = np.where(is_digit, column - 1, sign_position)
+    negative_rows = np.flatnonzero(is_negative)
+    lines[negative_rows, sign_position[negative_rows]] = _MINUS
+    return np.flatnonzero(is_tie)
+
+
+def format_gro_atom_lines(
+    residue_numbers: Sequence[int],
+    residue_names: Sequence[str],
+    atom_names: Sequence[str],
+    atom_indices: Sequence[int],
+    xyz: np.ndarray,
+) -> bytes:
+    """
+    Formats .gro atom lines for all atoms at once, with the same fixed-width
+    format as formatting them one by one ("%5d%-5s%5s%5d%8.3f%8.3f%8.3f").
+
+    :param xyz: Coordinates, with shape (atoms, 3).
+    :return: The lines, each ending with a newline.
+    :raises ValueError: If any value does not fit the fixed-width format.
+    """
+    xyz = np.asarray(xyz, dtype=np.float64).reshape(-1, 3)
+    lines = np.full((len(xyz), GRO_LINE_LENGTH + 1), _SPACE, dtype=np.uint8)
+    lines[:, -1] = ord("\n")
+    _format_integer_column(lines, 0, 5, residue_numbers)
+    _format_name_column(lines, 5, 5, residue_names, left=True)
+    _format_name_column(lines, 10, 5, atom_names, left=False)
+    _format_integer_column(lines, 15, 5, atom_indices)
+
+    tie_rows: List[np.ndarray] = []
+    for axis in range(3):
+        tie_rows.append(_format_fixed_point_column(lines, 20 + 8 * axis, xyz[:, axis]))
+    for row in np.unique(np.concatenate(tie_rows)):
+        # Rounding of ties is left to Python, as for the other lines
+        formatted = "".join(f"{value:8.3f}" for value in xyz[row]).encode()
+        if len(formatted) != 24:
+            raise ValueError("Coordinates do not fit the fixed-width format.")
+        lines[row, 20:44] = np.frombuffer(formatted, dtype=np.uint8)
+    return lines.tobytes()
+
+
+def format_box_line(box_dimensions: List[float]) -> str:
+    return f"{box_dimensions[0]:10.5f} {box_dimensions[1]:10.5f} {box_dimensions[2]:10.5f}"
+
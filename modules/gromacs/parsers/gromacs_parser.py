@@ -1,6 +1,9 @@
 from collections import OrderedDict
+from config.data_models.parsed_topology import SectionSpan
 from modules.gromacs.parsers.data_models.section import (
+    LazySection,
     Section,
+    split_lines,
 )
 from modules.gromacs.parsers.handlers.base_handler import (
     BaseHandler,
@@ -11,57 +14,162 @@ from modules.gromacs.parsers.handlers.gro_handler import (
 from modules.gromacs.parsers.handlers.default_handler import (
     DefaultHandler,
 )
-from typing import Dict, List, Optional, Tuple, OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple, OrderedDict
+from modules.gromacs.parsers.parsed_topology_store import (
+    ParsedTopologyStore,
+    parsed_topology_store,
+)
 from modules.gromacs.parsers.registries.handler_registry import (
     HandlerRegistry,
     handler_registry,
 )
+import hashlib
+import re
 
 
 class GromacsParser:
+    # Shares parsed files between parses, None to always parse them
+    topology_store: Optional[ParsedTopologyStore] = parsed_topology_store
+
     def __init__(self, handler_registry: HandlerRegistry = handler_registry):
         self.handler_registry = handler_registry
         self.suppressed_constructs: Optional[List[str]] = None
+        self._header_line_patterns = None
 
     # NOTE: make this more robust
 
-    def parse(self, filepath: str) -> OrderedDict[str, Section]:
+    def parse(self, filepath: str, lazy: bool = False) -> OrderedDict[str, Section]:
+        """
+        Splits a file into sections, one per `[ section ]` header, include or
+        conditional. Only lines that can start a section, by their leading
+        character and directive, are matched against the handler patterns;
+        all other lines are handed to the section before them as a block.
+
+        :param filepath: Path to the file.
+        :param lazy: Split each section into lines only when a handler first
+            accesses it (see `LazySection`). The sections are the same as
+            parsed eagerly.
+        :return: The sections, keyed by construct and name. Files already in
+            the `topology_store` are not parsed again, but every parse returns
+            new sections.
+        """
+        text, spans = self._get_sections(filepath)
+
         sections: OrderedDict[str, Section] = OrderedDict()
-        current_section = Section(construct_name=None, handler_name=None)
-
-        with open(filepath, "r") as file:
-            for line in file:
-                line = line.rstrip("\n")
-
-                construct_name, handler_name, name = self._match_line(line)
-
-                if construct_name:
-                    is_data_handler = construct_name == "data"
-                    key = self._generate_key(
-                        sections,
-                        current_section.construct_name,
-                        current_section.name,
-                    )
-                    sections[key] = current_section
-
-                    current_section = Section(
-                        construct_name=construct_name,
-                        handler_name=handler_name,
-                        name=name,
-                    )
-
-                current_section.add_line(line)
-
-        if current_section.lines:
-            key = self._generate_key(
-                sections,
-                current_section.construct_name,
-                current_section.name,
-            )
-            sections[key] = current_section
+        for span in spans:
+            if lazy:
+                section = LazySection(
+                    span.construct_name,
+                    span.handler_name,
+                    text,
+                    span.start,
+                    span.end,
+                    name=span.name,
+                )
+            else:
+                section = Section(
+                    construct_name=span.construct_name,
+                    handler_name=span.handler_name,
+                    name=span.name,
+                )
+                section.lines = split_lines(text[span.start : span.end])
+            key = self._generate_key(sections, span.construct_name, span.name)
+            sections[key] = section
 
         return sections
 
+    def _get_sections(self, filepath: str) -> Tuple[str, List[SectionSpan]]:
+        """
+        :return: Text of the file, and the spans of its sections.
+        """
+        # Every file is split from its own start, with nothing suppressed:
+        # parsers are shared between threads, and a file ending inside e.g.
+        # `#ifdef POSRES` must not hide the includes of the next file parsed
+        if self.topology_store is None:
+            with open(filepath, "r") as file:
+                text = file.read()
+            spans, _ = self._split_sections(text)
+            return text, spans
+
+        # Sections depend on the handlers
+        variant = hashlib.md5(
+            ",".join(self.handler_registry._handlers).encode()
+        ).hexdigest()
+        parsed = self.topology_store.get(filepath, variant, self._split_sections)
+        return parsed.text, parsed.spans
+
+    def _split_sections(
+        self, text: str, suppressed_constructs: Optional[List[str]] = None
+    ) -> Tuple[List[SectionSpan], Optional[List[str]]]:
+        """
+        :param suppressed_constructs: Constructs suppressed at the start of
+            `text`, none by default.
+        :return: Construct name, handler name, name, start and end offset in
+            `text` of each section, and the constructs suppressed at its end.
+        """
+        spans = []
+        construct_name, handler_name, name = None, None, None
+        section_start = 0
+        for line_start, line in self._find_header_lines(text):
+            match = self._match_line(line, suppressed_constructs)
+            if not match[0]:
+                continue
+            spans.append(
+                SectionSpan(
+                    construct_name, handler_name, name, section_start, line_start
+                )
+            )
+            construct_name, handler_name, name, suppressed_constructs = match
+            section_start = line_start
+
+        if section_start < len(text):
+            spans.append(
+                SectionSpan(
+                    construct_name, handler_name, name, section_start, len(text)
+                )
+            )
+        return spans, suppressed_constructs
+
+    def _get_header_line_patterns(self) -> Tuple[re.Pattern, re.Pattern]:
+        """
+        Patterns of the lines that can start a section: lines whose first
+        non-whitespace character starts a key of the registry's line dispatch,
+        or every line if a handler has no `line_keys`. The second pattern
+        searches from the newline before them, which is much faster than a ^
+        anchor.
+        """
+        line_dispatch = self.handler_registry.get_line_dispatch()
+        if (
+            self._header_line_patterns is None
+            or self._header_line_patterns[0] is not line_dispatch
+        ):
+            if line_dispatch[None]:
+                line_pattern = r"[^\n]*"
+            else:
+                leading_characters = {key[0] for key in line_dispatch if key}
+                # Matches nothing if no handler has a pattern
+                characters = re.escape("".join(sorted(leading_characters)))
+                line_pattern = (
+                    rf"[^\S\n]*[{characters}][^\n]*" if characters else r"(?!)"
+                )
+            self._header_line_patterns = (
+                line_dispatch,
+                re.compile(line_pattern),
+                re.compile(rf"\n({line_pattern})"),
+            )
+        return self._header_line_patterns[1:]
+
+    def _find_header_lines(self, text: str) -> Iterator[Tuple[int, str]]:
+        """
+        :return: Offset and text of each line that can start a section.
+        """
+        line_pattern, search_pattern = self._get_header_line_patterns()
+        first_line_match = line_pattern.match(text)
+        if first_line_match:
+            yield 0, first_line_match.group(0)
+        for match in search_pattern.finditer(text):
+            yield match.start(1), match.group(1)
+
     def _generate_key(
         self,
         sections: OrderedDict[str, Section],
@@ -112,23 +220,36 @@ class GromacsParser:
             if handler_name not in self.suppressed_constructs
         }
 
-    def _match_line(self, line: str) -> Tuple[str, str, str]:
+    def _match_line(
+        self, line: str, suppressed_constructs: Optional[List[str]] = None
+    ) -> Tuple[Optional[str], str, Optional[str], Optional[List[str]]]:
         """
-        Matches a line to a construct and returns its type, name, and handler name.
-        Filters out suppressed constructs.
+        Matches a line to a construct and returns its type, handler name and
+        name, and the constructs it suppresses. Only the handlers dispatched
+        for the line's key are tried, in registration order. Filters out
+        `suppressed_constructs`, which are returned unchanged if nothing matches.
         """
-        for handler_name, handler_class in self.available_handlers.items():
-            if handler_class.re_pattern is None:
+        line_dispatch = self.handler_registry.get_line_dispatch()
+        handler_names = line_dispatch.get(
+            BaseHandler.get_line_key(line), line_dispatch[None]
+        )
+        for handler_name in handler_names:
+            if suppressed_constructs and handler_name in suppressed_constructs:
                 continue
+            handler_class = self.handler_registry.get_handler(handler_name)
 
             match = handler_class.re_pattern.match(line)
             if match:
                 name = match.group(1) if match.groups() else None
-                self.suppressed_constructs = handler_class.suppress
-                return handler_class.construct_name, handler_name, name
+                return (
+                    handler_class.construct_name,
+                    handler_name,
+                    name,
+                    handler_class.suppress,
+                )
 
         # Fallback to DefaultHandler
-        return None, DefaultHandler.construct_name, None
+        return None, DefaultHandler.construct_name, None, suppressed_constructs
 
     def export(self, sections: OrderedDict[str, Section], output_filepath: str) -> str:
         """
@@ -138,8 +259,9 @@ class GromacsParser:
             sections (OrderedDict[str, Section]): Updated sections to export.
             output_filepath (str): Path to the output `.gro` file.
         """
+        # Joined up front and written at once, rather than once per section
+        content = "".join(section.export_text() for section in sections.values())
         with open(output_filepath, "w") as file:
-            for section in sections.values():
-                file.write("\n".join(section.lines) + "\n")
+            file.write(content)
 
         return output_filepath
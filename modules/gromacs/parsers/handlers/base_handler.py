@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from modules.gromacs.parsers.data_models.section import (
     Section,
 )  # Assuming Section is a predefined class
@@ -9,6 +9,9 @@ class BaseHandler:
     construct_name: str
     re_pattern: Optional[re.Pattern]
     suppress: Optional[List[str]]
+    # Keys of the lines `re_pattern` can match (see `get_line_key`), so the
+    # parser only tries the pattern on those lines. None to try it on all lines.
+    line_keys: Optional[Tuple[str, ...]] = None
 
     def __init__(self, store_top_line: bool = False):
         self.store_top_line = (
@@ -20,6 +23,23 @@ class BaseHandler:
         self._content = None  # Stores the main content (data or lines)
         self.section = None
 
+    @staticmethod
+    def get_line_key(line: str) -> Optional[str]:
+        """
+        Classifies a line by its first non-whitespace character, and by the
+        directive for preprocessor lines, e.g. "[" for section headers and
+        "#include" for includes.
+
+        :return: The key, or None for blank lines.
+        """
+        stripped = line.lstrip()
+        if not stripped:
+            return None
+        if stripped[0] == "#":
+            directive = stripped[1:].split(None, 1)
+            return f"#{directive[0]}" if directive else "#"
+        return stripped[0]
+
     def __init_subclass__(cls):
         super().__init_subclass__()
         required_attrs = ["construct_name", "re_pattern", "suppress"]
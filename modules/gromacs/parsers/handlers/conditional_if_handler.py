@@ -9,6 +9,7 @@ class ConditionalIfHandler(BaseHandler):
     construct_name = "conditional_if"
     re_pattern = re.compile(r"^\s*#\s*(ifdef|ifndef)\s+.*$")
     suppress = ["include"]
+    line_keys = ("#ifdef", "#ifndef")
 
     def __init__(self):
         super().__init__(
@@ -7,21 +7,43 @@ from modules.gromacs.parsers.data_models.section import (
 from modules.gromacs.parsers.registries.section_registry import (
     DataRegistry,
 )
+from modules.utils.shared.dataframe_utils import convert_numeric_columns
 import re
+import numpy as np
 import pandas as pd
-from typing import List, Dict
+from typing import Any, List, Dict, Optional, Tuple
 
 
 class DataHandler(BaseHandler):
     re_pattern = re.compile(r"^\s*\[\s*(.+?)\s*\]\s*$")
     construct_name = "data"
     suppress = None
+    line_keys = ("[",)
 
     def __init__(self, section_registry: DataRegistry = DataRegistry()):
         super().__init__(store_top_line=True)  # Handles the top line ([ section ])
         self.section_registry = section_registry  # Instance of SectionRegistry
         self.expected_headers = []  # Populated during processing
-        self.data = []  # Stores raw data rows (with in-line comments)
+        self._data = []  # Stores raw data rows (with in-line comments)
+        # Typed DataFrame of the rows, built on first access of `content`
+        self._content_cache: Optional[pd.DataFrame] = None
+        # Parsed value and text of each number, by column and row position,
+        # so unmodified numbers are exported as they were read
+        self._number_text: Dict[str, List[Tuple[Any, str]]] = {}
+
+    @property
+    def data(self) -> List[List]:
+        """
+        Raw data rows, with the in-line comment last. Accessing them
+        invalidates the cached `content`, as they may be modified in place.
+        """
+        self._content_cache = None
+        return self._data
+
+    @data.setter
+    def data(self, data: List[List]):
+        self._data = data
+        self._content_cache = None
 
     def process_line(self, line: str):
         """
@@ -58,12 +80,15 @@ class DataHandler(BaseHandler):
     @property
     def content(self) -> pd.DataFrame:
         """
-        Returns the data block as a DataFrame.
+        Returns the data block as a DataFrame, with numeric columns converted
+        to numbers. The DataFrame is built once and cached until the data is
+        modified; each access returns a copy, so callers can modify it.
         """
         if not self.expected_headers:
             raise ValueError("Headers are not defined.")
-        columns = self.expected_headers + ["In-Line Comments"]
-        return pd.DataFrame(self.data, columns=columns)
+        if self._content_cache is None:
+            self._content_cache = self._build_content()
+        return self._content_cache.copy()
 
     @content.setter
     def content(self, new_content: pd.DataFrame):
@@ -76,7 +101,43 @@ class DataHandler(BaseHandler):
             self.top_line.strip("[ ]"),
             list(new_content.columns[:-1]),  # Exclude in-line comments column
         )
-        self.data = new_content.values.tolist()
+        # Rows are kept as text, numbers as they were read where unchanged
+        columns = list(new_content.columns)
+        self.data = [
+            [
+                self._format_value(column, position, value)
+                for column, value in zip(columns, row)
+            ]
+            for position, *row in new_content.itertuples(index=True, name=None)
+        ]
+
+    def _build_content(self) -> pd.DataFrame:
+        columns = self.expected_headers + ["In-Line Comments"]
+        raw_content = pd.DataFrame(self._data, columns=columns)
+        content = convert_numeric_columns(
+            raw_content.copy(), columns=self.expected_headers
+        )
+        # Keyed by position rather than value, as different texts can parse to
+        # the same number (e.g. "1" and "1.0")
+        self._number_text = {
+            column: list(zip(content[column].tolist(), raw_content[column]))
+            for column in self.expected_headers
+            if pd.api.types.is_numeric_dtype(content[column])
+        }
+        return content
+
+    def _format_value(self, column: str, position: Any, value: Any) -> Any:
+        if isinstance(value, str) or value is None:
+            return value
+        if pd.isna(value):
+            return None
+        # Rows keep their index label in the content, which is their position
+        number_text = self._number_text.get(column, [])
+        if isinstance(position, (int, np.integer)) and 0 <= position < len(number_text):
+            original_value, text = number_text[position]
+            if original_value == value:
+                return text
+        return str(value)
 
     def _export_content(self) -> List[str]:
         """
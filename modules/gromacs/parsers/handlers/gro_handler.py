@@ -1,6 +1,18 @@
 from modules.gromacs.parsers.handlers.base_handler import (
     BaseHandler,
 )
+from modules.gromacs.parsers.data_models.section import Section
+from modules.gromacs.parsers.gro_reader import (
+    GRO_ATOM_DTYPE,
+    parse_gro_atom_lines,
+    read_gro,
+)
+from modules.gromacs.parsers.gro_writer import (
+    format_box_line,
+    format_gro_atom_lines,
+)
+from modules.utils.shared.dataframe_utils import convert_numeric_columns
+import numpy as np
 import pandas as pd
 import re
 from typing import List, Optional, Tuple
@@ -30,9 +42,122 @@ class GroHandler(BaseHandler):
         super().__init__(store_top_line=True)  # Store the top line
         self.expected_columns = expected_columns
         self.num_atoms = 0
-        self.atom_data = []
+        # The atoms are held as one of, in order of preference: the array
+        # parsed by the columnar reader, the typed DataFrame of `content` or
+        # rows. Each is converted to the others only when they are needed.
+        self._atoms: Optional[np.ndarray] = None
+        self._content_cache: Optional[pd.DataFrame] = None
+        self._atom_data: Optional[List[List]] = []
         self._box_dimensions = None
 
+    @property
+    def atom_data(self) -> List[List]:
+        """
+        Atom rows: residue number, residue name, atom name, atom index, x, y, z
+        and in-line comment. Rows may be modified in place, so once accessed
+        they are the only representation of the atoms.
+        """
+        if self._atom_data is None:
+            if self._atoms is not None:
+                self._atom_data = self._atoms_to_rows(self._atoms)
+            else:
+                self._atom_data = self._content_cache.values.tolist()
+        self._atoms = None
+        self._content_cache = None
+        return self._atom_data
+
+    @atom_data.setter
+    def atom_data(self, atom_data: List[List]):
+        self._atom_data = atom_data
+        self._atoms = None
+        self._content_cache = None
+
+    @property
+    def atoms(self) -> np.ndarray:
+        """
+        Atoms as a structured array (see `gro_reader.GRO_ATOM_DTYPE`), with
+        velocities if the file has them and was read by the columnar reader.
+        Velocities are dropped once the atoms are modified.
+        """
+        if self._atoms is not None:
+            return self._atoms
+        if self._content_cache is not None:
+            content = self._content_cache
+            return self._columns_to_atoms(
+                [content.iloc[:, index].to_numpy() for index in range(7)]
+            )
+        return self._columns_to_atoms(list(zip(*self._atom_data)))
+
+    @atoms.setter
+    def atoms(self, atoms: np.ndarray):
+        self._atoms = atoms
+        self._content_cache = None
+        self._atom_data = None
+
+    @property
+    def atom_count(self) -> int:
+        if self._atoms is not None:
+            return len(self._atoms)
+        if self._content_cache is not None:
+            return len(self._content_cache)
+        return len(self._atom_data)
+
+    @staticmethod
+    def _atoms_to_rows(atoms: np.ndarray) -> List[List]:
+        xyz = atoms["xyz"].tolist()
+        return [
+            [resid, resname, atomname, atomnr, x, y, z, None]
+            for resid, resname, atomname, atomnr, (x, y, z) in zip(
+                atoms["resid"].tolist(),
+                atoms["resname"].tolist(),
+                atoms["atomname"].tolist(),
+                atoms["atomnr"].tolist(),
+                xyz,
+            )
+        ]
+
+    @staticmethod
+    def _columns_to_atoms(columns: List) -> np.ndarray:
+        num_atoms = len(columns[0]) if columns else 0
+        atoms = np.empty(num_atoms, dtype=GRO_ATOM_DTYPE)
+        if num_atoms:
+            atoms["resid"] = columns[0]
+            atoms["resname"] = columns[1]
+            atoms["atomname"] = columns[2]
+            atoms["atomnr"] = columns[3]
+            atoms["xyz"] = np.column_stack(columns[4:7])
+        return atoms
+
+    def read(self, gro_path: str) -> "GroHandler":
+        """
+        Reads a .gro file directly, through the columnar reader, rather than
+        splitting it into sections first. Files the reader cannot parse (e.g.
+        with in-line comments) are processed line by line.
+
+        :param gro_path: Path to the .gro file.
+        :return: The handler, with the file's atoms and box dimensions.
+        """
+        self.section = Section(construct_name=None, handler_name=None)
+        try:
+            title, atoms, box_line = read_gro(gro_path)
+        except ValueError as e:
+            logger.debug(f"Reading {gro_path} line by line: {e}")
+            with open(gro_path, "r") as file:
+                for line in file:
+                    self.section.add_line(line.rstrip("\n"))
+            self.process(self.section)
+            return self
+
+        self.top_line = title or "default top line"
+        self.num_atoms = len(atoms)
+        self.atoms = atoms
+        self.box_dimensions = None
+        if box_line is not None:
+            self._process_box_line(box_line)
+        if self.box_dimensions is None:
+            logger.warning("No valid box dimensions found.")
+        return self
+
     @property
     def box_dimensions(self) -> List[float]:
         """
@@ -86,38 +211,43 @@ class GroHandler(BaseHandler):
         except ValueError:
             raise ValueError("Expected an integer for the number of atoms.")
 
-        # Parse atom data and box dimensions
+        # Parse atom data, all lines at once if they are in the default format
+        try:
+            self.atoms = parse_gro_atom_lines(
+                "\n".join(lines[: self.num_atoms]).encode(), self.num_atoms
+            )
+            lines = lines[self.num_atoms :]
+        except ValueError as e:
+            logger.debug(f"Parsing atom lines one by one: {e}")
+            self.atom_data = []
+
+        # Parse remaining atom data and box dimensions
         for line in lines:
-            if len(self.atom_data) < self.num_atoms:
+            if self.atom_count < self.num_atoms:
                 normalized_tokens = self._normalize_atom_line(line)
                 self.atom_data.append(normalized_tokens)
             else:
-                # Parse box dimensions
-                box_dims = self.parse_box_dimensions(line.strip())
-                if self.validate_box_dimensions(box_dims):
-                    self.box_dimensions = box_dims
-                else:
-                    logger.warning(f"Invalid box dimensions: {line.strip()}")
+                self._process_box_line(line)
                 break
 
         # Validate that all atoms and box dimensions are parsed correctly
-        if len(self.atom_data) != self.num_atoms:
-<<<<<<< HEAD
+        if self.atom_count != self.num_atoms:
             logger.error(
                 f"Expected {self.num_atoms} atoms but parsed {len(self.atom_data)}."
             )
 
-=======
-            print(self.atom_data.headers())
-            logger.error(
-                f"Expected {self.num_atoms} atoms but parsed {len(self.atom_data)}."
-            )
->>>>>>> 91758eb (cleaned up)
             raise ValueError("Mismatch between expected and parsed number of atoms.")
 
         if self.box_dimensions is None:
             logger.warning("No valid box dimensions found.")
 
+    def _process_box_line(self, line: str):
+        box_dims = self.parse_box_dimensions(line.strip())
+        if self.validate_box_dimensions(box_dims):
+            self.box_dimensions = box_dims
+        else:
+            logger.warning(f"Invalid box dimensions: {line.strip()}")
+
     def _normalize_atom_line(self, line: str) -> List:
         """
         Normalize a `.gro` atom line using fixed-width parsing.
@@ -149,46 +279,123 @@ class GroHandler(BaseHandler):
         Export the parsed content to `.gro` format lines.
         Ensures adherence to the fixed-width format for both atom lines and box dimensions.
         """
-        lines = []
+        atom_lines = self._export_atom_lines()
+        box_line = self._export_box_line()
+        return [f"{self.num_atoms}", *atom_lines.decode().splitlines(), box_line]
+
+    def write(self, output_path: str) -> str:
+        """
+        Writes the handler to a .gro file, formatting all atom lines at once
+        and writing the file in a single buffered write, rather than exporting
+        a line per atom first.
 
-        # Add the atom count as the second line
-        actual_num_atoms = len(self.atom_data)
-<<<<<<< HEAD
+        :param output_path: Path to the output .gro file.
+        :return: The output path.
+        """
+        atom_lines = self._export_atom_lines()
+        box_line = self._export_box_line()
+        header = []
+        if self.store_top_line and self.top_line:
+            header.append(self.top_line)
+        header.extend(self.top_comments)
+        header.append(f"{self.num_atoms}")
+        footer = [box_line, *self.bottom_comments]
+        with open(output_path, "wb") as file:
+            file.write(
+                b"".join(
+                    (
+                        ("\n".join(header) + "\n").encode(),
+                        atom_lines,
+                        ("\n".join(footer) + "\n").encode(),
+                    )
+                )
+            )
+        return output_path
 
-=======
->>>>>>> 91758eb (cleaned up)
+    def _export_atom_lines(self) -> bytes:
+        """
+        Atom lines in the fixed-width .gro format, each ending with a newline.
+        Also updates `num_atoms` to the actual number of atoms.
+        """
+        actual_num_atoms = self.atom_count
         if self.num_atoms != actual_num_atoms:
             logger.warning(
                 f"Mismatch between expected ({self.num_atoms}) and actual ({actual_num_atoms}) atom counts."
             )
             self.num_atoms = actual_num_atoms  # Update to reflect the actual count
-        lines.append(f"{self.num_atoms}")
 
-        # Export atom data with strict fixed-width formatting
-        for row in self.atom_data:
+        columns, comments = self._get_atom_columns()
+        if comments is None:
+            try:
+                return format_gro_atom_lines(*columns)
+            except ValueError as e:
+                logger.debug(f"Formatting atom lines one by one: {e}")
+
+        # Lines with in-line comments or values wider than the fixed-width
+        # format, with strict fixed-width formatting otherwise
+        lines = []
+        resids, resnames, atomnames, atomnrs, xyz = columns
+        if comments is None:
+            comments = [None] * len(resids)
+        for resid, resname, atomname, atomnr, (x, y, z), comment in zip(
+            resids, resnames, atomnames, atomnrs, xyz.tolist(), comments
+        ):
             content = (
-                f"{row[0]:>5}"  # Residue number (right-aligned, width 5)
-                f"{row[1]:<5}"  # Residue name (left-aligned, width 5)
-                f"{row[2]:>5}"  # Atom name (right-aligned, width 5)
-                f"{row[3]:>5}"  # Atom index (right-aligned, width 5)
-                f"{row[4]:8.3f}"  # X coordinate (fixed width, 8 chars, 3 decimals)
-                f"{row[5]:8.3f}"  # Y coordinate (fixed width, 8 chars, 3 decimals)
-                f"{row[6]:8.3f}"  # Z coordinate (fixed width, 8 chars, 3 decimals)
+                f"{resid:>5}"  # Residue number (right-aligned, width 5)
+                f"{resname:<5}"  # Residue name (left-aligned, width 5)
+                f"{atomname:>5}"  # Atom name (right-aligned, width 5)
+                f"{atomnr:>5}"  # Atom index (right-aligned, width 5)
+                f"{x:8.3f}"  # X coordinate (fixed width, 8 chars, 3 decimals)
+                f"{y:8.3f}"  # Y coordinate (fixed width, 8 chars, 3 decimals)
+                f"{z:8.3f}"  # Z coordinate (fixed width, 8 chars, 3 decimals)
             )
-            if row[7]:  # Include in-line comments if present
-                content += f" ; {row[7]}"
-            lines.append(content)
+            if comment:  # Include in-line comments if present
+                content += f" ; {comment}"
+            lines.append(content + "\n")
+        return "".join(lines).encode()
 
-        # Export box dimensions, ensuring proper formatting
-        if self.validate_box_dimensions(self.box_dimensions):
-            box_line = f"{self.box_dimensions[0]:10.5f} {self.box_dimensions[1]:10.5f} {self.box_dimensions[2]:10.5f}"
-            lines.append(box_line)
+    def _get_atom_columns(self) -> Tuple[List, Optional[List]]:
+        """
+        Columns of the atoms from whichever representation holds them, without
+        converting it: residue numbers, residue names, atom names, atom indices
+        and coordinates with shape (atoms, 3).
+
+        :return: The columns, and the in-line comments if any atom has one.
+        """
+        if self._atoms is not None:
+            atoms = self._atoms
+            columns = [
+                atoms["resid"],
+                atoms["resname"],
+                atoms["atomname"],
+                atoms["atomnr"],
+                atoms["xyz"],
+            ]
+            return columns, None
+        if self._content_cache is not None:
+            content = self._content_cache
+            columns = [content.iloc[:, index].to_numpy() for index in range(8)]
         else:
+            columns = [list(column) for column in zip(*self._atom_data)] or [
+                [] for _ in range(8)
+            ]
+        columns[4] = np.column_stack(columns[4:7]).astype(np.float64).reshape(-1, 3)
+        # Missing comments, e.g. NaN after a DataFrame round trip, are no comment
+        comments = [
+            comment if isinstance(comment, str) or not pd.isna(comment) else None
+            for comment in columns[7]
+        ]
+        if not any(comments):
+            comments = None
+        return columns[:5], comments
+
+    def _export_box_line(self) -> str:
+        # Export box dimensions, ensuring proper formatting
+        if not self.validate_box_dimensions(self.box_dimensions):
             raise ValueError(
                 "Missing or invalid box dimensions; cannot export .gro file."
             )
-
-        return lines
+        return format_box_line(self.box_dimensions)
 
     @staticmethod
     def parse_box_dimensions(line: str) -> Optional[List[float]]:
@@ -229,9 +436,14 @@ class GroHandler(BaseHandler):
     @property
     def content(self) -> pd.DataFrame:
         """
-        Return atom data as a Pandas DataFrame.
+        Return atom data as a Pandas DataFrame, with numeric residue numbers,
+        atom indices and coordinates. The DataFrame is built once and cached
+        until the atoms are modified; each access returns a copy, so callers
+        can modify it.
         """
-        return pd.DataFrame(self.atom_data, columns=self.expected_columns)
+        if self._content_cache is None:
+            self._content_cache = self._build_content()
+        return self._content_cache.copy()
 
     @content.setter
     def content(self, new_content: pd.DataFrame):
@@ -239,4 +451,28 @@ class GroHandler(BaseHandler):
             raise ValueError(
                 "Columns of the DataFrame do not match the expected format."
             )
-        self.atom_data = new_content.values.tolist()
+        # Copied, so the caller modifying its DataFrame later changes nothing
+        content = new_content.copy()
+        content.index = pd.RangeIndex(len(content))
+        self._content_cache = convert_numeric_columns(
+            content,
+            columns=[self.expected_columns[index] for index in (0, 3, 4, 5, 6)],
+        )
+        self._atoms = None
+        self._atom_data = None
+
+    def _build_content(self) -> pd.DataFrame:
+        if self._atoms is None:
+            return pd.DataFrame(self._atom_data, columns=self.expected_columns)
+        atoms = self._atoms
+        columns = [
+            atoms["resid"].astype(np.int64),
+            atoms["resname"].astype(object),
+            atoms["atomname"].astype(object),
+            atoms["atomnr"].astype(np.int64),
+            atoms["xyz"][:, 0],
+            atoms["xyz"][:, 1],
+            atoms["xyz"][:, 2],
+            np.full(len(atoms), None, dtype=object),
+        ]
+        return pd.DataFrame(dict(zip(self.expected_columns, columns)))
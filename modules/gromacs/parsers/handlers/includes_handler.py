@@ -9,6 +9,7 @@ class IncludesHandler(BaseHandler):
     re_pattern = re.compile(r'^\s*#\s*include\s+"(.+?)"\s*$')
     construct_name = "include"
     suppress = None
+    line_keys = ("#include",)
 
     def __init__(self):
         super().__init__(store_top_line=False)  # No static top line for #include
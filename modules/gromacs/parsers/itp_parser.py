@@ -14,7 +14,7 @@ class ITPParser:
     ):
         self.parser = parser
         self.handler = handler
-        self.sections = parser.parse(itp_path)
+        self.sections = parser.parse(itp_path, lazy=True)
 
     def _get_section_key(self, section_name: str):
         return f"data_{section_name}"
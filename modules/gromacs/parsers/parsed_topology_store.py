@@ -0,0 +1,152 @@
+from config.data_models.parsed_topology import ParsedTopology, SectionSpan
+from modules.cache_store.cache_stats import CacheStatsRecorder, cache_stats
+from modules.cache_store.memory_tier import MemoryTier
+from modules.cache_store.section_index_cache import SectionIndexCache
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+import hashlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SectionParser = Callable[[str], Tuple[List[SectionSpan], Optional[List[str]]]]
+
+
+class ParsedTopologyStore:
+    """
+    Process-wide store of parsed GROMACS files, keyed by content, so the same
+    solvent and polymer topologies are parsed once per worker rather than at
+    every job stage. Files are identified by path, size, inode and change
+    times, and only read again when those change; files with the same content
+    (e.g. copies in each job directory) share an entry. Files changed shortly
+    before they were last read are read again on every lookup, since a
+    same-size rewrite within the filesystem's timestamp granularity (e.g. on
+    NFS) leaves their stat unchanged.
+
+    Entries hold the file's text and section boundaries, which are immutable:
+    parsers build new sections from them on every parse (see `LazySection`),
+    so modifying sections never changes what later parses return.
+    """
+
+    # Files changed less than this long before they were read are read again
+    racy_window_s: float = 2.0
+    # File identities remembered, the least recently used are dropped beyond it
+    max_file_digests: int = 4096
+
+    def __init__(
+        self,
+        max_bytes: int = 128 * 1024**2,
+        index_cache: Optional[SectionIndexCache] = None,
+        stats_name: str = "parsed_topology_store",
+    ):
+        """
+        :param max_bytes: Combined size of the texts kept, the least recently
+            used are dropped beyond it.
+        :param index_cache: Disk cache of section boundaries, to persist them
+            across processes. Defaults to keeping them in memory only.
+        :param stats_name: Name lookups are recorded under, see `cache_stats`.
+        """
+        self.memory_tier = MemoryTier(max_bytes=max_bytes)
+        self.index_cache = index_cache
+        self.stats_name = stats_name
+        # Digest of each file identity, and when (ns) the file was read
+        self._file_digests: "OrderedDict[Tuple, Tuple[str, int]]" = OrderedDict()
+        self._file_digests_lock = threading.Lock()
+
+    @property
+    def stats(self) -> CacheStatsRecorder:
+        return cache_stats.get_recorder(self.stats_name)
+
+    def get(self, filepath: str, variant: str, parse: SectionParser) -> ParsedTopology:
+        """
+        Parsed file at `filepath`, parsing it only if its content has not been
+        parsed with the same `variant` before.
+
+        :param filepath: Path to the file.
+        :param variant: What else the sections depend on, e.g. the handlers.
+        :param parse: Splits the file's text into sections, returning their
+            spans and the constructs suppressed after them.
+        :return: The parsed file, shared with other callers.
+        """
+        start = time.perf_counter()
+        filepath = os.path.abspath(filepath)
+        stat = os.stat(filepath)
+        file_key = (
+            filepath,
+            stat.st_size,
+            stat.st_mtime_ns,
+            stat.st_ino,
+            stat.st_ctime_ns,
+        )
+        digest = self._get_file_digest(file_key, stat)
+        if digest is not None:
+            found, parsed = self.memory_tier.get((digest, variant))
+            if found:
+                self._record_hit(parsed, start)
+                return parsed
+
+        read_at_ns = time.time_ns()
+        with open(filepath, "r") as file:
+            text = file.read()
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        self._set_file_digest(file_key, digest, read_at_ns)
+        # The same content under another path
+        found, parsed = self.memory_tier.get((digest, variant))
+        if found:
+            self._record_hit(parsed, start)
+            return parsed
+
+        index = None
+        if self.index_cache is not None:
+            index_key = SectionIndexCache.get_cache_key(digest, variant)
+            index = self.index_cache.retrieve(index_key)
+        if index is None:
+            index = parse(text)
+            if self.index_cache is not None:
+                self.index_cache.store(index_key, index)
+        spans, suppressed_constructs = index
+        parsed = ParsedTopology(
+            text=text,
+            digest=digest,
+            spans=spans,
+            suppressed_constructs=suppressed_constructs,
+        )
+        self.memory_tier.put((digest, variant), parsed, len(text))
+        self.stats.record_lookup(False, time.perf_counter() - start)
+        self.stats.record_read(len(text))
+        return parsed
+
+    def _get_file_digest(self, file_key: Tuple, stat: os.stat_result) -> Optional[str]:
+        with self._file_digests_lock:
+            entry = self._file_digests.get(file_key)
+            if entry is None:
+                return None
+            self._file_digests.move_to_end(file_key)
+        digest, read_at_ns = entry
+        # Changed shortly before it was read, a rewrite since may not show in its stat
+        changed_at_ns = max(stat.st_mtime_ns, stat.st_ctime_ns)
+        if changed_at_ns > read_at_ns - self.racy_window_s * 1e9:
+            return None
+        return digest
+
+    def _set_file_digest(self, file_key: Tuple, digest: str, read_at_ns: int):
+        with self._file_digests_lock:
+            self._file_digests[file_key] = (digest, read_at_ns)
+            self._file_digests.move_to_end(file_key)
+            while len(self._file_digests) > self.max_file_digests:
+                self._file_digests.popitem(last=False)
+
+    def _record_hit(self, parsed: ParsedTopology, start: float):
+        self.stats.record_lookup(True, time.perf_counter() - start)
+        self.stats.record_read(len(parsed.text), from_memory=True)
+
+    def clear(self):
+        self.memory_tier.clear()
+        with self._file_digests_lock:
+            self._file_digests.clear()
+
+
+parsed_topology_store = ParsedTopologyStore()
@@ -1,4 +1,4 @@
-from typing import Dict, Type
+from typing import Dict, List, Optional, Type
 from modules.gromacs.parsers.handlers.base_handler import (
     BaseHandler,
 )
@@ -25,6 +25,7 @@ from modules.gromacs.parsers.handlers.gro_handler import (
 class HandlerRegistry:
     def __init__(self):
         self._handlers: Dict[str, Type[BaseHandler]] = {}
+        self._line_dispatch: Optional[Dict[Optional[str], List[str]]] = None
 
     def register_handler(self, handler_class: Type[BaseHandler]) -> None:
         """Registers a handler class by its construct name."""
@@ -32,6 +33,29 @@ class HandlerRegistry:
         if construct_name in self._handlers:
             raise ValueError(f"Handler '{construct_name}' is already registered.")
         self._handlers[construct_name] = handler_class
+        self._line_dispatch = None
+
+    def get_line_dispatch(self) -> Dict[Optional[str], List[str]]:
+        """
+        Handlers whose pattern can match a line, by the line's key (see
+        `BaseHandler.get_line_key`), in registration order. Lines of other keys
+        are under None: the handlers without `line_keys`, usually none.
+        """
+        if self._line_dispatch is None:
+            keys = {
+                key
+                for handler_class in self._handlers.values()
+                for key in handler_class.line_keys or ()
+            }
+            dispatch = {key: [] for key in [None, *keys]}
+            for handler_name, handler_class in self._handlers.items():
+                if handler_class.re_pattern is None:
+                    continue
+                for key in dispatch:
+                    if handler_class.line_keys is None or key in handler_class.line_keys:
+                        dispatch[key].append(handler_name)
+            self._line_dispatch = dispatch
+        return self._line_dispatch
 
     def get_handler(self, handler_name: str) -> Type[BaseHandler]:
         """Retrieves a handler class by its name."""
@@ -0,0 +1,379 @@
+from collections import OrderedDict
+from modules.gromacs.parsers.data_models.section import Section
+from modules.gromacs.parsers.gromacs_parser import GromacsParser
+from modules.gromacs.parsers.handlers.data_handler import DataHandler
+from modules.gromacs.parsers.itp_parser import ITPParser
+from modules.gromacs.parsers.registries.section_registry import DataRegistry
+from typing import Any, Dict, Iterable, List, Optional, Union
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+TOPOLOGY_SECTIONS = ("atomtypes", "atoms", "bonds", "pairs", "angles", "dihedrals")
+
+# Columns holding atom numbers, shifted and renumbered with the atoms
+ATOM_NUMBER_COLUMNS = {
+    "atoms": ("nr",),
+    "bonds": ("ai", "aj"),
+    "pairs": ("ai", "aj"),
+    "angles": ("ai", "aj", "ak"),
+    "dihedrals": ("i", "j", "k", "l"),
+}
+# Other integer columns, all remaining columns are kept as the text they were
+# read as, so unmodified values are exported exactly
+INTEGER_COLUMNS = {
+    "atoms": ("resi", "cgnr"),
+    "bonds": ("funct",),
+    "pairs": ("funct",),
+    "angles": ("funct",),
+    "dihedrals": ("funct",),
+}
+COMMENT_COLUMN = "comment"
+
+
+def _get_table_dtype(section_name: str, columns: Dict[str, np.ndarray]) -> np.dtype:
+    integer_columns = ATOM_NUMBER_COLUMNS.get(section_name, ()) + INTEGER_COLUMNS.get(
+        section_name, ()
+    )
+    return np.dtype(
+        [
+            (
+                column,
+                (
+                    np.int64
+                    if column in integer_columns
+                    else object if column == COMMENT_COLUMN else values.dtype
+                ),
+            )
+            for column, values in columns.items()
+        ]
+    )
+
+
+def _concatenate_tables(tables: List[np.ndarray]) -> np.ndarray:
+    """
+    Concatenates tables of the same columns, widening text columns to fit.
+    """
+    fields = tables[0].dtype.names
+    dtype = np.dtype(
+        [
+            (field, np.result_type(*[table.dtype[field] for table in tables]))
+            for field in fields
+        ]
+    )
+    combined = np.empty(sum(len(table) for table in tables), dtype=dtype)
+    start = 0
+    for table in tables:
+        for field in fields:
+            combined[field][start : start + len(table)] = table[field]
+        start += len(table)
+    return combined
+
+
+def deduplicate_table(table: np.ndarray, column: str, keep: str = "first") -> np.ndarray:
+    """
+    Rows of `table` with the first (or last) of each value of `column`, in
+    their original order, like `DataFrame.drop_duplicates`.
+
+    :param keep: "first" or "last".
+    """
+    values = table[column] if keep == "first" else table[column][::-1]
+    _, indices = np.unique(values, return_index=True)
+    if keep != "first":
+        indices = len(table) - 1 - indices
+    return table[np.sort(indices)]
+
+
+class Topology:
+    """
+    Atomtypes, atoms and interactions of a GROMACS topology as structured
+    numpy arrays, one per section, with the columns of the section registry
+    and an in-line comment column. Atom numbers and integer columns are int64,
+    so topologies are shifted, renumbered and combined with whole-array
+    operations; other values keep the text they were read as.
+
+    All other sections of the file are kept as they are, and exported in
+    their original order.
+    """
+
+    def __init__(
+        self,
+        sections: "OrderedDict[str, Section]",
+        tables: Dict[str, np.ndarray],
+        headers: Dict[str, Dict[str, Any]],
+        untabled_sections: Optional[List[str]] = None,
+    ):
+        """
+        :param sections: Sections of the file, see `GromacsParser.parse`.
+        :param tables: Table of each tabled section, by section name.
+        :param headers: Header line, and comment lines before and after the
+            rows, of each tabled section.
+        :param untabled_sections: Sections that could not be tabled, e.g.
+            with rows of differing columns or no rows.
+        """
+        self.sections = sections
+        self.tables = tables
+        self.headers = headers
+        self.untabled_sections = untabled_sections or []
+
+    @classmethod
+    def from_sections(
+        cls,
+        sections: "OrderedDict[str, Section]",
+        section_names: Iterable[str] = TOPOLOGY_SECTIONS,
+        section_registry: DataRegistry = DataRegistry(),
+    ) -> "Topology":
+        """
+        :param sections: Sections of a .itp or .top file, see `GromacsParser.parse`.
+        :param section_names: Sections to table, if the file has them.
+        :param section_registry: Columns of each section.
+        """
+        tables = {}
+        headers = {}
+        untabled_sections = []
+        for section_name in section_names:
+            section = sections.get(f"data_{section_name}")
+            if section is None:
+                continue
+            handler = DataHandler(section_registry=section_registry)
+            try:
+                handler.process(section)
+            except (ValueError, IndexError) as e:
+                # e.g. a malformed first row, or a section with no rows
+                logger.warning(
+                    f"[ {section_name} ] could not be read ({e}), the section "
+                    "is kept as text."
+                )
+                untabled_sections.append(section_name)
+                continue
+            columns = handler.expected_headers + [COMMENT_COLUMN]
+            rows = handler.data
+            if any(len(row) != len(columns) for row in rows):
+                logger.warning(
+                    f"Rows of [ {section_name} ] do not all have the columns "
+                    f"{handler.expected_headers}, the section is kept as text."
+                )
+                untabled_sections.append(section_name)
+                continue
+            tables[section_name] = cls._rows_to_table(section_name, columns, rows)
+            headers[section_name] = {
+                "top_line": handler.top_line,
+                "top_comments": list(handler.top_comments),
+                "bottom_comments": list(handler.bottom_comments),
+            }
+        return cls(sections, tables, headers, untabled_sections)
+
+    @classmethod
+    def from_itp_parser(
+        cls, itp_parser: ITPParser, section_names: Iterable[str] = TOPOLOGY_SECTIONS
+    ) -> "Topology":
+        return cls.from_sections(itp_parser.sections, section_names=section_names)
+
+    @classmethod
+    def from_file(
+        cls,
+        filepath: str,
+        section_names: Iterable[str] = TOPOLOGY_SECTIONS,
+        parser: GromacsParser = GromacsParser(),
+    ) -> "Topology":
+        """
+        :param filepath: Path to a .itp or .top file.
+        :param section_names: Sections to table, only these are split into
+            lines (see `GromacsParser.parse`).
+        """
+        sections = parser.parse(filepath, lazy=True)
+        return cls.from_sections(sections, section_names=section_names)
+
+    @staticmethod
+    def _rows_to_table(
+        section_name: str, columns: List[str], rows: List[List]
+    ) -> np.ndarray:
+        values = {
+            column: np.array(column_values, dtype=str)
+            for column, column_values in zip(
+                columns[:-1], zip(*rows) if rows else [[] for _ in columns]
+            )
+        }
+        values[COMMENT_COLUMN] = np.array([row[-1] for row in rows], dtype=object)
+        table = np.empty(len(rows), dtype=_get_table_dtype(section_name, values))
+        for column, column_values in values.items():
+            table[column] = column_values
+        return table
+
+    @property
+    def atomtypes(self) -> np.ndarray:
+        return self.tables["atomtypes"]
+
+    @property
+    def atoms(self) -> np.ndarray:
+        return self.tables["atoms"]
+
+    @property
+    def num_atoms(self) -> int:
+        return len(self.tables["atoms"]) if "atoms" in self.tables else 0
+
+    def get_values(self, section_name: str, column: str) -> np.ndarray:
+        """
+        Values of a column as numbers, e.g. the charges of the atoms.
+        """
+        return self.tables[section_name][column].astype(np.float64)
+
+    def pop_table(self, section_name: str) -> np.ndarray:
+        """
+        Removes a section, so it is no longer exported.
+
+        :return: The section's table.
+        """
+        self.sections.pop(f"data_{section_name}")
+        self.headers.pop(section_name)
+        return self.tables.pop(section_name)
+
+    def _check_atom_numbers_tabled(self):
+        untabled = [
+            section_name
+            for section_name in self.untabled_sections
+            if section_name in ATOM_NUMBER_COLUMNS
+        ]
+        if untabled:
+            raise ValueError(
+                f"Atom numbers of sections kept as text cannot be changed: {untabled}"
+            )
+
+    def shift_atom_numbers(self, offset: int):
+        """
+        Adds `offset` to every atom number, e.g. to place the topology after
+        `offset` atoms of another molecule.
+        """
+        self._check_atom_numbers_tabled()
+        for section_name, columns in ATOM_NUMBER_COLUMNS.items():
+            if section_name in self.tables:
+                table = self.tables[section_name]
+                for column in columns:
+                    table[column] += offset
+
+    def renumber_atoms(self, first: int = 1):
+        """
+        Numbers the atoms consecutively from `first` in their current order,
+        updating the atom numbers of every interaction, and renumbers charge
+        groups consecutively in order of appearance.
+
+        :raises ValueError: If an interaction refers to an atom that does not exist.
+        """
+        self._check_atom_numbers_tabled()
+        atoms = self.tables["atoms"]
+        order = np.argsort(atoms["nr"], kind="stable")
+        sorted_numbers = atoms["nr"][order]
+        new_numbers = np.arange(first, first + len(atoms), dtype=np.int64)
+        for section_name, columns in ATOM_NUMBER_COLUMNS.items():
+            if section_name == "atoms" or section_name not in self.tables:
+                continue
+            table = self.tables[section_name]
+            for column in columns:
+                positions = np.searchsorted(sorted_numbers, table[column])
+                positions = np.minimum(positions, len(sorted_numbers) - 1)
+                if len(table) and (
+                    not len(sorted_numbers)
+                    or np.any(sorted_numbers[positions] != table[column])
+                ):
+                    raise ValueError(
+                        f"[ {section_name} ] refers to atoms that do not exist."
+                    )
+                table[column] = new_numbers[order][positions]
+        atoms["nr"] = new_numbers
+        _, first_indices, inverse = np.unique(
+            atoms["cgnr"], return_index=True, return_inverse=True
+        )
+        # Charge groups in order of their first atom
+        rank = np.empty(len(first_indices), dtype=np.int64)
+        rank[np.argsort(first_indices, kind="stable")] = np.arange(len(first_indices))
+        atoms["cgnr"] = rank[inverse] + first
+
+    def merge_atomtypes(
+        self, atomtypes: Union[np.ndarray, "Topology"], keep: str = "first"
+    ):
+        """
+        Adds atomtypes after this topology's own, keeping one atomtype of
+        each name.
+
+        :param atomtypes: Atomtypes table, or a topology with atomtypes.
+        :param keep: Which atomtype of a name to keep, "first" or "last".
+        """
+        if isinstance(atomtypes, Topology):
+            atomtypes = atomtypes.atomtypes
+        combined = _concatenate_tables([self.tables["atomtypes"], atomtypes])
+        self.tables["atomtypes"] = deduplicate_table(combined, "name", keep=keep)
+
+    def append(self, other: "Topology"):
+        """
+        Appends the atoms and interactions of another topology, numbering its
+        atoms and charge groups after this topology's, and merges its
+        atomtypes.
+        """
+        self._check_atom_numbers_tabled()
+        other._check_atom_numbers_tabled()
+        atom_offset = int(self.atoms["nr"].max(initial=0))
+        charge_group_offset = int(self.atoms["cgnr"].max(initial=0))
+        for section_name, other_table in other.tables.items():
+            if section_name == "atomtypes":
+                self.merge_atomtypes(other_table)
+                continue
+            if section_name not in self.tables:
+                raise ValueError(f"Topology has no [ {section_name} ] to append to.")
+            other_table = other_table.copy()
+            for column in ATOM_NUMBER_COLUMNS.get(section_name, ()):
+                other_table[column] += atom_offset
+            if section_name == "atoms":
+                other_table["cgnr"] += charge_group_offset
+            self.tables[section_name] = _concatenate_tables(
+                [self.tables[section_name], other_table]
+            )
+
+    def _export_table_lines(self, section_name: str) -> List[str]:
+        table = self.tables[section_name]
+        columns = [
+            column for column in table.dtype.names if column != COMMENT_COLUMN
+        ]
+        rows = zip(*[table[column].astype(str).tolist() for column in columns])
+        lines = [" ".join(row) for row in rows]
+        for index in np.flatnonzero(
+            [bool(comment) for comment in table[COMMENT_COLUMN].tolist()]
+        ):
+            lines[index] = f"{lines[index]} ; {table[COMMENT_COLUMN][index]}"
+        headers = self.headers[section_name]
+        top_line = [headers["top_line"]] if headers["top_line"] else []
+        return [
+            *top_line,
+            *headers["top_comments"],
+            *lines,
+            *headers["bottom_comments"],
+        ]
+
+    def to_sections(self) -> "OrderedDict[str, Section]":
+        """
+        Sections of the topology, with the tabled sections exported in the
+        format of `DataHandler`.
+        """
+        sections = OrderedDict()
+        for key, section in self.sections.items():
+            section_name = section.name if section.construct_name == "data" else None
+            if key == f"data_{section_name}" and section_name in self.tables:
+                exported = Section(
+                    construct_name=section.construct_name,
+                    handler_name=section.handler_name,
+                    name=section.name,
+                )
+                exported.lines = self._export_table_lines(section_name)
+                section = exported
+            sections[key] = section
+        return sections
+
+    def export(
+        self, output_path: str, parser: GromacsParser = GromacsParser()
+    ) -> str:
+        """
+        Writes the topology to a .itp or .top file.
+
+        :return: The output path.
+        """
+        return parser.export(self.to_sections(), output_path)
@@ -0,0 +1,100 @@
+from rdkit import Chem
+from typing import Dict, Iterable, List, Optional
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Canonical SMILES by input SMILES, for every SMILES seen by this process
+_canonical_smiles: Dict[str, str] = {}
+_canonical_smiles_lock = threading.Lock()
+
+
+def _canonicalise(smiles: str) -> str:
+    mol = Chem.MolFromSmiles(smiles)
+    if mol is None:
+        # Invalid SMILES are kept as they are, the polymer builders reject them
+        logger.warning(f"Could not canonicalise SMILES {smiles}")
+        return smiles
+    return Chem.MolToSmiles(mol)
+
+
+def canonicalise_smiles(smiles_list: Iterable[str]) -> List[str]:
+    """
+    RDKit canonical SMILES of many molecules in one pass, parsing each distinct
+    SMILES once per process. Call it with every SMILES of a campaign up front,
+    so later cache key lookups are dictionary lookups.
+
+    :param smiles_list: SMILES in any spelling.
+    :return: The canonical SMILES, in the same order.
+    """
+    smiles_list = list(smiles_list)
+    with _canonical_smiles_lock:
+        missing = {smiles for smiles in smiles_list if smiles not in _canonical_smiles}
+    canonical = {smiles: _canonicalise(smiles) for smiles in missing}
+    with _canonical_smiles_lock:
+        _canonical_smiles.update(canonical)
+        return [_canonical_smiles[smiles] for smiles in smiles_list]
+
+
+def get_canonical_smiles(smiles: str) -> str:
+    return canonicalise_smiles([smiles])[0]
+
+
+def get_repeat_unit(monomer_smiles: List[str]) -> List[str]:
+    """
+    Shortest monomer sequence that the alternating sequence of `monomer_smiles`
+    repeats, e.g. [A] for [A, A] and [A, B] for [A, B, A, B].
+    """
+    n_monomers = len(monomer_smiles)
+    for length in range(1, n_monomers):
+        if n_monomers % length == 0 and monomer_smiles == (
+            monomer_smiles[:length] * (n_monomers // length)
+        ):
+            return monomer_smiles[:length]
+    return list(monomer_smiles)
+
+
+def get_monomer_list_key(monomer_smiles: List[str]) -> str:
+    """
+    Key of a monomer list in the order given, with each monomer's canonical
+    SMILES, e.g. for building blocks whose length follows from the list.
+    """
+    return "_".join(canonicalise_smiles(monomer_smiles))
+
+
+def get_polymer_key(monomer_smiles: List[str], num_units: Optional[int] = None) -> str:
+    """
+    Key of the polymer built by alternating `monomer_smiles`: the canonical
+    SMILES of its repeat unit, and its length. Different spellings of a monomer
+    and repeated monomer lists describing the same chain share a key.
+
+    :param monomer_smiles: Monomers in the order they are added to the chain.
+    :param num_units: Number of monomers in the chain, if part of the key.
+    :return: The key.
+    """
+    key = "_".join(get_repeat_unit(canonicalise_smiles(monomer_smiles)))
+    if num_units is not None:
+        key = f"{key}_{num_units}"
+    return key
+
+
+def get_polymer_keys(
+    polymers: Iterable[List[str]], num_units: Optional[Iterable[int]] = None
+) -> List[str]:
+    """
+    `get_polymer_key` of many polymers, canonicalising all their monomers in
+    one pass.
+
+    :param polymers: Monomer list of each polymer.
+    :param num_units: Length of each polymer, if part of the keys.
+    :return: The keys, in the same order.
+    """
+    polymers = [list(monomer_smiles) for monomer_smiles in polymers]
+    canonicalise_smiles(smiles for monomer_smiles in polymers for smiles in monomer_smiles)
+    if num_units is None:
+        return [get_polymer_key(monomer_smiles) for monomer_smiles in polymers]
+    return [
+        get_polymer_key(monomer_smiles, n_units)
+        for monomer_smiles, n_units in zip(polymers, num_units)
+    ]
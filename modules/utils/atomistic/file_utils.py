@@ -15,6 +15,7 @@ from modules.gromacs.commands.insert_molecules import InsertMolecules
 from config.paths import TEMP_DIR
 from config.constants import MassUnits, LengthUnits
 from modules.utils.shared.calculation_utils import calculate_num_particles
+import numpy as np
 import pandas as pd
 from modules.gromacs.parsers.gromacs_parser import GromacsParser
 from modules.gromacs.parsers.handlers.gro_handler import GroHandler
@@ -226,12 +227,8 @@ def calculate_minimum_box_size_from_df(
 
 @file_exists_check_wrapper(file_arg_index=0)
 def count_particles(gro_file: str) -> int:
-    parser = GromacsParser()
-    sections = parser.parse(gro_file)
-    gro_section = next(iter(sections.values()))
-    gro_handler = GroHandler()
-    gro_handler.process(gro_section)
-    residue_numbers = gro_handler.content["Residue Number"].unique()
+    gro_handler = GroHandler().read(gro_file)
+    residue_numbers = np.unique(gro_handler.atoms["resid"])
     return len(residue_numbers)
 
 
@@ -244,9 +241,7 @@ def num_molecules_needed(gro_file: str, desired_number: int) -> int:
 def calculate_minimum_box_size_from_gro(
     gro_file, padding: float = 0.1, parser=GromacsParser(), gro_handler=GroHandler()
 ) -> List[float]:
-    sections = parser.parse(gro_file)
-    gro_section = next(iter(sections.values()))
-    gro_handler.process(gro_section)
+    gro_handler.read(gro_file)
     box_size = calculate_minimum_box_size_from_df(gro_handler.content, padding)
     return box_size
 
@@ -261,9 +256,7 @@ def get_gro_handler(
     parser = GromacsParser()
 =======
 >>>>>>> 91758eb (cleaned up)
-    sections = parser.parse(gro_file)
-    gro_section = next(iter(sections.values()))
-    gro_handler.process(gro_section)
+    gro_handler.read(gro_file)
     return gro_handler
 
 
@@ -368,11 +361,9 @@ def export_gro_handler(
     output_path: str,
     parser: GromacsParser = GromacsParser(),
 ):
-    gro_section = gro_handler.export()
-    sections = OrderedDict()
-    sections["gro_file"] = gro_section
-    output_file = parser.export(sections, output_path)
-    return output_file
+    # Written by the handler in one buffered write, rather than exported to
+    # lines and written by the parser
+    return gro_handler.write(output_path)
 
 
 # NOTE: honestly, could turn the grohandler -> dataframe, dataframe -> grohandler part into a wrapper or something
@@ -1,12 +1,9 @@
 from functools import wraps
-from typing import Callable, List
+from typing import Callable, List, Optional
 import pandas as pd
-<<<<<<< HEAD
 import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
-=======
->>>>>>> 91758eb (cleaned up)
 
 
 def dataframe_not_empty_check(
@@ -97,8 +94,25 @@ def convert_xlsx_to_csv(xlsx_file: str, csv_file: str, required_headers: list):
 
     # Save to CSV
     df.to_csv(csv_file, index=False)
-<<<<<<< HEAD
     logger.info(f"Conversion successful! Saved CSV: {csv_file}")
-=======
-    print(f"Conversion successful! Saved CSV: {csv_file}")
->>>>>>> 91758eb (cleaned up)
+
+
+def convert_numeric_columns(
+    dataframe: pd.DataFrame, columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Converts columns whose values are all numbers (e.g. parsed from text) to
+    numeric dtypes, in place. Columns with any other value are left as they are.
+
+    :param dataframe: The DataFrame to convert.
+    :param columns: Columns to convert, defaults to all.
+    :return: The converted DataFrame.
+    """
+    for column in dataframe.columns if columns is None else columns:
+        values = dataframe[column]
+        if pd.api.types.is_numeric_dtype(values) or values.isna().all():
+            continue
+        numeric_values = pd.to_numeric(values, errors="coerce")
+        if numeric_values.isna().sum() == values.isna().sum():
+            dataframe[column] = numeric_values
+    return dataframe
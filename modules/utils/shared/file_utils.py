@@ -1,6 +1,7 @@
 import os
 import shutil
 import logging
+import threading
 from typing import List, Callable, TypeVar, Any
 
 # from typing import List, Callable, TypeVar, Any, ParamSpec
@@ -341,6 +342,31 @@ def copy_file(
     return dest_file
 
 
+def move_file_atomically(file_path: str, dest_dir: str) -> str:
+    """
+    Moves a file into a destination directory, replacing any file of the same
+    name at once, so concurrent readers see either the old or the complete new
+    file, never a partly written one. The file is first copied next to the
+    destination, as os.replace is only atomic within a filesystem.
+
+    :param file_path: Path to the file to move.
+    :type file_path: str
+    :param dest_dir: The directory to move the file to.
+    :type dest_dir: str
+    :return: The path to the moved file.
+    :rtype: str
+    """
+    check_file_exists(file_path)
+    check_directory_exists(dest_dir, make_dirs=True)
+
+    dest_file_path = os.path.join(dest_dir, os.path.basename(file_path))
+    temp_path = f"{dest_file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    shutil.copyfile(file_path, temp_path)
+    os.replace(temp_path, dest_file_path)
+    os.remove(file_path)
+    return dest_file_path
+
+
 def batch_rename_to_same(file_paths: List[str], new_name: str) -> List[Optional[str]]:
     """
     Renames multiple files to have the same name, preserving directories and extensions.
@@ -496,21 +522,13 @@ def delete_directory(directory_path: str, verbose: bool = False, confirm: bool =
         )
         if user_input not in ["y", "yes"]:
             if verbose:
-<<<<<<< HEAD
                 logger.info(f"Deletion of '{directory_path}' canceled by user.")
-=======
-                print(f"Deletion of '{directory_path}' canceled by user.")
->>>>>>> 91758eb (cleaned up)
             return
 
     try:
         shutil.rmtree(directory_path)
         if verbose:
-<<<<<<< HEAD
             logger.info(f"Directory '{directory_path}' has been deleted successfully.")
-=======
-            print(f"Directory '{directory_path}' has been deleted successfully.")
->>>>>>> 91758eb (cleaned up)
     except Exception as e:
         raise RuntimeError(f"Failed to delete directory '{directory_path}': {e}")
 
@@ -126,11 +126,19 @@ class JoinedAtomisticPolymerWorkflow(BaseWorkflow):
         return outputs, n_values, final_output_dir
 
     def _get_min_box_size(self, box_incriments: float = 5):
-        if self.num_units <= 30:
-            box_width = self.standard_box_width
-        if self.num_units > 30:
-            end_to_end_length = self.num_units * self.average_bond_length
-            safe_size = end_to_end_length * self.safety_factor
+        return self.get_box_size(self.num_units, box_incriments=box_incriments)
+
+    @classmethod
+    def get_box_size(cls, num_units: int, box_incriments: float = 5) -> List[float]:
+        """
+        Box size (nm) used for a chain of `num_units` monomers, so callers can
+        size a job without constructing the workflow.
+        """
+        if num_units <= 30:
+            box_width = cls.standard_box_width
+        if num_units > 30:
+            end_to_end_length = num_units * cls.average_bond_length
+            safe_size = end_to_end_length * cls.safety_factor
             box_width = math.ceil(safe_size / box_incriments) * box_incriments
 
         return [box_width, box_width, box_width]
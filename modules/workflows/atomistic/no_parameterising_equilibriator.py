@@ -21,7 +21,9 @@ from modules.utils.shared.file_utils import (
     check_directory_exists,
 )
 from modules.gromacs.parsers.gromacs_parser import GromacsParser
+from modules.gromacs.parsers.topology import Topology
 from typing import Optional, Tuple, Dict
+import numpy as np
 import pandas as pd
 from modules.gromacs.parsers.handlers.data_handler import DataHandler
 import logging
@@ -35,7 +37,6 @@ from modules.utils.atomistic.file_utils import (
     replace_value_in_dataframe,
     create_includes_section,
     delete_all_include_sections,
-    add_full_rows_to_handler_deduplicate,
 )
 from modules.cache_store.equilibriated_atomistic_polymer_cache import (
     EquilibriatedAtomisticPolymerCache,
@@ -44,6 +45,12 @@ from modules.moltemplate.moltemplate_utils import (
     add_polymer_to_solvent,
 )
 from modules.utils.shared.file_utils import delete_directory
+from modules.cache_store.provenance import (
+    get_file_digest,
+    get_gromacs_version,
+    get_provenance_digest,
+)
+from modules.acpype.acpype_parametizer import ACPYPEParameterizer
 import logging
 
 logger = logging.getLogger(__name__)
@@ -111,13 +118,71 @@ class NoParametiserPolymerEquilibriationWorkflow(BaseWorkflow):
         subdir = f"{self.solvent.name}_{self.solvent.compressibility}_{monomer_smiles_str}_{actual_num_units}"
         return subdir
 
-    def check_polymer_cache(self, temperature: float) -> Optional[GromacsOutputs]:
-        cache_key = self.cache.get_cache_key(
+    @classmethod
+    def get_provenance(
+        cls,
+        parameterised_polymer: GromacsPaths,
+        solvent: Solvent,
+        temperature: float,
+        minim_workflow: FullEquilibrationWorkflow = minim_workflow,
+        full_workflow: FullEquilibrationWorkflow = polymer_workflow,
+        pos_ion_name: str = "NA",
+        neg_ion_name: str = "CL",
+        polymer_name: str = "POLY",
+    ) -> str:
+        """
+        Digest of everything an equilibrated polymer depends on besides its
+        cache key: the polymer's parameter files, the solvent box's provenance,
+        the minimisation and equilibration steps with their MDP templates, the
+        force field and ion settings, and the programs that run them.
+        """
+        return get_provenance_digest(
+            inputs=[
+                get_file_digest(parameterised_polymer.itp_path),
+                get_file_digest(parameterised_polymer.gro_path),
+                get_file_digest(parameterised_polymer.top_path),
+                get_file_digest(parameterised_polymer.posre_path),
+            ],
+            solvent=SolventEquilibriationWorkflow.get_provenance(solvent, temperature),
+            protocol=[
+                minim_workflow.get_protocol([None]),
+                full_workflow.get_protocol(
+                    cls.get_varying_params_list(solvent, temperature)
+                ),
+            ],
+            settings={
+                "forcefield": cls.forcefield,
+                "ion_itp_file": cls.ion_itp_file,
+                "ions": [pos_ion_name, neg_ion_name],
+                "polymer_name": polymer_name,
+                "polymer_addition_cutoff": cls.polymer_addition_cutoff,
+                "saved_file_types": cls.saved_file_types,
+            },
+            acpype=ACPYPEParameterizer.get_settings(),
+            gromacs=get_gromacs_version(),
+        )
+
+    def _get_cache_key(self, temperature: float) -> str:
+        return self.cache.get_cache_key(
             solvent=self.solvent,
             monomer_smiles=self.monomer_smiles,
             num_units=self.num_units,
             temperature=temperature,
+            box_size_nm=self.box_size_nm,
+            provenance=self.get_provenance(
+                self.parameterised_polymer,
+                self.solvent,
+                temperature,
+                minim_workflow=self.minim_workflow,
+                full_workflow=self.full_workflow,
+                pos_ion_name=self.pname,
+                neg_ion_name=self.nname,
+                polymer_name=self.polymer_name,
+            ),
         )
+
+    def check_polymer_cache(self, temperature: float) -> Optional[GromacsOutputs]:
+        cache_key = self._get_cache_key(temperature)
         if self.cache.has_key(cache_key):
             parameterised_polymer = self.cache.retrieve_object(cache_key)
             logging.info(f"Polymer retrieved from cache with key: {cache_key}")
@@ -142,12 +207,7 @@ class NoParametiserPolymerEquilibriationWorkflow(BaseWorkflow):
                 continue
             logger.info(f"Polymer not found in cache, generating...")
             outputs = self._run_per_temp(temperature)
-            cache_key = self.cache.get_cache_key(
-                solvent=self.solvent,
-                monomer_smiles=self.monomer_smiles,
-                num_units=self.num_units,
-                temperature=temperature,
-            )
+            cache_key = self._get_cache_key(temperature)
             self.outputs.append(outputs)
             self.cache.store_object(key=cache_key, data=outputs)
 
@@ -229,10 +289,19 @@ class NoParametiserPolymerEquilibriationWorkflow(BaseWorkflow):
         return outputs
 
     def _create_varying_params_list(self, temperature: float) -> List[Dict[str, str]]:
+        return self.get_varying_params_list(self.solvent, temperature)
+
+    @staticmethod
+    def get_varying_params_list(
+        solvent: Solvent, temperature: float
+    ) -> List[Dict[str, str]]:
+        """
+        Parameters of the thermal equilibration steps, which also key their MDP files.
+        """
         return [
             {
                 "temp": str(temperature),
-                "compressibility": str(self.solvent.compressibility),
+                "compressibility": str(solvent.compressibility),
             }
         ]
 
@@ -305,48 +374,35 @@ class NoParametiserPolymerEquilibriationWorkflow(BaseWorkflow):
         output_dir: Optional[str] = None,
         output_name: Optional[str] = None,
         parser: GromacsParser = GromacsParser(),
-        data_handler: DataHandler = DataHandler,
-    ) -> Tuple[str, pd.DataFrame]:
-        data_handler = data_handler()
-
-        solvent_sections = parser.parse(solvent_itp_file)
-        atoms_sections = solvent_sections["data_atomtypes"]
-        data_handler.process(atoms_sections)
-        atom_content = data_handler.content
-        solvent_sections.pop("data_atomtypes")
+    ) -> Tuple[str, np.ndarray]:
+        solvent_topology = Topology.from_file(
+            solvent_itp_file, section_names=["atomtypes"], parser=parser
+        )
+        solvent_atomtypes = solvent_topology.pop_table("atomtypes")
         output_itp_path = prepare_output_file_path(
             solvent_itp_file, "itp", output_dir, output_name
         )
-        output_itp_path = parser.export(solvent_sections, output_itp_path)
-        return output_itp_path, atom_content
+        output_itp_path = solvent_topology.export(output_itp_path, parser=parser)
+        return output_itp_path, solvent_atomtypes
 
     def _process_solute_itp(
         self,
         solute_itp_file: str,
-        solvent_atomtype_data: pd.DataFrame,
+        solvent_atomtypes: np.ndarray,
         output_dir: Optional[str] = None,
         output_name: Optional[str] = None,
         parser: GromacsParser = GromacsParser(),
-        data_handler: DataHandler = DataHandler,
     ) -> str:
-        data_handler = data_handler()
-        solute_sections = parser.parse(solute_itp_file)
-        atoms_sections = solute_sections["data_atomtypes"]
-
-        data_handler.process(atoms_sections)
-        data_handler = add_full_rows_to_handler_deduplicate(
-            data_handler,
-            solvent_atomtype_data,
-            add_to_top=False,
-            deduplicate_column="name",
+        # Solvent atomtypes are added after the solute's, once per name
+        solute_topology = Topology.from_file(
+            solute_itp_file, section_names=["atomtypes"], parser=parser
         )
-        atoms_sections = data_handler.export()
-        solute_sections["data_atomtypes"] = atoms_sections
+        solute_topology.merge_atomtypes(solvent_atomtypes)
 
         output_itp_path = prepare_output_file_path(
             solute_itp_file, "itp", output_dir, output_name
         )
-        output_itp_path = parser.export(solute_sections, output_itp_path)
+        output_itp_path = solute_topology.export(output_itp_path, parser=parser)
         return output_itp_path
 
     def _process_solute_and_solvent_itps(
@@ -359,12 +415,12 @@ class NoParametiserPolymerEquilibriationWorkflow(BaseWorkflow):
         parser: GromacsParser = GromacsParser(),
         data_handler: DataHandler = DataHandler,
     ) -> Tuple[str, str]:
-        output_solvent_itp, solvent_atom_data = self._process_solvent_itp(
+        output_solvent_itp, solvent_atomtypes = self._process_solvent_itp(
             solvent_itp_file, output_dir, solvent_output_name, parser=parser
         )
         output_solute_itp = self._process_solute_itp(
             solute_itp_file,
-            solvent_atom_data,
+            solvent_atomtypes,
             output_dir=output_dir,
             output_name=solute_output_name,
             parser=parser,
@@ -387,7 +443,7 @@ class NoParametiserPolymerEquilibriationWorkflow(BaseWorkflow):
         del_defaults: bool = True,
     ):
 
-        sections = parser.parse(input_top_file)
+        sections = parser.parse(input_top_file, lazy=True)
 
         sections = delete_all_include_sections(sections)
 
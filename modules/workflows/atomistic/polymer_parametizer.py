@@ -36,6 +36,14 @@ import time as time
 from abc import ABC, abstractmethod
 from modules.workflows.base_workflow import BaseWorkflow
 from modules.cache_store.pickle_cache import PickleCache
+from modules.rdkit.canonical_smiles import (
+    canonicalise_smiles,
+    get_monomer_list_key,
+    get_polymer_key,
+)
+from modules.cache_store.failure_cache import FailureCache, failure_cache
+from modules.cache_store.provenance import get_provenance_digest
+from config.data_models.known_failure import FailureReason
 from modules.rdkit.polymer_builders.base_polymer_generator import BasePolymerGenerator
 from modules.rdkit.polymer_builders.alternating_copolymer import (
     AlternatingPolymerGenerator,
@@ -69,6 +77,7 @@ class PolymerGeneratorWorkflow(BaseWorkflow):
         num_units: int,
         short_polymer_cache: PickleCache = short_polymer_cache,
         long_polymer_cache: PickleCache = long_polymer_cache,
+        failure_cache: FailureCache = failure_cache,
         polymer_generator: BasePolymerGenerator = AlternatingPolymerGenerator,
         verbose: bool = True,
         output_dir: str = PARAMETERISED_POLYMER_DIR,
@@ -83,6 +92,7 @@ class PolymerGeneratorWorkflow(BaseWorkflow):
         self.num_units: int = num_units
         self.short_polymer_cache = short_polymer_cache
         self.long_polymer_cache = long_polymer_cache
+        self.failure_cache = failure_cache
         self.res_name = res_name
         self.short_polymer_generator: BasePolymerGenerator = polymer_generator(
             monomer_smiles=self.monomer_smiles, res_name=self.res_name
@@ -95,7 +105,7 @@ class PolymerGeneratorWorkflow(BaseWorkflow):
         self.num_repeats, self.actual_num_units = self._get_n_repeat()
 
     def check_short_polymer_cache(self):
-        cache_key = "_".join(self.monomer_smiles)
+        cache_key = get_monomer_list_key(self.monomer_smiles)
         if self.short_polymer_cache.has_key(cache_key):
             parameterised_short_polymer = self.short_polymer_cache.retrieve_object(
                 cache_key
@@ -156,7 +166,7 @@ class PolymerGeneratorWorkflow(BaseWorkflow):
             length
         )
 
-        cache_key = "_".join(self.monomer_smiles)
+        cache_key = get_monomer_list_key(self.monomer_smiles)
         self.short_polymer_cache.store_object(
             cache_key, {"outputs": parameterised_files, "cg_map": short_cg_map}
         )
@@ -240,7 +250,7 @@ class PolymerGeneratorWorkflow(BaseWorkflow):
         )
 
     def _generate_polymer_cache_key(self, monomer_smiles: List[str], num_units: int):
-        return "_".join(monomer_smiles) + "_" + str(num_units)
+        return get_polymer_key(monomer_smiles, num_units)
 
     def _get_itp_path(self, gro_path: str):
         return gro_path.replace(".gro", ".itp")
@@ -263,6 +273,43 @@ class PolymerGeneratorWorkflow(BaseWorkflow):
         logging.info(f"Parameterised polymer not found in cache with key: {cache_key}")
         return None, None
 
+    def _get_parameterisation_failure_key(self) -> str:
+        # ACPYPE parameterises the short polymer, or the whole polymer if it is
+        # too short to be built from repeats
+        length = (
+            self.num_units if self.num_repeats < 1 else self._get_minimum_polymer_length()
+        )
+        return f"parameterisation_{get_monomer_list_key(self.monomer_smiles)}_{length}"
+
+    def _get_parameterisation_digest(self) -> str:
+        return get_provenance_digest(
+            monomer_smiles=canonicalise_smiles(self.monomer_smiles),
+            acpype=ACPYPEParameterizer.get_settings(),
+        )
+
+    def check_known_failures(self):
+        """
+        :raises KnownFailureError: If one of the monomers is rejected, or the
+            polymer's parameterisation is known to fail.
+        """
+        self.failure_cache.check(
+            {
+                **self.failure_cache.get_monomer_digests(self.monomer_smiles),
+                self._get_parameterisation_failure_key(): (
+                    self._get_parameterisation_digest()
+                ),
+            }
+        )
+
+    def _record_failure(self, exception: Exception):
+        if self.failure_cache.record_monomer_rejection(exception) is None:
+            self.failure_cache.record_exception(
+                self._get_parameterisation_failure_key(),
+                self._get_parameterisation_digest(),
+                exception,
+                reasons=[FailureReason.PARAMETERISATION_FAILED],
+            )
+
     def run(self) -> GromacsPaths:
         output_dir = self.output_dir
         check_directory_exists(output_dir)
@@ -271,14 +318,18 @@ class PolymerGeneratorWorkflow(BaseWorkflow):
             self.long_polymer_generator = polymer_generator
             return parameterised_polymer_pdb
         logging.info(f"Long polymer not found in cache, generating...")
-
-        if self.num_repeats < 1:
-            polymer_paths, cg_map = self.build_and_parameterize_short_polymer(
-                self.num_units, output_dir=output_dir
-            )
-
-        else:
-            polymer_paths = self._build_long_polymer(output_dir)
+        self.check_known_failures()
+
+        try:
+            if self.num_repeats < 1:
+                polymer_paths, cg_map = self.build_and_parameterize_short_polymer(
+                    self.num_units, output_dir=output_dir
+                )
+            else:
+                polymer_paths = self._build_long_polymer(output_dir)
+        except Exception as e:
+            self._record_failure(e)
+            raise
         cache_key = self._generate_polymer_cache_key(
             self.monomer_smiles, self.actual_num_units
         )
@@ -349,7 +400,7 @@ class PolymerGeneratorWorkflow2(BaseWorkflow):
         self.num_repeats, self.actual_num_units = self._get_n_repeat()
 
     def check_short_polymer_cache(self):
-        cache_key = "_".join(self.monomer_smiles)
+        cache_key = get_monomer_list_key(self.monomer_smiles)
         if self.short_polymer_cache.has_key(cache_key):
             parameterised_short_polymer = self.short_polymer_cache.retrieve_object(
                 cache_key
@@ -411,7 +462,7 @@ class PolymerGeneratorWorkflow2(BaseWorkflow):
             length
         )
 
-        cache_key = "_".join(self.monomer_smiles)
+        cache_key = get_monomer_list_key(self.monomer_smiles)
         self.short_polymer_cache.store_object(
             cache_key, {"outputs": parameterised_files, "cg_map": short_cg_map}
         )
@@ -495,7 +546,7 @@ class PolymerGeneratorWorkflow2(BaseWorkflow):
         )
 
     def _generate_polymer_cache_key(self, monomer_smiles: List[str], num_units: int):
-        return "_".join(monomer_smiles) + "_" + str(num_units)
+        return get_polymer_key(monomer_smiles, num_units)
 
     def _get_itp_path(self, gro_path: str):
         return gro_path.replace(".gro", ".itp")
@@ -32,6 +32,7 @@ import time as time
 from abc import ABC, abstractmethod
 from modules.workflows.base_workflow import BaseWorkflow
 from modules.cache_store.pickle_cache import PickleCache
+from modules.rdkit.canonical_smiles import get_monomer_list_key, get_polymer_key
 from modules.rdkit.polymer_builders.base_polymer_generator import BasePolymerGenerator
 from modules.rdkit.polymer_builders.alternating_copolymer import (
     AlternatingPolymerGenerator,
@@ -93,7 +94,7 @@ class ReformattedPolymerWorkflow(BaseWorkflow):
         self.num_repeats, self.actual_num_units = self._get_n_repeat()
 
     def check_short_polymer_cache(self):
-        cache_key = "_".join(self.monomer_smiles)
+        cache_key = get_monomer_list_key(self.monomer_smiles)
         if self.short_polymer_cache.has_key(cache_key):
             parameterised_short_polymer = self.short_polymer_cache.retrieve_object(
                 cache_key
@@ -152,7 +153,7 @@ class ReformattedPolymerWorkflow(BaseWorkflow):
             length
         )
 
-        cache_key = "_".join(self.monomer_smiles)
+        cache_key = get_monomer_list_key(self.monomer_smiles)
         self.short_polymer_cache.store_object(
             cache_key, {"outputs": parameterised_files, "cg_map": short_cg_map}
         )
@@ -241,7 +242,7 @@ class ReformattedPolymerWorkflow(BaseWorkflow):
         )
 
     def _generate_polymer_cache_key(self, monomer_smiles: List[str], num_units: int):
-        return "_".join(monomer_smiles) + "_" + str(num_units)
+        return get_polymer_key(monomer_smiles, num_units)
 
     def _get_itp_path(self, gro_path: str):
         return gro_path.replace(".gro", ".itp")
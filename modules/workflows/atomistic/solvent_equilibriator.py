@@ -17,7 +17,7 @@ from config.paths import (
     LOG_DIR,
     PREPROCESSED_PACKMOL_DIR,
 )
-from typing import Optional
+from typing import Any, Dict, Optional
 import logging
 import os
 from config.data_models.output_types import GromacsPaths, GromacsOutputs
@@ -51,6 +51,11 @@ from modules.gromacs.equilibriation.full_equilibriation_workflow import (
 from config.mdp_workflow_config import solvent_workflow
 from modules.workflows.base_workflow import BaseWorkflow
 from modules.cache_store.solvent_cache import SolventCache
+from modules.cache_store.provenance import (
+    get_file_digest,
+    get_gromacs_version,
+    get_provenance_digest,
+)
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -93,10 +98,49 @@ class SolventEquilibriationWorkflow(BaseWorkflow):
         self.confirm_temp_dir_deletion = confirm_temp_dir_deletion
         self.parametizer = ACPYPEParameterizer(acpype_molecule_name="SVT")
 
-    def check_solvent_cache(self, temperature: float) -> Optional[GromacsOutputs]:
-        cache_key = self.solvent_cache.get_cache_key(
-            solvent=self.solvent, temperature=temperature
+    @staticmethod
+    def get_varying_params_list(
+        solvent: Solvent, temperature: float
+    ) -> List[Dict[str, Any]]:
+        """
+        Parameters of the thermal equilibration steps, which also key their MDP files.
+        """
+        return [{"temp": temperature, "compressibility": solvent.compressibility}]
+
+    @staticmethod
+    def get_provenance(
+        solvent: Solvent,
+        temperature: float,
+        workflow: FullEquilibrationWorkflow = solvent_workflow,
+    ) -> str:
+        """
+        Digest of everything an equilibrated box depends on besides its cache
+        key: the solvent's properties and PDB file, the ACPYPE settings it is
+        parameterised with, the equilibration steps and their MDP templates,
+        and the GROMACS version.
+        """
+        return get_provenance_digest(
+            solvent=[solvent.molecular_weight, solvent.density],
+            inputs=[get_file_digest(solvent.pdb_path)],
+            protocol=workflow.get_protocol(
+                SolventEquilibriationWorkflow.get_varying_params_list(
+                    solvent, temperature
+                )
+            ),
+            acpype=ACPYPEParameterizer.get_settings(),
+            gromacs=get_gromacs_version(),
         )
+
+    def _get_cache_key(self, temperature: float) -> str:
+        return self.solvent_cache.get_cache_key(
+            solvent=self.solvent,
+            temperature=temperature,
+            box_size_nm=self.box_size_nm,
+            provenance=self.get_provenance(self.solvent, temperature, self.workflow),
+        )
+
+    def check_solvent_cache(self, temperature: float) -> Optional[GromacsOutputs]:
+        cache_key = self._get_cache_key(temperature)
         if self.solvent_cache.has_key(cache_key):
             return self.solvent_cache.retrieve_object(cache_key)
         return None
@@ -135,9 +179,7 @@ class SolventEquilibriationWorkflow(BaseWorkflow):
         if outputs:
             return outputs
 
-        params = [
-            {"temp": temperature, "compressibility": self.solvent.compressibility}
-        ]
+        params = self.get_varying_params_list(self.solvent, temperature)
         gro_dir, output_paths = self.workflow.run(
             input_gro_path=gro_path,
             input_topol_path=top_path,
@@ -153,9 +195,7 @@ class SolventEquilibriationWorkflow(BaseWorkflow):
             save_intermediate_log=True,
         )
         output_paths.itp = itp_path
-        cache_key = self.solvent_cache.get_cache_key(
-            solvent=self.solvent, temperature=temperature
-        )
+        cache_key = self._get_cache_key(temperature)
         solvent_cache.store_object(cache_key, output_paths)
 
     def run(self):
@@ -277,7 +317,7 @@ class SolventEquilibriationWorkflow(BaseWorkflow):
         output_name: Optional[str] = None,
         parser: GromacsParser = GromacsParser(),
     ):
-        sections = parser.parse(input_itp_file)
+        sections = parser.parse(input_itp_file, lazy=True)
         if new_residue_name:
             moleculetype_section = sections["data_moleculetype"]
             moleculetype_section = rename_data_column_content(
@@ -309,7 +349,7 @@ class SolventEquilibriationWorkflow(BaseWorkflow):
         del_defaults: bool = True,
     ) -> str:
         residue_number = str(residue_number)
-        sections = parser.parse(input_top_file)
+        sections = parser.parse(input_top_file, lazy=True)
 
         sections = delete_all_include_sections(sections)
 
@@ -0,0 +1,174 @@
+from config.data_models.pipeline_stage import PipelineStage, StageKind
+from modules.campaign.core_budget import CoreAllocator, get_available_cores
+from modules.cache_store.cache_stats import CacheStatsDumper
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+class StageGraphExecutor:
+    """
+    Runs a graph of pipeline stages, starting every stage as soon as all of
+    its dependencies have finished. CPU stages and mdrun stages are run in
+    separate pools with their own concurrency limits, so the Python heavy
+    preparation of one job overlaps with the MD of others.
+
+    Both pools are thread pools: mdrun stages spend their time in GROMACS
+    subprocesses and release the GIL, while CPU stages hold it, which is why
+    `max_cpu_stages` defaults to 1.
+    """
+
+    def __init__(
+        self,
+        max_cpu_stages: int = 1,
+        max_mdrun_stages: Optional[int] = None,
+        cores_per_mdrun_stage: Optional[int] = None,
+        total_cores: Optional[int] = None,
+    ):
+        """
+        :param max_cpu_stages: Number of CPU stages allowed to run at once.
+        :param max_mdrun_stages: Number of mdrun stages allowed to run at once,
+            defaults to as many as fit in `total_cores`.
+        :param cores_per_mdrun_stage: If given, every mdrun stage is pinned to
+            its own block of this many cores via `mdrun_flags`.
+        :param total_cores: Cores shared by mdrun stages, defaults to the SLURM allocation.
+        """
+        self.total_cores = total_cores or get_available_cores()
+        self.cores_per_mdrun_stage = (
+            min(cores_per_mdrun_stage, self.total_cores)
+            if cores_per_mdrun_stage
+            else None
+        )
+        if max_mdrun_stages is None:
+            max_mdrun_stages = (
+                self.total_cores // self.cores_per_mdrun_stage
+                if self.cores_per_mdrun_stage
+                else 1
+            )
+        self.max_cpu_stages = max_cpu_stages
+        self.max_mdrun_stages = max_mdrun_stages
+
+    def _merge_stages(self, stages: List[PipelineStage]) -> Dict[str, PipelineStage]:
+        graph: Dict[str, PipelineStage] = {}
+        for stage in stages:
+            if stage.stage_id not in graph:
+                graph[stage.stage_id] = stage
+        for stage in graph.values():
+            for dependency in stage.depends_on:
+                if dependency not in graph:
+                    raise ValueError(
+                        f"Stage '{stage.stage_id}' depends on unknown stage '{dependency}'."
+                    )
+        self._check_acyclic(graph)
+        return graph
+
+    def _check_acyclic(self, graph: Dict[str, PipelineStage]):
+        visiting, visited = set(), set()
+
+        def visit(stage_id: str):
+            if stage_id in visited:
+                return
+            if stage_id in visiting:
+                raise ValueError(f"Stage graph has a cycle through '{stage_id}'.")
+            visiting.add(stage_id)
+            for dependency in graph[stage_id].depends_on:
+                visit(dependency)
+            visiting.remove(stage_id)
+            visited.add(stage_id)
+
+        for stage_id in graph:
+            visit(stage_id)
+
+    def run(
+        self,
+        stages: List[PipelineStage],
+        on_failure: Optional[Callable[[str, str], None]] = None,
+    ) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """
+        Runs all stages. A failed stage does not stop the graph, but every stage
+        downstream of it is skipped. The cache stats of the process are dumped
+        while the stages run.
+
+        :param stages: Stages to run, in any order.
+        :param on_failure: Called with the stage id and error message of every
+            stage that fails or is skipped.
+        :return: Results keyed by stage id, and error messages keyed by stage id.
+        """
+        graph = self._merge_stages(stages)
+        allocator = (
+            CoreAllocator(self.total_cores) if self.cores_per_mdrun_stage else None
+        )
+        results: Dict[str, Any] = {}
+        errors: Dict[str, str] = {}
+        pending = dict(graph)
+        running: Dict[Future, Tuple[PipelineStage, Any]] = {}
+
+        def fail(stage_id: str, message: str):
+            errors[stage_id] = message
+            logger.error(f"Stage {stage_id} failed: {message}")
+            if on_failure:
+                on_failure(stage_id, message)
+
+        with CacheStatsDumper(), ThreadPoolExecutor(
+            max_workers=self.max_cpu_stages, thread_name_prefix="cpu_stage"
+        ) as cpu_pool, ThreadPoolExecutor(
+            max_workers=self.max_mdrun_stages, thread_name_prefix="mdrun_stage"
+        ) as mdrun_pool:
+            while pending or running:
+                for stage_id, stage in list(pending.items()):
+                    failed_dependencies = [d for d in stage.depends_on if d in errors]
+                    if failed_dependencies:
+                        del pending[stage_id]
+                        fail(stage_id, f"Skipped, '{failed_dependencies[0]}' failed.")
+                        continue
+                    if not all(d in results for d in stage.depends_on):
+                        continue
+
+                    kwargs = dict(stage.kwargs)
+                    budget = None
+                    if stage.kind == StageKind.MDRUN:
+                        if self._num_running(running, StageKind.MDRUN) >= (
+                            self.max_mdrun_stages
+                        ):
+                            continue
+                        if allocator:
+                            budget = allocator.allocate(self.cores_per_mdrun_stage)
+                            if budget is None:
+                                continue
+                            kwargs["mdrun_flags"] = budget.to_mdrun_flags()
+                    elif self._num_running(running, StageKind.CPU) >= (
+                        self.max_cpu_stages
+                    ):
+                        continue
+
+                    pool = mdrun_pool if stage.kind == StageKind.MDRUN else cpu_pool
+                    args = [results[d] for d in stage.depends_on]
+                    logger.info(f"Starting {stage.kind.value} stage {stage_id}")
+                    future = pool.submit(stage.func, *args, **kwargs)
+                    running[future] = (stage, budget)
+                    del pending[stage_id]
+
+                if not running:
+                    continue
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, budget = running.pop(future)
+                    if budget is not None:
+                        allocator.release(budget)
+                    try:
+                        results[stage.stage_id] = future.result()
+                        logger.info(f"Stage {stage.stage_id} completed.")
+                    except Exception as e:
+                        fail(stage.stage_id, f"{type(e).__name__}: {e}")
+
+        return results, errors
+
+    @staticmethod
+    def _num_running(
+        running: Dict[Future, Tuple[PipelineStage, Any]], kind: StageKind
+    ) -> int:
+        return sum(1 for stage, _ in running.values() if stage.kind == kind)
@@ -9,9 +9,11 @@ from config.data_models.output_types import GromacsOutputs, GromacsPaths
 from config.mdp_workflow_config import minim_workflow, polymer_workflow
 from modules.workflows.base_workflow import BaseWorkflow
 from config.data_models.solvent import Solvent
-from config.paths import TEMP_DIR
+from config.data_models.pipeline_stage import PipelineStage, StageKind
+from config.paths import TEMP_DIR, LOG_DIR
 from modules.utils.shared.file_utils import delete_directory
-from typing import Any, Dict
+from typing import Any, Dict, Optional
+import functools
 import math
 import csv
 import logging
@@ -58,8 +60,20 @@ class JoinedAtomisticPolymerWorkflow(BaseWorkflow):
         cleanup_temp: bool = True,
         confirm_temp_deletion: bool = False,
         box_incriments: float = 5,
+        temp_dir: str = TEMP_DIR,
+        log_dir: str = LOG_DIR,
+        prepare_solvent_box: bool = True,
     ):
+        """
+        :param temp_dir: Scratch directory, give each job its own when running
+            several jobs through a stage graph in one process.
+        :param log_dir: Log directory, see `temp_dir`.
+        :param prepare_solvent_box: Create the solvent box on construction. Set
+            to False when the solvent box is created by a pipeline stage.
+        """
         self.solvent_smiles = solvent_smiles
+        self.temp_dir = temp_dir
+        self.log_dir = log_dir
         self.solvent = solvent
         self.cleanup_temp = cleanup_temp
         self.parameterised_polymer = parameterised_polymer
@@ -71,7 +85,7 @@ class JoinedAtomisticPolymerWorkflow(BaseWorkflow):
         self.cleanup = cleanup
         self.confirm_temp_deletion = confirm_temp_deletion
         self.polymer_res_name = polymer_res_name
-        self.solvent_box = self._get_solvent_box()
+        self.solvent_box = self._get_solvent_box() if prepare_solvent_box else None
 
         self.monomer_smiles = monomer_smiles
         self.output_dir = output_dir
@@ -86,6 +100,9 @@ class JoinedAtomisticPolymerWorkflow(BaseWorkflow):
 
     def _get_solvent_box(
         self,
+        temp_dir: Optional[str] = None,
+        log_dir: Optional[str] = None,
+        mdrun_flags: Optional[List[str]] = None,
     ):
         solvent_box = SolventEquilibriationWorkflow(
             solvent=self.solvent,
@@ -93,18 +110,29 @@ class JoinedAtomisticPolymerWorkflow(BaseWorkflow):
             box_size_nm=self.box_size_nm,
             temperature=self.temperature,
             confirm_temp_dir_deletion=False,
-        ).run()
+            temp_dir=temp_dir or self.temp_dir,
+            log_dir=log_dir or self.log_dir,
+        ).run(mdrun_flags=mdrun_flags)
         return solvent_box
 
     def _run_simulation(self) -> GromacsOutputs:
-        solvent_box = self._get_solvent_box()
+        if self.solvent_box is None:
+            self.solvent_box = self._get_solvent_box()
 
-        polymer_workflow = PolymerWorkflow(
+        polymer_workflow = self._build_polymer_workflow(self.solvent_box)
+        outputs = polymer_workflow.run()
+        final_output_dir = polymer_workflow.final_output_dir
+        return outputs, final_output_dir
+
+    def _build_polymer_workflow(
+        self, solvent_box: Optional[GromacsOutputs]
+    ) -> PolymerWorkflow:
+        return PolymerWorkflow(
             parameterised_polymer=self.parameterised_polymer,
             monomer_smiles=self.monomer_smiles,
             num_units=self.num_units,
             solvent=self.solvent,
-            solvent_box=self.solvent_box,
+            solvent_box=solvent_box,
             box_size_nm=self.box_size_nm,
             temperature=self.temperature,
             output_dir=self.output_dir,
@@ -118,17 +146,122 @@ class JoinedAtomisticPolymerWorkflow(BaseWorkflow):
             cleanup_log=True,
             cleanup_temp=False,
             confirm_temp_deletion=False,
+            temp_dir=self.temp_dir,
+            log_dir=self.log_dir,
+            solvent_provenance=SolventEquilibriationWorkflow.get_provenance(
+                self.solvent, self.parameterised_solvent, self.temperature
+            ),
         )
-        outputs = polymer_workflow.run()
+
+    def get_solvent_box_stage_id(self) -> str:
+        box_size_str = "_".join(map(str, self.box_size_nm))
+        return f"solvent_box:{self.solvent.name}_{self.solvent.compressibility}_{box_size_str}_{self.temperature}"
+
+    def get_stages(self, job_id: str) -> List[PipelineStage]:
+        """
+        Splits the workflow into stages for `StageGraphExecutor`: solvent box,
+        polymer insertion, minimisation, ion placement, equilibration and
+        analysis. The solvent box stage id only depends on the solvent, box size
+        and temperature, so jobs sharing a solvent box share the stage.
+
+        :param job_id: Prefix for this job's stage ids.
+        :return: The job's stages.
+        """
+        polymer_workflow = self._build_polymer_workflow(solvent_box=None)
         final_output_dir = polymer_workflow.final_output_dir
-        return outputs, final_output_dir
+
+        cached_outputs = polymer_workflow.check_polymer_cache(self.temperature)
+        if cached_outputs:
+            return [
+                PipelineStage(
+                    stage_id=f"{job_id}:analysis",
+                    func=functools.partial(
+                        self._analyse_and_record, cached_outputs, final_output_dir
+                    ),
+                )
+            ]
+
+        solvent_box = self.get_solvent_box_stage_id()
+        insertion = f"{job_id}:polymer_insertion"
+        minim_files = f"{job_id}:minimisation_files"
+        minimisation = f"{job_id}:minimisation"
+        ions = f"{job_id}:ion_placement"
+        equilibration = f"{job_id}:equilibration"
+        solvent_temp_dir = os.path.join(self.temp_dir, "solvent_box")
+        return [
+            PipelineStage(
+                stage_id=solvent_box,
+                func=self._get_solvent_box,
+                kind=StageKind.MDRUN,
+                kwargs={
+                    "temp_dir": solvent_temp_dir,
+                    "log_dir": os.path.join(self.log_dir, "solvent_box"),
+                },
+            ),
+            PipelineStage(
+                stage_id=insertion,
+                func=polymer_workflow.insert_polymer,
+                depends_on=[solvent_box],
+            ),
+            PipelineStage(
+                stage_id=minim_files,
+                func=polymer_workflow.prepare_minimisation_files,
+                depends_on=[solvent_box, insertion],
+            ),
+            PipelineStage(
+                stage_id=minimisation,
+                func=polymer_workflow.minimise,
+                kind=StageKind.MDRUN,
+                depends_on=[minim_files],
+            ),
+            PipelineStage(
+                stage_id=ions,
+                func=polymer_workflow.add_ions,
+                depends_on=[solvent_box, minim_files, minimisation],
+            ),
+            PipelineStage(
+                stage_id=equilibration,
+                func=functools.partial(
+                    self._equilibriate_stage, polymer_workflow
+                ),
+                kind=StageKind.MDRUN,
+                depends_on=[minim_files, ions],
+            ),
+            PipelineStage(
+                stage_id=f"{job_id}:analysis",
+                func=functools.partial(
+                    self._analyse_and_record, output_dir=final_output_dir
+                ),
+                depends_on=[equilibration],
+            ),
+        ]
+
+    def _equilibriate_stage(
+        self,
+        polymer_workflow: PolymerWorkflow,
+        initial_minim_files: GromacsPaths,
+        prepared_files: GromacsPaths,
+        mdrun_flags: Optional[List[str]] = None,
+    ) -> GromacsOutputs:
+        outputs = polymer_workflow.equilibriate(
+            initial_minim_files, prepared_files, mdrun_flags=mdrun_flags
+        )
+        return polymer_workflow.store_in_cache(outputs)
 
     def _get_min_box_size(self, box_incriments: float = 5):
-        if self.num_units <= 30:
-            box_width = self.standard_box_width
-        if self.num_units > 30:
-            end_to_end_length = self.num_units * self.average_bond_length
-            safe_size = end_to_end_length * self.safety_factor
+        return self.get_box_size(self.num_units, box_incriments=box_incriments)
+
+    @classmethod
+    def get_box_size(cls, num_units: int, box_incriments: float = 5) -> List[float]:
+        """
+        Box size (nm) used for a chain of `num_units` monomers, so callers can
+        size a job without constructing the workflow.
+        """
+        if num_units <= 30:
+            box_width = cls.standard_box_width
+        if num_units > 30:
+            end_to_end_length = num_units * cls.average_bond_length
+            safe_size = end_to_end_length * cls.safety_factor
             box_width = math.ceil(safe_size / box_incriments) * box_incriments
 
         return [box_width, box_width, box_width]
@@ -153,10 +286,13 @@ class JoinedAtomisticPolymerWorkflow(BaseWorkflow):
 
     def run(self) -> str:
         outputs, final_output_dir = self._run_simulation()
+        return self._analyse_and_record(outputs, final_output_dir)
+
+    def _analyse_and_record(self, outputs: GromacsOutputs, output_dir: str) -> str:
         Rg_mean, Rg_std, D, SASA_mean, SASA_std, E2E_mean, E2E_std = (
             self._analyse_outputs(
                 outputs=outputs,
-                output_dir=final_output_dir,
+                output_dir=output_dir,
                 temperature=self.temperature,
             )
         )
@@ -179,7 +315,7 @@ class JoinedAtomisticPolymerWorkflow(BaseWorkflow):
         csv = self._write_csv_row(row_data)
         if self.cleanup_temp:
             delete_directory(
-                TEMP_DIR, verbose=self.verbose, confirm=self.confirm_temp_deletion
+                self.temp_dir, verbose=self.verbose, confirm=self.confirm_temp_deletion
             )
 
         return csv
@@ -21,7 +21,9 @@ from modules.utils.shared.file_utils import (
     check_directory_exists,
 )
 from modules.gromacs.parsers.gromacs_parser import GromacsParser
+from modules.gromacs.parsers.topology import Topology
 from typing import Optional, Tuple, Dict
+import numpy as np
 import pandas as pd
 from modules.gromacs.parsers.handlers.data_handler import DataHandler
 import logging
@@ -35,7 +37,6 @@ from modules.utils.atomistic.file_utils import (
     replace_value_in_dataframe,
     create_includes_section,
     delete_all_include_sections,
-    add_full_rows_to_handler_deduplicate,
 )
 from modules.cache_store.equilibriated_atomistic_polymer_cache import (
     EquilibriatedAtomisticPolymerCache,
@@ -44,6 +45,13 @@ from modules.moltemplate.moltemplate_utils import (
     add_polymer_to_solvent,
 )
 from modules.utils.shared.file_utils import delete_directory
+from modules.campaign.runtime_predictor import record_runtime_history
+from modules.cache_store.provenance import (
+    get_file_digest,
+    get_gromacs_version,
+    get_provenance_digest,
+)
+from modules.acpype.acpype_parametizer import ACPYPEParameterizer
 import logging
 
 logger = logging.getLogger(__name__)
@@ -65,7 +73,7 @@ class PolymerWorkflow(BaseWorkflow):
         monomer_smiles: List[str],
         num_units: int,
         solvent: Solvent,
-        solvent_box: GromacsOutputs,
+        solvent_box: Optional[GromacsOutputs],
         box_size_nm: List[float],
         temperature: float,
         output_dir: str,
@@ -79,10 +87,18 @@ class PolymerWorkflow(BaseWorkflow):
         cleanup_log: bool = True,
         cleanup_temp: bool = True,
         confirm_temp_deletion: bool = True,
+        temp_dir: str = TEMP_DIR,
+        log_dir: str = LOG_DIR,
+        solvent_provenance: Optional[str] = None,
     ):
+        """
+        :param solvent_provenance: Provenance of the solvent box (see
+            `SolventEquilibriationWorkflow.get_provenance`), part of the cache key.
+        """
         super().__init__()
         self.verbose = verbose
         self.solvent = solvent
+        self.solvent_provenance = solvent_provenance
         self.output: Optional[GromacsOutputs] = None
         self.cache = cache
         self.polymer = None
@@ -104,8 +120,10 @@ class PolymerWorkflow(BaseWorkflow):
         self.subdir = self._retrieve_subdir_name(self.actual_num_units)
         self.final_output_dir = os.path.join(output_dir, self.subdir)
         self.solvent_box = solvent_box
-        check_directory_exists(TEMP_DIR, make_dirs=True)
-        check_directory_exists(LOG_DIR, make_dirs=True)
+        self.temp_dir = temp_dir
+        self.log_dir = log_dir
+        check_directory_exists(self.temp_dir, make_dirs=True)
+        check_directory_exists(self.log_dir, make_dirs=True)
         check_directory_exists(self.final_output_dir, make_dirs=True)
 
     def _retrieve_subdir_name(self, actual_num_units: int) -> str:
@@ -113,13 +131,73 @@ class PolymerWorkflow(BaseWorkflow):
         subdir = f"{self.solvent.name}_{self.solvent.compressibility}_{monomer_smiles_str}_{actual_num_units}"
         return subdir
 
-    def check_polymer_cache(self, temperature: float) -> Optional[GromacsOutputs]:
-        cache_key = self.cache.get_cache_key(
+    @classmethod
+    def get_provenance(
+        cls,
+        parameterised_polymer: GromacsPaths,
+        solvent: Solvent,
+        solvent_provenance: Optional[str],
+        temperature: float,
+        minim_workflow: FullEquilibrationWorkflow = minim_workflow,
+        full_workflow: FullEquilibrationWorkflow = polymer_workflow,
+        pos_ion_name: str = "NA",
+        neg_ion_name: str = "CL",
+        polymer_name: str = "POLY",
+    ) -> str:
+        """
+        Digest of everything an equilibrated polymer depends on besides its
+        cache key: the polymer's parameter files, the solvent box's provenance,
+        the minimisation and equilibration steps with their MDP templates, the
+        force field and ion settings, and the programs that run them.
+        """
+        return get_provenance_digest(
+            inputs=[
+                get_file_digest(parameterised_polymer.itp_path),
+                get_file_digest(parameterised_polymer.gro_path),
+                get_file_digest(parameterised_polymer.top_path),
+                get_file_digest(parameterised_polymer.posre_path),
+            ],
+            solvent=solvent_provenance,
+            protocol=[
+                minim_workflow.get_protocol([None]),
+                full_workflow.get_protocol(
+                    cls.get_varying_params_list(solvent, temperature)
+                ),
+            ],
+            settings={
+                "forcefield": cls.forcefield,
+                "ion_itp_file": cls.ion_itp_file,
+                "ions": [pos_ion_name, neg_ion_name],
+                "polymer_name": polymer_name,
+                "polymer_addition_cutoff": cls.polymer_addition_cutoff,
+                "saved_file_types": cls.saved_file_types,
+            },
+            acpype=ACPYPEParameterizer.get_settings(),
+            gromacs=get_gromacs_version(),
+        )
+
+    def _get_cache_key(self, temperature: float) -> str:
+        return self.cache.get_cache_key(
             solvent=self.solvent,
             monomer_smiles=self.monomer_smiles,
             num_units=self.num_units,
             temperature=temperature,
+            box_size_nm=self.box_size_nm,
+            provenance=self.get_provenance(
+                self.parameterised_polymer,
+                self.solvent,
+                self.solvent_provenance,
+                temperature,
+                minim_workflow=self.minim_workflow,
+                full_workflow=self.full_workflow,
+                pos_ion_name=self.pname,
+                neg_ion_name=self.nname,
+                polymer_name=self.polymer_name,
+            ),
         )
+
+    def check_polymer_cache(self, temperature: float) -> Optional[GromacsOutputs]:
+        cache_key = self._get_cache_key(temperature)
         if self.cache.has_key(cache_key):
             parameterised_polymer = self.cache.retrieve_object(cache_key)
             logging.info(f"Polymer retrieved from cache with key: {cache_key}")
@@ -131,47 +209,66 @@ class PolymerWorkflow(BaseWorkflow):
         output = self.check_polymer_cache(self.temperature)
         if output:
             self.output = output
+            return self.output
         logger.info(f"Polymer not found in cache, generating...")
         output = self._run_per_temp(self.temperature)
-        cache_key = self.cache.get_cache_key(
-            solvent=self.solvent,
-            monomer_smiles=self.monomer_smiles,
-            num_units=self.num_units,
-            temperature=self.temperature,
-        )
-        self.output = output
-        self.cache.store_object(key=cache_key, data=output)
+        self.store_in_cache(output)
 
+        record_runtime_history(self.log_dir)
         if self.cleanup_log:
-            delete_directory(LOG_DIR, verbose=self.verbose, confirm=False)
+            delete_directory(self.log_dir, verbose=self.verbose, confirm=False)
         if self.cleanup_temp:
             delete_directory(
-                TEMP_DIR, verbose=self.verbose, confirm=self.confirm_temp_deletion
+                self.temp_dir, verbose=self.verbose, confirm=self.confirm_temp_deletion
             )
         return self.output
 
     def _run_per_temp(self, temperature: float) -> GromacsOutputs:
         solvent_box = self.solvent_box
-        polymer_in_solvent = add_polymer_to_solvent(
+        polymer_in_solvent = self.insert_polymer(solvent_box)
+        initial_minim_files = self.prepare_minimisation_files(
+            solvent_box, polymer_in_solvent
+        )
+        minim_outputs = self.minimise(initial_minim_files)
+        prepared_files = self.add_ions(solvent_box, initial_minim_files, minim_outputs)
+        return self.equilibriate(
+            initial_minim_files, prepared_files, temperature=temperature
+        )
+
+    # The methods below are the individual stages of `_run_per_temp`, so that a
+    # stage graph executor can interleave them with other jobs.
+
+    def insert_polymer(self, solvent_box: GromacsOutputs) -> str:
+        return add_polymer_to_solvent(
             polymer_file=self.parameterised_polymer.gro_path,
             solvent_file=solvent_box.gro,
-            output_dir=TEMP_DIR,
+            output_dir=self.temp_dir,
             output_name=self.polymer_in_solvent_name,
             cutoff=self.polymer_addition_cutoff,
         )
-        initial_minim_files = self._prepare_solute_files(
+
+    def prepare_minimisation_files(
+        self, solvent_box: GromacsOutputs, polymer_in_solvent: str
+    ) -> GromacsPaths:
+        return self._prepare_solute_files(
             solute_itp_file=self.parameterised_polymer.itp_path,
             solvent_itp_file=solvent_box.itp,
             solvent_box_gro_file=polymer_in_solvent,
             input_top_file=self.parameterised_polymer.top_path,
-            output_dir=TEMP_DIR,
+            output_dir=self.temp_dir,
         )
+
+    def minimise(
+        self,
+        initial_minim_files: GromacsPaths,
+        mdrun_flags: Optional[List[str]] = None,
+    ) -> GromacsOutputs:
         _, outputs = self.minim_workflow.run(
             input_gro_path=initial_minim_files.gro_path,
             input_topol_path=initial_minim_files.top_path,
-            main_output_dir=TEMP_DIR,
-            temp_output_dir=TEMP_DIR,
-            log_dir=LOG_DIR,
+            main_output_dir=self.temp_dir,
+            temp_output_dir=self.temp_dir,
+            log_dir=self.log_dir,
             varying_params_list=[None],
             files_to_keep=["gro", "tpr"],
             save_intermediate_edr=True,
@@ -180,30 +277,48 @@ class PolymerWorkflow(BaseWorkflow):
             subdir=EQUILIBRIATED_OUTPUTS_SUBDIR,
             verbose=self.verbose,
             file_name_override="initial_minim",
+            mdrun_flags=mdrun_flags,
         )
+        return outputs
+
+    def add_ions(
+        self,
+        solvent_box: GromacsOutputs,
+        initial_minim_files: GromacsPaths,
+        minim_outputs: GromacsOutputs,
+    ) -> GromacsPaths:
         neutralised_gro = GenIon().run(
-            input_box_gro_path=outputs.gro,
-            tpr_path=outputs.tpr,
+            input_box_gro_path=minim_outputs.gro,
+            tpr_path=minim_outputs.tpr,
             top_path=initial_minim_files.top_path,
             pname=self.pname,
             nname=self.nname,
-            output_dir=TEMP_DIR,
+            output_dir=self.temp_dir,
         )
 
-        prepared_files = self._prepare_solute_files(
+        return self._prepare_solute_files(
             solute_itp_file=self.parameterised_polymer.itp_path,
             solvent_itp_file=solvent_box.itp,
             solvent_box_gro_file=neutralised_gro,
             input_top_file=self.parameterised_polymer.top_path,
-            output_dir=TEMP_DIR,
+            output_dir=self.temp_dir,
         )
+
+    def equilibriate(
+        self,
+        initial_minim_files: GromacsPaths,
+        prepared_files: GromacsPaths,
+        temperature: Optional[float] = None,
+        mdrun_flags: Optional[List[str]] = None,
+    ) -> GromacsOutputs:
+        temperature = temperature if temperature is not None else self.temperature
         varying_params_list = self._create_varying_params_list(temperature)
         _, outputs = self.full_workflow.run(
             input_gro_path=prepared_files.gro_path,
             input_topol_path=prepared_files.top_path,
-            temp_output_dir=TEMP_DIR,
+            temp_output_dir=self.temp_dir,
             main_output_dir=self.final_output_dir,
-            log_dir=LOG_DIR,
+            log_dir=self.log_dir,
             files_to_keep=self.saved_file_types,
             save_intermediate_edr=True,
             save_intermediate_gro=True,
@@ -211,6 +326,7 @@ class PolymerWorkflow(BaseWorkflow):
             subdir=EQUILIBRIATED_OUTPUTS_SUBDIR,
             verbose=self.verbose,
             varying_params_list=varying_params_list,
+            mdrun_flags=mdrun_flags,
         )
         topol_file = copy_file(
             initial_minim_files.top_path, self.final_output_dir, skip_if_exists=True
@@ -219,11 +335,26 @@ class PolymerWorkflow(BaseWorkflow):
 
         return outputs
 
+    def store_in_cache(self, outputs: GromacsOutputs) -> GromacsOutputs:
+        cache_key = self._get_cache_key(self.temperature)
+        self.output = outputs
+        self.cache.store_object(key=cache_key, data=outputs)
+        return outputs
+
     def _create_varying_params_list(self, temperature: float) -> List[Dict[str, str]]:
+        return self.get_varying_params_list(self.solvent, temperature)
+
+    @staticmethod
+    def get_varying_params_list(
+        solvent: Solvent, temperature: float
+    ) -> List[Dict[str, str]]:
+        """
+        Parameters of the thermal equilibration steps, which also key their MDP files.
+        """
         return [
             {
                 "temp": str(temperature),
-                "compressibility": str(self.solvent.compressibility),
+                "compressibility": str(solvent.compressibility),
             }
         ]
 
@@ -296,48 +427,35 @@ class PolymerWorkflow(BaseWorkflow):
         output_dir: Optional[str] = None,
         output_name: Optional[str] = None,
         parser: GromacsParser = GromacsParser(),
-        data_handler: DataHandler = DataHandler,
-    ) -> Tuple[str, pd.DataFrame]:
-        data_handler = data_handler()
-
-        solvent_sections = parser.parse(solvent_itp_file)
-        atoms_sections = solvent_sections["data_atomtypes"]
-        data_handler.process(atoms_sections)
-        atom_content = data_handler.content
-        solvent_sections.pop("data_atomtypes")
+    ) -> Tuple[str, np.ndarray]:
+        solvent_topology = Topology.from_file(
+            solvent_itp_file, section_names=["atomtypes"], parser=parser
+        )
+        solvent_atomtypes = solvent_topology.pop_table("atomtypes")
         output_itp_path = prepare_output_file_path(
             solvent_itp_file, "itp", output_dir, output_name
         )
-        output_itp_path = parser.export(solvent_sections, output_itp_path)
-        return output_itp_path, atom_content
+        output_itp_path = solvent_topology.export(output_itp_path, parser=parser)
+        return output_itp_path, solvent_atomtypes
 
     def _process_solute_itp(
         self,
         solute_itp_file: str,
-        solvent_atomtype_data: pd.DataFrame,
+        solvent_atomtypes: np.ndarray,
         output_dir: Optional[str] = None,
         output_name: Optional[str] = None,
         parser: GromacsParser = GromacsParser(),
-        data_handler: DataHandler = DataHandler,
     ) -> str:
-        data_handler = data_handler()
-        solute_sections = parser.parse(solute_itp_file)
-        atoms_sections = solute_sections["data_atomtypes"]
-
-        data_handler.process(atoms_sections)
-        data_handler = add_full_rows_to_handler_deduplicate(
-            data_handler,
-            solvent_atomtype_data,
-            add_to_top=False,
-            deduplicate_column="name",
+        # Solvent atomtypes are added after the solute's, once per name
+        solute_topology = Topology.from_file(
+            solute_itp_file, section_names=["atomtypes"], parser=parser
         )
-        atoms_sections = data_handler.export()
-        solute_sections["data_atomtypes"] = atoms_sections
+        solute_topology.merge_atomtypes(solvent_atomtypes)
 
         output_itp_path = prepare_output_file_path(
             solute_itp_file, "itp", output_dir, output_name
         )
-        output_itp_path = parser.export(solute_sections, output_itp_path)
+        output_itp_path = solute_topology.export(output_itp_path, parser=parser)
         return output_itp_path
 
     def _process_solute_and_solvent_itps(
@@ -350,12 +468,12 @@ class PolymerWorkflow(BaseWorkflow):
         parser: GromacsParser = GromacsParser(),
         data_handler: DataHandler = DataHandler,
     ) -> Tuple[str, str]:
-        output_solvent_itp, solvent_atom_data = self._process_solvent_itp(
+        output_solvent_itp, solvent_atomtypes = self._process_solvent_itp(
             solvent_itp_file, output_dir, solvent_output_name, parser=parser
         )
         output_solute_itp = self._process_solute_itp(
             solute_itp_file,
-            solvent_atom_data,
+            solvent_atomtypes,
             output_dir=output_dir,
             output_name=solute_output_name,
             parser=parser,
@@ -378,7 +496,7 @@ class PolymerWorkflow(BaseWorkflow):
         del_defaults: bool = True,
     ):
 
-        sections = parser.parse(input_top_file)
+        sections = parser.parse(input_top_file, lazy=True)
 
         sections = delete_all_include_sections(sections)
 
@@ -3,6 +3,7 @@ from modules.utils.shared.file_utils import (
     prepare_output_file_path,
     delete_directory,
     check_directory_exists,
+    move_file_atomically,
 )
 from modules.file_conversion.converters.obabel_pdb_to_mol2_converter import (
     OBabelPDBtoMOL2Converter,
@@ -17,7 +18,7 @@ from config.paths import (
     LOG_DIR,
     PREPROCESSED_PACKMOL_DIR,
 )
-from typing import Optional
+from typing import Any, Dict, Optional
 import logging
 import os
 from config.data_models.output_types import GromacsPaths, GromacsOutputs
@@ -47,6 +48,12 @@ from modules.gromacs.equilibriation.full_equilibriation_workflow import (
 from config.mdp_workflow_config import solvent_workflow
 from modules.workflows.base_workflow import BaseWorkflow
 from modules.cache_store.solvent_cache import SolventCache
+from modules.cache_store.provenance import (
+    get_file_digest,
+    get_gromacs_version,
+    get_provenance_digest,
+)
+from modules.campaign.runtime_predictor import record_runtime_history
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -71,37 +78,118 @@ class SolventEquilibriationWorkflow(BaseWorkflow):
         solvent_cache: SolventCache = solvent_cache,
         packmol_solvent_cache: PickleCache = packmol_solvent_cache,
         verbose: bool = True,
+        temp_dir: str = TEMP_DIR,
+        log_dir: str = LOG_DIR,
     ):
         self.parameterised_files = parameterised_solvent
-        check_directory_exists(TEMP_DIR, make_dirs=True)
-        check_directory_exists(LOG_DIR, make_dirs=True)
+        self.temp_dir = temp_dir
+        self.log_dir = log_dir
+        check_directory_exists(self.temp_dir, make_dirs=True)
+        check_directory_exists(self.log_dir, make_dirs=True)
         self.solvent_cache = solvent_cache
         self.packmol_solvent_cache = packmol_solvent_cache
         self.solvent = solvent
         self.box_size_nm = box_size_nm
         self.temperature = temperature
         self.workflow = workflow
-        self.subdir = solvent.name
+        # Boxes of each size have their own outputs, as they are cached separately
+        self.subdir = f"{solvent.name}_{self.get_box_size_str(box_size_nm)}"
         self.output_dir = os.path.join(output_dir, self.subdir)
         check_directory_exists(self.output_dir, make_dirs=True)
         self.cleanup = cleanup
         self.verbose = verbose
         self.confirm_temp_dir_deletion = confirm_temp_dir_deletion
 
-    def check_solvent_cache(self, temperature: float) -> Optional[GromacsOutputs]:
-        cache_key = self.solvent_cache.get_cache_key(
-            solvent=self.solvent, temperature=temperature
+    @staticmethod
+    def get_provenance(
+        solvent: Solvent,
+        parameterised_solvent: GromacsPaths,
+        temperature: float,
+        workflow: FullEquilibrationWorkflow = solvent_workflow,
+    ) -> str:
+        """
+        Digest of everything an equilibrated box depends on besides its cache
+        key: the solvent's properties and parameter files, the equilibration
+        steps and their MDP templates, and the programs that run them.
+        """
+        return get_provenance_digest(
+            solvent=[solvent.molecular_weight, solvent.density],
+            inputs=[
+                get_file_digest(parameterised_solvent.itp_path),
+                get_file_digest(parameterised_solvent.gro_path),
+                get_file_digest(parameterised_solvent.top_path),
+            ],
+            protocol=workflow.get_protocol(
+                SolventEquilibriationWorkflow.get_varying_params_list(
+                    solvent, temperature
+                )
+            ),
+            gromacs=get_gromacs_version(),
         )
+
+    @staticmethod
+    def get_cache_key(
+        solvent: Solvent,
+        parameterised_solvent: GromacsPaths,
+        box_size_nm: List[float],
+        temperature: float,
+        workflow: FullEquilibrationWorkflow = solvent_workflow,
+        solvent_cache: SolventCache = solvent_cache,
+    ) -> str:
+        """
+        Key the equilibrated box is cached under, so callers can look it up
+        without constructing the workflow.
+        """
+        return solvent_cache.get_cache_key(
+            solvent=solvent,
+            temperature=temperature,
+            box_size_nm=box_size_nm,
+            provenance=SolventEquilibriationWorkflow.get_provenance(
+                solvent, parameterised_solvent, temperature, workflow
+            ),
+        )
+
+    def _get_cache_key(self, temperature: float) -> str:
+        return self.get_cache_key(
+            self.solvent,
+            self.parameterised_files,
+            self.box_size_nm,
+            temperature,
+            workflow=self.workflow,
+            solvent_cache=self.solvent_cache,
+        )
+
+    def check_solvent_cache(self, temperature: float) -> Optional[GromacsOutputs]:
+        cache_key = self._get_cache_key(temperature)
         if self.solvent_cache.has_key(cache_key):
             return self.solvent_cache.retrieve_object(cache_key)
         return None
 
     def _get_packmol_cache_key(self) -> str:
-        solvent_name = self.solvent.name
-        compressibility = self.solvent.compressibility
-        box_size_str = "_".join(map(str, self.box_size_nm))
-
-        return f"{solvent_name}_{compressibility}_{box_size_str}"
+        return self.get_packmol_cache_key(self.solvent, self.box_size_nm)
+
+    @staticmethod
+    def get_packmol_cache_key(solvent: Solvent, box_size_nm: List[float]) -> str:
+        """
+        Key the unequilibrated Packmol box of `solvent` is cached under, so
+        callers can look it up without constructing the workflow.
+        """
+        box_size_str = SolventEquilibriationWorkflow.get_box_size_str(box_size_nm)
+
+        return f"{solvent.name}_{solvent.compressibility}_{box_size_str}"
+
+    @staticmethod
+    def get_box_size_str(box_size_nm: List[float]) -> str:
+        return "_".join(map(str, box_size_nm))
+
+    @staticmethod
+    def get_varying_params_list(
+        solvent: Solvent, temperature: float
+    ) -> List[Dict[str, Any]]:
+        """
+        Parameters of the thermal equilibration steps, which also key their MDP files.
+        """
+        return [{"temp": temperature, "compressibility": solvent.compressibility}]
 
     def check_packmol_cache(self) -> Optional[str]:
         cache_key = self._get_packmol_cache_key()
@@ -110,7 +198,12 @@ class SolventEquilibriationWorkflow(BaseWorkflow):
         return None
 
     def _equilibriate(
-        self, gro_path: str, top_path: str, temperature: float, itp_path: str
+        self,
+        gro_path: str,
+        top_path: str,
+        temperature: float,
+        itp_path: str,
+        mdrun_flags: Optional[List[str]] = None,
     ) -> Optional[GromacsOutputs]:
         check_file_type(gro_path, "gro")
         check_file_type(top_path, "top")
@@ -119,15 +212,13 @@ class SolventEquilibriationWorkflow(BaseWorkflow):
         if outputs:
             return outputs
 
-        params = [
-            {"temp": temperature, "compressibility": self.solvent.compressibility}
-        ]
+        params = self.get_varying_params_list(self.solvent, temperature)
         gro_dir, output_paths = self.workflow.run(
             input_gro_path=gro_path,
             input_topol_path=top_path,
             main_output_dir=self.output_dir,
-            temp_output_dir=TEMP_DIR,
-            log_dir=LOG_DIR,
+            temp_output_dir=self.temp_dir,
+            log_dir=self.log_dir,
             varying_params_list=params,
             files_to_keep=self.saved_file_types,
             subdir=EQUILIBRIATED_OUTPUTS_SUBDIR,
@@ -135,15 +226,33 @@ class SolventEquilibriationWorkflow(BaseWorkflow):
             save_intermediate_edr=True,
             save_intermediate_gro=True,
             save_intermediate_log=True,
+            mdrun_flags=mdrun_flags,
         )
         output_paths.itp = itp_path
-        cache_key = self.solvent_cache.get_cache_key(
-            solvent=self.solvent, temperature=temperature
-        )
-        solvent_cache.store_object(cache_key, output_paths)
+        cache_key = self._get_cache_key(temperature)
+        self.solvent_cache.store_object(cache_key, output_paths)
         return output_paths
 
-    def run(self) -> GromacsOutputs:
+    def run(self, mdrun_flags: Optional[List[str]] = None) -> GromacsOutputs:
+        # Boxes prefetched for the campaign are only read back
+        cached_outputs = self.check_solvent_cache(self.temperature)
+        if cached_outputs:
+            logger.info(f"Solvent box for {self.solvent.name} retrieved from cache")
+            return cached_outputs
+
+        return self.equilibriate_prepared_files(
+            self.prepare_files(), mdrun_flags=mdrun_flags
+        )
+
+    def prepare_files(self) -> GromacsPaths:
+        """
+        Builds the Packmol box, unless cached, and writes the solvent files the
+        equilibration starts from. These only depend on the solvent and box
+        size, so boxes of several temperatures can be equilibrated from them.
+
+        :return: Solvent .itp (in the output directory), .gro and .top (in the
+            temp directory).
+        """
         parameterised_files = self.parameterised_files
         solvent_box_gro = self.check_packmol_cache()
         if not solvent_box_gro:
@@ -152,6 +261,7 @@ class SolventEquilibriationWorkflow(BaseWorkflow):
                 PREPROCESSED_PACKMOL_DIR,
                 self.box_size_nm,
                 self.solvent,
+                temp_dir=self.temp_dir,
             )
             self.packmol_solvent_cache.store_object(
                 self._get_packmol_cache_key(), solvent_box_gro
@@ -163,22 +273,39 @@ class SolventEquilibriationWorkflow(BaseWorkflow):
             parameterised_files.top_path,
             new_residue_name=self.solvent.pdb_molecule_name,
             output_itp_dir=self.output_dir,
-            output_gro_dir=TEMP_DIR,
-            output_topol_dir=TEMP_DIR,
+            output_gro_dir=self.temp_dir,
+            output_topol_dir=self.temp_dir,
             output_itp_name=self.itp_name,
         )
+        return reformatted_files
+
+    def equilibriate_prepared_files(
+        self,
+        prepared_files: GromacsPaths,
+        mdrun_flags: Optional[List[str]] = None,
+    ) -> GromacsOutputs:
+        """
+        Equilibrates the box at this workflow's temperature and caches it.
+
+        :param prepared_files: Output of `prepare_files`, possibly of another
+            workflow of the same solvent and box size.
+        """
         output_paths = self._equilibriate(
-            gro_path=reformatted_files.gro_path,
-            top_path=reformatted_files.top_path,
+            gro_path=prepared_files.gro_path,
+            top_path=prepared_files.top_path,
             temperature=self.temperature,
-            itp_path=reformatted_files.itp_path,
+            itp_path=prepared_files.itp_path,
+            mdrun_flags=mdrun_flags,
         )
 
+        record_runtime_history(self.log_dir)
         if self.cleanup:
             delete_directory(
-                TEMP_DIR, verbose=self.verbose, confirm=self.confirm_temp_dir_deletion
+                self.temp_dir,
+                verbose=self.verbose,
+                confirm=self.confirm_temp_dir_deletion,
             )
-            delete_directory(LOG_DIR, verbose=self.verbose, confirm=False)
+            delete_directory(self.log_dir, verbose=self.verbose, confirm=False)
 
         return output_paths
 
@@ -247,7 +374,7 @@ class SolventEquilibriationWorkflow(BaseWorkflow):
         output_name: Optional[str] = None,
         parser: GromacsParser = GromacsParser(),
     ):
-        sections = parser.parse(input_itp_file)
+        sections = parser.parse(input_itp_file, lazy=True)
         if new_residue_name:
             moleculetype_section = sections["data_moleculetype"]
             moleculetype_section = rename_data_column_content(
@@ -262,8 +389,11 @@ class SolventEquilibriationWorkflow(BaseWorkflow):
         output_itp_path = prepare_output_file_path(
             input_itp_file, "itp", output_dir, output_name
         )
-        output_itp_path = parser.export(sections, output_itp_path)
-        return output_itp_path
+        # Written in the temp directory and moved into place, as workflows of
+        # other temperatures may be reading the same .itp
+        temp_itp_path = os.path.join(self.temp_dir, os.path.basename(output_itp_path))
+        parser.export(sections, temp_itp_path)
+        return move_file_atomically(temp_itp_path, os.path.dirname(output_itp_path))
 
     def _prepare_solvent_topol(
         self,
@@ -279,7 +409,7 @@ class SolventEquilibriationWorkflow(BaseWorkflow):
         del_defaults: bool = True,
     ) -> str:
         residue_number = str(residue_number)
-        sections = parser.parse(input_top_file)
+        sections = parser.parse(input_top_file, lazy=True)
 
         sections = delete_all_include_sections(sections)
 
@@ -320,8 +450,11 @@ class SolventEquilibriationWorkflow(BaseWorkflow):
 
         return output_path
 
-    def _prepare_solvent_box_name(self, solvent: Solvent, extension: str):
-        return f"{solvent.name.lower()}_solvent_box.{extension}"
+    def _prepare_solvent_box_name(
+        self, solvent: Solvent, box_size_nm: List[float], extension: str
+    ):
+        box_size_str = self.get_box_size_str(box_size_nm)
+        return f"{solvent.name.lower()}_{box_size_str}_solvent_box.{extension}"
 
     def _create_solvent_box_gro(
         self,
@@ -337,7 +470,7 @@ class SolventEquilibriationWorkflow(BaseWorkflow):
     ) -> str:
         output_pdb = gro_to_pdb_converter.run(input_gro_file, temp_dir)
         if not output_name:
-            output_name = self._prepare_solvent_box_name(solvent, "gro")
+            output_name = self._prepare_solvent_box_name(solvent, box_size_nm, "gro")
 
         packmol_output = packmol_operation.run(
             output_pdb,
@@ -347,6 +480,7 @@ class SolventEquilibriationWorkflow(BaseWorkflow):
         )
 
         output_gro = pdb_to_gro_converter.run(
-            packmol_output, output_dir, box_size_nm=box_size_nm, output_name=output_name
+            packmol_output, temp_dir, box_size_nm=box_size_nm, output_name=output_name
         )
-        return output_gro
+        # Workflows of other temperatures may build and read the same box
+        return move_file_atomically(output_gro, output_dir)
@@ -1,4 +1,6 @@
 from modules.workflows.separated.parametiser.polymer import PolymerParametiser
+from modules.cache_store.failure_cache import KnownFailureError
+from modules.rdkit.canonical_smiles import canonicalise_smiles
 import itertools
 from typing import List
 <<<<<<< HEAD
@@ -6,7 +8,9 @@ import logging
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 =======
+import logging
 
+logger = logging.getLogger(__name__)
 >>>>>>> 91758eb (cleaned up)
 
 class PolymerListParametiser:
@@ -14,6 +18,8 @@ class PolymerListParametiser:
         self, full_smiles_list: list, output_dir: str, num_units_list: List[int]
     ):
         self.full_smiles_list = full_smiles_list
+        # Warms the canonical SMILES the parametisers' cache keys are made of
+        canonicalise_smiles(full_smiles_list)
         self.output_dir = output_dir
         self.num_units_list = num_units_list
         self.monomer_list_combinations = self._generate_combinations()
@@ -49,6 +55,8 @@ class PolymerListParametiser:
                     )
                     generator.run()
 
+                except KnownFailureError as e:
+                    logger.info(f"Skipping {monomer_list}: {e}")
                 except ValueError as e:
                     logger.error(f"ValueError in {monomer_list}: {e}")
                 except Exception as e:
@@ -59,5 +67,8 @@ class PolymerListParametiser:
                     num_units=num_units,
                     output_dir=self.output_dir,
                 )
-                generator.run()
+                try:
+                    generator.run()
+                except KnownFailureError as e:
+                    logger.info(f"Skipping {monomer_list}: {e}")
 >>>>>>> 91758eb (cleaned up)
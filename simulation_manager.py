@@ -3,11 +3,49 @@ import itertools
 import logging
 import os
 import pandas as pd
-from typing import List, Tuple
+from typing import Dict, Iterable, Iterator, List, Tuple
 from modules.workflows.atomistic.joined_workflow import JoinedAtomisticPolymerWorkflow
-import random
-import multiprocessing
-import json
+from config.data_models.scheduled_job import ScheduledJob
+from modules.campaign.parallel_executor import CoreBudgetedExecutor
+from modules.campaign.job_ledger import JobLedger, JobState
+from modules.campaign.combination_stream import CombinationStream
+from modules.campaign.queue_worker import QueueWorker
+from modules.campaign.core_budget import (
+    count_atoms_from_smiles,
+    estimate_core_count,
+    estimate_system_atom_count,
+    get_available_cores,
+    molecular_weight_from_smiles,
+)
+from modules.campaign.runtime_predictor import RuntimePredictor, get_runtime_predictor
+from modules.campaign.campaign_planner import (
+    forecast_equilibriated_polymer,
+    forecast_polymer_generation,
+    forecast_solvent_box,
+    get_cached_parameterised_polymer,
+    log_plan,
+    write_plan_csv,
+)
+from modules.workflows.atomistic.joined_workflow import (
+    equiibriated_atomistic_polymer_cache as atomistic_polymer_cache,
+)
+from modules.workflows.atomistic.polymer_equilibriator import (
+    PolymerEquilibriationWorkflow,
+)
+from modules.workflows.atomistic.solvent_equilibriator import (
+    SolventEquilibriationWorkflow,
+    packmol_solvent_cache as atomistic_packmol_solvent_cache,
+    solvent_cache as atomistic_solvent_cache,
+)
+from modules.rdkit.solvent_generator import SolventGenerator
+from modules.acpype.acpype_parametizer import ACPYPEParameterizer
+from modules.cache_store.failure_cache import KnownFailureError, failure_cache
+from modules.rdkit.canonical_smiles import canonicalise_smiles
+from modules.cache_store.provenance import get_gromacs_version, get_provenance_digest
+from config.data_models.campaign_plan import JobPlan, StageForecast
+from config.data_models.solvent import Solvent
+from config.mdp_workflow_config import minim_workflow, polymer_workflow
+from typing import Optional
 
 
 # Set up logging
@@ -15,11 +53,47 @@ import json
 from modules.directory_parser.polymer_directory_parser import PolymerDirectoryParser
 from modules.directory_parser.solvent_directory_parser import SolventDirectoryParser
 from modules.workflows.separated.gromacs.joined import JoinedAtomisticPolymerWorkflow
+from modules.workflows.separated.gromacs.polymer import PolymerWorkflow
+from modules.workflows.separated.gromacs.solvent import SolventEquilibriationWorkflow
 from modules.utils.shared.file_utils import check_directory_exists
+from modules.cache_store.failure_cache import KnownFailureError, failure_cache
+from modules.rdkit.canonical_smiles import canonicalise_smiles
+from config.data_models.output_types import GromacsPaths
+from config.data_models.scheduled_job import ScheduledJob
+from config.data_models.solvent import Solvent
+from modules.campaign.parallel_executor import CoreBudgetedExecutor
+from modules.workflows.pipeline.stage_graph_executor import StageGraphExecutor
+from modules.campaign.solvent_prefetch import (
+    collect_solvent_boxes,
+    get_solvent_box_key,
+    prefetch_solvent_boxes,
+)
+from modules.campaign.sharding import (
+    atom_count_cost,
+    get_shard_from_env,
+    job_cost,
+    select_shard,
+)
+from modules.campaign.campaign_planner import (
+    forecast_equilibriated_polymer,
+    forecast_solvent_box,
+    log_plan,
+    write_plan_csv,
+)
+from config.data_models.campaign_plan import JobPlan
+from config.paths import TEMP_DIR, LOG_DIR
+from modules.campaign.core_budget import (
+    count_atoms_from_gro,
+    estimate_core_count,
+    estimate_system_atom_count,
+    get_available_cores,
+)
+from modules.campaign.runtime_predictor import RuntimePredictor, get_runtime_predictor
+from config.mdp_workflow_config import minim_workflow, polymer_workflow
 import logging
 import os
 import pandas as pd
-from typing import List
+from typing import Dict, List, Optional
 
 >>>>>>> 91758eb (cleaned up)
 logging.basicConfig(level=logging.INFO)
@@ -28,185 +102,506 @@ logger = logging.getLogger(__name__)
 
 <<<<<<< HEAD
 class PolymerSimulationManager:
-    error_file_path = "error.csv"
     random_seed = 42
+    # Jobs held by the executor at once, sorted longest-first
+    job_lookahead = 256
+    # Combinations checked against the ledger per query
+    ledger_chunk_size = 500
+
     def __init__(
         self,
         solvent_csv: str,
         monomer_smiles: List[str],
         output_dir: str,
         progress_file: str = "progress",
+        ledger_file: str = "job_ledger",
         csv_file_path: str = "outputs",
         num_units: List[int] = [5, 10, 20],
         temperatures: List[int] = [280, 298, 346],
+        total_cores: Optional[int] = None,
+        total_memory_gb: Optional[float] = None,
+        runtime_model_path: Optional[str] = None,
     ):
         """
         Initializes the simulation manager.
         :param solvent_csv: Path to the CSV file containing solvent properties.
         :param monomer_smiles: List of monomer SMILES strings.
         :param output_dir: Directory where results should be stored.
-        :param progress_file: File for tracking progress.
+        :param progress_file: Legacy progress CSV, its completed jobs are imported into the ledger.
+        :param ledger_file: SQLite job ledger tracking the state, errors and outputs of every job.
+        :param total_cores: Cores shared between concurrent jobs, defaults to the SLURM allocation.
+        :param total_memory_gb: Memory shared between concurrent jobs, defaults to the SLURM allocation.
+        :param runtime_model_path: Frozen runtime model to prioritise jobs with,
+            defaults to the current model (see `get_runtime_predictor`).
         """
+        self.total_cores = total_cores
+        self.total_memory_gb = total_memory_gb
+        self.runtime_predictor = (
+            RuntimePredictor.load(runtime_model_path)
+            if runtime_model_path
+            else get_runtime_predictor()
+        )
         self.solvent_df = pd.read_csv(solvent_csv)
         self.monomer_smiles = monomer_smiles
+        # Cache keys use canonical SMILES, canonicalise the campaign's monomers
+        # in one pass rather than once per job
+        canonicalise_smiles(monomer_smiles)
         self.num_units = num_units
         self.temperatures = temperatures
         self.output_dir = output_dir
         self.progress_file = f"{progress_file}.csv"
         self.csv_file_path = csv_file_path
-        self._initialise_progress_file()
-        self.completed_jobs = self._load_progress()
-
-    def _initialise_progress_file(self):
-        if not os.path.exists(self.progress_file):
-            pd.DataFrame(columns =["job_id"]).to_csv(self.progress_file, index = False)
-            logger.info(f"Created progress file at {self.progress_file}")
+        self.ledger = JobLedger(f"{ledger_file}.db")
+        self._import_legacy_progress()
 
-    def _load_progress(self):
+    def _import_legacy_progress(self):
         """
-        Load completed jobs from progress file to avoid re-running.
+        Carries completed jobs over from a progress CSV written before the ledger existed.
         """
-        if os.path.exists(self.progress_file):
-            try:
-                progress_df = pd.read_csv(self.progress_file)
-                return set(progress_df["job_id"].astype(str))
-            except Exception as e:
-                logger.error(f"Failed to read progress file {self.progress_file}:{e}")
-            return set()
-        return set()
+        if not os.path.exists(self.progress_file):
+            return
+        try:
+            progress_df = pd.read_csv(self.progress_file)
+            imported = self.ledger.import_completed_jobs(
+                progress_df["job_id"].astype(str)
+            )
+            logger.info(f"Imported {imported} completed jobs from {self.progress_file}")
+        except Exception as e:
+            logger.error(f"Failed to read progress file {self.progress_file}:{e}")
 
     def _save_progress(self, job_id: str):
         """
-        Save the completed job to progress file.
+        Marks a job as done in the ledger.
         """
-        progress_entry = pd.DataFrame([[job_id]], columns=["job_id"])
-        progress_entry.to_csv(self.progress_file, mode = "a", header = not os.path.exists(self.progress_file), index = False)
+        self.ledger.mark_done(job_id)
         logger.info(f"Progress saved for {job_id}")
 
     def _log_error(self, job_id: str, error_message: str):
-        error_entry = pd.DataFrame([[job_id, error_message]], columns=["Job ID", "Error"])
-        error_entry.to_csv(self.error_file_path, mode = "a", header = False, index = False)
-        
-
-    def _generate_combinations(self):
-        """
-        Generate all single-monomer, two-monomer, and three-monomer combinations with solvents.
-        """
-        
-        all_combinations = []
-        for num_units in self.num_units:
-            for temp in self.temperatures:
-                for _, solvent in self.solvent_df.iterrows():
-                    solvent_name = solvent["name"]
-                    solvent_smiles = solvent["SMILES"]
-                    solvent_compressibility = float(solvent["compressibility"])
-                    solvent_density = float(solvent["density"])
-
-                    # Single-monomer cases
-                    for monomer in self.monomer_smiles:
-                        all_combinations.append(
-                            (
-                                [monomer],
-                                solvent_name,
-                                solvent_smiles,
-                                solvent_density,
-                                solvent_compressibility,
-                                temp,
-                                num_units
-                            )
-                        )
+        self.ledger.mark_failed(job_id, error_message)
 
-                    # Two-monomer copolymers (order-independent, no duplicates)
-                    for monomer_pair in itertools.combinations(self.monomer_smiles, 2):
-                        all_combinations.append(
-                            (
-                                list(monomer_pair),
-                                solvent_name,
-                                solvent_smiles,
-                                solvent_density,
-                                solvent_compressibility,
-                                temp,
-                                num_units
-                            )
-                        )
+    def _mark_interrupted(self, job_id: str, message: str):
+        """
+        Marks a job stopped by the timeout or SIGTERM as resumable, the next run
+        continues it from its mdrun checkpoints.
+        """
+        self.ledger.mark_interrupted(job_id, message)
 
-                    # Three-monomer copolymers
-                    for monomer_triplet in itertools.combinations(self.monomer_smiles, 3):
-                        all_combinations.append(
-                            (
-                                list(monomer_triplet),
-                                solvent_name,
-                                solvent_smiles,
-                                solvent_density,
-                                solvent_compressibility,
-                                temp,
-                                num_units
-                            )
-                        )
 
-        return all_combinations
-    
-    def run(self, timeout=3200):
+    def _generate_combinations(self) -> CombinationStream:
         """
-        Iterates through all polymer-solvent-temperature combinations and executes the workflow.
-        Includes a timeout mechanism to avoid stuck simulations.
+        Lazily generates all single-monomer, two-monomer, and three-monomer
+        combinations with solvents, in a shuffled order that is the same on
+        every run of the campaign.
         """
-        self.completed_jobs = self._load_progress()
-        combinations = self._generate_combinations()
-        random.seed(self.random_seed)
-        random.shuffle(combinations)
+        solvents = [
+            (
+                solvent["name"],
+                solvent["SMILES"],
+                float(solvent["density"]),
+                float(solvent["compressibility"]),
+            )
+            for _, solvent in self.solvent_df.iterrows()
+        ]
+        return CombinationStream(
+            monomer_smiles=self.monomer_smiles,
+            solvents=solvents,
+            temperatures=self.temperatures,
+            num_units=self.num_units,
+            seed=self.random_seed,
+        )
 
-        for (
-            monomer_list,
-            solvent_name,
-            solvent_smiles,
-            solvent_density,
-            solvent_compressibility,
-            temp,
-            num_units
-        ) in combinations:
-            job_id = f"{'_'.join(monomer_list)}_{solvent_name}_{num_units}_{temp}"
+    def _estimate_atom_count(
+        self,
+        monomer_list: List[str],
+        solvent_smiles: str,
+        solvent_density: float,
+        num_units: int,
+    ) -> int:
+        """
+        Estimates the size of a job's solvated box, used to give it a core budget.
+        """
+        atoms_per_monomer = sum(
+            count_atoms_from_smiles(monomer) for monomer in monomer_list
+        ) / len(monomer_list)
+        return estimate_system_atom_count(
+            box_size_nm=JoinedAtomisticPolymerWorkflow.get_box_size(num_units),
+            solvent_density=solvent_density,
+            solvent_molecular_weight=molecular_weight_from_smiles(solvent_smiles),
+            atoms_per_solvent_molecule=count_atoms_from_smiles(solvent_smiles),
+            polymer_atom_count=int(atoms_per_monomer * num_units),
+        )
+
+    def _predict_runtime(self, atom_count: int, num_units: int) -> float:
+        """
+        Predicted wall time of a job in seconds, used to start and shard the
+        longest jobs first.
+        """
+        total_cores = self.total_cores or get_available_cores()
+        n_threads = estimate_core_count(
+            atom_count, total_cores=total_cores, min_cores=2
+        )
+        return self.runtime_predictor.predict_job(
+            [minim_workflow, polymer_workflow],
+            atom_count=atom_count,
+            n_threads=n_threads,
+            box_size_nm=JoinedAtomisticPolymerWorkflow.get_box_size(num_units),
+        )
 
-            if job_id in self.completed_jobs:
-                logger.info(f"Skipping {job_id}, already completed.")
-                continue
+    def _iter_pending(self, combinations: Iterable[Tuple]) -> Iterator[Tuple[str, Tuple]]:
+        """
+        Yields the job id and combination of every job the ledger has not
+        completed yet. Completed keys are looked up a chunk at a time, so
+        memory stays flat however large the campaign is. Jobs that failed, or
+        are running elsewhere, are skipped as well.
+        """
+        combinations = iter(combinations)
+        while True:
+            chunk = list(itertools.islice(combinations, self.ledger_chunk_size))
+            if not chunk:
+                return
+            job_ids = [
+                f"{'_'.join(monomer_list)}_{solvent_name}_{num_units}_{temp}"
+                for monomer_list, solvent_name, _, _, _, temp, num_units in chunk
+            ]
+            completed_jobs = self.ledger.filter_state(job_ids, JobState.DONE)
+            if completed_jobs:
+                logger.info(f"Skipping {len(completed_jobs)} already completed jobs.")
+            skipped_jobs = self.ledger.filter_states(
+                job_ids, [JobState.RUNNING, JobState.FAILED]
+            )
+            if skipped_jobs:
+                logger.info(f"Skipping {len(skipped_jobs)} running or failed jobs.")
+            skipped_jobs |= completed_jobs
+            for job_id, combination in zip(job_ids, chunk):
+                if job_id not in skipped_jobs:
+                    yield job_id, combination
 
-            try:
-                logger.info(f"Running simulation for: {job_id}")
+    @staticmethod
+    def _get_job_digest(
+        monomer_list,
+        solvent_name,
+        solvent_smiles,
+        solvent_density,
+        solvent_compressibility,
+        temp,
+        num_units,
+    ) -> str:
+        """
+        Digest of everything a job's result depends on, a known failure of the
+        job is only skipped while it is the same.
+        """
+        return get_provenance_digest(
+            inputs=[
+                list(monomer_list),
+                solvent_name,
+                solvent_smiles,
+                solvent_density,
+                solvent_compressibility,
+                temp,
+                num_units,
+            ],
+            protocol=[
+                minim_workflow.get_protocol([None]),
+                polymer_workflow.get_protocol([None]),
+            ],
+            acpype=ACPYPEParameterizer.get_settings(),
+            gromacs=get_gromacs_version(),
+        )
+
+    def _get_known_failures(self, chunk: List[Tuple[str, Tuple]]) -> Dict[str, str]:
+        """
+        Looks up, in one query, which jobs of a chunk failed before with the
+        same inputs or contain a rejected monomer.
+
+        :return: Error message of each job to skip, keyed by job id.
+        """
+        input_digests = {}
+        for job_id, combination in chunk:
+            input_digests[job_id] = self._get_job_digest(*combination)
+            input_digests.update(failure_cache.get_monomer_digests(combination[0]))
+        failures = failure_cache.get_failures(input_digests)
+
+        known_failures = {}
+        for job_id, combination in chunk:
+            failure_keys = [job_id, *failure_cache.get_monomer_digests(combination[0])]
+            for failure_key in failure_keys:
+                if failure_key in failures:
+                    known_failures[job_id] = str(KnownFailureError(failures[failure_key]))
+                    break
+        return known_failures
+
+    def _iter_jobs(self, combinations: Iterable[Tuple]) -> Iterator[ScheduledJob]:
+        """
+        Turns combinations into scheduled jobs as they are consumed, skipping
+        jobs the ledger has already completed, and submits them to the ledger
+        a chunk at a time. Jobs known to fail are marked failed straight away,
+        without starting a process for them.
+        """
+        pending = self._iter_pending(combinations)
+        while True:
+            chunk = list(itertools.islice(pending, self.ledger_chunk_size))
+            if not chunk:
+                return
+
+            known_failures = self._get_known_failures(chunk)
+            if known_failures:
+                logger.info(f"Skipping {len(known_failures)} jobs known to fail.")
+            jobs = []
+            for job_id, (
+                monomer_list,
+                solvent_name,
+                solvent_smiles,
+                solvent_density,
+                solvent_compressibility,
+                temp,
+                num_units
+            ) in chunk:
+                if job_id in known_failures:
+                    self._log_error(job_id=job_id, error_message=known_failures[job_id])
+                    continue
+                try:
+                    atom_count = self._estimate_atom_count(
+                        monomer_list, solvent_smiles, solvent_density, num_units
+                    )
+                    predicted_runtime_s = self._predict_runtime(atom_count, num_units)
+                except ValueError as e:
+                    error_message = f"ValueError in {job_id}: {e}"
+                    self._log_error(job_id=job_id, error_message=error_message)
+                    continue
 
-                # Run workflow in a separate process with a timeout
-                process = multiprocessing.Process(
-                    target=self._run_workflow, 
-                    args=(monomer_list, solvent_name, solvent_smiles, 
-                          solvent_density, solvent_compressibility, temp, num_units, job_id)
+                jobs.append(
+                    ScheduledJob(
+                        job_id=job_id,
+                        target=self._run_workflow,
+                        kwargs=dict(
+                            monomer_list=monomer_list,
+                            solvent_name=solvent_name,
+                            solvent_smiles=solvent_smiles,
+                            solvent_density=solvent_density,
+                            solvent_compressibility=solvent_compressibility,
+                            temp=temp,
+                            num_units=num_units,
+                            job_id=job_id,
+                        ),
+                        atom_count=atom_count,
+                        predicted_runtime_s=predicted_runtime_s,
+                    )
                 )
-                process.start()
-                process.join(timeout)  # Wait for workflow to complete or timeout
-                
-                if process.is_alive():
-                    logger.warning(f"Timeout exceeded for {job_id}, terminating process.")
-                    process.terminate()
-                    process.join()
-                    self._log_error(job_id=job_id, error_message="Simulation timed out.")
-
-                else:
-                    # Log progress if completed successfully
-                    self._save_progress(job_id)
 
-            except ValueError as e:
-                error_message = f"ValueError in {job_id}: {e}"
-                self._log_error(job_id=job_id, error_message=error_message)
-            except Exception as e:
-                error_message = f"Unexpected error in {job_id}: {e}"
-                self._log_error(job_id=job_id, error_message=error_message)
+            self.ledger.submit(
+                (job.job_id, job.predicted_runtime_s, self._get_job_payload(job))
+                for job in jobs
+            )
+            yield from jobs
+
+    @staticmethod
+    def _get_job_payload(job: ScheduledJob) -> Dict:
+        """
+        What a queue worker needs to rebuild the job, see `_make_job`.
+        """
+        kwargs = dict(job.kwargs)
+        kwargs["monomer_list"] = list(kwargs["monomer_list"])
+        return {
+            "kwargs": kwargs,
+            "atom_count": job.atom_count,
+            "predicted_runtime_s": job.predicted_runtime_s,
+        }
+
+    def _make_job(self, job_id: str, payload: Dict) -> ScheduledJob:
+        return ScheduledJob(
+            job_id=job_id,
+            target=self._run_workflow,
+            kwargs=payload["kwargs"],
+            atom_count=payload["atom_count"],
+            predicted_runtime_s=payload["predicted_runtime_s"],
+        )
+
+    def seed_queue(self, retry_failed: bool = False) -> int:
+        """
+        Submits every combination that has not completed yet to the ledger's
+        work queue, for `run_worker` processes to pull from. Safe to repeat,
+        jobs already in the ledger keep their state.
+
+        :param retry_failed: Also resubmit jobs that failed in an earlier run.
+        :return: Number of submitted jobs.
+        """
+        # Running jobs are left to their workers' leases
+        self.ledger.requeue_unfinished(retry_failed=retry_failed)
+        n_jobs = sum(1 for _ in self._iter_jobs(self._generate_combinations()))
+        logger.info(f"Submitted {n_jobs} jobs to the work queue, {self.ledger.get_counts()}")
+        return n_jobs
+
+    def run_worker(
+        self,
+        timeout=3200,
+        lease_s: float = 900.0,
+        heartbeat_s: float = 60.0,
+        poll_s: float = 60.0,
+    ):
+        """
+        Worker daemon mode: pulls jobs submitted by `seed_queue` from the shared
+        ledger until the campaign is drained. Start any number of workers, on
+        any number of nodes sharing the ledger's filesystem.
+
+        :param timeout: Wall time in seconds after which a job is stopped.
+        :param lease_s: Seconds a claimed job is held without a heartbeat,
+            after which other workers may take it over.
+        :param heartbeat_s: Seconds between lease renewals.
+        :param poll_s: Seconds between queue checks while other workers finish.
+        """
+        executor = CoreBudgetedExecutor(
+            total_cores=self.total_cores,
+            total_memory_gb=self.total_memory_gb,
+            timeout=timeout,
+        )
+        QueueWorker(
+            ledger=self.ledger,
+            make_job=self._make_job,
+            executor=executor,
+            lease_s=lease_s,
+            heartbeat_s=heartbeat_s,
+            poll_s=poll_s,
+        ).run(
+            on_success=self._save_progress,
+            on_failure=self._log_error,
+            on_interrupted=self._mark_interrupted,
+        )
+
+    def run(self, timeout=3200, retry_failed: bool = False):
+        """
+        Runs every polymer-solvent-temperature combination that has not completed yet.
+        Jobs are streamed to the executor rather than built up front and run
+        concurrently, longest predicted runtime first within a window of
+        `job_lookahead` jobs, each with its own core budget. They are
+        stopped after `timeout` seconds to avoid stuck simulations, and resume
+        from their last mdrun checkpoint on the next run.
+
+        :param retry_failed: Also rerun jobs that failed in an earlier run.
+        """
+        combinations = self._generate_combinations()
+        logger.info(f"Campaign has {len(combinations)} combinations")
+
+        # Jobs left running by an earlier run are retried, jobs still leased by
+        # queue workers are left to them
+        self.ledger.requeue_unfinished(retry_failed=retry_failed)
+
+        executor = CoreBudgetedExecutor(
+            total_cores=self.total_cores,
+            total_memory_gb=self.total_memory_gb,
+            timeout=timeout,
+        )
+        executor.run(
+            self._iter_jobs(combinations),
+            on_success=self._save_progress,
+            on_failure=self._log_error,
+            lookahead=self.job_lookahead,
+            on_interrupted=self._mark_interrupted,
+        )
 
         logger.info("All simulations completed!")
 
+    def _plan_job(
+        self,
+        job_id: str,
+        monomer_list: List[str],
+        solvent_name: str,
+        solvent_smiles: str,
+        solvent_density: float,
+        solvent_compressibility: float,
+        temp: float,
+        num_units: int,
+    ) -> JobPlan:
+        # The solvent PDB is looked up rather than generated, its contents are
+        # part of the provenance of the solvent box
+        solvent_generator = SolventGenerator(
+            solvent_name=solvent_name,
+            solvent_smiles=solvent_smiles,
+            solvent_compressibility=solvent_compressibility,
+            solvent_density=solvent_density,
+        )
+        solvent = Solvent(
+            name=solvent_name,
+            molecular_weight=solvent_generator.sol_molar_mass,
+            density=solvent_density,
+            pdb_path=solvent_generator.check_solvent_pdb_cache(
+                solvent_generator.cache_key
+            )
+            or "",
+            compressibility=solvent_compressibility,
+        )
+        box_size_nm = JoinedAtomisticPolymerWorkflow.get_box_size(num_units)
+        # The parameterised polymer is retrieved whether or not the
+        # equilibrated polymer is cached
+        stages = forecast_polymer_generation(monomer_list, num_units)
+        parameterised_polymer = get_cached_parameterised_polymer(monomer_list, num_units)
+        polymer_stages = forecast_equilibriated_polymer(
+            solvent,
+            monomer_list,
+            num_units,
+            temp,
+            cache=atomistic_polymer_cache,
+            box_size_nm=box_size_nm,
+            provenance=(
+                PolymerEquilibriationWorkflow.get_provenance(
+                    parameterised_polymer, solvent, temp
+                )
+                if parameterised_polymer
+                else None
+            ),
+        )
+        stages.extend(polymer_stages)
+        if polymer_stages[0].hit:
+            return JobPlan(job_id=job_id, stages=stages)
+
+        # The atomistic solvent workflow parameterises the solvent on every run
+        stages.append(StageForecast(stage="solvent_parameterisation", hit=False))
+        stages.extend(
+            forecast_solvent_box(
+                solvent,
+                box_size_nm,
+                temp,
+                solvent_cache=atomistic_solvent_cache,
+                packmol_solvent_cache=atomistic_packmol_solvent_cache,
+                provenance=SolventEquilibriationWorkflow.get_provenance(solvent, temp),
+            )
+        )
+        atom_count = self._estimate_atom_count(
+            monomer_list, solvent_smiles, solvent_density, num_units
+        )
+        return JobPlan(
+            job_id=job_id,
+            stages=stages,
+            predicted_runtime_s=self._predict_runtime(atom_count, num_units),
+        )
+
+    def plan(self, plan_file: Optional[str] = None) -> List[JobPlan]:
+        """
+        Dry run of `run`: forecasts, for every job that has not completed yet,
+        which stages would be read from the solvent, polymer and MDP caches and
+        which would be computed. Nothing is run and the ledger is not changed.
+
+        :param plan_file: CSV file to write every stage forecast to.
+        :return: Plan of each pending job.
+        """
+        plans = []
+        for job_id, combination in self._iter_pending(self._generate_combinations()):
+            try:
+                plans.append(self._plan_job(job_id, *combination))
+            except ValueError as e:
+                logger.warning(f"{job_id} would fail: {e}")
+        log_plan(plans)
+        if plan_file:
+            write_plan_csv(plans, plan_file)
+        return plans
+
     def _run_workflow(self, monomer_list, solvent_name, solvent_smiles, 
                       solvent_density, solvent_compressibility, temp, num_units, job_id):
         """
         Wrapper function to run workflow. This runs in a separate process.
         """
+        # Jobs claimed from the work queue are already running
+        if self.ledger.get_state(job_id) != JobState.RUNNING:
+            self.ledger.mark_running(job_id)
         try:
             workflow = JoinedAtomisticPolymerWorkflow(
                 monomer_smiles=monomer_list,
@@ -223,9 +618,7 @@ class PolymerSimulationManager:
             workflow.run()  # Runs the simulation
             
             data = workflow.data
-            
-                    # Prepare data for CSV
-            output_file = "output_backup.csv"
+
             row = {
                 "monomer_list": str(monomer_list),
                 "solvent_name": solvent_name,
@@ -235,20 +628,26 @@ class PolymerSimulationManager:
                 "temperature": temp,
                 "num_units": num_units,
                 "job_id": job_id,
-                "data": json.dumps(data)  # Convert data to string if it's not scalar
+                "data": data,
             }
-
-            # Convert to DataFrame
-            df = pd.DataFrame([row])
-
-            # Append or create CSV
-            if not os.path.exists(output_file):
-                df.to_csv(output_file, index=False)
-            else:
-                df.to_csv(output_file, mode='a', header=False, index=False)
+            self.ledger.record_output(job_id, row)
 
         except Exception as e:
             logger.error(f"Error in {job_id}: {e}")
+            failure_cache.record_exception(
+                job_id,
+                self._get_job_digest(
+                    monomer_list,
+                    solvent_name,
+                    solvent_smiles,
+                    solvent_density,
+                    solvent_compressibility,
+                    temp,
+                    num_units,
+                ),
+                e,
+            )
+            raise
 =======
 class SimulationManager:
     error_csv_filename = "error_log"
@@ -265,7 +664,21 @@ class SimulationManager:
         solvent_end_idx: int = None,
         polymer_start_idx: int = 0,
         polymer_end_idx: int = None,
+        total_cores: Optional[int] = None,
+        total_memory_gb: Optional[float] = None,
+        n_shards: Optional[int] = None,
+        shard_index: Optional[int] = None,
+        runtime_model_path: Optional[str] = None,
     ):
+        """
+        :param n_shards: Splits the campaign into this many cost-balanced shards
+            (e.g. SLURM array tasks) and only runs one of them. Defaults to the
+            size of the SLURM job array, if any.
+        :param shard_index: Shard to run, defaults to `SLURM_ARRAY_TASK_ID`.
+        :param runtime_model_path: Runtime model frozen for the whole job array
+            (see `freeze_runtime_model`), shards are balanced on its predicted
+            runtimes. Without one, shards are balanced on atom counts.
+        """
         self.parameterised_solvents = SolventDirectoryParser(
             parameterised_sol_dir
         ).parse_directory()
@@ -291,6 +704,19 @@ class SimulationManager:
         self.output_dir = output_dir
         check_directory_exists(output_dir, make_dirs=True)
         self.temperatures = temperatures
+        self.total_cores = total_cores
+        self.total_memory_gb = total_memory_gb
+        # Tasks of an array start at different times, a model fitted by each
+        # one to the growing runtime history would give each a different split
+        self.runtime_model_path = runtime_model_path
+        self.runtime_predictor = (
+            RuntimePredictor.load(runtime_model_path)
+            if runtime_model_path
+            else get_runtime_predictor()
+        )
+        env_shard_index, env_n_shards = get_shard_from_env()
+        self.n_shards = n_shards or env_n_shards
+        self.shard_index = shard_index if shard_index is not None else env_shard_index
         self.error_file_path = os.path.join(
             output_dir, f"{self.error_csv_filename}_{identifying_tag}.csv"
         )
@@ -298,7 +724,86 @@ class SimulationManager:
     def _get_sanitised_monomer_smiles(self, monomer_smiles: List[str]) -> str:
         return "_".join(monomer_smiles)
 
-    def run(self):
+    def _get_job_id(
+        self, solvent: Solvent, monomer_smiles: List[str], n_units: int, temp: float
+    ) -> str:
+        return f"{solvent.name}_{self._get_sanitised_monomer_smiles(monomer_smiles=monomer_smiles)}_{n_units}_{temp}"
+
+    @staticmethod
+    def _get_job_digest(
+        parameterised_polymer: GromacsPaths,
+        solvent: Solvent,
+        parameterised_solvent: GromacsPaths,
+        temp: float,
+    ) -> str:
+        """
+        Digest of everything a job's result depends on, a known failure of the
+        job is only skipped while it is the same.
+        """
+        return PolymerWorkflow.get_provenance(
+            parameterised_polymer,
+            solvent,
+            SolventEquilibriationWorkflow.get_provenance(
+                solvent, parameterised_solvent, temp
+            ),
+            temp,
+        )
+
+    def _estimate_atom_count(
+        self,
+        parameterised_solvent: GromacsPaths,
+        solvent: Solvent,
+        parameterised_polymer: GromacsPaths,
+        n_units: int,
+    ) -> int:
+        """
+        Estimates the size of a job's solvated box from the parameterised
+        solvent and polymer, used to give it a core budget.
+        """
+        atoms_per_solvent_molecule = (
+            count_atoms_from_gro(parameterised_solvent.gro_path)
+            if parameterised_solvent.gro_path
+            else 1
+        )
+        polymer_atom_count = (
+            count_atoms_from_gro(parameterised_polymer.gro_path)
+            if parameterised_polymer.gro_path
+            else 0
+        )
+        return estimate_system_atom_count(
+            box_size_nm=JoinedAtomisticPolymerWorkflow.get_box_size(n_units),
+            solvent_density=solvent.density,
+            solvent_molecular_weight=solvent.molecular_weight,
+            atoms_per_solvent_molecule=atoms_per_solvent_molecule,
+            polymer_atom_count=polymer_atom_count,
+        )
+
+    def _predict_runtime(self, atom_count: int, num_units: int) -> float:
+        """
+        Predicted wall time of a job in seconds, used to start and shard the
+        longest jobs first.
+        """
+        total_cores = self.total_cores or get_available_cores()
+        n_threads = estimate_core_count(
+            atom_count, total_cores=total_cores, min_cores=2
+        )
+        return self.runtime_predictor.predict_job(
+            [minim_workflow, polymer_workflow],
+            atom_count=atom_count,
+            n_threads=n_threads,
+            box_size_nm=JoinedAtomisticPolymerWorkflow.get_box_size(num_units),
+        )
+
+    def _generate_jobs(self, sharded: bool = True) -> List[ScheduledJob]:
+        """
+        :param sharded: Only return this manager's shard of the campaign, if sharding.
+        """
+        canonicalise_smiles(
+            smiles
+            for _, monomer_smiles, _ in self.parameterised_polymers
+            for smiles in monomer_smiles
+        )
+        jobs = []
         for (
             parameterised_solvent,
             solvent,
@@ -309,32 +814,259 @@ class SimulationManager:
                 monomer_smiles,
                 n_units,
             ) in self.parameterised_polymers:
+                atom_count = self._estimate_atom_count(
+                    parameterised_solvent, solvent, parameterised_polymer, n_units
+                )
+                predicted_runtime_s = self._predict_runtime(atom_count, n_units)
                 for temp in self.temperatures:
 
-                    job_id = f"{solvent.name}_{self._get_sanitised_monomer_smiles(monomer_smiles=monomer_smiles)}_{n_units}_{temp}"
-                    try:
-                        workflow = JoinedAtomisticPolymerWorkflow(
-                            parameterised_polymer=parameterised_polymer,
-                            monomer_smiles=monomer_smiles,
-                            num_units=n_units,
-                            solvent=solvent,
-                            solvent_smiles=solvent_smiles,
-                            parameterised_solvent=parameterised_solvent,
-                            temperature=temp,
-                            output_dir=self.output_dir,
-                            csv_file_path=self.output_csv_filename,
-                        ).run()
-                        workflow.run()
-
-                    except ValueError as e:
-                        error_message = f"ValueError in {job_id}: {e}"
-                        logger.error(error_message)
-                        self._log_error(job_id, str(e))
-
-                    except Exception as e:
-                        error_message = f"Unexpected error in {job_id}: {e}"
-                        logger.error(error_message)
-                        self._log_error(job_id, str(e))
+                    job_id = self._get_job_id(solvent, monomer_smiles, n_units, temp)
+                    jobs.append(
+                        ScheduledJob(
+                            job_id=job_id,
+                            target=self._run_workflow,
+                            kwargs=dict(
+                                parameterised_polymer=parameterised_polymer,
+                                monomer_smiles=monomer_smiles,
+                                n_units=n_units,
+                                solvent=solvent,
+                                solvent_smiles=solvent_smiles,
+                                parameterised_solvent=parameterised_solvent,
+                                temp=temp,
+                            ),
+                            atom_count=atom_count,
+                            predicted_runtime_s=predicted_runtime_s,
+                        )
+                    )
+        if sharded and self.n_shards:
+            if self.shard_index is None:
+                raise ValueError(
+                    f"Sharding into {self.n_shards} shards needs a shard index, pass "
+                    f"shard_index or run as a SLURM array task."
+                )
+            jobs = select_shard(
+                jobs,
+                self.shard_index,
+                self.n_shards,
+                cost_fn=job_cost if self.runtime_model_path else atom_count_cost,
+            )
+        return jobs
+
+    def _skip_known_failures(self, jobs: List[ScheduledJob]) -> List[ScheduledJob]:
+        """
+        Drops the jobs that failed before with the same inputs or contain a
+        rejected monomer, logging them as errors, so no process is started for them.
+        """
+        input_digests = {}
+        for job in jobs:
+            kwargs = job.kwargs
+            input_digests[job.job_id] = self._get_job_digest(
+                kwargs["parameterised_polymer"],
+                kwargs["solvent"],
+                kwargs["parameterised_solvent"],
+                kwargs["temp"],
+            )
+            input_digests.update(
+                failure_cache.get_monomer_digests(kwargs["monomer_smiles"])
+            )
+        failures = failure_cache.get_failures(input_digests)
+
+        remaining_jobs = []
+        for job in jobs:
+            failure_keys = [
+                job.job_id,
+                *failure_cache.get_monomer_digests(job.kwargs["monomer_smiles"]),
+            ]
+            failure = next(
+                (failures[key] for key in failure_keys if key in failures), None
+            )
+            if failure is None:
+                remaining_jobs.append(job)
+            else:
+                self._log_error(job.job_id, str(KnownFailureError(failure)))
+        if len(remaining_jobs) < len(jobs):
+            logger.info(f"Skipping {len(jobs) - len(remaining_jobs)} jobs known to fail.")
+        return remaining_jobs
+
+    def _run_workflow(
+        self,
+        parameterised_polymer: GromacsPaths,
+        monomer_smiles: List[str],
+        n_units: int,
+        solvent: Solvent,
+        solvent_smiles: str,
+        parameterised_solvent: GromacsPaths,
+        temp: float,
+    ):
+        """
+        Runs a single job. This runs in a separate process. Deterministic
+        failures are recorded, so the job is skipped by later runs.
+        """
+        try:
+            JoinedAtomisticPolymerWorkflow(
+                parameterised_polymer=parameterised_polymer,
+                monomer_smiles=monomer_smiles,
+                num_units=n_units,
+                solvent=solvent,
+                solvent_smiles=solvent_smiles,
+                parameterised_solvent=parameterised_solvent,
+                temperature=temp,
+                output_dir=self.output_dir,
+                csv_file_path=self.output_csv_filename,
+            ).run()
+        except Exception as e:
+            failure_cache.record_exception(
+                self._get_job_id(solvent, monomer_smiles, n_units, temp),
+                self._get_job_digest(
+                    parameterised_polymer, solvent, parameterised_solvent, temp
+                ),
+                e,
+            )
+            raise
+
+    def plan(self, plan_file: Optional[str] = None) -> List[JobPlan]:
+        """
+        Dry run of `run`: forecasts, for every job of this shard, which stages
+        would be read from the solvent, polymer and MDP caches and which would
+        be computed, without starting Packmol or GROMACS.
+
+        :param plan_file: CSV file to write every stage forecast to.
+        :return: Plan of each job.
+        """
+        plans = []
+        for job in self._generate_jobs():
+            kwargs = job.kwargs
+            box_size_nm = JoinedAtomisticPolymerWorkflow.get_box_size(kwargs["n_units"])
+            solvent_provenance = SolventEquilibriationWorkflow.get_provenance(
+                kwargs["solvent"], kwargs["parameterised_solvent"], kwargs["temp"]
+            )
+            # The solvent box is prepared before the polymer cache is checked
+            stages = forecast_solvent_box(
+                kwargs["solvent"],
+                box_size_nm,
+                kwargs["temp"],
+                provenance=solvent_provenance,
+            )
+            polymer_stages = forecast_equilibriated_polymer(
+                kwargs["solvent"],
+                kwargs["monomer_smiles"],
+                kwargs["n_units"],
+                kwargs["temp"],
+                box_size_nm=box_size_nm,
+                provenance=PolymerWorkflow.get_provenance(
+                    kwargs["parameterised_polymer"],
+                    kwargs["solvent"],
+                    solvent_provenance,
+                    kwargs["temp"],
+                ),
+            )
+            plans.append(
+                JobPlan(
+                    job_id=job.job_id,
+                    stages=stages + polymer_stages,
+                    predicted_runtime_s=(
+                        0.0 if polymer_stages[0].hit else job.predicted_runtime_s
+                    ),
+                )
+            )
+        log_plan(plans)
+        if plan_file:
+            write_plan_csv(plans, plan_file)
+        return plans
+
+    def prefetch_solvent_boxes(
+        self, jobs: Optional[List[ScheduledJob]] = None
+    ) -> Dict[str, str]:
+        """
+        Equilibrates every solvent box needed by `jobs` once, before any polymer
+        job starts. Jobs whose box failed are logged as errors.
+
+        :param jobs: Jobs whose boxes to prefetch, defaults to the whole campaign
+            across all shards, so one prefetch job can serve a whole job array.
+        :return: Error message of every failed box, keyed by its cache key.
+        """
+        if jobs is None:
+            jobs = self._generate_jobs(sharded=False)
+        boxes = collect_solvent_boxes(jobs)
+        _, box_errors = prefetch_solvent_boxes(boxes, total_cores=self.total_cores)
+        for job in jobs:
+            box_error = box_errors.get(get_solvent_box_key(job))
+            if box_error:
+                self._log_error(job.job_id, f"Solvent box failed: {box_error}")
+        return box_errors
+
+    def run(self, timeout: Optional[float] = None):
+        """
+        Runs every solvent-polymer-temperature combination, several at once,
+        each with its own core budget. Solvent boxes are equilibrated up front.
+
+        :param timeout: Wall time in seconds after which a job is terminated.
+        """
+        jobs = self._skip_known_failures(self._generate_jobs())
+        box_errors = self.prefetch_solvent_boxes(jobs)
+        # Rather than each rebuilding the box that failed
+        jobs = [job for job in jobs if get_solvent_box_key(job) not in box_errors]
+        executor = CoreBudgetedExecutor(
+            total_cores=self.total_cores,
+            total_memory_gb=self.total_memory_gb,
+            timeout=timeout,
+        )
+        executor.run(jobs, on_failure=self._log_error)
+
+        logger.info("All simulations completed!")
+
+    def run_pipeline(
+        self,
+        max_cpu_stages: int = 1,
+        cores_per_mdrun_stage: Optional[int] = None,
+    ):
+        """
+        Runs every combination in one process as a graph of stages, so the
+        Python file preparation of one job overlaps with the mdrun stages of
+        others. Jobs sharing a solvent box share its stage.
+
+        :param max_cpu_stages: Number of Python stages allowed to run at once.
+        :param cores_per_mdrun_stage: Cores pinned to each mdrun stage, the
+            number of concurrent mdrun stages follows from `total_cores`.
+        """
+        stages = []
+        jobs = self._skip_known_failures(self._generate_jobs())
+        for job in jobs:
+            kwargs = job.kwargs
+            workflow = JoinedAtomisticPolymerWorkflow(
+                parameterised_polymer=kwargs["parameterised_polymer"],
+                monomer_smiles=kwargs["monomer_smiles"],
+                num_units=kwargs["n_units"],
+                solvent=kwargs["solvent"],
+                solvent_smiles=kwargs["solvent_smiles"],
+                parameterised_solvent=kwargs["parameterised_solvent"],
+                temperature=kwargs["temp"],
+                output_dir=self.output_dir,
+                csv_file_path=self.output_csv_filename,
+                temp_dir=os.path.join(TEMP_DIR, job.job_id),
+                log_dir=os.path.join(LOG_DIR, job.job_id),
+                prepare_solvent_box=False,
+            )
+            stages.extend(workflow.get_stages(job.job_id))
+
+        executor = StageGraphExecutor(
+            max_cpu_stages=max_cpu_stages,
+            cores_per_mdrun_stage=cores_per_mdrun_stage,
+            total_cores=self.total_cores,
+        )
+        job_ids = {job.job_id for job in jobs}
+        failed_job_ids = set()
+
+        def log_stage_failure(stage_id: str, error_message: str):
+            # Stage ids are "<job id>:<stage>", and a job's stages downstream of
+            # a failure are skipped. Jobs failing on a shared stage (their
+            # solvent box) are logged by their first stage skipped after it.
+            job_id = stage_id.rsplit(":", 1)[0]
+            if job_id in job_ids and job_id not in failed_job_ids:
+                failed_job_ids.add(job_id)
+                self._log_error(job_id, f"{stage_id}: {error_message}")
+
+        executor.run(stages, on_failure=log_stage_failure)
 
         logger.info("All simulations completed!")
 
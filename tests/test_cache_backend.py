@@ -0,0 +1,68 @@
+from modules.cache_store.cache_backend import JsonIndexBackend, SQLiteCacheBackend
+import multiprocessing
+import os
+import pytest
+
+
+@pytest.fixture
+def legacy_index_path(tmp_path):
+    legacy = JsonIndexBackend(str(tmp_path / "solvent_cache_index.json"))
+    for index in range(3):
+        legacy.set(f"legacy_{index}", f"/boxes/box_{index}.gro")
+    return legacy.index_path
+
+
+def test_legacy_index_is_imported_once(tmp_path, legacy_index_path):
+    db_path = str(tmp_path / "solvent_cache_index.sqlite")
+    backend = SQLiteCacheBackend(db_path, legacy_index_path=legacy_index_path)
+    assert backend.items() == JsonIndexBackend(legacy_index_path).items()
+
+    # Entries removed since, e.g. by cache maintenance, do not come back when
+    # the cache is opened again, even once the index is empty
+    backend.delete("legacy_0")
+    SQLiteCacheBackend(db_path, legacy_index_path=legacy_index_path)
+    assert set(backend.keys()) == {"legacy_1", "legacy_2"}
+    backend.clear()
+    SQLiteCacheBackend(db_path, legacy_index_path=legacy_index_path)
+    assert backend.items() == {}
+
+    # Later stores to the legacy index are not imported either
+    JsonIndexBackend(legacy_index_path).set("legacy_3", "/boxes/box_3.gro")
+    SQLiteCacheBackend(db_path, legacy_index_path=legacy_index_path)
+    assert backend.items() == {}
+
+
+def _store_entries(db_path: str, legacy_index_path: str, worker: int, n_entries: int):
+    # Every worker opens the cache, as a workflow would, then stores its entries
+    # one at a time
+    backend = SQLiteCacheBackend(db_path, legacy_index_path=legacy_index_path)
+    for index in range(n_entries):
+        backend.set(f"worker_{worker}_{index}", {"worker": worker, "index": index})
+
+
+def test_concurrent_stores_lose_no_entries(tmp_path, legacy_index_path):
+    db_path = str(tmp_path / "solvent_cache_index.sqlite")
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(
+            target=_store_entries, args=(db_path, legacy_index_path, worker, 50)
+        )
+        for worker in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=120)
+        assert process.exitcode == 0
+
+    items = SQLiteCacheBackend(db_path).items()
+    assert len(items) == 3 + 4 * 50
+    for worker in range(4):
+        for index in range(50):
+            assert items[f"worker_{worker}_{index}"] == {"worker": worker, "index": index}
+    assert items["legacy_0"] == "/boxes/box_0.gro"
+    # No temporary or journal files are left behind
+    assert sorted(os.listdir(tmp_path)) == [
+        "solvent_cache_index.json",
+        "solvent_cache_index.sqlite",
+    ]
@@ -0,0 +1,184 @@
+from modules.cache_store.cache_maintenance import (
+    DANGLING,
+    EVICTED,
+    ORPHANED,
+    CacheMaintenance,
+)
+from modules.cache_store.file_cache import FileCache
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import time
+import pandas as pd
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def dirs(tmp_path, monkeypatch):
+    # Relative paths in cached objects resolve against the campaign directory
+    monkeypatch.chdir(tmp_path)
+    cache_dir = tmp_path / "cache"
+    output_dir = tmp_path / "outputs"
+    output_dir.mkdir()
+    return str(cache_dir), str(output_dir)
+
+
+def _write_file(path: str, size_bytes: int, age_s: float = 0.0) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(b"x" * size_bytes)
+    if age_s:
+        modified_at = time.time() - age_s
+        os.utime(path, (modified_at, modified_at))
+    return path
+
+
+def _set_accessed_at(cache: FileCache, accessed_at: dict):
+    with sqlite3.connect(cache.backend.db_path) as connection:
+        connection.executemany(
+            "UPDATE entries SET accessed_at = ? WHERE key = ?",
+            [(time_s, key) for key, time_s in accessed_at.items()],
+        )
+
+
+def _fill_cache(cache_dir: str, output_dir: str, n_entries: int) -> FileCache:
+    # Entry i refers to a file of 1000 bytes and was used i seconds after the first
+    cache = FileCache("boxes", cache_dir=cache_dir)
+    for index in range(n_entries):
+        box_path = _write_file(os.path.join(output_dir, f"box_{index}.gro"), 1000)
+        cache.store_object(f"box_{index}", box_path)
+    _set_accessed_at(
+        cache, {f"box_{index}": 1000.0 + index for index in range(n_entries)}
+    )
+    return cache
+
+
+def test_dangling_file_cache_entry_is_dropped(dirs):
+    cache_dir, output_dir = dirs
+    cache = FileCache("boxes", cache_dir=cache_dir)
+    temp_dir = os.path.join(output_dir, "temp_1")
+    cache.store_object("gone", _write_file(os.path.join(temp_dir, "box.gro"), 100))
+    cache.store_object("here", _write_file(os.path.join(output_dir, "box.gro"), 100))
+    # A worker removed its TEMP_DIR after the run
+    shutil.rmtree(temp_dir)
+
+    actions = CacheMaintenance([cache_dir]).run()
+    assert [(action.reason, action.key) for action in actions] == [(DANGLING, "gone")]
+    assert actions[0].paths == []
+    assert set(cache.backend.keys()) == {"here"}
+    assert cache.file_exists("here")
+
+
+def test_eviction_stops_at_quota(dirs):
+    cache_dir, output_dir = dirs
+    cache = _fill_cache(cache_dir, output_dir, n_entries=5)
+
+    maintenance = CacheMaintenance([cache_dir], quotas={"file_cache_boxes": 2500})
+    actions = maintenance.run()
+    # Least recently used first, until the remaining 2000 bytes fit
+    assert [(action.reason, action.key) for action in actions] == [
+        (EVICTED, "box_0"),
+        (EVICTED, "box_1"),
+        (EVICTED, "box_2"),
+    ]
+    assert sum(action.bytes_freed for action in actions) == 3000
+    assert set(cache.backend.keys()) == {"box_3", "box_4"}
+    for index in range(5):
+        box_path = os.path.join(output_dir, f"box_{index}.gro")
+        assert os.path.exists(box_path) == (index >= 3)
+
+    # Within the quota nothing more is evicted
+    assert CacheMaintenance([cache_dir], quotas={"file_cache_boxes": 2500}).run() == []
+
+
+def test_shared_file_survives_eviction(dirs):
+    cache_dir, output_dir = dirs
+    cache = FileCache("boxes", cache_dir=cache_dir)
+    shared_path = _write_file(os.path.join(output_dir, "shared.gro"), 1000)
+    cache.store_object("old", shared_path)
+    cache.store_object("new", shared_path)
+    _set_accessed_at(cache, {"old": 1000.0, "new": 2000.0})
+
+    # The shared file counts for both entries, so one of them is evicted
+    actions = CacheMaintenance([cache_dir], quotas={"file_cache_boxes": 1500}).run()
+    assert [(action.reason, action.key) for action in actions] == [(EVICTED, "old")]
+    assert actions[0].paths == []
+    assert actions[0].bytes_freed == 0
+    assert os.path.exists(shared_path)
+    assert cache.retrieve_object("new") == shared_path
+
+
+def test_only_old_orphaned_files_are_removed(dirs):
+    cache_dir, output_dir = dirs
+    cache = _fill_cache(cache_dir, output_dir, n_entries=1)
+    objects_dir = os.path.join(cache_dir, "objects", "ab")
+    old = _write_file(os.path.join(objects_dir, "old.pkl"), 10, age_s=7200.0)
+    # Left behind by a writer killed between write and rename
+    old_temp = _write_file(os.path.join(objects_dir, "old.pkl.1.2.tmp"), 10, age_s=7200.0)
+    # May belong to a running workflow that has not stored its entry yet
+    young = _write_file(os.path.join(objects_dir, "young.pkl"), 10)
+    not_cache_file = _write_file(os.path.join(cache_dir, "notes.txt"), 10, age_s=7200.0)
+
+    actions = CacheMaintenance([cache_dir]).run()
+    assert {action.reason for action in actions} == {ORPHANED}
+    assert {action.cache_name for action in actions} == {"objects"}
+    assert sorted(path for action in actions for path in action.paths) == [old, old_temp]
+    assert not os.path.exists(old) and not os.path.exists(old_temp)
+    assert os.path.exists(young) and os.path.exists(not_cache_file)
+    assert set(cache.backend.keys()) == {"box_0"}
+
+
+def test_dry_run_deletes_nothing(dirs, tmp_path):
+    cache_dir, output_dir = dirs
+    cache = _fill_cache(cache_dir, output_dir, n_entries=3)
+    cache.store_object("gone", _write_file(os.path.join(output_dir, "gone.gro"), 100))
+    os.remove(os.path.join(output_dir, "gone.gro"))
+    orphan = _write_file(
+        os.path.join(cache_dir, "objects", "orphan.pkl"), 10, age_s=7200.0
+    )
+    files_before = sorted(
+        os.path.join(root, file_name)
+        for root, _, file_names in os.walk(tmp_path)
+        for file_name in file_names
+    )
+
+    actions = CacheMaintenance([cache_dir], default_quota=1500).run(dry_run=True)
+    assert {(action.reason, action.key) for action in actions} == {
+        (DANGLING, "gone"),
+        (EVICTED, "box_0"),
+        (EVICTED, "box_1"),
+        (ORPHANED, None),
+    }
+
+    report_path = str(tmp_path / "report.csv")
+    result = subprocess.run(
+        [
+            sys.executable,
+            os.path.join(REPO_DIR, "maintain_cache.py"),
+            "--cache-dir",
+            cache_dir,
+            "--default-quota",
+            "1500",
+            "--dry-run",
+            "--report",
+            report_path,
+        ],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    report = pd.read_csv(report_path)
+    assert sorted(report["reason"]) == [DANGLING, EVICTED, EVICTED, ORPHANED]
+    assert orphan in set(report["paths"])
+
+    os.remove(report_path)
+    assert files_before == sorted(
+        os.path.join(root, file_name)
+        for root, _, file_names in os.walk(tmp_path)
+        for file_name in file_names
+    )
+    assert set(cache.backend.keys()) == {"box_0", "box_1", "box_2", "gone"}
@@ -0,0 +1,40 @@
+from modules.gromacs.parsers.gromacs_parser import GromacsParser
+from modules.gromacs.parsers.handlers.data_handler import DataHandler
+import pytest
+
+ATOMS_ITP = """[ atoms ]
+;   nr  type  resnr  residue  atom  cgnr  charge  mass
+     1    c3      1      POL    C1     1  0.000  12.0
+     2    hc      1      POL    H1     1  -0.000  1
+     3    hc      1      POL    H2     1  0.100  1.0
+"""
+
+
+@pytest.fixture
+def handler(tmp_path):
+    path = tmp_path / "atoms.itp"
+    path.write_text(ATOMS_ITP)
+    handler = DataHandler()
+    handler.process(GromacsParser().parse(str(path))["data_atoms"])
+    return handler
+
+
+def test_unchanged_numbers_keep_their_text(handler):
+    # "0.000" and "-0.000", "1" and "1.0" parse to the same numbers
+    content = handler.content
+    content.loc[2, "charge"] = 0.2
+    handler.content = content
+    assert [row[6:8] for row in handler.data] == [
+        ["0.000", "12.0"],
+        ["-0.000", "1"],
+        ["0.2", "1.0"],
+    ]
+
+
+def test_reordered_rows_keep_their_text(handler):
+    handler.content = handler.content.iloc[::-1]
+    assert [row[6:8] for row in handler.data] == [
+        ["0.100", "1.0"],
+        ["-0.000", "1"],
+        ["0.000", "12.0"],
+    ]
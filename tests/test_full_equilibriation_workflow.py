@@ -0,0 +1,47 @@
+from modules.gromacs.equilibriation.full_equilibriation_workflow import (
+    FullEquilibrationWorkflow,
+)
+
+TOPOLOGY = """#include "{itp_dir}/polymer.itp"
+
+[ system ]
+Polymer in solvent
+
+[ molecules ]
+POL 1
+SOL 900
+"""
+
+GRO = """Solvated polymer
+    1
+    1POL     C1    1   {x:.3f}   1.624   1.679
+   3.00000   3.00000   3.00000
+"""
+
+
+def _write_inputs(directory, itp_dir: str = "temp_1", x: float = 0.126):
+    directory.mkdir(exist_ok=True)
+    top_path = directory / "topol.top"
+    gro_path = directory / "solvated.gro"
+    top_path.write_text(TOPOLOGY.format(itp_dir=itp_dir))
+    gro_path.write_text(GRO.format(x=x))
+    return str(top_path), str(gro_path)
+
+
+def test_initial_checkpoint_key_ignores_include_dirs(tmp_path):
+    key = FullEquilibrationWorkflow._get_initial_checkpoint_key(
+        *_write_inputs(tmp_path / "first")
+    )
+    assert key == FullEquilibrationWorkflow._get_initial_checkpoint_key(
+        *_write_inputs(tmp_path / "second", itp_dir="temp_2")
+    )
+
+
+def test_initial_checkpoint_key_depends_on_structure(tmp_path):
+    # e.g. a polymer inserted again, with the same molecule counts
+    key = FullEquilibrationWorkflow._get_initial_checkpoint_key(
+        *_write_inputs(tmp_path / "first")
+    )
+    assert key != FullEquilibrationWorkflow._get_initial_checkpoint_key(
+        *_write_inputs(tmp_path / "second", x=0.127)
+    )
@@ -0,0 +1,106 @@
+from modules.gromacs.parsers.gromacs_parser import GromacsParser
+from modules.gromacs.parsers.parsed_topology_store import ParsedTopologyStore
+import pytest
+import os
+
+TOPOLOGY = """; topol.top
+#include "amber99sb-ildn.ff/forcefield.itp"
+#include "polymer.itp"
+
+[ system ]
+Polymer in solvent
+
+[ molecules ]
+POL 1
+"""
+
+
+@pytest.fixture
+def top_path(tmp_path):
+    path = tmp_path / "topol.top"
+    path.write_text(TOPOLOGY)
+    return str(path)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = ParsedTopologyStore()
+    monkeypatch.setattr(GromacsParser, "topology_store", store)
+    return store
+
+
+def test_parse_sections(top_path, store):
+    sections = GromacsParser().parse(top_path)
+    assert list(sections) == [None, "include", "include_1", "data_system", "data_molecules"]
+    assert GromacsParser().parse(top_path, lazy=True)["include_1"].lines == [
+        '#include "polymer.itp"',
+        "",
+    ]
+
+
+def test_suppression_changed_by_another_thread(top_path, store):
+    # Another thread using the same parser finishes a file inside an #ifdef
+    # while this one is parsing, which must not change the sections stored
+    shared = GromacsParser()
+    find_header_lines = shared._find_header_lines
+
+    def interleaved(text):
+        for header_line in find_header_lines(text):
+            shared.suppressed_constructs = ["include"]
+            yield header_line
+
+    shared._find_header_lines = interleaved
+    shared.parse(top_path)
+    assert list(GromacsParser().parse(top_path)) == [
+        None,
+        "include",
+        "include_1",
+        "data_system",
+        "data_molecules",
+    ]
+
+
+@pytest.mark.parametrize("stored", [True, False])
+def test_suppression_not_carried_to_next_file(tmp_path, top_path, monkeypatch, store, stored):
+    # ACPYPE ITPs end inside `#ifdef POSRES`, which suppresses includes
+    itp_path = tmp_path / "polymer.itp"
+    itp_path.write_text(
+        '[ moleculetype ]\n POL 3\n\n#ifdef POSRES\n#include "posre.itp"\n#endif\n'
+    )
+    if not stored:
+        monkeypatch.setattr(GromacsParser, "topology_store", None)
+    parser = GromacsParser()
+    assert list(parser.parse(str(itp_path))) == [None, "data_moleculetype", "conditional_if"]
+    assert list(parser.parse(top_path)) == [
+        None,
+        "include",
+        "include_1",
+        "data_system",
+        "data_molecules",
+    ]
+
+
+def test_store_rereads_rewrite_with_unchanged_stat(tmp_path, monkeypatch, store):
+    # A same-size rewrite within the timestamp granularity of e.g. NFS leaves
+    # the file's stat as it was
+    path = tmp_path / "topol.top"
+    path.write_text(TOPOLOGY)
+    frozen_stat = os.stat(path)
+    monkeypatch.setattr(
+        "modules.gromacs.parsers.parsed_topology_store.os.stat", lambda _: frozen_stat
+    )
+    assert "data_molecules" in GromacsParser().parse(str(path))
+    path.write_text(TOPOLOGY.replace("[ molecules ]", "[ moleculez ]"))
+    assert "data_moleculez" in GromacsParser().parse(str(path))
+
+
+def test_store_bounds_file_identities(tmp_path, monkeypatch, store):
+    monkeypatch.setattr(store, "max_file_digests", 2)
+    for index in range(3):
+        path = tmp_path / f"topol_{index}.top"
+        path.write_text(TOPOLOGY)
+        GromacsParser().parse(str(path))
+    assert [key[0] for key in store._file_digests] == [
+        str(tmp_path / "topol_1.top"),
+        str(tmp_path / "topol_2.top"),
+    ]
@@ -0,0 +1,147 @@
+from modules.campaign.job_ledger import JobLedger, JobState
+import multiprocessing
+import os
+import time
+import pytest
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return JobLedger(str(tmp_path / "job_ledger.db"))
+
+
+def _expire_lease(ledger: JobLedger, job_key: str):
+    with ledger._connect() as connection:
+        connection.execute(
+            "UPDATE jobs SET lease_expires_at = ? WHERE job_key = ?",
+            (time.time() - 1.0, job_key),
+        )
+
+
+def _get_lease(ledger: JobLedger, job_key: str):
+    with ledger._connect() as connection:
+        return connection.execute(
+            "SELECT lease_owner, lease_expires_at, attempts FROM jobs WHERE job_key = ?",
+            (job_key,),
+        ).fetchone()
+
+
+def test_claim_holds_job_until_lease_expires(ledger):
+    ledger.submit([("job_a", 0.0, {"duration_s": 1.0})])
+    assert ledger.claim_next(lease_s=60.0) == ("job_a", {"duration_s": 1.0})
+    assert ledger.get_state("job_a") == JobState.RUNNING
+    owner, expires_at, attempts = _get_lease(ledger, "job_a")
+    assert owner == JobLedger._worker_name()
+    assert expires_at > time.time()
+    assert attempts == 1
+
+    # A live lease is never handed out again
+    assert ledger.claim_next(lease_s=60.0) is None
+    assert ledger.has_queued_work()
+
+    _expire_lease(ledger, "job_a")
+    assert ledger.claim_next(lease_s=60.0) == ("job_a", {"duration_s": 1.0})
+    assert ledger.get_error("job_a") == "Lease expired."
+    assert _get_lease(ledger, "job_a")[2] == 2
+
+
+def test_claim_order_and_heartbeat(ledger):
+    ledger.submit([("job_low", 0.0, {}), ("job_high", 5.0, {})])
+    # Jobs only enqueued have no payload and are not claimed
+    ledger.enqueue(["job_unsubmitted"])
+    assert ledger.claim_next(lease_s=1.0)[0] == "job_high"
+    _, expires_at, _ = _get_lease(ledger, "job_high")
+    assert ledger.renew_leases(lease_s=60.0) == 1
+    assert _get_lease(ledger, "job_high")[1] > expires_at
+    assert ledger.claim_next(lease_s=1.0)[0] == "job_low"
+    assert ledger.claim_next(lease_s=1.0) is None
+
+    assert ledger.release_leases() == 2
+    assert ledger.get_jobs(JobState.QUEUED) == {"job_high", "job_low", "job_unsubmitted"}
+    assert _get_lease(ledger, "job_high")[:2] == (None, None)
+
+
+def test_requeue_unfinished(ledger):
+    ledger.submit((job_key, 0.0, {}) for job_key in ["live", "expired"])
+    ledger.enqueue(["unleased", "interrupted", "failed", "done"])
+    assert ledger.claim_next(lease_s=60.0)[0] == "expired"
+    assert ledger.claim_next(lease_s=60.0)[0] == "live"
+    _expire_lease(ledger, "expired")
+    # Run outside the work queue, without a lease
+    ledger.mark_running("unleased")
+    ledger.mark_running("interrupted")
+    ledger.mark_interrupted("interrupted", "Wall time limit reached.")
+    ledger.mark_failed("failed", "Failed.")
+    ledger.mark_running("done")
+    ledger.mark_done("done")
+
+    assert ledger.requeue_unfinished() == 3
+    assert ledger.get_jobs(JobState.QUEUED) == {"unleased", "interrupted", "expired"}
+    assert ledger.get_jobs(JobState.RUNNING) == {"live"}
+    assert ledger.get_state("failed") == JobState.FAILED
+    assert ledger.get_state("done") == JobState.DONE
+    assert _get_lease(ledger, "live")[0] == JobLedger._worker_name()
+
+    assert ledger.requeue_unfinished(retry_failed=True) == 1
+    assert ledger.get_state("failed") == JobState.QUEUED
+    assert ledger.get_jobs(JobState.RUNNING) == {"live"}
+
+
+def test_filter_states_chunks_keys(ledger):
+    # Small enough that every lookup below spans several chunks
+    ledger.max_query_params = 5
+    job_keys = [f"job_{index:02d}" for index in range(23)]
+    ledger.enqueue(job_keys)
+    done = set(job_keys[::3])
+    failed = set(job_keys[1::5]) - done
+    for job_key in done:
+        ledger.mark_running(job_key)
+        ledger.mark_done(job_key)
+    for job_key in failed:
+        ledger.mark_failed(job_key, "Failed.")
+
+    # Keys unknown to the ledger are not found
+    lookup = job_keys + [f"unknown_{index}" for index in range(7)]
+    assert ledger.filter_state(lookup) == done
+    assert ledger.filter_states(lookup, [JobState.DONE, JobState.FAILED]) == done | failed
+    assert ledger.filter_states(iter(lookup), [JobState.FAILED]) == failed
+    assert ledger.filter_states([], [JobState.DONE]) == set()
+
+
+def _claim_all(db_path: str, claimed_path: str):
+    ledger = JobLedger(db_path)
+    with open(claimed_path, "w") as file:
+        while True:
+            claimed = ledger.claim_next(lease_s=600.0)
+            if claimed is None:
+                break
+            file.write(f"{claimed[0]}\n")
+            file.flush()
+
+
+def test_concurrent_claims_never_share_a_job(tmp_path):
+    db_path = str(tmp_path / "job_ledger.db")
+    job_keys = {f"job_{index:03d}" for index in range(200)}
+    JobLedger(db_path).submit((job_key, 0.0, {}) for job_key in job_keys)
+
+    context = multiprocessing.get_context("spawn")
+    claimed_paths = [str(tmp_path / f"claimed_{worker}.txt") for worker in range(2)]
+    processes = [
+        context.Process(target=_claim_all, args=(db_path, claimed_path))
+        for claimed_path in claimed_paths
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=120)
+        assert process.exitcode == 0
+
+    claimed = []
+    for claimed_path in claimed_paths:
+        assert os.path.exists(claimed_path)
+        with open(claimed_path, "r") as file:
+            claimed.append(file.read().split())
+    assert len(claimed[0]) + len(claimed[1]) == len(job_keys)
+    assert set(claimed[0]) | set(claimed[1]) == job_keys
+    assert not set(claimed[0]) & set(claimed[1])
+    assert JobLedger(db_path).get_jobs(JobState.RUNNING) == job_keys
@@ -0,0 +1,142 @@
+from config.data_models.scheduled_job import ScheduledJob
+from modules.campaign.job_ledger import JobLedger, JobState
+from modules.campaign.parallel_executor import CoreBudgetedExecutor
+from modules.campaign.queue_worker import QueueWorker
+from typing import Any, Dict
+import multiprocessing
+import os
+import signal
+import time
+import pytest
+
+
+def _record_run(job_id: str, marker_dir: str, duration_s: float):
+    """
+    Trivial job target: appends a line to the job's marker file, then sleeps.
+    A job that was started before (e.g. by a killed worker) finishes at once,
+    as a job resumed from its checkpoint would.
+    """
+    marker_path = os.path.join(marker_dir, f"{job_id}.runs")
+    resumed = os.path.exists(marker_path)
+    with open(marker_path, "a") as file:
+        file.write(f"{os.getpid()}\n")
+    if not resumed:
+        time.sleep(duration_s)
+
+
+def _run_worker(
+    db_path: str,
+    marker_dir: str,
+    total_cores: int = 2,
+    lease_s: float = 30.0,
+    heartbeat_s: float = 1.0,
+):
+    ledger = JobLedger(db_path)
+
+    def make_job(job_key: str, payload: Dict[str, Any]) -> ScheduledJob:
+        return ScheduledJob(
+            job_id=job_key,
+            target=_record_run,
+            kwargs=dict(job_id=job_key, marker_dir=marker_dir, **payload),
+            atom_count=1,
+        )
+
+    executor = CoreBudgetedExecutor(
+        total_cores=total_cores, total_memory_gb=None, min_cores_per_job=1
+    )
+    executor.poll_interval = 0.1
+    QueueWorker(
+        ledger=ledger,
+        make_job=make_job,
+        executor=executor,
+        lease_s=lease_s,
+        heartbeat_s=heartbeat_s,
+        poll_s=0.2,
+    ).run(on_success=ledger.mark_done, on_failure=ledger.mark_failed)
+
+
+def _read_runs(marker_dir: str, job_key: str) -> list:
+    marker_path = os.path.join(marker_dir, f"{job_key}.runs")
+    if not os.path.exists(marker_path):
+        return []
+    with open(marker_path, "r") as file:
+        return file.read().split()
+
+
+def _wait_for(condition, timeout_s: float = 120.0):
+    deadline = time.time() + timeout_s
+    while not condition():
+        if time.time() > deadline:
+            raise TimeoutError("Condition not met in time.")
+        time.sleep(0.1)
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    # Workers and their jobs write checkpoints, caches and logs relative to
+    # the working directory
+    monkeypatch.chdir(tmp_path)
+    marker_dir = tmp_path / "markers"
+    marker_dir.mkdir()
+    return str(tmp_path / "job_ledger.db"), str(marker_dir)
+
+
+def test_workers_run_each_job_once(queue):
+    db_path, marker_dir = queue
+    job_keys = [f"job_{index:02d}" for index in range(12)]
+    JobLedger(db_path).submit(
+        (job_key, float(index), {"duration_s": 0.5})
+        for index, job_key in enumerate(job_keys)
+    )
+
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=_run_worker, args=(db_path, marker_dir)) for _ in range(3)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=300)
+        assert worker.exitcode == 0
+
+    ledger = JobLedger(db_path)
+    assert ledger.get_jobs(JobState.DONE) == set(job_keys)
+    for job_key in job_keys:
+        assert len(_read_runs(marker_dir, job_key)) == 1, job_key
+
+
+def test_killed_worker_job_is_reclaimed(queue):
+    db_path, marker_dir = queue
+    ledger = JobLedger(db_path)
+    ledger.submit([("job_slow", 0.0, {"duration_s": 600.0})])
+
+    context = multiprocessing.get_context("spawn")
+    doomed = context.Process(
+        target=_run_worker,
+        args=(db_path, marker_dir),
+        kwargs=dict(total_cores=1, lease_s=2.0, heartbeat_s=0.5),
+    )
+    doomed.start()
+    _wait_for(lambda: len(_read_runs(marker_dir, "job_slow")) == 1)
+    assert ledger.get_state("job_slow") == JobState.RUNNING
+
+    # The node dies: neither the worker nor its job process get to clean up
+    doomed.kill()
+    doomed.join()
+    os.kill(int(_read_runs(marker_dir, "job_slow")[0]), signal.SIGKILL)
+    assert ledger.get_state("job_slow") == JobState.RUNNING
+
+    survivor = context.Process(
+        target=_run_worker, args=(db_path, marker_dir), kwargs=dict(total_cores=1)
+    )
+    survivor.start()
+    survivor.join(timeout=300)
+    assert survivor.exitcode == 0
+
+    assert ledger.get_state("job_slow") == JobState.DONE
+    assert len(_read_runs(marker_dir, "job_slow")) == 2
+    with ledger._connect() as connection:
+        attempts = connection.execute(
+            "SELECT attempts FROM jobs WHERE job_key = ?", ("job_slow",)
+        ).fetchone()[0]
+    assert attempts == 2
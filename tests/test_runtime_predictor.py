@@ -0,0 +1,187 @@
+from modules.campaign.runtime_predictor import (
+    RuntimeHistory,
+    RuntimePredictor,
+    harvest_timings,
+    parse_mdrun_log,
+    record_runtime_history,
+)
+import multiprocessing
+import numpy as np
+import pandas as pd
+import os
+import shutil
+import sqlite3
+import pytest
+
+LOG_FIXTURES_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "fixtures", "mdrun_logs"
+)
+
+
+def _fixture_path(name: str) -> str:
+    return os.path.join(LOG_FIXTURES_DIR, name)
+
+
+def _synthetic_timings(coefficients, n_samples: int = 200, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    atom_count = rng.integers(1_000, 200_000, n_samples)
+    nsteps = rng.choice([5_000, 50_000, 500_000], n_samples)
+    n_threads = rng.choice([1, 2, 4, 8, 16], n_samples)
+    box_volume_nm3 = atom_count / 100.0 * rng.uniform(0.8, 1.2, n_samples)
+    is_minimisation = rng.random(n_samples) < 0.3
+    features = RuntimePredictor._features(
+        atom_count, nsteps, n_threads, box_volume_nm3, is_minimisation
+    )
+    return pd.DataFrame(
+        {
+            "stage_name": "synthetic",
+            "atom_count": atom_count,
+            "nsteps": nsteps,
+            "n_threads": n_threads,
+            "wall_time_s": np.exp(features @ np.asarray(coefficients)),
+            "is_minimisation": is_minimisation,
+            "box_volume_nm3": box_volume_nm3,
+            "log_path": None,
+        }
+    )
+
+
+def test_parse_mdrun_log_md():
+    timing = parse_mdrun_log(_fixture_path("npt.log"))
+    assert timing.stage_name == "npt"
+    assert timing.atom_count == 3000
+    assert timing.nsteps == 50000
+    assert timing.n_threads == 8
+    assert timing.wall_time_s == pytest.approx(120.03)
+    assert not timing.is_minimisation
+    assert timing.box_volume_nm3 is None
+
+
+def test_parse_mdrun_log_minimisation():
+    timing = parse_mdrun_log(_fixture_path("em.log"))
+    assert timing.atom_count == 1500
+    assert timing.nsteps == 5000
+    # 2 thread-MPI ranks of 4 OpenMP threads each
+    assert timing.n_threads == 8
+    assert timing.wall_time_s == pytest.approx(5.0)
+    assert timing.is_minimisation
+
+
+def test_parse_mdrun_log_incomplete():
+    assert parse_mdrun_log(_fixture_path("incomplete.log")) is None
+
+
+def test_parse_mdrun_log_reads_output_gro(tmp_path):
+    # Workflow steps save logs to log_files/ and coordinates to gro_files/
+    log_dir = tmp_path / "log_files"
+    gro_dir = tmp_path / "gro_files"
+    log_dir.mkdir()
+    gro_dir.mkdir()
+    shutil.copy(_fixture_path("npt.log"), log_dir / "npt.log")
+    (gro_dir / "npt.gro").write_text(
+        "Solvent box\n"
+        "    2\n"
+        "    1SOL     OW    1   0.126   1.624   1.679\n"
+        "    1SOL    HW1    2   0.190   1.661   1.747\n"
+        "   2.00000   3.00000   4.00000\n"
+    )
+    timing = parse_mdrun_log(str(log_dir / "npt.log"))
+    assert timing.atom_count == 2
+    assert timing.box_volume_nm3 == pytest.approx(24.0)
+
+
+def test_harvest_timings_skips_incomplete_logs():
+    timings = harvest_timings([LOG_FIXTURES_DIR])
+    assert sorted(timings["stage_name"]) == ["em", "npt"]
+
+
+def test_fit_recovers_coefficients():
+    coefficients = [np.log(1e-6), 1.1, 0.95, -0.8, 0.05, -1.5]
+    predictor = RuntimePredictor().fit(_synthetic_timings(coefficients))
+    assert predictor.n_samples == 200
+    # The ridge penalty leaves a small bias in the intercept, the fitted
+    # scaling in each feature and the predictions must match
+    np.testing.assert_allclose(predictor.coefficients[1:], coefficients[1:], atol=0.05)
+    expected = np.exp(
+        RuntimePredictor._features([10_000], [50_000], [8], [100.0], [False])
+        @ np.asarray(coefficients)
+    )[0]
+    assert predictor.predict(10_000, 50_000, 8, 100.0) == pytest.approx(expected, rel=0.05)
+
+
+def test_fit_keeps_default_with_few_timings():
+    timings = harvest_timings([LOG_FIXTURES_DIR])
+    predictor = RuntimePredictor().fit(timings)
+    assert predictor.n_samples == 0
+    np.testing.assert_allclose(
+        predictor.coefficients, RuntimePredictor.default_coefficients
+    )
+
+
+def test_default_predict_scales_with_work():
+    predictor = RuntimePredictor()
+    runtime = predictor.predict(10_000, 50_000, n_threads=4)
+    assert predictor.predict(20_000, 50_000, n_threads=4) == pytest.approx(2 * runtime)
+    assert predictor.predict(10_000, 50_000, n_threads=8) == pytest.approx(runtime / 2)
+
+
+def test_save_and_load(tmp_path):
+    coefficients = [np.log(1e-6), 1.1, 0.95, -0.8, 0.05, -1.5]
+    predictor = RuntimePredictor().fit(_synthetic_timings(coefficients))
+    model_path = str(tmp_path / "runtime_model.json")
+    predictor.save(model_path)
+    loaded = RuntimePredictor.load(model_path)
+    np.testing.assert_allclose(loaded.coefficients, predictor.coefficients)
+    assert loaded.n_samples == predictor.n_samples
+
+
+def test_record_runtime_history(tmp_path):
+    history_path = str(tmp_path / "runtime_history.db")
+    assert record_runtime_history(LOG_FIXTURES_DIR, history_path) == 2
+    # Harvesting the same log directory again records nothing new
+    assert record_runtime_history(LOG_FIXTURES_DIR, history_path) == 0
+    timings = RuntimeHistory(history_path).read()
+    assert len(timings) == 2
+    assert timings["atom_count"].dtype == np.int64
+    assert timings["is_minimisation"].dtype == bool
+    assert timings["box_volume_nm3"].isna().all()
+
+
+def _append_history(history_path: str, worker: int, n_appends: int):
+    history = RuntimeHistory(history_path)
+    timings = harvest_timings([LOG_FIXTURES_DIR])
+    for i in range(n_appends):
+        # Distinct log paths, as if every append came from another workflow
+        history.append(timings.assign(log_path=timings["log_path"] + f".{worker}.{i}"))
+
+
+def test_concurrent_history_appends(tmp_path):
+    history_path = str(tmp_path / "runtime_history.db")
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_append_history, args=(history_path, worker, 10))
+        for worker in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=120)
+        assert process.exitcode == 0
+    timings = RuntimeHistory(history_path).read()
+    assert len(timings) == 4 * 10 * 2
+    assert timings["wall_time_s"].dtype == np.float64
+    # The history still fits once enough timings were recorded
+    RuntimePredictor().fit(timings)
+
+
+def test_history_drops_existing_duplicates(tmp_path):
+    history_path = str(tmp_path / "runtime_history.db")
+    history = RuntimeHistory(history_path)
+    timings = harvest_timings([LOG_FIXTURES_DIR])
+    history.append(timings)
+    # As written before timings were unique per log file
+    with sqlite3.connect(history_path) as connection:
+        connection.execute("DROP INDEX timings_log_stage")
+        connection.execute("INSERT INTO timings SELECT * FROM timings")
+    assert history.append(timings) == 0
+    assert len(history.read()) == 2
@@ -0,0 +1,38 @@
+from modules.gromacs.parsers.topology import Topology
+
+SOLVENT_ITP = """[ atomtypes ]
+; name  at.num  mass  charge  ptype  sigma  epsilon
+ ow ow 0.00000 0.00000 A 3.15e-01 6.36e-01
+
+[ moleculetype ]
+; name  nrexcl
+ SOL 2
+
+[ atoms ]
+;   nr  type  resnr  residue  atom  cgnr  charge  mass
+     1    ow      1      SOL    OW     1  -0.834  16.00000
+     2    hw      1      SOL   HW1     1   0.417   1.00800
+     3    hw      1      SOL   HW2     1   0.417   1.00800
+
+[ pairs ]
+;  ai  aj  funct
+    1   2      1   0.1
+
+[ bonds ]
+;  ai  aj  funct
+"""
+
+
+def test_unreadable_sections_are_kept_as_text(tmp_path):
+    # The first row of [ pairs ] has an extra column, [ bonds ] has no rows
+    path = tmp_path / "solvent.itp"
+    path.write_text(SOLVENT_ITP)
+    topology = Topology.from_file(str(path))
+    assert set(topology.tables) == {"atomtypes", "atoms"}
+    assert topology.untabled_sections == ["bonds", "pairs"]
+
+    # Sections kept as text are exported as they were read
+    topology.export(str(tmp_path / "out.itp"))
+    exported = (tmp_path / "out.itp").read_text()
+    assert "[ pairs ]\n;  ai  aj  funct\n    1   2      1   0.1\n" in exported
+    assert "[ bonds ]\n;  ai  aj  funct\n" in exported